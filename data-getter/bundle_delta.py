@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+Offline Bundle Deltas
+
+Devices that already hold an offline bundle (offline_bundle.py) should not
+download the whole catalogue again after every crawl. Each publish builds the
+new bundle with the row ids of the previous one and writes the row-level
+change set between the two:
+
+    data/offline_bundles/bundle_{version}.db(.gz)   the latest full bundle
+    data/offline_bundles/delta_{from}_{to}.bin      inserted rows, changed
+                                                    columns of updated rows
+                                                    and keys of deleted rows,
+                                                    per table
+    data/offline_bundles/manifest.json              the chain of versions,
+                                                    oldest first
+
+A device several versions behind gets one compacted patch: the deltas after
+its version are folded together, so a row changed on three nights is sent
+once and a product added and removed in between is not sent at all. When the
+patch would not be smaller than the compressed bundle, or the chain is broken
+by a schema change, the device downloads the full bundle instead.
+
+Delta files use the single-file layout of price_history.py: magic, header
+length, JSON header, then the zlib-compressed change set.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import struct
+import tempfile
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from catalogue import load_products
+from chunk_diff import write_json
+from config import OUTPUT_DIR
+from offline_bundle import BUNDLE_VERSION, TABLES, compress, synthetic_products, write_bundle
+
+MAGIC = b'BDD1'
+BUNDLE_DIR = os.path.join(OUTPUT_DIR, 'offline_bundles')
+
+DELTA_TABLES = ('bundle_info',) + tuple(TABLES)
+
+# Tables whose rows feed the product_search view, and the column that names the product
+SEARCH_SOURCES = {'products': 'id', 'specs': 'product', 'product_lists': 'product'}
+# Lookup tables shown in product_search: changing a row changes every product that refers to it
+SEARCH_LOOKUPS = {
+    'brands': 'SELECT id FROM products WHERE brand IN ({})',
+    'categories': 'SELECT id FROM products WHERE category IN ({})',
+    'spec_keys': 'SELECT product FROM specs WHERE key IN ({})',
+}
+SEARCH_COLUMNS = ('name', 'brand', 'category', 'description', 'specs', 'features')
+
+# Daily change rates of a simulated crawl, as fractions of the catalogue
+CRAWL_CHANGES = {'price': 0.05, 'availability': 0.02, 'edited': 0.01, 'added': 0.005, 'removed': 0.003}
+
+def primary_key(conn: sqlite3.Connection, table: str) -> List[str]:
+    columns = [(row[5], row[1]) for row in conn.execute(f'PRAGMA table_info({table})') if row[5]]
+    return [name for _, name in sorted(columns)]
+
+def read_table(conn: sqlite3.Connection, table: str) -> Tuple[List[str], List[str], Dict[tuple, tuple]]:
+    """(columns, key columns, key -> row) of one table"""
+    columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+    key = primary_key(conn, table)
+    positions = [columns.index(name) for name in key]
+    rows = {tuple(row[i] for i in positions): row for row in conn.execute(f'SELECT * FROM {table}')}
+    return columns, key, rows
+
+def bundle_version(conn: sqlite3.Connection) -> Optional[str]:
+    row = conn.execute("SELECT value FROM bundle_info WHERE key = 'version'").fetchone()
+    return row[0] if row else None
+
+def diff_bundles(old_path: str, new_path: str) -> Dict:
+    """Row-level change set that turns the old bundle into the new one"""
+    old = sqlite3.connect(f'file:{old_path}?mode=ro', uri=True)
+    new = sqlite3.connect(f'file:{new_path}?mode=ro', uri=True)
+    delta = {'from': bundle_version(old), 'to': bundle_version(new), 'schema': BUNDLE_VERSION, 'tables': {}}
+    for table in DELTA_TABLES:
+        columns, key, before = read_table(old, table)
+        _, _, after = read_table(new, table)
+        changes = {'columns': columns, 'key': key, 'insert': {}, 'update': {}, 'delete': set()}
+        for pk, row in after.items():
+            if pk not in before:
+                changes['insert'][pk] = list(row)
+            elif before[pk] != row:
+                changes['update'][pk] = {name: value for name, value, old_value in zip(columns, row, before[pk])
+                                         if value != old_value}
+        changes['delete'] = {pk for pk in before if pk not in after}
+        delta['tables'][table] = changes
+    old.close()
+    new.close()
+    return delta
+
+def compose(first: Dict, second: Dict) -> Dict:
+    """One delta with the effect of applying 'first' and then 'second'"""
+    if first['to'] != second['from']:
+        raise ValueError(f"Delta to {first['to']} can't be followed by a delta from {second['from']}")
+    result = {'from': first['from'], 'to': second['to'], 'schema': second['schema'], 'tables': {}}
+    for table, later in second['tables'].items():
+        earlier = first['tables'][table]
+        insert, update, delete = dict(earlier['insert']), dict(earlier['update']), set(earlier['delete'])
+        columns = later['columns'] or earlier['columns']
+        for pk in later['delete']:
+            if insert.pop(pk, None) is None:  # rows added after the base never reach the device
+                update.pop(pk, None)
+                delete.add(pk)
+        for pk, row in later['insert'].items():
+            if pk in delete:
+                # The base had a row under this key: overwrite every column
+                delete.discard(pk)
+                update[pk] = dict(zip(columns, row))
+            else:
+                insert[pk] = row
+        for pk, changed in later['update'].items():
+            if pk in insert:
+                row = list(insert[pk])
+                for name, value in changed.items():
+                    row[columns.index(name)] = value
+                insert[pk] = row
+            else:
+                update[pk] = {**update.get(pk, {}), **changed}
+        result['tables'][table] = {'columns': columns, 'key': later['key'] or earlier['key'], 'insert': insert,
+                                   'update': update, 'delete': delete}
+    return result
+
+def delta_stats(delta: Dict) -> Dict[str, int]:
+    return {op: sum(len(changes[op]) for changes in delta['tables'].values())
+            for op in ('insert', 'update', 'delete')}
+
+def encode_delta(delta: Dict) -> bytes:
+    """Delta file bytes: magic, header, then the zlib-compressed change set"""
+    tables = {}
+    for table, changes in delta['tables'].items():
+        if not (changes['insert'] or changes['update'] or changes['delete']):
+            continue
+        tables[table] = {
+            'columns': changes['columns'],
+            'key': changes['key'],
+            'insert': [changes['insert'][pk] for pk in sorted(changes['insert'])],
+            'update': [list(pk) + [changes['update'][pk]] for pk in sorted(changes['update'])],
+            'delete': [list(pk) for pk in sorted(changes['delete'])],
+        }
+    body = zlib.compress(json.dumps(tables, separators=(',', ':'), ensure_ascii=False).encode('utf-8'), 9)
+    header = json.dumps({'from': delta['from'], 'to': delta['to'], 'schema': delta['schema'],
+                         'created_at': datetime.now().isoformat(), 'changes': delta_stats(delta)}).encode('utf-8')
+    return MAGIC + struct.pack('<I', len(header)) + header + body
+
+def decode_delta(data: bytes) -> Dict:
+    if data[:4] != MAGIC:
+        raise ValueError("Not a bundle delta")
+    size, = struct.unpack('<I', data[4:8])
+    header = json.loads(data[8:8 + size])
+    tables = json.loads(zlib.decompress(data[8 + size:]))
+    delta = {'from': header['from'], 'to': header['to'], 'schema': header['schema'], 'tables': {}}
+    for table in DELTA_TABLES:
+        changes = tables.get(table)
+        if not changes:
+            delta['tables'][table] = {'columns': [], 'key': [], 'insert': {}, 'update': {}, 'delete': set()}
+            continue
+        width = len(changes['key'])
+        positions = [changes['columns'].index(name) for name in changes['key']]
+        delta['tables'][table] = {
+            'columns': changes['columns'],
+            'key': changes['key'],
+            'insert': {tuple(row[i] for i in positions): row for row in changes['insert']},
+            'update': {tuple(entry[:width]): entry[width] for entry in changes['update']},
+            'delete': {tuple(pk) for pk in changes['delete']},
+        }
+    return delta
+
+def read_delta(path: str) -> Dict:
+    with open(path, 'rb') as f:
+        return decode_delta(f.read())
+
+def searched_products(conn: sqlite3.Connection, delta: Dict) -> List[int]:
+    """Products whose product_search row the delta can change"""
+    products = set()
+    for table, column in SEARCH_SOURCES.items():
+        changes = delta['tables'][table]
+        if not changes['columns']:
+            continue
+        position = changes['key'].index(column)
+        for op in ('insert', 'update', 'delete'):
+            products.update(pk[position] for pk in changes[op])
+    for table, sql in SEARCH_LOOKUPS.items():
+        changes = delta['tables'][table]
+        ids = [pk[0] for pk in list(changes['update']) + list(changes['delete'])]
+        if ids:
+            products.update(row[0] for row in conn.execute(sql.format(', '.join('?' * len(ids))), ids))
+    return sorted(products)
+
+def apply_delta(path: str, delta: Dict):
+    """Apply a delta to a bundle in one transaction, keeping the search index in step
+
+    This is what the app does with a downloaded patch.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        current = bundle_version(conn)
+        if current != delta['from']:
+            raise ValueError(f"Bundle is at {current}, the delta starts from {delta['from']}")
+        with conn:
+            products = searched_products(conn, delta)
+            placeholders = ', '.join('?' * len(products))
+            columns = ', '.join(SEARCH_COLUMNS)
+            # External content: the old text must be removed while the rows still hold it
+            conn.execute(f"INSERT INTO products_fts (products_fts, rowid, {columns}) "
+                         f"SELECT 'delete', id, {columns} FROM product_search WHERE id IN ({placeholders})", products)
+            for table in reversed(DELTA_TABLES):
+                changes = delta['tables'][table]
+                if changes['delete']:
+                    where = ' AND '.join(f'{name} = ?' for name in changes['key'])
+                    conn.executemany(f'DELETE FROM {table} WHERE {where}', sorted(changes['delete']))
+            for table in DELTA_TABLES:
+                changes = delta['tables'][table]
+                if changes['insert']:
+                    names = changes['columns']
+                    conn.executemany(f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                                     list(changes['insert'].values()))
+                where = ' AND '.join(f'{name} = ?' for name in changes['key'])
+                for pk, changed in changes['update'].items():
+                    assignments = ', '.join(f'{name} = ?' for name in changed)
+                    conn.execute(f'UPDATE {table} SET {assignments} WHERE {where}', list(changed.values()) + list(pk))
+            conn.execute(f"INSERT INTO products_fts (rowid, {columns}) "
+                         f"SELECT id, {columns} FROM product_search WHERE id IN ({placeholders})", products)
+    finally:
+        conn.close()
+
+def load_manifest(directory: str = BUNDLE_DIR) -> Dict:
+    try:
+        with open(os.path.join(directory, 'manifest.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {'versions': []}
+
+def publish(products: List[Dict], directory: str = BUNDLE_DIR, page_size: Optional[int] = None) -> Dict:
+    """Build the next bundle in the chain and the delta from the previous one
+
+    Returns its manifest entry, or None when the catalogue has not changed.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = load_manifest(directory)
+    latest = manifest['versions'][-1] if manifest['versions'] else None
+    previous = os.path.join(directory, f"bundle_{latest['version']}.db") if latest else None
+    # A schema change starts a new chain: row ids and columns are not comparable across it
+    if latest and (latest['schema'] != BUNDLE_VERSION or not os.path.exists(previous)):
+        previous = None
+
+    tmp_path = os.path.join(directory, 'bundle.db.tmp')
+    stats = write_bundle(tmp_path, products, page_size, previous)
+    if latest and stats['version'] == latest['version']:
+        os.remove(tmp_path)
+        return None
+    path = os.path.join(directory, f"bundle_{stats['version']}.db")
+    os.replace(tmp_path, path)
+    compressed = compress(path)
+
+    entry = {
+        'version': stats['version'],
+        'created_at': datetime.now().isoformat(),
+        'schema': BUNDLE_VERSION,
+        'products': stats['rows']['products'],
+        'bundle': os.path.basename(compressed),
+        'bundle_bytes': stats['bytes'],
+        'compressed_bytes': os.path.getsize(compressed),
+        'delta': None,
+        'delta_bytes': None,
+        'changes': None,
+    }
+    if previous:
+        delta = diff_bundles(previous, path)
+        name = f"delta_{delta['from']}_{delta['to']}.bin"
+        data = encode_delta(delta)
+        with open(os.path.join(directory, name), 'wb') as f:
+            f.write(data)
+        entry.update(delta=name, delta_bytes=len(data), changes=delta_stats(delta))
+    manifest['versions'].append(entry)
+    # Written last: an interrupted publish leaves the chain as it was
+    write_json(os.path.join(directory, 'manifest.json'), manifest)
+
+    # Only the newest full bundle is kept; older versions are reached through deltas
+    for version in manifest['versions'][:-1]:
+        for suffix in ('.db', '.db.gz'):
+            old = os.path.join(directory, f"bundle_{version['version']}{suffix}")
+            if os.path.exists(old):
+                os.remove(old)
+    return entry
+
+def patch(version: str, directory: str = BUNDLE_DIR) -> Optional[bytes]:
+    """Compacted delta from a device's version to the latest, or None when it should get the full bundle"""
+    versions = load_manifest(directory)['versions']
+    index = next((i for i, entry in enumerate(versions) if entry['version'] == version), None)
+    if index is None or index == len(versions) - 1:
+        return None
+    links = versions[index + 1:]
+    if any(entry['delta'] is None for entry in links):
+        return None
+    delta = read_delta(os.path.join(directory, links[0]['delta']))
+    for entry in links[1:]:
+        delta = compose(delta, read_delta(os.path.join(directory, entry['delta'])))
+    data = encode_delta(delta)
+    return data if len(data) < versions[-1]['compressed_bytes'] else None
+
+def dump(path: str) -> Dict[str, List[tuple]]:
+    """Every row of every table, to compare a patched bundle with a freshly built one"""
+    conn = sqlite3.connect(path)
+    rows = {table: sorted(map(tuple, conn.execute(f'SELECT * FROM {table}')), key=repr) for table in DELTA_TABLES}
+    conn.execute("INSERT INTO products_fts (products_fts, rank) VALUES ('integrity-check', 1)")
+    conn.close()
+    return rows
+
+def crawl(products: List[Dict], day: int, rng: random.Random) -> List[Dict]:
+    """The catalogue after one more nightly crawl: price and stock changes, edits, new and removed products"""
+    products = [dict(product) for product in products]
+    count = len(products)
+    for product in rng.sample(products, int(count * CRAWL_CHANGES['price'])):
+        price = float(product.get('price') or 20.0)
+        product['price'] = round(max(1.0, price * rng.uniform(0.8, 1.1))) - 0.01
+    for product in rng.sample(products, int(count * CRAWL_CHANGES['availability'])):
+        product['availability'] = not product.get('availability', True)
+    for product in rng.sample(products, int(count * CRAWL_CHANGES['edited'])):
+        product['description'] = f"{product.get('description') or ''} Updated listing {day}.".strip()
+    removed = {id(product) for product in rng.sample(products, int(count * CRAWL_CHANGES['removed']))}
+    products = [product for product in products if id(product) not in removed]
+    for i in range(int(count * CRAWL_CHANGES['added'])):
+        product = dict(rng.choice(products))
+        for field in ('id', 'sku', 'model'):
+            if product.get(field):
+                product[field] = f"{product[field]}-new{day}.{i}"
+        products.append(product)
+    return products
+
+def simulate(products: List[Dict], days: int, copies: int, seed: int = 0) -> List[Dict]:
+    """Publish a week of simulated crawls into a throwaway chain and check every patch"""
+    rng = random.Random(seed)
+    catalogue = synthetic_products(products, copies)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        first = publish(catalogue, directory)
+        base = os.path.join(directory, 'device.db')
+        shutil.copyfile(os.path.join(directory, f"bundle_{first['version']}.db"), base)
+        chained = os.path.join(directory, 'chained.db')
+        shutil.copyfile(base, chained)
+        conn = sqlite3.connect(base)
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        conn.close()
+
+        for day in range(1, days + 1):
+            catalogue = crawl(catalogue, day, rng)
+            started = time.perf_counter()
+            entry = publish(catalogue, directory, page_size)
+            build_seconds = time.perf_counter() - started
+            latest = os.path.join(directory, f"bundle_{entry['version']}.db")
+
+            # A device that synced yesterday applies tonight's delta
+            apply_delta(chained, read_delta(os.path.join(directory, entry['delta'])))
+            # A device still on the first bundle gets one compacted patch
+            started = time.perf_counter()
+            data = patch(first['version'], directory)
+            patch_seconds = time.perf_counter() - started
+            device = os.path.join(directory, 'patched.db')
+            shutil.copyfile(base, device)
+            started = time.perf_counter()
+            apply_delta(device, decode_delta(data))
+            apply_seconds = time.perf_counter() - started
+
+            expected = dump(latest)
+            results.append({
+                'day': day,
+                'products': entry['products'],
+                'changes': entry['changes'],
+                'delta_bytes': entry['delta_bytes'],
+                'patch_bytes': len(data),
+                'bundle_bytes': entry['bundle_bytes'],
+                'compressed_bytes': entry['compressed_bytes'],
+                'build_seconds': round(build_seconds, 2),
+                'patch_seconds': round(patch_seconds, 3),
+                'apply_seconds': round(apply_seconds, 3),
+                'verified': dump(chained) == expected and dump(device) == expected,
+            })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Versioned deltas between offline catalogue bundles')
+    parser.add_argument('--dir', default=BUNDLE_DIR, help='Bundle chain directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('publish', help='Build the next bundle and its delta from the latest product data')
+    commands.add_parser('status', help='Show the version chain')
+    command = commands.add_parser('patch', help='Write the compacted patch from a version to the latest')
+    command.add_argument('version')
+    command.add_argument('--output', help='Patch file (default: data/offline_bundles/patch_{from}_{to}.bin)')
+    command = commands.add_parser('apply', help='Apply a delta or patch file to a bundle')
+    command.add_argument('bundle')
+    command.add_argument('delta')
+    command = commands.add_parser('simulate', help='Delta vs full bundle size over simulated nightly crawls')
+    command.add_argument('--days', type=int, default=7)
+    command.add_argument('--copies', type=int, default=200, help='Copies of the catalogue to start from')
+    command.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == 'status':
+        versions = load_manifest(args.dir)['versions']
+        if not versions:
+            print("No bundles published yet. Run: python bundle_delta.py publish")
+        for entry in versions:
+            delta = (f"delta {entry['delta_bytes'] / 1024:.1f} KB ({entry['changes']['insert']} ins, "
+                     f"{entry['changes']['update']} upd, {entry['changes']['delete']} del)"
+                     if entry['delta'] else 'full bundle only')
+            print(f"📦 {entry['version']}  {entry['created_at'][:19]}  {entry['products']:,} products  "
+                  f"{entry['compressed_bytes'] / 1024:.1f} KB gz  {delta}")
+        return
+
+    if args.command == 'patch':
+        data = patch(args.version, args.dir)
+        if data is None:
+            print(f"Version {args.version} has no patch to the latest: download the full bundle")
+            return
+        output = args.output or os.path.join(args.dir, f"patch_{args.version}_{decode_delta(data)['to']}.bin")
+        with open(output, 'wb') as f:
+            f.write(data)
+        print(f"📁 Patch: {output} ({len(data) / 1024:.1f} KB)")
+        return
+
+    if args.command == 'apply':
+        delta = read_delta(args.delta)
+        apply_delta(args.bundle, delta)
+        stats = delta_stats(delta)
+        print(f"✅ {args.bundle} is now at {delta['to']} "
+              f"({stats['insert']} inserted, {stats['update']} updated, {stats['delete']} deleted)")
+        return
+
+    products = load_products()
+    if not products:
+        print("No product data found. Run comprehensive_drill_data.py or working_scraper.py first.")
+        return
+
+    if args.command == 'publish':
+        entry = publish(products, args.dir)
+        if entry is None:
+            print("✅ Catalogue unchanged since the latest bundle")
+            return
+        print(f"📦 Bundle {entry['version']}: {entry['products']:,} products, "
+              f"{entry['compressed_bytes'] / 1024:.1f} KB gz")
+        if entry['delta']:
+            print(f"   • Delta {entry['delta']}: {entry['delta_bytes'] / 1024:.1f} KB "
+                  f"({entry['changes']['insert']} inserted, {entry['changes']['update']} updated, "
+                  f"{entry['changes']['delete']} deleted rows)")
+        return
+
+    print(f"🧪 Simulating {args.days} nightly crawls over {len(products) * args.copies:,} products...")
+    results = simulate(products, args.days, args.copies, args.seed)
+    print(f"\n{'day':<5}{'products':>9}{'rows':>8}{'delta KB':>10}{'patch KB':>10}{'bundle KB':>11}"
+          f"{'gz KB':>9}{'delta/gz':>10}{'apply ms':>10}  ok")
+    for row in results:
+        rows = sum(row['changes'].values())
+        print(f"{row['day']:<5}{row['products']:>9,}{rows:>8,}{row['delta_bytes'] / 1024:>10.1f}"
+              f"{row['patch_bytes'] / 1024:>10.1f}{row['bundle_bytes'] / 1024:>11.0f}"
+              f"{row['compressed_bytes'] / 1024:>9.1f}{row['delta_bytes'] / row['compressed_bytes']:>10.1%}"
+              f"{row['apply_seconds'] * 1000:>10.0f}  {'✅' if row['verified'] else '❌'}")
+    print("\n'patch' is the compacted patch from the first bundle, as a device offline since then downloads it.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Catalogue Loading Helpers
+
+Finds the latest outputs written by the data-getter scripts and flattens them
+into one list of product records, whichever script produced them.
+"""
+
+import glob
+import json
+import os
+from typing import Dict, List, Optional
+
+from config import OUTPUT_DIR
+
+def latest_file(pattern: str, data_dir: str = OUTPUT_DIR) -> Optional[str]:
+    """Return the newest file matching a glob pattern in the data directory"""
+    files = [f for f in glob.glob(os.path.join(data_dir, pattern))
+             if not f.endswith('_metadata.json')]
+    return max(files) if files else None
+
+def load_json(path: str):
+    """Load a JSON file, returning None for empty or truncated files"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return None
+
+def load_products(data_dir: str = OUTPUT_DIR, include_scraped: bool = True) -> List[Dict]:
+    """Load curated and scraped products as a flat list of dicts
+
+    Every record gets an 'id', a 'product_type' and a 'source'. When the same
+    id appears in several datasets the first one wins and later datasets only
+    fill in fields it is missing.
+    """
+    products = {}
+
+    def add(record, product_type, source):
+        record = dict(record)
+        record.setdefault('id', record.get('sku') or record.get('model') or record.get('url'))
+        if not record['id']:
+            return
+        record.setdefault('product_type', product_type)
+        record.setdefault('source', source)
+        if record['id'] in products:
+            for key, value in record.items():
+                products[record['id']].setdefault(key, value)
+        else:
+            products[record['id']] = record
+
+    drilling_file = latest_file('comprehensive_drilling_data_*.json', data_dir)
+    if drilling_file:
+        data = load_json(drilling_file) or {}
+        for drill in data.get('drills', []):
+            add(drill, 'drill', os.path.basename(drilling_file))
+        for bit in data.get('drill_bits', []):
+            add(bit, 'drill_bit', os.path.basename(drilling_file))
+
+    hardware_file = latest_file('complete_hardware_data_*.json', data_dir)
+    if hardware_file:
+        data = load_json(hardware_file) or {}
+        for product in data.get('products', []):
+            add(product, 'product', os.path.basename(hardware_file))
+
+    if include_scraped:
+        from config import SITES_CONFIG
+        for site in SITES_CONFIG:
+            scraped_file = latest_file(f'products_{site}_*.json', data_dir)
+            if not scraped_file:
+                continue
+            for item in load_json(scraped_file) or []:
+                add(item, 'product', os.path.basename(scraped_file))
+
+    return list(products.values())
+
+def latest_prices(site: str, data_dir: str = OUTPUT_DIR) -> Dict[str, Dict]:
+    """Current price and availability per product URL for a site
+
+    Starts from the latest full scrape and applies, in order, the price
+    deltas written by refresh crawls since then.
+    """
+    prices = {}
+    products_file = latest_file(f'products_{site}_*.json', data_dir)
+    since = os.path.getmtime(products_file) if products_file else 0
+    if products_file:
+        for item in load_json(products_file) or []:
+            if item.get('url'):
+                prices[item['url']] = {
+                    'sku': item.get('sku'),
+                    'price': item.get('price'),
+                    'availability': item.get('availability'),
+                    'checked_at': item.get('scraped_at'),
+                }
+
+    delta_files = [f for f in glob.glob(os.path.join(data_dir, f'price_delta_{site}_*.jsonl'))
+                   if os.path.getmtime(f) >= since]
+    for delta_file in sorted(delta_files):
+        with open(delta_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    change = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                record = prices.setdefault(change['url'], {'sku': change.get('sku')})
+                for key in ('price', 'availability', 'checked_at'):
+                    record[key] = change.get(key)
+
+    return prices
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+RAG Chunk Deduplication
+
+Safety lines such as "Always wear safety glasses" and stock feature phrases
+appear nearly verbatim in many products, and every copy used to become its
+own chunk and its own embedding. This stage stores each distinct piece of
+content once, with the list of products it belongs to (a fan-out list):
+
+Products are identified by their `canonical_id` (entity_resolution.py) when
+the chunk has one, so one product listed by several sites counts once:
+
+1. List chunks (safety, features, applications) are split into their items;
+   items shared by at least `min_products` products move to a shared chunk
+   and the product chunk keeps only what is specific to it.
+2. Chunks of the same type and canonical id are one product listed on
+   several sites, and are merged into one.
+   Chunks of the same type whose content is identical after normalization
+   are merged into one. Boilerplate types (safety, features, applications)
+   are also merged when nearly identical: MinHash/LSH candidates confirmed by
+   exact Jaccard similarity of character shingles, with the same numbers and
+   model numbers. Overviews and specifications of sibling models differ only
+   in those tokens, so they are never merged on similarity.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from config import OUTPUT_DIR
+from entity_resolution import MinHasher, lsh_shape, normalize_text
+
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_MIN_PRODUCTS = 3
+
+# Chunk prefixes whose content is a '; '-separated list of independent items
+LIST_PREFIXES = ('Safety Information', 'Key Features', 'Features', 'Applications')
+
+# Chunk types made of stock phrases; other types are only merged when identical
+NEAR_DUPLICATE_TYPES = ('safety', 'features', 'applications',
+                        'drill_applications', 'drill_bit_materials', 'drill_bit_applications')
+
+# Vector size of the pgvector knowledge_embeddings table (OpenAI embeddings)
+EMBEDDING_DIM = 1536
+
+def char_shingles(text: str, k: int = 5) -> set:
+    text = normalize_text(text)
+    return {text[i:i + k] for i in range(max(len(text) - k + 1, 1))}
+
+def number_tokens(text: str) -> set:
+    """Tokens holding a digit: prices, sizes, model numbers ('129.00', '1-1/2', 'dcd771c2')"""
+    return set(re.findall(r'[a-z0-9]*\d[a-z0-9]*(?:[./-]\d+|,\d{3})*', str(text or '').lower()))
+
+def near_duplicate_groups(texts: List[str], threshold: float = DEFAULT_THRESHOLD) -> List[List[int]]:
+    """Group indexes of texts that are equal after normalization or nearly equal"""
+    parent = list(range(len(texts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # Exact duplicates first; only one text per normalized form goes through LSH
+    first_seen = {}
+    for i, text in enumerate(texts):
+        parent[i] = first_seen.setdefault(normalize_text(text), i)
+    unique = sorted(first_seen.values())
+
+    if threshold < 1.0 and len(unique) > 1:
+        shingle_sets = {i: char_shingles(texts[i]) for i in unique}
+        numbers = {i: number_tokens(texts[i]) for i in unique}
+        bands, rows = lsh_shape(threshold)
+        hasher = MinHasher()
+        signatures = np.array([hasher.signature(shingle_sets[i]) for i in unique], dtype=np.uint64)
+        candidates = set()
+        for band in range(bands):
+            buckets = {}
+            for position, key in enumerate(map(bytes, signatures[:, band * rows:(band + 1) * rows])):
+                buckets.setdefault(key, []).append(unique[position])
+            for members in buckets.values():
+                candidates.update((a, b) for k, a in enumerate(members) for b in members[k + 1:])
+        for a, b in sorted(candidates):
+            root_a, root_b = find(a), find(b)
+            if root_a == root_b:
+                continue
+            # Similar wording around another price or model number is another product
+            if numbers[a] != numbers[b]:
+                continue
+            union = len(shingle_sets[a] | shingle_sets[b])
+            if union and len(shingle_sets[a] & shingle_sets[b]) / union >= threshold:
+                parent[root_b] = root_a
+
+    groups = {}
+    for i in range(len(texts)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+def split_list_chunk(content: str):
+    """('Safety Information', [items]) for list chunks, else (None, None)"""
+    for prefix in LIST_PREFIXES:
+        if content.startswith(prefix + ': '):
+            items = [item.strip() for item in content[len(prefix) + 2:].split(';') if item.strip()]
+            return prefix, items
+    return None, None
+
+def product_ids(chunk: Dict) -> List[str]:
+    metadata = chunk.get('metadata', {})
+    return metadata.get('product_ids') or [metadata.get('product_id')]
+
+def canonical_ids(chunk: Dict) -> List[str]:
+    """Canonical product ids of a chunk's products; product ids where unresolved"""
+    metadata = chunk.get('metadata', {})
+    return metadata.get('canonical_ids') or [metadata.get('canonical_id') or pid for pid in product_ids(chunk)]
+
+def merge_chunks(members: List[Dict]) -> Dict:
+    """One chunk standing for several: shared metadata plus a product fan-out list"""
+    if len(members) == 1:
+        chunk = dict(members[0])
+        chunk['metadata'] = dict(chunk.get('metadata', {}), product_ids=product_ids(chunk))
+        return chunk
+
+    fan_out = []
+    products = []
+    chunk_ids = []
+    for member in members:
+        for product_id in product_ids(member):
+            if product_id not in fan_out:
+                fan_out.append(product_id)
+        for canonical_id in canonical_ids(member):
+            if canonical_id not in products:
+                products.append(canonical_id)
+        chunk_ids.extend(member.get('metadata', {}).get('chunk_ids') or [member['id']])
+
+    # Keep only metadata every member agrees on; brand or price of one product would mislead
+    first = members[0].get('metadata', {})
+    metadata = {key: value for key, value in first.items()
+                if key not in ('product_ids', 'canonical_ids', 'chunk_ids')
+                and all(m.get('metadata', {}).get(key) == value for m in members[1:])}
+    metadata.update({'product_id': fan_out[0], 'product_ids': fan_out, 'canonical_ids': products,
+                     'chunk_ids': chunk_ids, 'shared': True})
+
+    content = max((m['content'] for m in members), key=len)
+    digest = hashlib.sha1(f"{members[0].get('type')}\n{normalize_text(content)}".encode('utf-8')).hexdigest()
+    return {'id': f'shared_{digest[:12]}', 'type': members[0].get('type'), 'content': content, 'metadata': metadata}
+
+def extract_shared_items(chunks: List[Dict], threshold: float, min_products: int) -> List[Dict]:
+    """Move list items repeated across many products into shared chunks"""
+    items = []  # (chunk index, prefix, item)
+    for c, chunk in enumerate(chunks):
+        prefix, values = split_list_chunk(chunk.get('content', ''))
+        if prefix:
+            items.extend((c, prefix, value) for value in values)
+    if not items:
+        return chunks
+
+    shared_chunks = []
+    removed = set()
+    for group in near_duplicate_groups([f"{prefix}: {item}" for _, prefix, item in items], threshold):
+        owners = {cid for i in group for cid in canonical_ids(chunks[items[i][0]])}
+        if len(owners) < min_products:
+            continue
+        members = []
+        for i in group:
+            c, prefix, item = items[i]
+            removed.add(i)
+            members.append({
+                'id': chunks[c]['id'], 'type': chunks[c].get('type'),
+                'content': f'{prefix}: {item}', 'metadata': chunks[c].get('metadata', {}),
+            })
+        shared_chunks.append(merge_chunks(members))
+
+    remaining = {}
+    for i, (c, prefix, item) in enumerate(items):
+        if i not in removed:
+            remaining.setdefault(c, (prefix, []))[1].append(item)
+
+    result = []
+    for c, chunk in enumerate(chunks):
+        prefix, values = split_list_chunk(chunk.get('content', ''))
+        if not prefix:
+            result.append(chunk)
+        elif c in remaining:
+            prefix, kept = remaining[c]
+            result.append(dict(chunk, content=f"{prefix}: {'; '.join(kept)}") if len(kept) < len(values) else chunk)
+        # else: everything in it is shared and lives on in the shared chunks
+    return result + shared_chunks
+
+def vector_bytes(chunks: List[Dict], dim: int = EMBEDDING_DIM) -> int:
+    """float32 embedding memory for one vector per chunk"""
+    return len(chunks) * dim * 4
+
+def merge_duplicates(chunks: List[Dict], threshold: float) -> List[Dict]:
+    """Merge chunks of the same type: one product's listings, exact duplicates, boilerplate near duplicates"""
+    by_type = {}
+    for chunk in chunks:
+        by_type.setdefault(chunk.get('type'), []).append(chunk)
+    result = []
+    for chunk_type, typed in by_type.items():
+        # Listings of one product on several sites share a canonical id
+        by_product = {}
+        for i, chunk in enumerate(typed):
+            by_product.setdefault(chunk.get('metadata', {}).get('canonical_id') or i, []).append(chunk)
+        typed = [merge_chunks(members) if len(members) > 1 else members[0] for members in by_product.values()]
+        type_threshold = threshold if chunk_type in NEAR_DUPLICATE_TYPES else 1.0
+        for group in near_duplicate_groups([chunk['content'] for chunk in typed], type_threshold):
+            result.append(merge_chunks([typed[i] for i in group]))
+    return result
+
+def dedupe_chunks(chunks: List[Dict], threshold: float = DEFAULT_THRESHOLD,
+                  min_products: int = DEFAULT_MIN_PRODUCTS, dim: int = EMBEDDING_DIM) -> Tuple[List[Dict], Dict]:
+    """Deduplicate RAG chunks; returns the new chunks and a size report
+
+    Splitting out shared list items adds one chunk per shared item and only
+    removes a product chunk once all of its items are shared, so it is kept
+    only when it ends up with fewer chunks than merging whole chunks alone.
+    """
+    result = merge_duplicates(chunks, threshold)
+    split = merge_duplicates(extract_shared_items(chunks, threshold, min_products), threshold)
+    items_split = len(split) < len(result)
+    if items_split:
+        result = split
+
+    characters_before = sum(len(chunk.get('content', '')) for chunk in chunks)
+    characters_after = sum(len(chunk.get('content', '')) for chunk in result)
+    report = {
+        'chunks_before': len(chunks),
+        'chunks_after': len(result),
+        'chunk_reduction': 1 - len(result) / len(chunks) if chunks else 0.0,
+        'shared_chunks': sum(1 for chunk in result if chunk['metadata'].get('shared')),
+        'characters_before': characters_before,
+        'characters_after': characters_after,
+        # Rough embedding token count, ~4 characters per token
+        'embedding_tokens_saved': (characters_before - characters_after) // 4,
+        'embedding_dim': dim,
+        'vector_bytes_before': vector_bytes(chunks, dim),
+        'vector_bytes_after': vector_bytes(result, dim),
+        'list_items_split': items_split,
+        'threshold': threshold,
+        'min_products': min_products,
+    }
+    return result, report
+
+def format_report(report: Dict) -> str:
+    return (f"{report['chunks_before']} -> {report['chunks_after']} chunks "
+            f"({report['chunk_reduction']:.1%} fewer, {report['shared_chunks']} shared), "
+            f"vectors {report['vector_bytes_before'] / 1024:.0f} KB -> {report['vector_bytes_after'] / 1024:.0f} KB")
+
+def main():
+    parser = argparse.ArgumentParser(description='Deduplicate RAG chunks across products')
+    parser.add_argument('files', nargs='*', help='Chunk files (default: latest rag_chunks_* and drilling_rag_chunks_*)')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Character-shingle Jaccard similarity for near-duplicate boilerplate (1.0 = exact only)')
+    parser.add_argument('--min-products', type=int, default=DEFAULT_MIN_PRODUCTS,
+                        help='Products a list item must appear in to become a shared chunk')
+    parser.add_argument('--dim', type=int, default=EMBEDDING_DIM, help='Embedding dimension for the memory report')
+    args = parser.parse_args()
+
+    files = args.files
+    if not files:
+        for pattern in ('rag_chunks_*.json', 'drilling_rag_chunks_*.json'):
+            matches = [f for f in glob.glob(os.path.join(OUTPUT_DIR, pattern))
+                       if not f.endswith(('_deduped.json', '_dedup_report.json'))]
+            if matches:
+                files.append(max(matches))
+    if not files:
+        print("No RAG chunk files found. Run working_scraper.py or comprehensive_drill_data.py first.")
+        return
+
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            chunks = json.load(f)
+        deduped, report = dedupe_chunks(chunks, args.threshold, args.min_products, args.dim)
+
+        output_file = path.replace('.json', '_deduped.json')
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(deduped, f, indent=2, ensure_ascii=False)
+        report_file = path.replace('.json', '_dedup_report.json')
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+        print(f"🧹 {os.path.basename(path)}: {format_report(report)}")
+        print(f"   • ~{report['embedding_tokens_saved']} embedding tokens saved")
+        print(f"📄 {output_file}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Incremental Chunk Publishing
+
+Every run of comprehensive_drill_data.py or working_scraper.py writes a new
+chunk file with every chunk in it. This stage compares the latest chunks with
+the last published set by chunk id and content hash and writes only the
+difference:
+
+    data/chunk_diffs/diff_{timestamp}/diff.json     upserts (added and changed
+                                                    chunks) and tombstones
+                                                    (ids of deleted chunks)
+    data/chunk_diffs/diff_{timestamp}/vectors.npy   embeddings of the upserts
+                                                    only, with --embed (else
+                                                    the loader embeds them)
+    data/chunk_diffs/published.json                 id -> hash of what
+                                                    downstream now holds
+
+Diffs are applied in publish order, e.g. `python pg_loader.py diff`, which
+records the diffs it has applied and picks up every later one, so re-embedding
+and index updates scale with the size of the change instead of the size of
+the catalogue.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import OUTPUT_DIR
+from embedding import DEFAULT_DIM, HashingEmbedder, chunk_text, load_chunk_files, save_embeddings
+
+CHUNK_DIFF_DIR = os.path.join(OUTPUT_DIR, 'chunk_diffs')
+
+def content_hash(chunk: Dict) -> str:
+    """Hash of everything a chunk carries into the vector store besides its id"""
+    payload = json.dumps([chunk.get('type'), chunk.get('content'), chunk.get('metadata')],
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def load_published(directory: str = CHUNK_DIFF_DIR) -> Dict:
+    """The last published manifest, or an empty one before the first publish"""
+    try:
+        with open(os.path.join(directory, 'published.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {'published_at': None, 'model': None, 'chunks': {}}
+
+def diff_chunks(chunks: List[Dict], published: Dict[str, str]) -> Dict:
+    """Added, changed and deleted chunks between a chunk set and published id -> hash"""
+    current = {}
+    duplicates = 0
+    for chunk in chunks:
+        if chunk['id'] in current:
+            duplicates += 1  # first one wins, as in the vector store load
+            continue
+        current[chunk['id']] = chunk
+
+    added, changed = [], []
+    hashes = {}
+    for chunk_id, chunk in current.items():
+        hashes[chunk_id] = content_hash(chunk)
+        if chunk_id not in published:
+            added.append(chunk)
+        elif published[chunk_id] != hashes[chunk_id]:
+            changed.append(chunk)
+    deleted = sorted(chunk_id for chunk_id in published if chunk_id not in current)
+
+    return {
+        'added': added,
+        'changed': changed,
+        'deleted': deleted,
+        'hashes': hashes,
+        'unchanged': len(current) - len(added) - len(changed),
+        'duplicates': duplicates,
+    }
+
+def write_json(path: str, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def publish(chunks: List[Dict], directory: str = CHUNK_DIFF_DIR, embedder: Optional[HashingEmbedder] = None,
+            full: bool = False) -> Dict:
+    """Write the diff against the published set and make the new set the published one
+
+    Returns the diff stats plus its 'path', which is None when nothing changed.
+    """
+    previous = load_published(directory)
+    diff = diff_chunks(chunks, {} if full else previous['chunks'])
+    if full:
+        diff['deleted'] = sorted(chunk_id for chunk_id in previous['chunks'] if chunk_id not in diff['hashes'])
+    upserts = diff['added'] + diff['changed']
+    stats = {
+        'added': len(diff['added']),
+        'changed': len(diff['changed']),
+        'deleted': len(diff['deleted']),
+        'unchanged': diff['unchanged'],
+        'duplicates': diff['duplicates'],
+        'path': None,
+    }
+    if not upserts and not diff['deleted']:
+        return stats
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    path = os.path.join(directory, f'diff_{timestamp}')
+    suffix = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, f'diff_{timestamp}_{suffix}')
+        suffix += 1
+    os.makedirs(path)
+    model = f'hashing-{embedder.dim}' if embedder else previous.get('model')
+    if embedder:
+        save_embeddings(upserts, embedder.embed([chunk_text(chunk) for chunk in upserts]), path, model)
+    write_json(os.path.join(path, 'diff.json'), {
+        'created_at': datetime.now().isoformat(),
+        'base': previous['published_at'],
+        'full': full,
+        'model': model,
+        'stats': {key: value for key, value in stats.items() if key != 'path'},
+        'upsert': upserts,
+        'delete': diff['deleted'],
+    })
+
+    # Published last: an interrupted run leaves the old set in place and is simply redone
+    write_json(os.path.join(directory, 'published.json'), {
+        'published_at': datetime.now().isoformat(),
+        'model': model,
+        'chunks': diff['hashes'],
+    })
+    stats['path'] = path
+    return stats
+
+def latest_diff(directory: str = CHUNK_DIFF_DIR) -> Optional[str]:
+    diffs = list_diffs(directory)
+    return diffs[-1] if diffs else None
+
+def list_diffs(directory: str = CHUNK_DIFF_DIR) -> List[str]:
+    """Complete diff directories, oldest first"""
+    diffs = []
+    for path in glob.glob(os.path.join(directory, 'diff_*')):
+        try:
+            with open(os.path.join(path, 'diff.json'), 'r', encoding='utf-8') as f:
+                created_at = json.load(f)['created_at']
+        except (OSError, json.JSONDecodeError, KeyError):
+            continue  # interrupted before its diff.json was written
+        diffs.append((created_at, path))
+    return [path for _, path in sorted(diffs)]
+
+def main():
+    parser = argparse.ArgumentParser(description='Publish only the chunks that changed since the last publish')
+    parser.add_argument('--dir', default=CHUNK_DIFF_DIR, help='Diff directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    for name, help_text in (('status', 'Show what the next publish would contain'),
+                            ('publish', 'Write a diff and mark the chunks as published')):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('files', nargs='*',
+                             help='Chunk files (default: latest rag_chunks_* and drilling_rag_chunks_*)')
+    command.add_argument('--embed', action='store_true', help='Embed the upserted chunks into the diff')
+    command.add_argument('--dim', type=int, default=DEFAULT_DIM, help='Embedding dimension')
+    command.add_argument('--full', action='store_true',
+                         help='Upsert every chunk, e.g. after changing the embedding model')
+    args = parser.parse_args()
+
+    if args.files:
+        chunks = []
+        for path in args.files:
+            with open(path, 'r', encoding='utf-8') as f:
+                chunks.extend(json.load(f))
+    else:
+        chunks = load_chunk_files()
+    if not chunks:
+        print("No RAG chunk files found. Run working_scraper.py or comprehensive_drill_data.py first.")
+        return
+
+    previous = load_published(args.dir)
+    if args.command == 'status':
+        diff = diff_chunks(chunks, previous['chunks'])
+        print(f"📊 Since {previous['published_at'] or 'never'}: {len(diff['added'])} added, "
+              f"{len(diff['changed'])} changed, {len(diff['deleted'])} deleted, {diff['unchanged']} unchanged")
+        return
+
+    embedder = HashingEmbedder(args.dim) if args.embed else None
+    if embedder and previous.get('model') not in (None, f'hashing-{args.dim}') and not args.full:
+        print(f"Published chunks were embedded with {previous['model']}; "
+              f"re-run with --full to re-embed everything with hashing-{args.dim}.")
+        return
+
+    os.makedirs(args.dir, exist_ok=True)
+    stats = publish(chunks, args.dir, embedder, args.full)
+    print(f"📤 {stats['added']} added, {stats['changed']} changed, {stats['deleted']} deleted, "
+          f"{stats['unchanged']} unchanged")
+    if stats['duplicates']:
+        print(f"   • {stats['duplicates']} duplicate chunk ids ignored")
+    if stats['path']:
+        print(f"📁 Diff: {stats['path']}")
+    else:
+        print("✅ Nothing changed since the last publish")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,551 @@
+#!/usr/bin/env python3
+"""
+Chunk Retrieval Index
+
+A read-only, memory-mapped index over the RAG chunks for hybrid retrieval:
+
+- vectors.npy                  float32 chunk embeddings (cosine similarity)
+- bm25_*.npy, terms.*          BM25 postings per term, terms sorted
+- filter_{field}.npy           dictionary-encoded metadata columns for filters
+- filter_{field}_rows.npy      chunk row of each value, for multi-valued columns
+- price.npy                    chunk price, NaN when unknown
+- ids.*, texts.*, metadata.*   chunk ids, content and metadata as string tables
+- product_ids.*, products.*    the product catalogue as JSON, ids sorted
+
+Every file is opened with mmap, so opening an index is cheap and processes
+reading the same index share its pages through the page cache. Queries
+combine the dense and BM25 scores, restricted to the chunks matching the
+metadata filters.
+
+Indexes are published as immutable, versioned snapshots under
+data/chunk_index/: each build goes to its own directory and the CURRENT file,
+replaced atomically, names the live one. Readers (IndexManager) switch to a
+new snapshot without a restart; queries already running finish on the old
+one. Every process holds a shared flock on the snapshot directories it has
+open, so a snapshot is only deleted once no process references it.
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from catalogue import load_products
+from chunk_dedup import product_ids as chunk_product_ids
+from config import OUTPUT_DIR
+from embedding import DEFAULT_DIM, HashingEmbedder, chunk_text, load_chunk_files, tokenize
+from vector_quantization import top_k
+
+# Metadata fields that can be filtered on, matched case-insensitively
+FILTER_FIELDS = ('type', 'product_id', 'product_type', 'brand', 'category', 'subcategory',
+                 'drill_type', 'bit_type')
+
+# Filters holding several values per chunk; a chunk shared by several products matches any of them
+MULTI_VALUED_FILTERS = ('product_id',)
+
+CHUNK_INDEX_DIR = os.path.join(OUTPUT_DIR, 'chunk_index')
+CURRENT_FILE = 'CURRENT'
+
+# Snapshots kept besides the current one, for rolling back
+KEEP_SNAPSHOTS = 1
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+DEFAULT_ALPHA = 0.5
+
+# Above this share of the chunks, scoring everything beats gathering the candidates' vectors
+GATHER_FRACTION = 0.25
+
+def write_strings(path: str, name: str, strings: List[str]):
+    """A string table: one UTF-8 blob plus int64 offsets"""
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    with open(os.path.join(path, f'{name}.bin'), 'wb') as f:
+        f.write(b''.join(encoded))
+    np.save(os.path.join(path, f'{name}_offsets.npy'), offsets)
+
+class StringTable:
+    """Memory-mapped strings written by write_strings()"""
+
+    def __init__(self, path: str, name: str):
+        self.offsets = np.load(os.path.join(path, f'{name}_offsets.npy'), mmap_mode='r')
+        blob_path = os.path.join(path, f'{name}.bin')
+        # np.memmap cannot map an empty file
+        self.blob = np.memmap(blob_path, dtype=np.uint8, mode='r') if os.path.getsize(blob_path) else b''
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    def find(self, value: str) -> Optional[int]:
+        """Position of a value in a sorted table"""
+        i = bisect_left(self, value)
+        return i if i < len(self) and self[i] == value else None
+
+def unique_chunks(chunks: List[Dict]) -> List[Dict]:
+    """First chunk per id, as the other loaders keep"""
+    seen = set()
+    result = []
+    for chunk in chunks:
+        if chunk['id'] not in seen:
+            seen.add(chunk['id'])
+            result.append(chunk)
+    return result
+
+def filter_value(chunk: Dict, field: str):
+    value = chunk.get('type') if field == 'type' else chunk.get('metadata', {}).get(field)
+    return str(value).strip().lower() if value not in (None, '') else None
+
+def filter_values(chunk: Dict, field: str) -> List[str]:
+    """Values of a multi-valued filter: every owner of a shared chunk for product_id"""
+    values = chunk_product_ids(chunk) if field == 'product_id' else [chunk.get('metadata', {}).get(field)]
+    return list(dict.fromkeys(str(v).strip().lower() for v in values if v not in (None, '')))
+
+def build_chunk_index(chunks: List[Dict], output_dir: str, embedder: Optional[HashingEmbedder] = None,
+                      products: Optional[List[Dict]] = None) -> str:
+    """Write an index directory for a chunk list and the products they describe"""
+    embedder = embedder or HashingEmbedder()
+    chunks = unique_chunks(chunks)
+    os.makedirs(output_dir, exist_ok=True)
+    texts = [chunk_text(chunk) for chunk in chunks]
+
+    np.save(os.path.join(output_dir, 'vectors.npy'), embedder.embed(texts))
+
+    # BM25 postings, CSR by term
+    term_counts = [Counter(tokenize(text)) for text in texts]
+    terms = sorted({term for counts in term_counts for term in counts})
+    term_ids = {term: i for i, term in enumerate(terms)}
+    term_col, doc_col, tf_col = [], [], []
+    for doc, counts in enumerate(term_counts):
+        for term, tf in counts.items():
+            term_col.append(term_ids[term])
+            doc_col.append(doc)
+            tf_col.append(tf)
+    term_col = np.array(term_col, dtype=np.int64)
+    order = np.argsort(term_col, kind='stable')
+    indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(term_col, minlength=len(terms)), out=indptr[1:])
+    np.save(os.path.join(output_dir, 'bm25_indptr.npy'), indptr)
+    np.save(os.path.join(output_dir, 'bm25_docs.npy'), np.array(doc_col, dtype=np.int32)[order])
+    np.save(os.path.join(output_dir, 'bm25_tf.npy'),
+            np.minimum(np.array(tf_col, dtype=np.int64), 65535).astype(np.uint16)[order])
+    doc_lengths = np.array([sum(counts.values()) for counts in term_counts], dtype=np.float32)
+    np.save(os.path.join(output_dir, 'doc_lengths.npy'), doc_lengths)
+    write_strings(output_dir, 'terms', terms)
+
+    filters = {}
+    for field in MULTI_VALUED_FILTERS:
+        values = [filter_values(chunk, field) for chunk in chunks]
+        vocabulary = sorted({v for row in values for v in row})
+        if not vocabulary:
+            continue
+        codes = {v: i for i, v in enumerate(vocabulary)}
+        dtype = np.int16 if len(vocabulary) < 32767 else np.int32
+        np.save(os.path.join(output_dir, f'filter_{field}.npy'),
+                np.array([codes[v] for row in values for v in row], dtype=dtype))
+        np.save(os.path.join(output_dir, f'filter_{field}_rows.npy'),
+                np.array([i for i, row in enumerate(values) for _ in row], dtype=np.int32))
+        filters[field] = vocabulary
+    for field in FILTER_FIELDS:
+        if field in MULTI_VALUED_FILTERS:
+            continue
+        values = [filter_value(chunk, field) for chunk in chunks]
+        vocabulary = sorted({v for v in values if v is not None})
+        if not vocabulary:
+            continue
+        codes = {v: i for i, v in enumerate(vocabulary)}
+        dtype = np.int16 if len(vocabulary) < 32767 else np.int32
+        np.save(os.path.join(output_dir, f'filter_{field}.npy'),
+                np.array([codes[v] if v is not None else -1 for v in values], dtype=dtype))
+        filters[field] = vocabulary
+
+    prices = []
+    for chunk in chunks:
+        try:
+            prices.append(float(chunk.get('metadata', {}).get('price')))
+        except (TypeError, ValueError):
+            prices.append(np.nan)
+    np.save(os.path.join(output_dir, 'price.npy'), np.array(prices, dtype=np.float32))
+
+    write_strings(output_dir, 'ids', [chunk['id'] for chunk in chunks])
+    write_strings(output_dir, 'texts', texts)
+    write_strings(output_dir, 'metadata', [json.dumps(chunk.get('metadata', {}), ensure_ascii=False)
+                                           for chunk in chunks])
+
+    catalogue = {}
+    for product in products or []:
+        catalogue.setdefault(str(product['id']), product)
+    product_ids = sorted(catalogue)
+    product_json = [json.dumps(catalogue[pid], sort_keys=True, ensure_ascii=False) for pid in product_ids]
+    write_strings(output_dir, 'product_ids', product_ids)
+    write_strings(output_dir, 'products', product_json)
+
+    digest = hashlib.sha1(f'hashing-{embedder.dim}\n'.encode('utf-8'))
+    for chunk, text in zip(chunks, texts):
+        metadata = json.dumps(chunk.get('metadata', {}), sort_keys=True, ensure_ascii=False)
+        digest.update(f"{chunk['id']}\n{chunk.get('type')}\n{text}\n{metadata}\n".encode('utf-8'))
+    for product in product_json:
+        digest.update(f'{product}\n'.encode('utf-8'))
+    manifest = {
+        'created_at': datetime.now().isoformat(),
+        'version': digest.hexdigest()[:16],
+        'model': f'hashing-{embedder.dim}',
+        'count': len(chunks),
+        'products': len(product_ids),
+        'average_length': float(doc_lengths.mean()) if len(chunks) else 0.0,
+        'filters': filters,
+        'multi_valued': [field for field in MULTI_VALUED_FILTERS if field in filters],
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return output_dir
+
+class ChunkIndex:
+    """Memory-mapped, read-only hybrid (dense + BM25) chunk index"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self.version = self.manifest['version']
+        self.embedder = HashingEmbedder(int(self.manifest['model'].split('-')[1]))
+
+        def load(name):
+            return np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+
+        self.vectors = load('vectors')
+        self.bm25 = (load('bm25_indptr'), load('bm25_docs'), load('bm25_tf'))
+        self.doc_lengths = load('doc_lengths')
+        self.prices = load('price')
+        self.terms = StringTable(path, 'terms')
+        self.ids = StringTable(path, 'ids')
+        self.texts = StringTable(path, 'texts')
+        self.metadata = StringTable(path, 'metadata')
+        self.product_ids = StringTable(path, 'product_ids')
+        self.products = StringTable(path, 'products')
+        self.filters = {field: (load(f'filter_{field}'), {v: i for i, v in enumerate(values)})
+                        for field, values in self.manifest['filters'].items()}
+        # Snapshots built before multi-valued columns hold one value per chunk
+        self.filter_rows = {field: load(f'filter_{field}_rows') for field in self.manifest.get('multi_valued', [])}
+
+    @classmethod
+    def latest(cls, root: str = CHUNK_INDEX_DIR) -> Optional['ChunkIndex']:
+        """Open the current snapshot, if any"""
+        path = current_snapshot(root)
+        return cls(path) if path else None
+
+    def __len__(self) -> int:
+        return self.manifest['count']
+
+    def mask(self, filters: Optional[Dict]) -> Optional[np.ndarray]:
+        """Boolean mask of the chunks matching every filter, None when unfiltered
+
+        Filters map a field to a value or list of values; 'price_min' and
+        'price_max' bound the price. Unknown fields and values match nothing,
+        and a multi-valued column matches when any of a chunk's values does.
+        """
+        if not filters:
+            return None
+        mask = np.ones(len(self), dtype=bool)
+        for field, wanted in filters.items():
+            if field in ('price_min', 'price_max'):
+                bound = float(wanted)
+                with np.errstate(invalid='ignore'):
+                    mask &= self.prices >= bound if field == 'price_min' else self.prices <= bound
+                continue
+            codes, vocabulary = self.filters.get(field, (None, {}))
+            values = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+            wanted_codes = [vocabulary[v] for v in (str(v).strip().lower() for v in values) if v in vocabulary]
+            if codes is None or not wanted_codes:
+                return np.zeros(len(self), dtype=bool)
+            hits = np.isin(codes, wanted_codes)
+            if field in self.filter_rows:
+                rows = self.filter_rows[field]
+                hits = np.bincount(rows[hits], minlength=len(self)) > 0
+            mask &= hits
+        return mask
+
+    def bm25_scores(self, query: str) -> np.ndarray:
+        indptr, docs, tfs = self.bm25
+        scores = np.zeros(len(self), dtype=np.float32)
+        average_length = self.manifest['average_length'] or 1.0
+        for term in set(tokenize(query)):
+            term_id = self.terms.find(term)
+            if term_id is None:
+                continue
+            start, end = indptr[term_id], indptr[term_id + 1]
+            postings, tf = docs[start:end], tfs[start:end].astype(np.float32)
+            idf = np.log(1 + (len(self) - (end - start) + 0.5) / ((end - start) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[postings] / average_length)
+            scores[postings] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    def search_rows(self, query: str, k: int = 10, filters: Optional[Dict] = None,
+                    alpha: float = DEFAULT_ALPHA, query_vector: Optional[np.ndarray] = None):
+        """(rows, scores) of the k best chunks; alpha weighs dense against BM25 scores"""
+        mask = self.mask(filters)
+        # Filtered queries only score their candidates, so narrow filters make queries cheap
+        candidates = np.flatnonzero(mask) if mask is not None else None
+        if candidates is not None and not len(candidates):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = np.zeros(len(self) if candidates is None else len(candidates), dtype=np.float32)
+        if alpha > 0:
+            if query_vector is None:
+                query_vector = self.embedder.embed_query(query)
+            if candidates is None:
+                scores += alpha * (self.vectors @ query_vector)
+            elif len(candidates) <= GATHER_FRACTION * len(self):
+                scores += alpha * (self.vectors[candidates] @ query_vector)
+            else:
+                scores += alpha * (self.vectors @ query_vector)[candidates]
+        if alpha < 1:
+            lexical = self.bm25_scores(query)
+            top = lexical.max() if len(lexical) else 0
+            if top > 0:
+                scores += (1 - alpha) * (lexical if candidates is None else lexical[candidates]) / top
+        best = top_k(scores, k)
+        rows = best if candidates is None else candidates[best]
+        return rows, scores[best]
+
+    def product(self, product_id: str) -> Optional[Dict]:
+        row = self.product_ids.find(str(product_id))
+        return json.loads(self.products[row]) if row is not None else None
+
+    def chunk(self, row: int) -> Dict:
+        return {'id': self.ids[row], 'content': self.texts[row], 'metadata': json.loads(self.metadata[row])}
+
+    def search(self, query: str, k: int = 10, filters: Optional[Dict] = None,
+               alpha: float = DEFAULT_ALPHA, query_vector: Optional[np.ndarray] = None) -> List[Dict]:
+        rows, scores = self.search_rows(query, k, filters, alpha, query_vector)
+        return [dict(self.chunk(row), score=round(float(score), 4)) for row, score in zip(rows, scores)]
+
+def current_snapshot(root: str = CHUNK_INDEX_DIR) -> Optional[str]:
+    """Directory of the live snapshot named by CURRENT"""
+    try:
+        with open(os.path.join(root, CURRENT_FILE), 'r', encoding='utf-8') as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    return os.path.join(root, name) if name else None
+
+def list_snapshots(root: str = CHUNK_INDEX_DIR) -> List[str]:
+    """Snapshot directories, oldest first"""
+    if not os.path.isdir(root):
+        return []
+    return sorted(os.path.join(root, name) for name in os.listdir(root)
+                  if not name.startswith('.') and os.path.isfile(os.path.join(root, name, 'manifest.json')))
+
+def set_current(root: str, path: str):
+    tmp_path = os.path.join(root, f'.{CURRENT_FILE}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(os.path.basename(path) + '\n')
+    os.replace(tmp_path, os.path.join(root, CURRENT_FILE))
+
+def publish_snapshot(chunks: List[Dict], root: str = CHUNK_INDEX_DIR,
+                     embedder: Optional[HashingEmbedder] = None, products: Optional[List[Dict]] = None) -> str:
+    """Build a new snapshot and make it current; an unchanged chunk set reuses its snapshot"""
+    os.makedirs(root, exist_ok=True)
+    building = os.path.join(root, f'.building_{os.getpid()}_{time.time_ns()}')
+    try:
+        build_chunk_index(chunks, building, embedder, products)
+        with open(os.path.join(building, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+        existing = [path for path in list_snapshots(root)
+                    if path.endswith('_' + manifest['version'])]
+        if existing:
+            path = existing[-1]
+        else:
+            path = os.path.join(root, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{manifest['version']}")
+            os.rename(building, path)  # the snapshot appears complete or not at all
+    finally:
+        shutil.rmtree(building, ignore_errors=True)
+    set_current(root, path)
+    return path
+
+def lock_snapshot(path: str, exclusive: bool = False) -> Optional[int]:
+    """Open a snapshot directory and flock it; returns the fd, or None if unavailable"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB if exclusive else fcntl.LOCK_SH)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+def collect_snapshots(root: str = CHUNK_INDEX_DIR, keep: int = KEEP_SNAPSHOTS) -> List[str]:
+    """Delete old snapshots that no process has open; returns the deleted paths"""
+    current = current_snapshot(root)
+    old = [path for path in list_snapshots(root) if path != current]
+    deleted = []
+    for path in old[:max(len(old) - keep, 0)]:
+        fd = lock_snapshot(path, exclusive=True)
+        if fd is None:
+            continue  # still in use by a reader
+        try:
+            shutil.rmtree(path)
+            deleted.append(path)
+        finally:
+            os.close(fd)
+    return deleted
+
+class Snapshot:
+    """An open snapshot, its shared lock, and the queries using it"""
+
+    def __init__(self, path: str, fd: int):
+        self.path = path
+        self.fd = fd
+        self.index = ChunkIndex(path)
+        self.refs = 0
+        self.retired = False
+
+    def close(self):
+        self.index = None  # unmapped once the last array view is gone
+        os.close(self.fd)
+
+class IndexManager:
+    """Serves the current snapshot and switches to new ones without blocking queries
+
+    Use `with manager.acquire() as index:` around each query; reload() swaps
+    the snapshot for new queries while acquired ones keep the old snapshot
+    until they finish, after which its lock is dropped and it can be
+    collected.
+    """
+
+    def __init__(self, root: str = CHUNK_INDEX_DIR):
+        self.root = root
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.swaps = 0
+        if not self.reload():
+            raise FileNotFoundError(f'no chunk index snapshot in {root}')
+
+    def open(self) -> Optional[Snapshot]:
+        # CURRENT may move on between reading it and locking the snapshot; retry until both agree
+        for _ in range(5):
+            path = current_snapshot(self.root)
+            if not path:
+                return None
+            fd = lock_snapshot(path)
+            if fd is not None and os.path.isfile(os.path.join(path, 'manifest.json')):
+                return Snapshot(path, fd)
+            if fd is not None:
+                os.close(fd)
+        return None
+
+    def reload(self) -> bool:
+        """Switch to the snapshot named by CURRENT if it changed; True if a snapshot is loaded"""
+        path = current_snapshot(self.root)
+        if self.snapshot and path == self.snapshot.path:
+            return True
+        snapshot = self.open()
+        if snapshot is None:
+            return self.snapshot is not None
+        with self.lock:
+            old, self.snapshot = self.snapshot, snapshot
+            if old:
+                old.retired = True
+                self.swaps += 1
+                if old.refs == 0:
+                    old.close()
+        return True
+
+    @property
+    def index(self) -> ChunkIndex:
+        return self.snapshot.index
+
+    @contextmanager
+    def acquire(self):
+        with self.lock:
+            snapshot = self.snapshot
+            snapshot.refs += 1
+        try:
+            yield snapshot.index
+        finally:
+            with self.lock:
+                snapshot.refs -= 1
+                if snapshot.retired and snapshot.refs == 0:
+                    snapshot.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and query the hybrid chunk retrieval index')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('build', help='Index the latest RAG chunk files as a new snapshot')
+    command.add_argument('--dim', type=int, default=DEFAULT_DIM, help='Embedding dimension')
+    commands.add_parser('snapshots', help='List snapshots and whether a process has them open')
+    command = commands.add_parser('gc', help='Delete old snapshots no process has open')
+    command.add_argument('--keep', type=int, default=KEEP_SNAPSHOTS, help='Old snapshots to keep')
+    command = commands.add_parser('search', help='Query the current snapshot')
+    command.add_argument('query')
+    command.add_argument('--k', type=int, default=5)
+    command.add_argument('--alpha', type=float, default=DEFAULT_ALPHA, help='1 = dense only, 0 = BM25 only')
+    command.add_argument('--filter', action='append', default=[], metavar='FIELD=VALUE',
+                         help='Metadata filter, e.g. brand=dewalt or price_max=200 (repeatable)')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        chunks = load_chunk_files()
+        if not chunks:
+            print("No RAG chunk files found. Run working_scraper.py or comprehensive_drill_data.py first.")
+            return
+        print(f"🗂️  Indexing {len(chunks)} chunks...")
+        output_dir = publish_snapshot(chunks, CHUNK_INDEX_DIR, HashingEmbedder(args.dim), load_products())
+        index = ChunkIndex(output_dir)
+        print(f"✅ {len(index)} chunks, {len(index.products)} products, {len(index.terms)} terms, "
+              f"version {index.version}")
+        print(f"📁 Current snapshot: {output_dir}")
+        for path in collect_snapshots():
+            print(f"🗑️  Removed {path}")
+        return
+
+    if args.command == 'snapshots':
+        current = current_snapshot()
+        for path in list_snapshots():
+            in_use = lock_snapshot(path, exclusive=True)
+            if in_use is not None:
+                os.close(in_use)
+            state = 'current' if path == current else ('idle' if in_use is not None else 'in use')
+            print(f"{os.path.basename(path)}  {state}")
+        return
+
+    if args.command == 'gc':
+        deleted = collect_snapshots(keep=args.keep)
+        print(f"🗑️  Removed {len(deleted)} snapshots")
+        return
+
+    index = ChunkIndex.latest()
+    if not index:
+        print("No chunk index found. Run: python chunk_index.py build")
+        return
+    filters = {}
+    for spec in args.filter:
+        field, _, value = spec.partition('=')
+        filters.setdefault(field, []).append(value)
+    filters = {field: values if len(values) > 1 else values[0] for field, values in filters.items()}
+
+    started = time.perf_counter()
+    results = index.search(args.query, args.k, filters, args.alpha)
+    elapsed = (time.perf_counter() - started) * 1000
+    for result in results:
+        print(f"{result['score']:>7.3f}  {result['id']:30}  {result['content'][:80]}")
+    print(f"🔎 {len(results)} results ({elapsed:.2f} ms)")
+
+if __name__ == "__main__":
+    main()
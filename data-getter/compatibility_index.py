@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Tool-Accessory Compatibility Index Builder
+
+Derives which drill bits fit which drills from the chuck and shank
+specifications we already hold, plus material -> bit and screw size -> bit
+lookup tables. The result is written as a directory of .npy arrays (sparse CSR
+matrices) and a small JSON manifest, so it can be memory-mapped and queried
+in O(1) at request time.
+"""
+
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from catalogue import latest_file, load_products
+from config import OUTPUT_DIR
+from spec_normalizer import parse_quantities
+
+INCH = 0.0254
+
+# Compatibility levels stored in the matrix
+PARTIAL = 1  # only some sizes of the set fit the chuck
+FULL = 2
+
+# Hole saws are driven through a mandrel; standard mandrels have a 3/8" hex shank
+HOLE_SAW_MANDREL = ('hex', 3 / 8 * INCH)
+
+# Pilot hole diameters (inches) for wood screws: (hardwood, softwood)
+SCREW_PILOT_HOLES = {
+    4: (5 / 64, 1 / 16),
+    6: (7 / 64, 3 / 32),
+    8: (1 / 8, 7 / 64),
+    10: (9 / 64, 1 / 8),
+    12: (5 / 32, 9 / 64),
+    14: (3 / 16, 5 / 32),
+}
+
+# Bit sets sold in fractional sizes that can drill screw pilot holes
+PILOT_BIT_TYPES = ('twist_drill_bits', 'cobalt_drill_bits', 'titanium_drill_bits')
+
+# Broader material families so "wood" also finds hardwood and plywood bits
+MATERIAL_FAMILIES = {
+    'hardwood': 'wood', 'softwood': 'wood', 'plywood': 'wood', 'mdf': 'wood',
+    'particle board': 'wood', 'particleboard': 'wood',
+    'hardened steel': 'steel', 'stainless steel': 'steel', 'thin steel': 'steel',
+    'sheet metal': 'metal', 'steel': 'metal', 'aluminum': 'metal', 'cast iron': 'metal',
+    'reinforced concrete': 'concrete', 'hard concrete': 'concrete',
+    'natural stone': 'stone', 'artificial stone': 'stone',
+    'ceramic tile': 'tile', 'porcelain': 'tile',
+    'concrete': 'masonry', 'brick': 'masonry', 'stone': 'masonry', 'masonry block': 'masonry',
+    'mortar': 'masonry',
+}
+
+def lengths(text: str) -> List[float]:
+    """Return the min and max length (metres) mentioned in a spec value"""
+    for quantity in parse_quantities(text or ''):
+        if quantity['dimension'] == 'length':
+            return [quantity['min'], quantity['max']]
+    return []
+
+def chuck_profile(product: Dict) -> Optional[Dict]:
+    """Describe a drill's chuck, or None if the tool has no chuck"""
+    specs = product.get('specifications') or {}
+    text = specs.get('Chuck Size') or specs.get('Chuck Type')
+    if not text:
+        return None
+
+    text_lower = text.lower()
+    if 'sds' in text_lower:
+        kind = 'sds_plus'
+    elif 'hex' in text_lower:
+        kind = 'hex'
+    else:
+        kind = 'jaw'
+
+    capacity = lengths(text)
+    masonry = (product.get('drilling_capacity') or {}).get('Masonry', '')
+    tool_text = f"{product.get('drill_type', '')} {product.get('name', '')}".lower()
+    hammer = bool(lengths(masonry)) or 'hammer' in tool_text
+
+    return {'kind': kind, 'capacity': capacity[-1] if capacity else None, 'hammer': hammer}
+
+def shank_profile(product: Dict) -> Optional[Dict]:
+    """Describe a bit's shank(s) and diameter range, or None if unknown"""
+    specs = product.get('specifications') or {}
+    size_range = product.get('size_range') or {}
+    text = specs.get('Shank') or specs.get('Shank Type') or ''
+    text_lower = text.lower()
+
+    kinds = set()
+    if 'sds' in text_lower:
+        kinds.add('sds_plus')
+    if 'hex' in text_lower:
+        kinds.add('hex')
+    if 'round' in text_lower:
+        kinds.add('round')
+
+    diameters = lengths(text)
+    if not kinds and product.get('bit_type') == 'hole_saws':
+        kinds.add(HOLE_SAW_MANDREL[0])
+        diameters = [HOLE_SAW_MANDREL[1]] * 2
+    if not kinds:
+        return None
+
+    if not diameters and 'round' in kinds:
+        # Round-shank sets: the shank is the bit diameter
+        diameters = (lengths(f"{size_range.get('Smallest', '')} to {size_range.get('Largest', '')}")
+                     or lengths(specs.get('Sizes', '')))
+    if not diameters:
+        diameters = [0.25 * INCH] * 2 if 'hex' in kinds else []
+
+    masonry = 'masonry' in (product.get('bit_type') or '')
+    return {
+        'kinds': kinds,
+        'min': diameters[0] if diameters else None,
+        'max': diameters[-1] if diameters else None,
+        'needs_hammer': masonry,
+    }
+
+def fit_level(chuck: Dict, shank: Dict) -> int:
+    """Return FULL, PARTIAL or 0 for a chuck/shank pair"""
+    if shank['needs_hammer'] and not chuck['hammer']:
+        return 0
+    if chuck['kind'] == 'sds_plus':
+        return FULL if 'sds_plus' in shank['kinds'] else 0
+    if chuck['kind'] == 'hex':
+        # 1/4" quick-change chucks only take 1/4" hex shanks
+        return FULL if 'hex' in shank['kinds'] and shank['max'] and shank['max'] <= 0.25 * INCH + 1e-9 else 0
+
+    # Three-jaw chuck: takes round and hex shanks up to its capacity
+    if not ({'round', 'hex'} & shank['kinds']) or shank['max'] is None or chuck['capacity'] is None:
+        return 0
+    if shank['max'] <= chuck['capacity'] + 1e-9:
+        return FULL
+    if shank['min'] <= chuck['capacity'] + 1e-9:
+        return PARTIAL
+    return 0
+
+def to_csr(rows: List[List[tuple]]):
+    """Convert per-row [(column, value)] lists into CSR arrays"""
+    indptr = np.zeros(len(rows) + 1, dtype=np.int32)
+    for i, row in enumerate(rows):
+        indptr[i + 1] = indptr[i] + len(row)
+    indices = np.array([c for row in rows for c, _ in row], dtype=np.int32)
+    values = np.array([v for row in rows for _, v in row], dtype=np.float32)
+    return indptr, indices, values
+
+def material_keys(material: str) -> List[str]:
+    """Lookup keys for a material name, including its broader family"""
+    key = material.strip().lower()
+    keys = [key]
+    while key in MATERIAL_FAMILIES:
+        key = MATERIAL_FAMILIES[key]
+        keys.append(key)
+    return keys
+
+def screw_gauges(product: Dict) -> List[int]:
+    """Screw gauges a countersink-style bit is sized for"""
+    specs = product.get('specifications') or {}
+    size_range = product.get('size_range') or {}
+    for text in (specs.get('Sizes', ''), size_range.get('Screw Sizes', '')):
+        for quantity in parse_quantities(text):
+            if quantity['dimension'] == 'gauge':
+                return [g for g in SCREW_PILOT_HOLES if quantity['min'] <= g <= quantity['max']]
+    return []
+
+def screw_uses(bit: Dict) -> Dict[int, float]:
+    """Screw gauge -> pilot hole diameter (metres) a bit drills, or 0 if it countersinks that gauge"""
+    uses = {gauge: 0.0 for gauge in screw_gauges(bit)}
+    size_range = bit.get('size_range') or {}
+    span = lengths(f"{size_range.get('Smallest', '')} to {size_range.get('Largest', '')}")
+    if span and bit.get('bit_type') in PILOT_BIT_TYPES:
+        for gauge, (hard, _) in SCREW_PILOT_HOLES.items():
+            pilot = hard * INCH
+            if gauge not in uses and span[0] - 1e-9 <= pilot <= span[1] + 1e-9:
+                uses[gauge] = round(pilot, 6)
+    return uses
+
+def build_compatibility_index(products: List[Dict]) -> Dict:
+    """Compute the drill x bit matrix and lookup tables as arrays"""
+    drills = [(p, chuck_profile(p)) for p in products]
+    drills = [(p, c) for p, c in drills if c]
+    bits = [(p, shank_profile(p)) for p in products if p.get('product_type') == 'drill_bit']
+
+    drill_rows = []
+    for drill, chuck in drills:
+        row = []
+        for col, (bit, shank) in enumerate(bits):
+            level = fit_level(chuck, shank) if shank else 0
+            if level:
+                row.append((col, level))
+        drill_rows.append(row)
+
+    bit_rows = [[] for _ in bits]
+    for drill_idx, row in enumerate(drill_rows):
+        for col, level in row:
+            bit_rows[col].append((drill_idx, level))
+
+    materials = {}
+    for col, (bit, _) in enumerate(bits):
+        for material in bit.get('materials_drilled', []):
+            for key in material_keys(material):
+                materials.setdefault(key, set()).add(col)
+    material_names = sorted(materials)
+
+    # Screw gauge -> bits that can drill its pilot hole (value = pilot diameter)
+    # or countersink it (value = 0)
+    uses = [screw_uses(bit) for bit, _ in bits]
+    screw_rows = [[(col, uses[col][gauge]) for col in range(len(bits)) if gauge in uses[col]]
+                  for gauge in sorted(SCREW_PILOT_HOLES)]
+
+    return {
+        'drill_ids': [p['id'] for p, _ in drills],
+        'bit_ids': [p['id'] for p, _ in bits],
+        'materials': material_names,
+        'screw_gauges': sorted(SCREW_PILOT_HOLES),
+        'drill_bit': to_csr(drill_rows),
+        'bit_drill': to_csr(bit_rows),
+        'material_bit': to_csr([[(c, 1.0) for c in sorted(materials[m])] for m in material_names]),
+        'screw_bit': to_csr(screw_rows),
+    }
+
+def save_index(index: Dict, output_dir: str) -> str:
+    """Write the index as .npy arrays plus a JSON manifest"""
+    os.makedirs(output_dir, exist_ok=True)
+    for table in ('drill_bit', 'bit_drill', 'material_bit', 'screw_bit'):
+        for name, array in zip(('indptr', 'indices', 'values'), index[table]):
+            np.save(os.path.join(output_dir, f'{table}_{name}.npy'), array)
+
+    manifest = {
+        'created_at': datetime.now().isoformat(),
+        'levels': {'partial': PARTIAL, 'full': FULL},
+        'drill_ids': index['drill_ids'],
+        'bit_ids': index['bit_ids'],
+        'materials': index['materials'],
+        'screw_gauges': index['screw_gauges'],
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return output_dir
+
+class CompatibilityIndex:
+    """Memory-mapped, read-only view over a saved compatibility index"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        self.drill_ids = self.manifest['drill_ids']
+        self.bit_ids = self.manifest['bit_ids']
+        self.drill_rows = {pid: i for i, pid in enumerate(self.drill_ids)}
+        self.bit_rows = {pid: i for i, pid in enumerate(self.bit_ids)}
+        self.material_rows = {m: i for i, m in enumerate(self.manifest['materials'])}
+        self.screw_rows = {g: i for i, g in enumerate(self.manifest['screw_gauges'])}
+        self.tables = {}
+        for table in ('drill_bit', 'bit_drill', 'material_bit', 'screw_bit'):
+            self.tables[table] = tuple(
+                np.load(os.path.join(path, f'{table}_{name}.npy'), mmap_mode='r')
+                for name in ('indptr', 'indices', 'values')
+            )
+
+    @classmethod
+    def latest(cls, data_dir: str = OUTPUT_DIR) -> Optional['CompatibilityIndex']:
+        """Open the most recently built index, if any"""
+        path = latest_file('compat_index_*', data_dir)
+        return cls(path) if path else None
+
+    def _row(self, table: str, row: Optional[int]):
+        if row is None:
+            return [], []
+        indptr, indices, values = self.tables[table]
+        start, end = indptr[row], indptr[row + 1]
+        return indices[start:end].tolist(), values[start:end].tolist()
+
+    def bits_for_drill(self, drill_id: str) -> List[Dict]:
+        """Bits that fit a drill, with 'full' or 'partial' fit"""
+        cols, values = self._row('drill_bit', self.drill_rows.get(drill_id))
+        return [{'bit_id': self.bit_ids[c], 'fit': 'full' if v == FULL else 'partial'}
+                for c, v in zip(cols, values)]
+
+    def drills_for_bit(self, bit_id: str) -> List[Dict]:
+        """Drills that can drive a bit, with 'full' or 'partial' fit"""
+        cols, values = self._row('bit_drill', self.bit_rows.get(bit_id))
+        return [{'drill_id': self.drill_ids[c], 'fit': 'full' if v == FULL else 'partial'}
+                for c, v in zip(cols, values)]
+
+    def bits_for_material(self, material: str) -> List[str]:
+        """Bits rated for a material or material family"""
+        cols, _ = self._row('material_bit', self.material_rows.get(material.strip().lower()))
+        return [self.bit_ids[c] for c in cols]
+
+    def bits_for_screw(self, size) -> List[Dict]:
+        """Pilot-hole and countersink bits for a screw gauge such as '#8'"""
+        try:
+            gauge = int(str(size).strip().lstrip('#'))
+        except ValueError:
+            return []
+        cols, values = self._row('screw_bit', self.screw_rows.get(gauge))
+        results = []
+        for c, v in zip(cols, values):
+            if v:
+                results.append({'bit_id': self.bit_ids[c], 'use': 'pilot_hole',
+                                'pilot_inches': round(v / INCH, 4)})
+            else:
+                results.append({'bit_id': self.bit_ids[c], 'use': 'countersink'})
+        return results
+
+def main():
+    products = load_products()
+    if not products:
+        print("No product data found. Run comprehensive_drill_data.py first.")
+        return
+
+    print("🔩 Building tool-accessory compatibility index...")
+    index = build_compatibility_index(products)
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    output_dir = save_index(index, os.path.join(OUTPUT_DIR, f'compat_index_{timestamp}'))
+    nnz = len(index['drill_bit'][1])
+    size = sum(os.path.getsize(os.path.join(output_dir, f)) for f in os.listdir(output_dir))
+
+    print(f"✅ {len(index['drill_ids'])} drills x {len(index['bit_ids'])} bits, {nnz} compatible pairs")
+    print(f"   • Materials: {len(index['materials'])}")
+    print(f"   • Screw gauges: {', '.join('#%d' % g for g in index['screw_gauges'])}")
+    print(f"📁 Index: {output_dir} ({size} bytes)")
+
+    compat = CompatibilityIndex(output_dir)
+    if compat.drill_ids:
+        drill_id = compat.drill_ids[0]
+        fits = ', '.join(b['bit_id'] for b in compat.bits_for_drill(drill_id))
+        print(f"\n🔧 Bits that fit {drill_id}: {fits}")
+    print(f"🔩 Bits for #8 screws: {', '.join(b['bit_id'] for b in compat.bits_for_screw('#8'))}")
+    print(f"🧱 Bits for concrete: {', '.join(compat.bits_for_material('concrete'))}")
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,9 @@ import json
 import os
 from datetime import datetime
 
+from chunk_dedup import dedupe_chunks, format_report
+from entity_resolution import load_canonical_ids, resolve_canonical_id
+
 def generate_all_drill_types():
     """Generate comprehensive drill data covering all major types"""
     
@@ -577,8 +580,13 @@ def create_comprehensive_drilling_dataset():
     # Create RAG-optimized chunks
     rag_chunks = []
     
+    # Cross-site product clusters from entity_resolution.py, if it has been run
+    canonical_ids = load_canonical_ids()
+    
     # Process drills
     for drill in all_drills:
+        canonical_id = resolve_canonical_id(drill, canonical_ids)
+        
         # Main product chunk
         main_content = f"Drill: {drill['name']} by {drill['brand']} (Model: {drill['model']}). Type: {drill['drill_type'].replace('_', ' ').title()}. {drill['description']}"
         rag_chunks.append({
@@ -587,6 +595,7 @@ def create_comprehensive_drilling_dataset():
             "content": main_content,
             "metadata": {
                 "product_id": drill["id"],
+                "canonical_id": canonical_id,
                 "product_type": "drill",
                 "drill_type": drill["drill_type"],
                 "brand": drill["brand"],
@@ -602,6 +611,7 @@ def create_comprehensive_drilling_dataset():
             "content": specs_text,
             "metadata": {
                 "product_id": drill["id"],
+                "canonical_id": canonical_id,
                 "product_type": "drill",
                 "brand": drill["brand"],
                 "model": drill["model"]
@@ -617,6 +627,7 @@ def create_comprehensive_drilling_dataset():
                 "content": capacity_text,
                 "metadata": {
                     "product_id": drill["id"],
+                    "canonical_id": canonical_id,
                     "product_type": "drill",
                     "brand": drill["brand"]
                 }
@@ -630,6 +641,7 @@ def create_comprehensive_drilling_dataset():
             "content": apps_text,
             "metadata": {
                 "product_id": drill["id"],
+                "canonical_id": canonical_id,
                 "product_type": "drill",
                 "drill_type": drill["drill_type"]
             }
@@ -637,6 +649,8 @@ def create_comprehensive_drilling_dataset():
     
     # Process drill bits
     for bit in all_drill_bits:
+        canonical_id = resolve_canonical_id(bit, canonical_ids)
+        
         # Main product chunk
         main_content = f"Drill Bit: {bit['name']} by {bit['brand']} (Model: {bit['model']}). Type: {bit['bit_type'].replace('_', ' ').title()}. {bit['description']}"
         rag_chunks.append({
@@ -645,6 +659,7 @@ def create_comprehensive_drilling_dataset():
             "content": main_content,
             "metadata": {
                 "product_id": bit["id"],
+                "canonical_id": canonical_id,
                 "product_type": "drill_bit",
                 "bit_type": bit["bit_type"],
                 "brand": bit["brand"],
@@ -660,6 +675,7 @@ def create_comprehensive_drilling_dataset():
             "content": specs_text,
             "metadata": {
                 "product_id": bit["id"],
+                "canonical_id": canonical_id,
                 "product_type": "drill_bit",
                 "brand": bit["brand"],
                 "model": bit["model"]
@@ -675,6 +691,7 @@ def create_comprehensive_drilling_dataset():
                 "content": size_text,
                 "metadata": {
                     "product_id": bit["id"],
+                    "canonical_id": canonical_id,
                     "product_type": "drill_bit",
                     "bit_type": bit["bit_type"]
                 }
@@ -688,6 +705,7 @@ def create_comprehensive_drilling_dataset():
             "content": materials_text,
             "metadata": {
                 "product_id": bit["id"],
+                "canonical_id": canonical_id,
                 "product_type": "drill_bit",
                 "bit_type": bit["bit_type"]
             }
@@ -701,11 +719,15 @@ def create_comprehensive_drilling_dataset():
             "content": apps_text,
             "metadata": {
                 "product_id": bit["id"],
+                "canonical_id": canonical_id,
                 "product_type": "drill_bit",
                 "bit_type": bit["bit_type"]
             }
         })
     
+    # Store content repeated across products once, with a product fan-out list
+    rag_chunks, dedup_report = dedupe_chunks(rag_chunks)
+    
     # Save files
     os.makedirs("./data", exist_ok=True)
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -726,6 +748,7 @@ def create_comprehensive_drilling_dataset():
         "total_drills": len(all_drills),
         "total_drill_bits": len(all_drill_bits),
         "total_chunks": len(rag_chunks),
+        "dedup_report": dedup_report,
         "metadata": complete_dataset["metadata"]
     }
 
@@ -739,6 +762,7 @@ def main():
     print(f"   • Drills: {results['total_drills']} different types")
     print(f"   • Drill Bits: {results['total_drill_bits']} different sets/types")
     print(f"   • RAG Chunks: {results['total_chunks']} optimized pieces")
+    print(f"   • Deduplication: {format_report(results['dedup_report'])}")
     print(f"   • Brands: {len(results['metadata']['brands'])} major manufacturers")
     
     print(f"\n📁 Files Created:")
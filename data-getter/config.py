@@ -3,6 +3,15 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Optional per-site keys:
+#   price_api         URL template with {sku} returning JSON, used by price refreshes
+#   price_api_fields  {'price': 'dotted.path', 'availability': 'dotted.path'} in that JSON
+#   inventory_api         URL template with {sku} returning per-store stock as JSON,
+#                         used by inventory crawls (-a mode=inventory)
+#   inventory_api_fields  {'stores': 'dotted.path' to the store list, and 'store_id',
+#                         'quantity', 'availability', 'name', 'latitude', 'longitude'
+#                         paths within each store entry} (defaults: the key names)
+#   budget_weight     share of a multi-site crawl budget (default 1)
 SITES_CONFIG = {
     'canadiantire': {
         'name': 'Canadian Tire',
@@ -43,6 +52,10 @@ DEFAULT_SETTINGS = {
 OUTPUT_DIR = os.getenv('OUTPUT_DIR', './data')
 LOGS_DIR = os.getenv('LOGS_DIR', './logs')
 MANUALS_DIR = os.getenv('MANUALS_DIR', './manuals')
+CRAWLS_DIR = os.getenv('CRAWLS_DIR', './crawls')
+
+# Same Postgres database as backend/core-service (pg_loader.py)
+DATABASE_URL = os.getenv('DATABASE_URL')
 
 TARGET_CATEGORIES = [
     'tools',
@@ -54,4 +67,17 @@ TARGET_CATEGORIES = [
     'automotive',
     'lawn-garden',
     'home-improvement'
-]
\ No newline at end of file
+]
+
+# Relative value of each category when prioritizing URLs (0-1)
+CATEGORY_WEIGHTS = {
+    'power-tools': 1.0,
+    'hand-tools': 0.9,
+    'tools': 0.9,
+    'hardware': 0.8,
+    'home-improvement': 0.6,
+    'appliances': 0.5,
+    'lawn-garden': 0.5,
+    'outdoor': 0.4,
+    'automotive': 0.3,
+}
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Chunk Embeddings
+
+Embeds RAG chunks into a float32 matrix saved next to the chunk ids, the
+input for vector_quantization.py and the retrieval tools.
+
+The built-in embedder needs nothing beyond NumPy: hashed word, word-bigram
+and character 4-gram features with signed buckets (the hashing trick), log
+scaled and L2-normalized, so dot products are cosine similarities. Vectors
+from a hosted embedding model can be saved in the same layout with
+save_embeddings().
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from catalogue import latest_file
+from config import OUTPUT_DIR
+
+DEFAULT_DIM = 256
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+(?:[./-][a-z0-9]+)*')
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(str(text or '').lower())
+
+class HashingEmbedder:
+    """Dense embeddings from hashed n-gram features"""
+
+    def __init__(self, dim: int = DEFAULT_DIM, seed: int = 0):
+        self.dim = dim
+        self.seed = seed
+
+    def features(self, text: str) -> List[str]:
+        words = tokenize(text)
+        features = ['w:' + word for word in words]
+        features.extend(f'b:{a} {b}' for a, b in zip(words, words[1:]))
+        for word in words:
+            padded = f'<{word}>'
+            features.extend('c:' + padded[i:i + 4] for i in range(max(len(padded) - 3, 1)))
+        return features
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self.features(text):
+                h = zlib.crc32(feature.encode('utf-8'), self.seed)
+                vectors[row, h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        # Dampen repeated features, then normalize for cosine similarity
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self.embed([text])[0]
+
+def chunk_text(chunk: Dict) -> str:
+    return chunk.get('content', '')
+
+def save_embeddings(chunks: List[Dict], vectors: np.ndarray, output_dir: str, model: str) -> str:
+    """Write vectors.npy (float32, one row per chunk) and a manifest with the chunk ids"""
+    os.makedirs(output_dir, exist_ok=True)
+    np.save(os.path.join(output_dir, 'vectors.npy'), vectors.astype(np.float32))
+    manifest = {
+        'created_at': datetime.now().isoformat(),
+        'model': model,
+        'dim': int(vectors.shape[1]),
+        'count': int(vectors.shape[0]),
+        'ids': [chunk['id'] for chunk in chunks],
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    return output_dir
+
+def load_embeddings(path: str, mmap: bool = True):
+    """(vectors, manifest) of a saved embedding directory"""
+    with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    vectors = np.load(os.path.join(path, 'vectors.npy'), mmap_mode='r' if mmap else None)
+    return vectors, manifest
+
+def latest_embeddings(data_dir: str = OUTPUT_DIR) -> Optional[str]:
+    return latest_file('chunk_embeddings_*', data_dir)
+
+def load_chunk_files(data_dir: str = OUTPUT_DIR) -> List[Dict]:
+    """Chunks from the latest rag_chunks_* and drilling_rag_chunks_* files"""
+    chunks = []
+    for pattern in ('rag_chunks_*.json', 'drilling_rag_chunks_*.json'):
+        files = [f for f in glob.glob(os.path.join(data_dir, pattern))
+                 if not f.endswith(('_deduped.json', '_dedup_report.json'))]
+        if files:
+            with open(max(files), 'r', encoding='utf-8') as f:
+                chunks.extend(json.load(f))
+    return chunks
+
+def main():
+    parser = argparse.ArgumentParser(description='Embed RAG chunks into a float32 matrix')
+    parser.add_argument('--dim', type=int, default=DEFAULT_DIM, help='Embedding dimension')
+    args = parser.parse_args()
+
+    chunks = load_chunk_files()
+    if not chunks:
+        print("No RAG chunk files found. Run working_scraper.py or comprehensive_drill_data.py first.")
+        return
+
+    print(f"🧮 Embedding {len(chunks)} chunks ({args.dim} dimensions)...")
+    embedder = HashingEmbedder(args.dim)
+    vectors = embedder.embed([chunk_text(chunk) for chunk in chunks])
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    output_dir = save_embeddings(chunks, vectors, os.path.join(OUTPUT_DIR, f'chunk_embeddings_{timestamp}'),
+                                 f'hashing-{args.dim}')
+    print(f"✅ {vectors.shape[0]} x {vectors.shape[1]} float32 ({vectors.nbytes / 1024:.0f} KB)")
+    print(f"📁 Embeddings: {output_dir}")
+
+if __name__ == "__main__":
+    main()
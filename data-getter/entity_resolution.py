@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Cross-Site Product Entity Resolution
+
+Rona and Canadian Tire list the same DEWALT, Milwaukee or Makita product under
+different names and URLs. This groups equivalent records into clusters and
+gives each cluster a canonical product id that chunking and indexing can
+dedupe on.
+
+Two passes, both near-linear in the number of products:
+
+1. Blocking: records with the same normalized brand and model number
+   (from the model field, or a model-like token in the name) are merged.
+2. MinHash/LSH: name, specification and description shingles are MinHashed
+   and banded; records that share a band bucket and whose estimated Jaccard
+   similarity passes the threshold are merged, unless their brands or model
+   numbers disagree. When either record has no model number, their names
+   must also carry the same sizes, voltages and variant codes, and specs
+   they both list must agree.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from catalogue import latest_file, load_json, load_products
+from config import OUTPUT_DIR
+
+NUM_PERM = 128
+DEFAULT_THRESHOLD = 0.5
+
+# Buckets larger than this are boilerplate ("cordless drill kit"), not evidence;
+# they are split by name codes, and what is still larger is dropped
+MAX_BUCKET = 50
+
+# Mersenne prime 2^31 - 1: a * x + b stays inside uint64
+PRIME = (1 << 31) - 1
+
+MODEL_PATTERN = re.compile(r'\b(?:[A-Z]{1,5}\d{2,}[A-Z0-9]*|\d{4}-\d{2})\b')
+
+def normalize_text(text) -> str:
+    return re.sub(r'[^a-z0-9]+', ' ', str(text or '').lower()).strip()
+
+def normalize_brand(brand) -> str:
+    return re.sub(r'[^a-z0-9]', '', str(brand or '').lower())
+
+def normalize_model(model) -> str:
+    """'DCD771C2', 'dcd-771 c2' -> 'DCD771C2'"""
+    return re.sub(r'[^A-Z0-9]', '', str(model or '').upper())
+
+def model_number(record: Dict) -> str:
+    """The record's normalized model number, falling back to one found in its name"""
+    model = normalize_model(record.get('model'))
+    if len(model) >= 4:
+        return model
+    # Product lines such as 'M18' or 'DCB' are shorter than real model numbers
+    found = [normalize_model(m) for m in MODEL_PATTERN.findall(str(record.get('name') or '').upper())]
+    return max((m for m in found if len(m) >= 5), key=len, default='')
+
+def name_codes(record: Dict) -> frozenset:
+    """Name tokens holding a digit: '20v', '1/2', 'v3', model numbers"""
+    return frozenset(t for t in normalize_text(record.get('name')).split() if any(c.isdigit() for c in t))
+
+def specs_agree(a: Dict, b: Dict) -> bool:
+    """True unless a specification both records list has different values"""
+    specs_a = {normalize_text(k): normalize_text(v) for k, v in (a.get('specifications') or {}).items()}
+    specs_b = {normalize_text(k): normalize_text(v) for k, v in (b.get('specifications') or {}).items()}
+    return all(specs_b[key] == value for key, value in specs_a.items() if key in specs_b)
+
+def shingles(record: Dict) -> set:
+    """Field-tagged shingles: name character 5-grams, spec pairs, description word 3-grams"""
+    result = set()
+    name = normalize_text(f"{record.get('brand', '')} {record.get('name', '')}")
+    for i in range(max(len(name) - 4, 1)):
+        result.add('n:' + name[i:i + 5])
+    for key, value in (record.get('specifications') or {}).items():
+        result.add(f's:{normalize_text(key)}={normalize_text(value)}')
+    words = normalize_text(record.get('description')).split()
+    for i in range(len(words) - 2):
+        result.add('d:' + ' '.join(words[i:i + 3]))
+    return result
+
+def lsh_shape(threshold: float, num_perm: int = NUM_PERM) -> Tuple[int, int]:
+    """Bands and rows whose S-curve midpoint (1/b)^(1/r) is closest to the threshold"""
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+class MinHasher:
+    """MinHash signatures with universal hashing (a*x + b) mod p"""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, tokens: set) -> np.ndarray:
+        if not tokens:
+            return np.full(len(self.a), PRIME, dtype=np.uint64)
+        hashes = np.array([zlib.crc32(t.encode('utf-8')) & PRIME for t in tokens], dtype=np.uint64)
+        return ((np.outer(hashes, self.a) + self.b) % PRIME).min(axis=0)
+
+class Clusters:
+    """Union-find that refuses to merge clusters with conflicting brands or models"""
+
+    def __init__(self, records: List[Dict]):
+        self.parent = list(range(len(records)))
+        self.brands = [{normalize_brand(r.get('brand'))} - {''} for r in records]
+        self.models = [{model_number(r)} - {''} for r in records]
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i: int, j: int, check: bool = True) -> bool:
+        i, j = self.find(i), self.find(j)
+        if i == j:
+            return False
+        if check and ((self.brands[i] and self.brands[j] and not self.brands[i] & self.brands[j])
+                      or (self.models[i] and self.models[j] and not self.models[i] & self.models[j])):
+            return False
+        self.parent[j] = i
+        self.brands[i] |= self.brands[j]
+        self.models[i] |= self.models[j]
+        return True
+
+    def groups(self) -> Dict[int, List[int]]:
+        groups = {}
+        for i in range(len(self.parent)):
+            groups.setdefault(self.find(i), []).append(i)
+        return groups
+
+def record_id(record: Dict) -> str:
+    return str(record.get('id') or record.get('sku') or record.get('url'))
+
+def canonical_id(members: List[Dict]) -> str:
+    """Stable id for a cluster: brand and model when known, else a hash of its members"""
+    keys = Counter((normalize_brand(r.get('brand')), model_number(r)) for r in members if model_number(r))
+    if keys:
+        (brand, model), _ = keys.most_common(1)[0]
+        return f"{brand}-{model.lower()}" if brand else model.lower()
+    digest = hashlib.sha1('\n'.join(sorted(record_id(r) for r in members)).encode('utf-8'))
+    return 'p-' + digest.hexdigest()[:12]
+
+def resolve_entities(records: List[Dict], threshold: float = DEFAULT_THRESHOLD,
+                     num_perm: int = NUM_PERM) -> Dict:
+    """Cluster equivalent records; returns clusters and a record id -> canonical id map"""
+    clusters = Clusters(records)
+    stats = {'records': len(records), 'blocked_merges': 0, 'lsh_candidates': 0, 'lsh_merges': 0,
+             'lsh_rejected': 0}
+
+    # Pass 1: same brand and model number
+    blocks = {}
+    for i, record in enumerate(records):
+        model = model_number(record)
+        if model:
+            blocks.setdefault((normalize_brand(record.get('brand')), model), []).append(i)
+    for members in blocks.values():
+        for j in members[1:]:
+            stats['blocked_merges'] += clusters.union(members[0], j, check=False)
+
+    # Pass 2: MinHash/LSH over shingles
+    models = [model_number(r) for r in records]
+    codes = [name_codes(r) for r in records]
+    bands, rows = lsh_shape(threshold, num_perm)
+    hasher = MinHasher(num_perm)
+    signatures = np.array([hasher.signature(shingles(r)) for r in records], dtype=np.uint64).reshape(-1, num_perm)
+    candidates = set()
+    for band in range(bands):
+        buckets = {}
+        chunk = signatures[:, band * rows:(band + 1) * rows]
+        for i, key in enumerate(map(bytes, chunk)):
+            buckets.setdefault(key, []).append(i)
+        for members in buckets.values():
+            groups = [members]
+            if len(members) > MAX_BUCKET:
+                # Sibling variants crowd the bucket; only records with the same
+                # name codes could merge anyway (same models were blocked above)
+                by_codes = {}
+                for i in members:
+                    by_codes.setdefault(codes[i], []).append(i)
+                groups = by_codes.values()
+            for group in groups:
+                if 1 < len(group) <= MAX_BUCKET:
+                    candidates.update((a, b) for k, a in enumerate(group) for b in group[k + 1:])
+
+    stats['lsh_candidates'] = len(candidates)
+    pairs = np.array(sorted(candidates), dtype=np.int64).reshape(-1, 2)
+    for start in range(0, len(pairs), 100000):
+        batch = pairs[start:start + 100000]
+        similarity = (signatures[batch[:, 0]] == signatures[batch[:, 1]]).mean(axis=1)
+        for i, j in batch[similarity >= threshold].tolist():
+            # Without a model number on both sides, similar text is not enough:
+            # sibling kits and sizes differ only in a few name tokens or specs
+            if not (models[i] and models[j]) and (
+                    codes[i] != codes[j] or not specs_agree(records[i], records[j])):
+                stats['lsh_rejected'] += 1
+                continue
+            stats['lsh_merges'] += clusters.union(i, j)
+
+    result = {}
+    canonical_ids = {}
+    for members in clusters.groups().values():
+        member_records = [records[i] for i in members]
+        cluster_id = canonical_id(member_records)
+        result[cluster_id] = {
+            'name': member_records[0].get('name'),
+            'brand': member_records[0].get('brand'),
+            'members': [{'id': record_id(r), 'site': r.get('site') or r.get('source'),
+                         'url': r.get('url'), 'name': r.get('name')} for r in member_records],
+        }
+        for record in member_records:
+            canonical_ids[record_id(record)] = cluster_id
+
+    stats['clusters'] = len(result)
+    stats['multi_record_clusters'] = sum(1 for c in result.values() if len(c['members']) > 1)
+    stats['bands'], stats['rows'] = bands, rows
+    return {'clusters': result, 'canonical_ids': canonical_ids, 'stats': stats}
+
+def load_canonical_ids(data_dir: str = OUTPUT_DIR) -> Dict[str, str]:
+    """Record id -> canonical product id from the latest resolution run"""
+    path = latest_file('entity_clusters_*.json', data_dir)
+    data = load_json(path) if path else None
+    return (data or {}).get('canonical_ids', {})
+
+def resolve_canonical_id(record: Dict, canonical_ids: Dict[str, str]) -> str:
+    """A record's canonical id, or its own id if it has not been resolved"""
+    return canonical_ids.get(record_id(record), record_id(record))
+
+def perturbed_copy(record: Dict, site: str, rng: random.Random) -> Dict:
+    """The same product as another retailer might list it"""
+    words = str(record.get('name', '')).split()
+    if len(words) > 2:
+        i = rng.randrange(len(words) - 1)
+        words[i], words[i + 1] = words[i + 1], words[i]
+    copy = dict(record)
+    copy['id'] = f"{site}-{record_id(record)}"
+    copy['site'] = site
+    copy['name'] = ' '.join(words) + rng.choice(['', ' Kit', ' - Tool Only', ' (New)'])
+    if rng.random() < 0.5:
+        copy['model'] = ''
+    return copy
+
+def run_benchmark(products: List[Dict], copies: int, threshold: float) -> Dict:
+    """Resolve `copies` listings of the catalogue: each product family in 3 sites"""
+    rng = random.Random(0)
+    records = []
+    for i in range(copies):
+        variant, site = divmod(i, 3)
+        for product in products:
+            record = dict(product)
+            if variant:
+                # A distinct product of the same family (another kit, size or colour)
+                record['model'] = f"{product.get('model') or product.get('id')}V{variant}"
+                record['name'] = f"{product.get('name', '')} V{variant}"
+            record = perturbed_copy(record, f'site{site}', rng)
+            record['id'] = f"{record['id']}-{i}"
+            records.append(record)
+    started = time.perf_counter()
+    result = resolve_entities(records, threshold)
+    elapsed = time.perf_counter() - started
+    return {'records': len(records), 'seconds': elapsed,
+            'records_per_second': len(records) / elapsed if elapsed else 0.0,
+            'clusters': result['stats']['clusters'],
+            'expected_clusters': len(products) * -(-copies // 3)}
+
+def main():
+    parser = argparse.ArgumentParser(description='Cluster equivalent products across sites')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='MinHash Jaccard similarity needed to merge')
+    parser.add_argument('--benchmark', action='store_true', help='Run the scaling benchmark')
+    parser.add_argument('--copies', type=int, default=300, help='Catalogue copies for the benchmark')
+    args = parser.parse_args()
+
+    products = load_products()
+    if not products:
+        print("No product data found. Run comprehensive_drill_data.py first.")
+        return
+
+    print(f"🔗 Resolving {len(products)} products across sites...")
+    result = resolve_entities(products, args.threshold)
+    stats = result['stats']
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    output_file = os.path.join(OUTPUT_DIR, f'entity_clusters_{timestamp}.json')
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            'created_at': datetime.now().isoformat(),
+            'threshold': args.threshold,
+            'stats': stats,
+            'clusters': result['clusters'],
+            'canonical_ids': result['canonical_ids'],
+        }, f, indent=2, ensure_ascii=False)
+
+    print(f"✅ {stats['records']} records -> {stats['clusters']} products "
+          f"({stats['multi_record_clusters']} listed more than once)")
+    print(f"   • Model-number merges: {stats['blocked_merges']}")
+    print(f"   • LSH candidates: {stats['lsh_candidates']}, merges: {stats['lsh_merges']} "
+          f"({stats['bands']} bands x {stats['rows']} rows)")
+    print(f"📄 Clusters: {output_file}")
+
+    if args.benchmark:
+        print(f"\n⏱️  Benchmarking with {args.copies}x catalogue...")
+        for copies in (args.copies // 4, args.copies // 2, args.copies):
+            bench = run_benchmark(products, max(copies, 1), args.threshold)
+            print(f"   • {bench['records']} records: {bench['seconds']:.2f}s "
+                  f"({bench['records_per_second']:.0f} records/s, "
+                  f"{bench['clusters']} clusters, {bench['expected_clusters']} expected)")
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,9 @@ import json
 import os
 from datetime import datetime
 
+from entity_resolution import load_canonical_ids, resolve_canonical_id
+from spec_normalizer import normalize_specifications
+
 def create_raw_export():
     """Create raw export data with no pre-chunking"""
     
@@ -24,6 +27,9 @@ def create_raw_export():
     with open(latest_file, 'r') as f:
         data = json.load(f)
     
+    # Cross-site product clusters from entity_resolution.py, if it has been run
+    canonical_ids = load_canonical_ids()
+    
     # Create raw format - just clean product data
     raw_export = {
         "metadata": {
@@ -41,6 +47,7 @@ def create_raw_export():
     for drill in data["drills"]:
         raw_product = {
             "id": drill["id"],
+            "canonical_id": resolve_canonical_id(drill, canonical_ids),
             "name": drill["name"],
             "brand": drill["brand"],
             "model": drill["model"],
@@ -56,6 +63,9 @@ def create_raw_export():
             # All specifications as structured data
             "specifications": drill["specifications"],
             
+            # Numeric SI values parsed from the specifications
+            "normalized_specifications": normalize_specifications(drill["specifications"]),
+            
             # Drilling capabilities
             "drilling_capacity": drill.get("drilling_capacity", {}),
             
@@ -81,6 +91,7 @@ def create_raw_export():
     for bit in data["drill_bits"]:
         raw_product = {
             "id": bit["id"],
+            "canonical_id": resolve_canonical_id(bit, canonical_ids),
             "name": bit["name"],
             "brand": bit["brand"],
             "model": bit["model"],
@@ -96,6 +107,9 @@ def create_raw_export():
             # All specifications as structured data
             "specifications": bit["specifications"],
             
+            # Numeric SI values parsed from the specifications
+            "normalized_specifications": normalize_specifications(bit["specifications"]),
+            
             # Size information
             "size_range": bit.get("size_range", {}),
             
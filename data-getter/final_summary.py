@@ -6,6 +6,19 @@ Final Summary of Comprehensive Drilling Equipment Database
 import json
 import glob
 
+RAG_QUERIES = [
+    "What drill should I use for concrete work?",
+    "What size drill bit do I need for #10 screws?",
+    "Best cordless drill under $200?",
+    "What drill bits work best with stainless steel?",
+    "I need to drill holes in ceramic tile, what should I use?",
+    "What's the difference between impact driver and regular drill?",
+    "What drill bit sizes come in the DEWALT black oxide set?",
+    "I need a drill for tight spaces, what do you recommend?",
+    "What's the drilling capacity of the Milwaukee hammer drill?",
+    "Best drill bits for woodworking projects?"
+]
+
 def show_final_summary():
     # Load the comprehensive dataset
     data_files = glob.glob('./data/comprehensive_drilling_data_*.json')
@@ -43,20 +56,7 @@ def show_final_summary():
     print(f'   • Drill Bits: ${min(bit_prices):.2f} - ${max(bit_prices):.2f}')
     
     print(f'\n🎯 PERFECT FOR RAG QUERIES:')
-    queries = [
-        "What drill should I use for concrete work?",
-        "What size drill bit do I need for #10 screws?", 
-        "Best cordless drill under $200?",
-        "What drill bits work best with stainless steel?",
-        "I need to drill holes in ceramic tile, what should I use?",
-        "What's the difference between impact driver and regular drill?",
-        "What drill bit sizes come in the DEWALT black oxide set?",
-        "I need a drill for tight spaces, what do you recommend?",
-        "What's the drilling capacity of the Milwaukee hammer drill?",
-        "Best drill bits for woodworking projects?"
-    ]
-    
-    for i, query in enumerate(queries, 1):
+    for i, query in enumerate(RAG_QUERIES, 1):
         print(f'   {i:2d}. "{query}"')
     
     print(f'\n📁 FILES CREATED:')
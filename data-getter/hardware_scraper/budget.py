@@ -0,0 +1,319 @@
+import math
+import time
+from urllib.parse import urlparse
+
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider
+from twisted.internet import task
+
+from hardware_scraper.checkpoint import CheckpointStore
+
+# Spider callbacks whose requests are charged to the request budget
+PRODUCT_CALLBACKS = ('parse_product', 'parse_price', 'parse_price_api', 'parse_inventory_api')
+
+def water_fill(capacity, demands, weights=None):
+    """Split an integer capacity by weight without giving anyone more than they ask
+
+    Weighted max-min fairness: keys whose demand is below their weighted
+    share get all of it, and what they leave is shared among the rest.
+    """
+    weights = weights or {}
+    allocation = {key: 0 for key in demands}
+    active = {key for key, demand in demands.items() if demand > 0}
+    remaining = capacity
+
+    while active and remaining > 0:
+        total_weight = sum(weights.get(key, 1.0) for key in active) or len(active)
+        shares = {key: remaining * weights.get(key, 1.0) / total_weight for key in active}
+        satisfied = {key for key in active if demands[key] - allocation[key] <= shares[key]}
+        if satisfied:
+            for key in satisfied:
+                remaining -= demands[key] - allocation[key]
+                allocation[key] = demands[key]
+            active -= satisfied
+            continue
+
+        # Everyone wants more than their share: round down, then hand out
+        # the remainder by largest fractional part
+        for key in active:
+            allocation[key] += math.floor(shares[key])
+        leftover = remaining - sum(math.floor(shares[key]) for key in active)
+        for key in sorted(active, key=lambda k: shares[k] - math.floor(shares[k]), reverse=True)[:leftover]:
+            allocation[key] += 1
+        break
+
+    return allocation
+
+class Shard:
+    """Budget bookkeeping for one sitemap shard"""
+
+    def __init__(self, name, weight):
+        self.name = name
+        self.weight = weight
+        self.reported = False
+        # Restored from a checkpoint; its sitemap's entries were counted before
+        self.resumed = False
+        self.granted = 0
+        self.demand = 0
+        # category -> ranked entries not granted yet
+        self.backlog = {}
+
+    def backlog_size(self):
+        return sum(len(entries) for entries in self.backlog.values())
+
+class CrawlBudget:
+    """Global request/byte/time budget shared across sitemap shards and categories
+
+    The request budget is split between the shards listed in the sitemap
+    index by weight (CRAWL_BUDGET_SHARD_WEIGHTS, matched against the shard
+    URL), and each shard's grant between URL categories by CATEGORY_WEIGHTS.
+    Entries arrive already ranked, so each category gets its best URLs.
+    A shard that holds fewer URLs than its share returns the rest to a pool,
+    which is redistributed to shards with a backlog as soon as it appears,
+    and again when the crawl goes idle.
+
+    The byte and time budgets close the spider when exhausted; since the
+    highest-priority requests go first, what is left undone is the least
+    valuable. Burn-down numbers are updated under 'budget/' every
+    CRAWL_BUDGET_INTERVAL seconds.
+
+    In a resumable run (JOBDIR) the grants, pool, shard demand, bytes and
+    elapsed time are checkpointed, so a resumed crawl spends only what the
+    interrupted one left.
+
+    Settings:
+        CRAWL_BUDGET_REQUESTS       product page requests (0 = unlimited)
+        CRAWL_BUDGET_BYTES          downloaded bytes (0 = unlimited)
+        CRAWL_BUDGET_SECONDS        crawl duration (0 = unlimited)
+        CRAWL_BUDGET_SHARD_WEIGHTS  {substring of sitemap URL: weight}
+        CRAWL_BUDGET_INTERVAL       seconds between burn-down updates
+    """
+
+    def __init__(self, crawler, category_weights):
+        self.crawler = crawler
+        settings = crawler.settings
+        self.requests = settings.getint('CRAWL_BUDGET_REQUESTS', 0)
+        self.bytes = settings.getint('CRAWL_BUDGET_BYTES', 0)
+        self.seconds = settings.getfloat('CRAWL_BUDGET_SECONDS', 0)
+        self.shard_weights = settings.getdict('CRAWL_BUDGET_SHARD_WEIGHTS')
+        self.interval = settings.getfloat('CRAWL_BUDGET_INTERVAL', 30.0)
+        self.category_weights = category_weights
+
+        self.shards = {}
+        self.granted = 0
+        self.pool = 0
+        self.bytes_used = 0
+        self.elapsed_before = 0.0
+        self.started = None
+        self.task = None
+        self.closing = False
+
+    @property
+    def stats(self):
+        # Built with the spider, before the crawler has its stats collector
+        return self.crawler.stats
+
+    @classmethod
+    def from_crawler(cls, crawler, category_weights):
+        budget = cls(crawler, category_weights)
+        crawler.signals.connect(budget.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(budget.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(budget.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(budget.response_received, signal=signals.response_received)
+
+        store = CheckpointStore.from_crawler(crawler)
+        if store:
+            budget.restore_state(store.load(cls.__name__, {}))
+        return budget
+
+    def checkpoint_state(self):
+        return {
+            'granted': self.granted,
+            'pool': self.pool,
+            'bytes_used': self.bytes_used,
+            'seconds_elapsed': self.elapsed(),
+            'shards': {
+                name: {'weight': shard.weight, 'reported': shard.reported,
+                       'granted': shard.granted, 'demand': shard.demand}
+                for name, shard in self.shards.items()
+            },
+        }
+
+    def restore_state(self, state):
+        self.granted = state.get('granted', 0)
+        self.pool = state.get('pool', 0)
+        self.bytes_used = state.get('bytes_used', 0)
+        self.elapsed_before = state.get('seconds_elapsed', 0.0)
+        for name, saved in state.get('shards', {}).items():
+            shard = Shard(name, saved['weight'])
+            shard.reported = shard.resumed = saved['reported']
+            shard.granted = saved['granted']
+            shard.demand = saved['demand']
+            self.shards[name] = shard
+
+    def elapsed(self):
+        """Crawl seconds, including those of the run this one resumes"""
+        return self.elapsed_before + (time.time() - self.started if self.started else 0.0)
+
+    def shard_name(self, url):
+        return urlparse(url).path.rsplit('/', 1)[-1] or url
+
+    def shard_weight(self, url):
+        url_lower = url.lower()
+        return max((float(weight) for key, weight in self.shard_weights.items()
+                    if key.lower() in url_lower), default=1.0)
+
+    def register_shards(self, urls):
+        """Declare the shards the request budget will be split between"""
+        for url in urls:
+            name = self.shard_name(url)
+            if name not in self.shards:
+                self.shards[name] = Shard(name, self.shard_weight(url))
+
+    def category(self, url):
+        url_lower = url.lower()
+        matches = [(weight, category) for category, weight in self.category_weights.items()
+                   if category in url_lower]
+        return max(matches)[1] if matches else 'other'
+
+    def entitlement(self, shard):
+        """A shard's weighted share of the request budget"""
+        if not self.requests:
+            return shard.demand
+        shares = water_fill(
+            self.requests,
+            {name: self.requests for name in self.shards},
+            {name: s.weight for name, s in self.shards.items()},
+        )
+        return shares[shard.name]
+
+    def grant(self, url, entries):
+        """Report a shard's ranked entries; returns the entries to request now"""
+        self.register_shards([url])
+        shard = self.shards[self.shard_name(url)]
+        # A resumed shard's demand and leftover were counted before the
+        # interruption; its entries only refill the backlog
+        resumed, shard.resumed = shard.resumed, False
+        shard.reported = True
+        if not resumed:
+            shard.demand += len(entries)
+        for entry in entries:
+            shard.backlog.setdefault(self.category(entry['loc']), []).append(entry)
+
+        share = self.entitlement(shard)
+        granted = self.take(shard, min(share, shard.demand) - shard.granted)
+        # What this shard cannot use goes to the others
+        if self.requests and not resumed:
+            self.pool += max(share - shard.demand, 0)
+        return granted + self.rebalance()
+
+    def take(self, shard, count):
+        """Move up to count entries from a shard's backlog, split by category"""
+        if count <= 0:
+            return []
+        demands = {category: len(entries) for category, entries in shard.backlog.items()}
+        allocation = water_fill(count, demands, self.category_weights)
+        taken = []
+        for category, n in allocation.items():
+            taken.extend(shard.backlog[category][:n])
+            shard.backlog[category] = shard.backlog[category][n:]
+            self.stats.inc_value(f'budget/category/{category}', n)
+        shard.granted += len(taken)
+        self.granted += len(taken)
+        return taken
+
+    def rebalance(self):
+        """Hand the pool to shards that still have a backlog"""
+        if self.pool <= 0:
+            return []
+        demands = {name: shard.backlog_size() for name, shard in self.shards.items()}
+        weights = {name: shard.weight for name, shard in self.shards.items()}
+        allocation = water_fill(self.pool, demands, weights)
+        extra = []
+        for name, count in allocation.items():
+            extra.extend(self.take(self.shards[name], count))
+        self.pool -= sum(allocation.values())
+        if extra:
+            self.stats.inc_value('budget/requests_reallocated', len(extra))
+        return extra
+
+    def release_unreported(self):
+        """Shards whose sitemap never arrived give up their share"""
+        for shard in self.shards.values():
+            if not shard.reported:
+                shard.reported = True
+                self.pool += self.entitlement(shard)
+
+    def response_received(self, response, request, spider):
+        self.bytes_used += len(response.body)
+        if getattr(request.callback, '__name__', '') in PRODUCT_CALLBACKS:
+            self.stats.inc_value('budget/requests_done')
+        if self.bytes and self.bytes_used >= self.bytes:
+            self.close(spider, 'budget_bytes')
+
+    def spider_opened(self, spider):
+        self.started = time.time()
+        self.task = task.LoopingCall(self.tick, spider)
+        self.task.start(self.interval, now=False)
+
+    def spider_idle(self, spider):
+        if not self.requests or self.closing:
+            return
+        self.release_unreported()
+        extra = self.rebalance()
+        for entry in extra:
+            self.crawler.engine.crawl(spider.product_request(entry))
+        if extra:
+            raise DontCloseSpider
+
+    def spider_closed(self, spider, reason):
+        if self.task and self.task.running:
+            self.task.stop()
+        self.tick(spider)
+
+    def close(self, spider, reason):
+        if not self.closing:
+            self.closing = True
+            spider.logger.info(f"Crawl budget exhausted ({reason}), closing spider")
+            self.crawler.engine.close_spider(spider, reason)
+
+    def tick(self, spider):
+        elapsed = self.elapsed()
+        if self.seconds and elapsed >= self.seconds:
+            self.close(spider, 'budget_time')
+
+        snapshot = self.snapshot()
+        for key, value in snapshot.items():
+            if value is not None and not isinstance(value, dict):
+                self.stats.set_value(f'budget/{key}', value)
+        for name, shard in snapshot['shards'].items():
+            for key, value in shard.items():
+                self.stats.set_value(f'budget/shard/{name}/{key}', value)
+
+        if self.requests:
+            spider.logger.info(
+                f"Budget: {snapshot['requests_granted']}/{self.requests} requests granted, "
+                f"{snapshot['requests_done']} done, {self.bytes_used / 1024 / 1024:.1f} MB, "
+                f"{elapsed / 60:.1f} min"
+            )
+
+    def snapshot(self):
+        elapsed = self.elapsed()
+        done = self.stats.get_value('budget/requests_done', 0)
+        snapshot = {
+            'requests_total': self.requests,
+            'requests_granted': self.granted,
+            'requests_done': done,
+            'requests_remaining': max(self.requests - self.granted, 0) if self.requests else None,
+            'pool': self.pool,
+            'bytes_used': self.bytes_used,
+            'bytes_remaining': max(self.bytes - self.bytes_used, 0) if self.bytes else None,
+            'seconds_elapsed': round(elapsed, 1),
+            'seconds_remaining': round(max(self.seconds - elapsed, 0), 1) if self.seconds else None,
+            'shards': {
+                name: {'weight': shard.weight, 'demand': shard.demand,
+                       'granted': shard.granted, 'backlog': shard.backlog_size()}
+                for name, shard in self.shards.items()
+            },
+        }
+        return snapshot
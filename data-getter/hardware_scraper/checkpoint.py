@@ -0,0 +1,37 @@
+import json
+import os
+
+class CheckpointStore:
+    """Atomic JSON checkpoints kept in the crawl's JOBDIR
+
+    Each named checkpoint is a separate file, replaced atomically, so a
+    crash mid-write leaves the previous checkpoint intact.
+    """
+
+    def __init__(self, directory):
+        self.directory = os.path.join(directory, 'checkpoints')
+        os.makedirs(self.directory, exist_ok=True)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """Return a store for resumable runs (JOBDIR set), else None"""
+        job_dir = crawler.settings.get('JOBDIR')
+        return cls(job_dir) if job_dir else None
+
+    def path(self, name):
+        return os.path.join(self.directory, f'{name}.json')
+
+    def load(self, name, default=None):
+        try:
+            with open(self.path(name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return default
+
+    def save(self, name, data):
+        tmp_path = self.path(name) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path(name))
@@ -0,0 +1,590 @@
+import bisect
+import inspect
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from datetime import datetime
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import defer, task
+
+from hardware_scraper.checkpoint import CheckpointStore
+
+logger = logging.getLogger(__name__)
+
+def find_extension(crawler, cls):
+    """Return the running instance of an extension class, if enabled"""
+    extensions = getattr(crawler, 'extensions', None)
+    for extension in getattr(extensions, 'middlewares', []):
+        if isinstance(extension, cls):
+            return extension
+    return None
+
+def find_downloader_middleware(crawler, cls):
+    """Return the running instance of a downloader middleware class, if enabled"""
+    downloader = getattr(getattr(crawler, 'engine', None), 'downloader', None)
+    for middleware in getattr(getattr(downloader, 'middleware', None), 'middlewares', []):
+        if isinstance(middleware, cls):
+            return middleware
+    return None
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (seconds), Prometheus style"""
+
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+               1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Approximate quantile using bucket upper bounds"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(self.BUCKETS[i], self.max) if i < len(self.BUCKETS) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 6) if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'max': round(self.max, 6),
+            'total': round(self.total, 6),
+        }
+
+class TimingStats:
+    """Latency histograms per spider callback, pipeline stage and download slot
+
+    Also tracks item throughput and queue depths. Summaries go into the crawl
+    stats under 'timing/' and into the JsonWriterPipeline metadata file, with an
+    optional Prometheus text endpoint and/or periodically written textfile.
+
+    Settings:
+        TIMING_STATS_ENABLED       enable the extension
+        TIMING_STATS_INTERVAL      seconds between stats/textfile flushes
+        TIMING_STATS_CALLBACKS     spider methods to time (default: parse*, extract_*)
+        TIMING_STATS_TEXTFILE      path for a Prometheus textfile (optional)
+        TIMING_STATS_PROMETHEUS_PORT  port for a /metrics endpoint (optional)
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        settings = crawler.settings
+        self.interval = settings.getfloat('TIMING_STATS_INTERVAL', 30.0)
+        self.callbacks = settings.getlist('TIMING_STATS_CALLBACKS')
+        self.textfile = settings.get('TIMING_STATS_TEXTFILE')
+        self.port = settings.getint('TIMING_STATS_PROMETHEUS_PORT', 0)
+
+        self.histograms = {}
+        self.gauges = {}
+        self.items_scraped = 0
+        self.observations = 0
+        self.observe_cost = 0.0
+        self.started = None
+        self.task = None
+        self.server = None
+        self.rendered = b''
+        self.last_tick = None
+        self.last_items = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('TIMING_STATS_ENABLED'):
+            raise NotConfigured
+
+        ext = cls(crawler)
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(ext.response_received, signal=signals.response_received)
+        crawler.signals.connect(ext.item_scraped, signal=signals.item_scraped)
+        return ext
+
+    def observe(self, kind, name, seconds):
+        key = (kind, name)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram()
+        histogram.observe(seconds)
+        self.observations += 1
+
+    def spider_opened(self, spider):
+        self.started = self.last_tick = time.perf_counter()
+        self.calibrate()
+        self.instrument_spider(spider)
+        self.instrument_pipelines()
+
+        if self.port:
+            self.start_server()
+        self.task = task.LoopingCall(self.tick, spider)
+        self.task.start(self.interval, now=False)
+
+    def spider_closed(self, spider, reason):
+        if self.task and self.task.running:
+            self.task.stop()
+        self.tick(spider)
+        if self.server:
+            self.server.shutdown()
+
+    def response_received(self, response, request, spider):
+        latency = request.meta.get('download_latency')
+        if latency is None:
+            return
+        slot = request.meta.get('download_slot') or urlparse(request.url).hostname or 'unknown'
+        self.observe('download', slot, latency)
+
+    def item_scraped(self, item, response, spider):
+        self.items_scraped += 1
+
+    def calibrate(self, rounds=20000):
+        """Measure the cost of one timed observation to report overhead"""
+        histogram = LatencyHistogram()
+        start = time.perf_counter()
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            histogram.observe(time.perf_counter() - t0)
+        self.observe_cost = (time.perf_counter() - start) / rounds
+
+    def instrument_spider(self, spider):
+        """Replace spider callbacks with timed wrappers on the instance
+
+        Requests built after this point (self.parse_product, etc.) pick up
+        the wrapped bound methods. The wrappers are bound to the spider so
+        requests persisted to JOBDIR still serialize their callbacks by name.
+        """
+        names = self.callbacks or [
+            name for name, _ in inspect.getmembers(type(spider), inspect.isfunction)
+            if name.startswith('parse') or name.startswith('extract_')
+        ]
+        for name in names:
+            func = getattr(type(spider), name, None)
+            if inspect.isfunction(func):
+                setattr(spider, name, types.MethodType(self.timed(func, 'callback', name), spider))
+
+    def instrument_pipelines(self):
+        """Wrap each pipeline's process_item in the pipeline manager chain"""
+        itemproc = self.crawler.engine.scraper.itemproc
+        methods = itemproc.methods['process_item']
+        # Newer Scrapy looks methods up by identity to decide whether to
+        # pass the spider argument, so register the wrappers there too
+        requiring_spider = getattr(itemproc, '_mw_methods_requiring_spider', None)
+        for i, method in enumerate(list(methods)):
+            name = type(getattr(method, '__self__', method)).__name__
+            wrapped = self.timed(method, 'pipeline', name)
+            if requiring_spider is not None and method in requiring_spider:
+                requiring_spider.add(wrapped)
+            methods[i] = wrapped
+
+    def timed(self, func, kind, name):
+        """Wrap a callable so its run time lands in a histogram
+
+        Generators are timed across all of their iterations; Deferreds and
+        coroutines until they complete.
+        """
+        observe = self.observe
+        clock = time.perf_counter
+
+        if inspect.isgeneratorfunction(func):
+            @wraps(func)
+            def timed_generator(*args, **kwargs):
+                elapsed = 0.0
+                generator = func(*args, **kwargs)
+                try:
+                    while True:
+                        t0 = clock()
+                        try:
+                            value = next(generator)
+                        finally:
+                            elapsed += clock() - t0
+                        yield value
+                except StopIteration:
+                    return
+                finally:
+                    observe(kind, name, elapsed)
+            return timed_generator
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def timed_coroutine(*args, **kwargs):
+                t0 = clock()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    observe(kind, name, clock() - t0)
+            return timed_coroutine
+
+        @wraps(func)
+        def timed_call(*args, **kwargs):
+            t0 = clock()
+            result = func(*args, **kwargs)
+            if isinstance(result, defer.Deferred):
+                def done(value):
+                    observe(kind, name, clock() - t0)
+                    return value
+                return result.addBoth(done)
+            observe(kind, name, clock() - t0)
+            return result
+        return timed_call
+
+    def queue_depths(self):
+        engine = self.crawler.engine
+        depths = {}
+        scheduler = getattr(engine, 'scheduler', None) or getattr(getattr(engine, 'slot', None), 'scheduler', None)
+        if scheduler is not None and hasattr(scheduler, '__len__'):
+            depths['scheduler'] = len(scheduler)
+        downloader = getattr(engine, 'downloader', None)
+        if downloader is not None:
+            depths['downloader_active'] = len(downloader.active)
+        scraper_slot = getattr(getattr(engine, 'scraper', None), 'slot', None)
+        if scraper_slot is not None:
+            depths['scraper_active'] = len(scraper_slot.active)
+        return depths
+
+    def tick(self, spider):
+        now = time.perf_counter()
+        elapsed = now - self.last_tick
+        if elapsed > 0:
+            self.gauges['items_per_second'] = round((self.items_scraped - self.last_items) / elapsed, 3)
+        self.last_tick, self.last_items = now, self.items_scraped
+        try:
+            for queue, depth in self.queue_depths().items():
+                self.gauges[f'queue_depth/{queue}'] = depth
+        except Exception as e:
+            logger.debug(f"Could not read queue depths: {e}")
+
+        snapshot = self.snapshot()
+        for (kind, name), histogram in self.histograms.items():
+            for metric, value in histogram.summary().items():
+                self.stats.set_value(f'timing/{kind}/{name}/{metric}', value)
+        for gauge, value in self.gauges.items():
+            self.stats.set_value(f'timing/{gauge}', value)
+        self.stats.set_value('timing/overhead_ratio', snapshot['overhead_ratio'])
+
+        self.rendered = self.render_prometheus().encode('utf-8')
+        if self.textfile:
+            self.write_textfile()
+
+    def snapshot(self):
+        """Current summaries, for stats and the output metadata file"""
+        elapsed = time.perf_counter() - self.started if self.started else 0.0
+        overhead = self.observations * self.observe_cost
+        result = {
+            'elapsed_seconds': round(elapsed, 3),
+            'items_scraped': self.items_scraped,
+            'overhead_seconds': round(overhead, 6),
+            'overhead_ratio': round(overhead / elapsed, 6) if elapsed else 0.0,
+            'gauges': dict(self.gauges),
+        }
+        for (kind, name), histogram in sorted(self.histograms.items()):
+            result.setdefault(kind, {})[name] = histogram.summary()
+        return result
+
+    def render_prometheus(self):
+        lines = [
+            '# HELP scrapy_latency_seconds Latency per callback, pipeline stage and download slot',
+            '# TYPE scrapy_latency_seconds histogram',
+        ]
+        for (kind, name), histogram in sorted(self.histograms.items()):
+            labels = f'kind="{kind}",name="{name}"'
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.BUCKETS + ('+Inf',), histogram.counts):
+                cumulative += bucket_count
+                lines.append(f'scrapy_latency_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'scrapy_latency_seconds_sum{{{labels}}} {histogram.total:.6f}')
+            lines.append(f'scrapy_latency_seconds_count{{{labels}}} {histogram.count}')
+        lines.append('# TYPE scrapy_items_scraped_total counter')
+        lines.append(f'scrapy_items_scraped_total {self.items_scraped}')
+        for gauge, value in sorted(self.gauges.items()):
+            metric = 'scrapy_' + gauge.replace('/', '_')
+            lines.append(f'# TYPE {metric} gauge')
+            lines.append(f'{metric} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self):
+        directory = os.path.dirname(self.textfile)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_file = f'{self.textfile}.tmp'
+        with open(tmp_file, 'wb') as f:
+            f.write(self.rendered)
+        os.replace(tmp_file, self.textfile)
+
+    def start_server(self):
+        ext = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') != '/metrics':
+                    self.send_error(404)
+                    return
+                body = ext.rendered
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('0.0.0.0', self.port), MetricsHandler)
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        logger.info(f"Timing metrics available at http://0.0.0.0:{self.port}/metrics")
+
+def current_rss_bytes():
+    """Resident set size of this process, in bytes"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is the peak, in kilobytes on Linux and bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+class MemoryTracker:
+    """Sample memory growth during long crawls
+
+    Every interval it records RSS, optionally the top tracemalloc allocation
+    sites, Scrapy live-object counts (trackref) and the size of growing containers
+    held by pipelines (seen-URL sets, download logs). Samples are appended
+    as JSON lines next to the run output. Crossing the ceiling either closes
+    the spider gracefully or only logs an alert.
+
+    Settings:
+        MEMORY_TRACKER_ENABLED      enable the extension (opt-in)
+        MEMORY_TRACKER_INTERVAL     seconds between samples
+        MEMORY_TRACKER_DIR          directory for the time series (default OUTPUT_DIR)
+        MEMORY_TRACKER_TRACEMALLOC  also record top allocators (slows every allocation)
+        MEMORY_TRACKER_TOP          number of allocation sites to record
+        MEMORY_TRACKER_WARNING_MB   log a warning once above this RSS
+        MEMORY_TRACKER_CEILING_MB   RSS ceiling
+        MEMORY_TRACKER_ACTION       'close' (soft close) or 'alert'
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        settings = crawler.settings
+        self.interval = settings.getfloat('MEMORY_TRACKER_INTERVAL', 60.0)
+        self.output_dir = settings.get('MEMORY_TRACKER_DIR') or settings.get('OUTPUT_DIR', 'data')
+        self.use_tracemalloc = settings.getbool('MEMORY_TRACKER_TRACEMALLOC', False)
+        self.top = settings.getint('MEMORY_TRACKER_TOP', 10)
+        self.warning_bytes = settings.getint('MEMORY_TRACKER_WARNING_MB', 0) * 1024 * 1024
+        self.ceiling_bytes = settings.getint('MEMORY_TRACKER_CEILING_MB', 0) * 1024 * 1024
+        self.action = settings.get('MEMORY_TRACKER_ACTION', 'close')
+
+        self.task = None
+        self.file = None
+        self.filename = None
+        self.started = None
+        self.warned = False
+        self.ceiling_hit = False
+        self.baseline_rss = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('MEMORY_TRACKER_ENABLED'):
+            raise NotConfigured
+
+        ext = cls(crawler)
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_opened(self, spider):
+        if self.use_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        # Named by the run id like the run output, so a resumed run appends to its own series
+        run_id = self.crawler.settings.get('RUN_ID') or datetime.now().strftime('%Y%m%d_%H%M%S')
+        site = getattr(spider, 'site_name', spider.name)
+        self.filename = os.path.join(self.output_dir, f'memory_{site}_{run_id}.jsonl')
+        self.file = open(self.filename, 'a', encoding='utf-8')
+
+        self.started = time.time()
+        self.baseline_rss = current_rss_bytes()
+        self.task = task.LoopingCall(self.sample, spider)
+        self.task.start(self.interval, now=True)
+
+    def spider_closed(self, spider, reason):
+        if self.task and self.task.running:
+            self.task.stop()
+        self.sample(spider)
+        if self.file:
+            self.file.close()
+        if self.use_tracemalloc and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        spider.logger.info(f"Memory time series saved to {self.filename}")
+
+    def live_objects(self):
+        from scrapy.utils.trackref import live_refs
+
+        return {cls.__name__: len(refs) for cls, refs in live_refs.items() if refs}
+
+    def container_sizes(self):
+        """len() of list/set/dict attributes held by item pipelines"""
+        sizes = {}
+        itemproc = getattr(getattr(self.crawler.engine, 'scraper', None), 'itemproc', None)
+        for pipeline in getattr(itemproc, 'middlewares', []):
+            for attr, value in vars(pipeline).items():
+                if isinstance(value, (list, set, dict)):
+                    sizes[f'{type(pipeline).__name__}.{attr}'] = len(value)
+        return sizes
+
+    def top_allocators(self):
+        if not tracemalloc.is_tracing():
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        return [
+            {'location': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+             'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+            for stat in snapshot.statistics('lineno')[:self.top]
+        ]
+
+    def sample(self, spider):
+        rss = current_rss_bytes()
+        record = {
+            'time': round(time.time() - self.started, 1),
+            'rss_mb': round(rss / 1024 / 1024, 1),
+            'rss_growth_mb': round((rss - self.baseline_rss) / 1024 / 1024, 1),
+            'items_scraped': self.stats.get_value('item_scraped_count', 0),
+            'live_objects': self.live_objects(),
+            'containers': self.container_sizes(),
+        }
+        if self.use_tracemalloc:
+            record['top_allocators'] = self.top_allocators()
+
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+
+        self.stats.set_value('memory/rss_mb', record['rss_mb'])
+        self.stats.max_value('memory/rss_max_mb', record['rss_mb'])
+        self.check_limits(rss, spider)
+
+    def check_limits(self, rss, spider):
+        if self.warning_bytes and rss > self.warning_bytes and not self.warned:
+            self.warned = True
+            self.stats.set_value('memory/warning_reached', True)
+            spider.logger.warning(f"Memory usage above warning level: {rss / 1024 / 1024:.0f} MB")
+
+        if self.ceiling_bytes and rss > self.ceiling_bytes and not self.ceiling_hit:
+            self.ceiling_hit = True
+            self.stats.set_value('memory/ceiling_reached', True)
+            if self.action == 'close':
+                spider.logger.error(f"Memory ceiling reached ({rss / 1024 / 1024:.0f} MB), closing spider")
+                self.crawler.engine.close_spider(spider, 'memory_ceiling')
+            else:
+                spider.logger.error(f"Memory ceiling reached ({rss / 1024 / 1024:.0f} MB)")
+
+class Checkpointer:
+    """Periodically checkpoint pipeline state and crawl stats for resuming
+
+    Only active when JOBDIR is set; Scrapy itself persists the scheduler
+    queue and request fingerprints there. This adds the state Scrapy does
+    not keep: every pipeline or downloader middleware with
+    checkpoint_state()/restore_state() (seen URLs, download log, output
+    metadata, unchanged pages), the spider's crawl budget, plus the integer
+    crawl counters,
+    which are added back on resume so totals cover the whole run.
+
+    Settings:
+        CHECKPOINT_INTERVAL    seconds between checkpoints (default 60)
+    """
+
+    # Gauges and per-process values that make no sense to carry over
+    SKIP_STATS = ('timing/', 'memory/', 'memusage/', 'checkpoint/')
+
+    def __init__(self, crawler, store):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.store = store
+        self.interval = crawler.settings.getfloat('CHECKPOINT_INTERVAL', 60.0)
+        self.task = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        store = CheckpointStore.from_crawler(crawler)
+        if store is None:
+            raise NotConfigured
+
+        ext = cls(crawler, store)
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def components(self):
+        """Item pipelines, downloader middlewares and the crawl budget that keep resumable state"""
+        engine = self.crawler.engine
+        itemproc = getattr(getattr(engine, 'scraper', None), 'itemproc', None)
+        downloader_mw = getattr(getattr(engine, 'downloader', None), 'middleware', None)
+        components = getattr(itemproc, 'middlewares', []) + getattr(downloader_mw, 'middlewares', [])
+        budget = getattr(getattr(self.crawler, 'spider', None), 'budget', None)
+        if budget:
+            components = components + [budget]
+        return [c for c in components if hasattr(c, 'checkpoint_state')]
+
+    def spider_opened(self, spider):
+        previous = self.store.load('stats', {})
+        for key, value in previous.items():
+            if isinstance(value, int) and not key.startswith(self.SKIP_STATS):
+                self.stats.inc_value(key, value)
+        if previous:
+            self.stats.inc_value('checkpoint/resumed_count')
+            spider.logger.info(f"Resumed crawl from checkpoint in {self.store.directory}")
+
+        self.task = task.LoopingCall(self.checkpoint, spider)
+        self.task.start(self.interval, now=False)
+
+    def spider_closed(self, spider, reason):
+        if self.task and self.task.running:
+            self.task.stop()
+        self.checkpoint(spider)
+
+    def checkpoint(self, spider):
+        # Pipeline state first, so the stats never count items that the
+        # pipeline checkpoint does not know about
+        for component in self.components():
+            self.store.save(type(component).__name__, component.checkpoint_state())
+
+        stats = {key: value for key, value in self.stats.get_stats().items()
+                 if isinstance(value, int) and not isinstance(value, bool)
+                 and not key.startswith(self.SKIP_STATS)}
+        # Values restored at open are already included in the live counters
+        self.store.save('stats', stats)
+        self.stats.inc_value('checkpoint/saved_count')
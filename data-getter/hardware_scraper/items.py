@@ -9,6 +9,7 @@ class ProductItem(scrapy.Item):
     price = scrapy.Field()
     description = scrapy.Field()
     specifications = scrapy.Field()
+    normalized_specifications = scrapy.Field()
     category = scrapy.Field()
     subcategory = scrapy.Field()
     images = scrapy.Field()
@@ -22,4 +23,24 @@ class ProductItem(scrapy.Item):
     weight = scrapy.Field()
     warranty = scrapy.Field()
     scraped_at = scrapy.Field()
-    site = scrapy.Field()
\ No newline at end of file
+    site = scrapy.Field()
+
+
+class PriceItem(scrapy.Item):
+    url = scrapy.Field()
+    sku = scrapy.Field()
+    site = scrapy.Field()
+    price = scrapy.Field()
+    availability = scrapy.Field()
+    previous_price = scrapy.Field()
+    previous_availability = scrapy.Field()
+    checked_at = scrapy.Field()
+
+
+class InventoryItem(scrapy.Item):
+    url = scrapy.Field()
+    sku = scrapy.Field()
+    site = scrapy.Field()
+    # [{'store_id', 'quantity', 'availability', 'name', 'latitude', 'longitude'}]
+    stores = scrapy.Field()
+    checked_at = scrapy.Field()
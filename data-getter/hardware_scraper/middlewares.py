@@ -0,0 +1,360 @@
+from urllib.parse import urlparse
+
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider, IgnoreRequest, NotConfigured
+from twisted.internet import reactor
+
+from hardware_scraper.checkpoint import CheckpointStore
+from hardware_scraper.utils import classify_page
+from hardware_scraper.validators import ValidatorStore
+
+# Page types that count against a domain's circuit breaker
+BLOCKED_PAGE_TYPES = ('challenge', 'empty')
+
+# Page types whose validators must not be kept: a 304 would hide the real page
+UNCACHEABLE_PAGE_TYPES = BLOCKED_PAGE_TYPES + ('soft_404',)
+
+# Statuses worth classifying; other errors are left to Scrapy's own handling
+CLASSIFIED_STATUSES = (200, 401, 403, 429, 503)
+
+class DomainBreaker:
+    """Circuit breaker state for one domain
+
+    closed     requests flow; consecutive blocked responses are counted
+    open       requests are parked until the cooldown ends
+    half_open  a single probe request is let through
+    dead       the domain kept blocking after max_trips; requests are dropped
+    """
+
+    def __init__(self, domain):
+        self.domain = domain
+        self.state = 'closed'
+        self.failures = 0
+        self.trips = 0
+        self.parked = []
+        self.response_bytes = 0
+        self.responses = 0
+
+    def average_size(self):
+        return self.response_bytes // self.responses if self.responses else 0
+
+class BlockDetectionMiddleware:
+    """Classify responses and stop sending requests into bot walls
+
+    Each response is classified as challenge, empty, soft_404, product or
+    other (see utils.classify_page). Challenge and empty pages never reach
+    the spider callbacks, so they no longer turn into empty items for
+    ValidationPipeline to drop. After BLOCK_BREAKER_THRESHOLD blocked
+    responses in a row the domain's breaker opens: its requests are parked
+    rather than retried, freeing the download slots for other domains.
+    After the cooldown one probe request is sent; if it succeeds the parked
+    requests are released, otherwise the cooldown doubles. A domain that
+    trips BLOCK_BREAKER_MAX_TRIPS times is given up on.
+
+    Runs before RetryMiddleware in the response chain, so 429/503 walls are
+    not retried. Stats under 'blocks/' count the requests
+    parked while a breaker was open, and the requests (download slots) and
+    estimated bytes never spent on a domain that was given up on.
+
+    Settings:
+        BLOCK_DETECTION_ENABLED     enable the middleware
+        BLOCK_BREAKER_THRESHOLD     consecutive blocked responses to open the breaker
+        BLOCK_BREAKER_COOLDOWN      seconds before the first probe
+        BLOCK_BREAKER_MAX_COOLDOWN  upper bound for the doubling cooldown
+        BLOCK_BREAKER_MAX_TRIPS     trips before the domain is given up on
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        settings = crawler.settings
+        self.threshold = settings.getint('BLOCK_BREAKER_THRESHOLD', 3)
+        self.cooldown = settings.getfloat('BLOCK_BREAKER_COOLDOWN', 60.0)
+        self.max_cooldown = settings.getfloat('BLOCK_BREAKER_MAX_COOLDOWN', 900.0)
+        self.max_trips = settings.getint('BLOCK_BREAKER_MAX_TRIPS', 4)
+        self.breakers = {}
+        self.timers = []
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('BLOCK_DETECTION_ENABLED'):
+            raise NotConfigured
+
+        middleware = cls(crawler)
+        crawler.signals.connect(middleware.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def breaker(self, request):
+        domain = urlparse(request.url).hostname or ''
+        if domain not in self.breakers:
+            self.breakers[domain] = DomainBreaker(domain)
+        return self.breakers[domain]
+
+    def process_request(self, request, spider):
+        breaker = self.breaker(request)
+
+        if breaker.state == 'dead':
+            self.count_skipped(breaker)
+            raise IgnoreRequest(f"Domain {breaker.domain} is blocking the crawler")
+
+        if breaker.state == 'open' or (breaker.state == 'half_open' and not request.meta.get('breaker_probe')):
+            breaker.parked.append(request)
+            self.stats.inc_value('blocks/requests_parked')
+            raise IgnoreRequest(f"Circuit open for {breaker.domain}, request parked")
+
+        return None
+
+    def process_response(self, request, response, spider):
+        if response.status not in CLASSIFIED_STATUSES or request.meta.get('dont_obey_robotstxt'):
+            return response
+        content_type = response.headers.get('Content-Type', b'').decode('latin-1').lower()
+        if response.status == 200 and 'html' not in content_type:
+            # Sitemaps, PDFs and feeds
+            return response
+
+        breaker = self.breaker(request)
+        request.meta.pop('breaker_probe', None)
+        expect_product = getattr(request.callback, '__name__', '') in ('parse_product', 'parse_price')
+        body = response.text if hasattr(response, 'text') else ''
+        page_type = classify_page(response.status, body, expect_product)
+
+        request.meta['page_type'] = page_type
+        self.stats.inc_value(f'blocks/page_type/{page_type}')
+
+        breaker.response_bytes += len(response.body)
+        breaker.responses += 1
+
+        if page_type in BLOCKED_PAGE_TYPES:
+            self.stats.inc_value('blocks/blocked_bytes', len(response.body))
+            self.record_failure(breaker, spider)
+            self.park(breaker, request)
+            raise IgnoreRequest(f"Blocked response ({page_type}) from {response.url}")
+
+        self.record_success(breaker, spider)
+
+        if page_type == 'soft_404':
+            raise IgnoreRequest(f"Soft 404: {response.url}")
+
+        return response
+
+    def park(self, breaker, request):
+        """Keep a blocked request to try again later, a bounded number of times"""
+        attempts = request.meta.get('block_attempts', 0) + 1
+        if attempts > self.max_trips:
+            self.stats.inc_value('blocks/requests_abandoned')
+            return
+        request.meta['block_attempts'] = attempts
+        if breaker.state == 'dead':
+            self.count_skipped(breaker)
+        else:
+            breaker.parked.append(request)
+
+    def record_failure(self, breaker, spider):
+        breaker.failures += 1
+        if breaker.state == 'half_open' or (breaker.state == 'closed' and breaker.failures >= self.threshold):
+            self.trip(breaker, spider)
+
+    def record_success(self, breaker, spider):
+        breaker.failures = 0
+        if breaker.state == 'half_open':
+            spider.logger.info(f"Domain {breaker.domain} recovered, releasing {len(breaker.parked)} parked requests")
+            self.stats.inc_value('blocks/breaker_recoveries')
+            breaker.state = 'closed'
+            self.release(breaker.parked)
+            breaker.parked = []
+
+    def trip(self, breaker, spider):
+        breaker.trips += 1
+        self.stats.inc_value('blocks/breaker_trips')
+        self.stats.inc_value(f'blocks/breaker_trips/{breaker.domain}')
+
+        if breaker.trips >= self.max_trips:
+            spider.logger.error(f"Domain {breaker.domain} still blocking after {breaker.trips} trips, giving up on it")
+            breaker.state = 'dead'
+            for _ in breaker.parked:
+                self.count_skipped(breaker)
+            breaker.parked = []
+            return
+
+        cooldown = min(self.cooldown * 2 ** (breaker.trips - 1), self.max_cooldown)
+        spider.logger.warning(f"Domain {breaker.domain} is blocking requests, pausing it for {cooldown:.0f}s")
+        breaker.state = 'open'
+        self.timers.append(reactor.callLater(cooldown, self.half_open, breaker, spider))
+
+    def half_open(self, breaker, spider):
+        if breaker.state != 'open':
+            return
+        breaker.state = 'half_open'
+        if not breaker.parked:
+            # Nothing waiting; reopen on the next blocked response
+            breaker.state = 'closed'
+            breaker.failures = self.threshold - 1
+            return
+        probe = breaker.parked.pop(0)
+        probe.meta['breaker_probe'] = True
+        self.release([probe])
+
+    def release(self, requests):
+        engine = self.crawler.engine
+        for request in requests:
+            # Already seen by the dupefilter when it was first scheduled
+            request.dont_filter = True
+            engine.crawl(request)
+
+    def count_skipped(self, breaker):
+        """A request never sent to a dead domain: one download slot saved"""
+        self.stats.inc_value('blocks/requests_skipped')
+        self.stats.inc_value('blocks/bytes_saved_estimate', breaker.average_size())
+
+    def spider_idle(self, spider):
+        waiting = False
+        for breaker in self.breakers.values():
+            if breaker.state in ('open', 'half_open'):
+                # Parked requests are waiting for a cooldown to end
+                waiting = True
+            elif breaker.state == 'closed' and breaker.parked:
+                # Blocked below the threshold; give them another go
+                self.release(breaker.parked)
+                breaker.parked = []
+                waiting = True
+        if waiting:
+            raise DontCloseSpider
+
+    def spider_closed(self, spider, reason):
+        for timer in self.timers:
+            if timer.active():
+                timer.cancel()
+        for breaker in self.breakers.values():
+            if breaker.trips:
+                self.stats.set_value(f'blocks/breaker_state/{breaker.domain}', breaker.state)
+            if breaker.parked:
+                self.stats.inc_value('blocks/requests_abandoned', len(breaker.parked))
+
+class RevalidationMiddleware:
+    """Conditional requests (ETag / If-Modified-Since) for pages, sitemaps and manuals
+
+    Validators from earlier crawls are kept in a ValidatorStore
+    (REVALIDATION_DB). Requests for known URLs carry If-None-Match /
+    If-Modified-Since, and a 304 means "unchanged" (robots.txt is always
+    fetched in full):
+      - sitemaps are answered from the stored body, so their product URLs
+        are still scheduled (and revalidated in turn)
+      - product pages are dropped before parsing, so they skip the spider
+        and the item pipelines; JsonWriterPipeline carries the previous
+        record for them into the new output
+
+    It runs after BlockDetectionMiddleware in the response chain: challenge,
+    empty and soft-404 pages never get their validators stored.
+
+    Stats under 'revalidation/<domain>/' give full vs not-modified responses,
+    the 304 ratio and the bytes avoided (size of the stored copy).
+
+    Settings:
+        REVALIDATION_ENABLED   enable the middleware
+        REVALIDATION_DB        SQLite file holding the validators
+    """
+
+    # Sitemaps bigger than this are not kept; they are just fetched in full
+    MAX_STORED_BODY = 10 * 1024 * 1024
+
+    def __init__(self, crawler, store):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.store = store
+        self.unchanged = set()
+        self.counts = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('REVALIDATION_ENABLED'):
+            raise NotConfigured
+
+        middleware = cls(crawler, ValidatorStore.from_settings(crawler.settings))
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+
+        store = CheckpointStore.from_crawler(crawler)
+        if store:
+            middleware.restore_state(store.load(cls.__name__, {}))
+        return middleware
+
+    def checkpoint_state(self):
+        return {'unchanged': sorted(self.unchanged), 'counts': self.counts}
+
+    def restore_state(self, state):
+        self.unchanged.update(state.get('unchanged', []))
+        self.counts.update(state.get('counts', {}))
+
+    def process_request(self, request, spider):
+        if not self.revalidates(request):
+            return None
+        headers = self.store.conditional_headers(request.url)
+        for name, value in headers.items():
+            request.headers.setdefault(name, value)
+        if headers:
+            request.meta['revalidating'] = True
+        return None
+
+    def process_response(self, request, response, spider):
+        domain = urlparse(request.url).hostname or ''
+
+        if response.status == 304 and request.meta.get('revalidating'):
+            validators = self.store.get(request.url) or {}
+            self.count(domain, 'not_modified', validators.get('length', 0))
+            if validators.get('body') is not None:
+                # Unchanged sitemap: parse the stored copy
+                return response.replace(status=200, body=validators['body'],
+                                        flags=response.flags + ['revalidated'])
+            self.unchanged.add(request.url)
+            raise IgnoreRequest(f"Not modified since last crawl: {request.url}")
+
+        if (response.status == 200 and self.revalidates(request)
+                and request.meta.get('page_type') not in UNCACHEABLE_PAGE_TYPES):
+            self.count(domain, 'full', 0)
+            self.store.put(
+                request.url,
+                etag=self.header(response, 'ETag'),
+                last_modified=self.header(response, 'Last-Modified'),
+                length=len(response.body),
+                body=response.body if self.is_sitemap(response) else None,
+            )
+        return response
+
+    def revalidates(self, request):
+        # robots.txt must always come back with a body: RobotsTxtMiddleware
+        # reads an ignored request as "no robots.txt" and allows everything
+        return (request.method == 'GET'
+                and not request.meta.get('dont_revalidate')
+                and not request.meta.get('dont_obey_robotstxt')
+                and urlparse(request.url).path != '/robots.txt')
+
+    def header(self, response, name):
+        value = response.headers.get(name)
+        return value.decode('latin-1') if value else None
+
+    def is_sitemap(self, response):
+        content_type = (self.header(response, 'Content-Type') or '').lower()
+        path = urlparse(response.url).path.lower()
+        return (('xml' in content_type or path.endswith(('.xml', '.xml.gz')))
+                and len(response.body) <= self.MAX_STORED_BODY)
+
+    def count(self, domain, kind, bytes_avoided):
+        counts = self.counts.setdefault(domain, {'full': 0, 'not_modified': 0, 'bytes_avoided': 0})
+        counts[kind] += 1
+        counts['bytes_avoided'] += bytes_avoided
+        self.stats.inc_value(f'revalidation/{domain}/{kind}')
+        if bytes_avoided:
+            self.stats.inc_value(f'revalidation/{domain}/bytes_avoided', bytes_avoided)
+
+    def summary(self):
+        """Per-domain counts with the share of 304 responses"""
+        summary = {}
+        for domain, counts in self.counts.items():
+            total = counts['full'] + counts['not_modified']
+            summary[domain] = dict(counts, ratio_304=round(counts['not_modified'] / total, 3) if total else 0.0)
+        return summary
+
+    def spider_closed(self, spider, reason):
+        for domain, counts in self.summary().items():
+            self.stats.set_value(f'revalidation/{domain}/ratio_304', counts['ratio_304'])
+        self.store.close()
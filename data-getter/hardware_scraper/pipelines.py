@@ -1,3 +1,4 @@
+import glob
 import json
 import os
 import hashlib
@@ -9,10 +10,37 @@ from scrapy.pipelines.files import FilesPipeline
 from scrapy.http import Request
 import logging
 
+from hardware_scraper.checkpoint import CheckpointStore
+from hardware_scraper.items import InventoryItem, PriceItem
+from hardware_scraper.extensions import TimingStats, find_downloader_middleware, find_extension
+from hardware_scraper.middlewares import RevalidationMiddleware
+from catalogue import load_json
+from inventory_matrix import build_inventory_matrix, load_observations, load_stores, save_inventory_matrix
+from price_history import PriceHistory
+from spec_normalizer import normalize_specifications
+
+def truncate_partial_line(path):
+    """Drop a half-written last line left in a JSON lines file by a crash"""
+    if os.path.exists(path):
+        with open(path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+
 class ValidationPipeline:
     """Validate that items have required fields"""
     
     def process_item(self, item, spider):
+        if isinstance(item, InventoryItem):
+            if not item.get('sku') or item.get('stores') is None:
+                raise DropItem(f"No store inventory found: {item.get('url', 'unknown')}")
+            return item
+        
+        if isinstance(item, PriceItem):
+            if item.get('price') is None and not item.get('availability'):
+                raise DropItem(f"No price or availability found: {item.get('url', 'unknown')}")
+            return item
+        
         if not item.get('name'):
             raise DropItem(f"Missing product name: {item.get('url', 'unknown')}")
         
@@ -27,6 +55,17 @@ class DuplicatesPipeline:
     def __init__(self):
         self.urls_seen = set()
     
+    def checkpoint_state(self):
+        return {'urls_seen': sorted(self.urls_seen)}
+    
+    def restore_state(self, state):
+        self.urls_seen.update(state.get('urls_seen', []))
+    
+    def open_spider(self, spider):
+        store = CheckpointStore.from_crawler(spider.crawler)
+        if store:
+            self.restore_state(store.load(type(self).__name__, {}))
+    
     def process_item(self, item, spider):
         url = item.get('url')
         if url in self.urls_seen:
@@ -35,6 +74,14 @@ class DuplicatesPipeline:
             self.urls_seen.add(url)
             return item
 
+class SpecNormalizationPipeline:
+    """Parse free-text specifications into numeric SI values"""
+    
+    def process_item(self, item, spider):
+        if item.get('specifications'):
+            item['normalized_specifications'] = normalize_specifications(item['specifications'])
+        return item
+
 class ManualDownloadPipeline:
     """Download instruction manuals and documents"""
     
@@ -46,8 +93,25 @@ class ManualDownloadPipeline:
         self.manuals_dir = os.path.join('manuals', spider.site_name)
         os.makedirs(self.manuals_dir, exist_ok=True)
         
-        # Create download log
+        # Validators of manuals fetched by earlier crawls, if revalidating
+        self.revalidation = find_downloader_middleware(spider.crawler, RevalidationMiddleware)
+        
+        # Create download log, continuing it when resuming a crawl
         self.download_log = []
+        store = CheckpointStore.from_crawler(spider.crawler)
+        if store:
+            self.restore_state(store.load(type(self).__name__, {}))
+    
+    def checkpoint_state(self):
+        return {'download_log': self.download_log}
+    
+    def restore_state(self, state):
+        self.download_log = state.get('download_log', [])
+        # Files fetched before the interruption are not downloaded again
+        self.downloaded = {
+            entry['url']: entry['local_path'] for entry in self.download_log
+            if os.path.exists(entry['local_path'])
+        }
     
     def process_item(self, item, spider):
         # Download manuals
@@ -96,10 +160,23 @@ class ManualDownloadPipeline:
     
     def download_file(self, url, title, sku, spider):
         """Download a file and return the local path"""
+        if url in getattr(self, 'downloaded', {}):
+            return self.downloaded[url]
+        
         try:
-            response = requests.get(url, timeout=30, stream=True)
+            headers = {}
+            validators = self.revalidation.store.get(url) if self.revalidation else None
+            if validators and validators['local_path'] and os.path.exists(validators['local_path']):
+                headers = self.revalidation.store.conditional_headers(url)
+            
+            response = requests.get(url, timeout=30, stream=True, headers=headers)
             response.raise_for_status()
             
+            if response.status_code == 304:
+                # Unchanged since the last crawl; keep the copy we have
+                self.revalidation.count(urlparse(url).hostname or '', 'not_modified', validators['length'])
+                return validators['local_path']
+            
             # Generate filename
             parsed_url = urlparse(url)
             file_ext = os.path.splitext(parsed_url.path)[1] or '.pdf'
@@ -123,6 +200,16 @@ class ManualDownloadPipeline:
                 for chunk in response.iter_content(chunk_size=8192):
                     f.write(chunk)
             
+            if self.revalidation:
+                self.revalidation.count(urlparse(url).hostname or '', 'full', 0)
+                self.revalidation.store.put(
+                    url,
+                    etag=response.headers.get('ETag'),
+                    last_modified=response.headers.get('Last-Modified'),
+                    length=os.path.getsize(filepath),
+                    local_path=filepath,
+                )
+            
             # Log download
             self.download_log.append({
                 'url': url,
@@ -145,24 +232,34 @@ class ManualDownloadPipeline:
             json.dump(self.download_log, f, indent=2)
 
 class JsonWriterPipeline:
-    """Write items to JSON file with additional metadata"""
+    """Write items to JSON file with additional metadata
+
+    Items are appended one per line to a '.jsonl.part' file and flushed, so a
+    crashed crawl leaves a valid prefix behind. Resuming the same RUN_ID
+    continues that file; closing the spider (re)builds the final JSON array
+    and metadata file from it, so finalizing twice gives the same output.
+    """
     
     def open_spider(self, spider):
-        # Create data directory
-        os.makedirs('data', exist_ok=True)
+        # Price refreshes write a delta (PriceDeltaPipeline), not a full product file
+        self.enabled = getattr(spider, 'mode', 'full') == 'full'
+        if not self.enabled:
+            return
         
-        # Create filename with timestamp
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        self.filename = f'data/products_{spider.site_name}_{timestamp}.json'
+        settings = spider.crawler.settings
+        output_dir = settings.get('OUTPUT_DIR', 'data')
+        os.makedirs(output_dir, exist_ok=True)
         
-        self.file = open(self.filename, 'w', encoding='utf-8')
-        self.file.write('[\n')
-        self.first_item = True
+        # Create filename with the run id (a timestamp unless resuming)
+        run_id = settings.get('RUN_ID') or datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.filename = os.path.join(output_dir, f'products_{spider.site_name}_{run_id}.json')
+        self.part_filename = self.filename.replace('.json', '.jsonl.part')
         
         # Metadata
         self.metadata = {
             'scrape_info': {
                 'site': spider.site_name,
+                'run_id': run_id,
                 'started_at': datetime.now().isoformat(),
                 'spider_name': spider.name,
             },
@@ -172,41 +269,365 @@ class JsonWriterPipeline:
                 'items_with_documents': 0,
             }
         }
+        
+        self.store = CheckpointStore.from_crawler(spider.crawler)
+        if self.store:
+            previous = self.store.load(type(self).__name__, {}).get('scrape_info')
+            if previous:
+                self.metadata['scrape_info'] = previous
+                self.metadata['scrape_info'].setdefault('resumed_at', []).append(datetime.now().isoformat())
+        
+        self.recovered_urls = self.recover_part_file()
+        if self.recovered_urls:
+            spider.logger.info(f"Resuming {self.filename} with {len(self.recovered_urls)} items already written")
+        
+        self.file = open(self.part_filename, 'a', encoding='utf-8')
     
-    def process_item(self, item, spider):
-        # Update stats
+    def recover_part_file(self):
+        """Repair the part file after a crash and recount what it holds"""
+        if not os.path.exists(self.part_filename) and os.path.exists(self.filename):
+            # A finished run being resumed: continue from its final output
+            with open(self.filename, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+            with open(self.part_filename, 'w', encoding='utf-8') as f:
+                for item in items:
+                    f.write(json.dumps(item, ensure_ascii=False) + '\n')
+        
+        if not os.path.exists(self.part_filename):
+            return set()
+        
+        truncate_partial_line(self.part_filename)
+        
+        urls = set()
+        for item in self.iter_part_file():
+            urls.add(item.get('url'))
+            self.count_item(item)
+        return urls
+    
+    def iter_part_file(self):
+        with open(self.part_filename, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    
+    def count_item(self, item):
         self.metadata['stats']['total_items'] += 1
         if item.get('manuals'):
             self.metadata['stats']['items_with_manuals'] += 1
         if item.get('documents'):
             self.metadata['stats']['items_with_documents'] += 1
+    
+    def carry_forward(self, unchanged, spider):
+        """Copy records of unchanged (304) pages from the previous output"""
+        output_dir = os.path.dirname(self.filename)
+        previous_files = sorted(
+            f for f in glob.glob(os.path.join(output_dir, f'products_{spider.site_name}_*.json'))
+            if f != self.filename and not f.endswith('_metadata.json')
+        )
+        pending = set(unchanged) - {item.get('url') for item in self.iter_part_file()}
         
-        # Write item to file
-        if not self.first_item:
-            self.file.write(',\n')
-        else:
-            self.first_item = False
+        with open(self.part_filename, 'a', encoding='utf-8') as f:
+            # Newest output first, so each URL gets its latest record
+            for previous_file in reversed(previous_files):
+                if not pending:
+                    break
+                for item in load_json(previous_file) or []:
+                    if item.get('url') in pending:
+                        pending.discard(item['url'])
+                        f.write(json.dumps(item, ensure_ascii=False) + '\n')
+                        self.count_item(item)
+                        self.metadata['stats']['unchanged_items'] = self.metadata['stats'].get('unchanged_items', 0) + 1
+        
+        if pending:
+            spider.logger.warning(f"{len(pending)} unchanged pages have no previous record to carry forward")
+    
+    def checkpoint_state(self):
+        if not self.enabled:
+            return {}
+        if not self.file.closed:
+            self.file.flush()
+        return {'scrape_info': self.metadata['scrape_info'], 'stats': self.metadata['stats']}
+    
+    def process_item(self, item, spider):
+        # Items written before an interruption are not written twice
+        if not self.enabled or item.get('url') in self.recovered_urls:
+            return item
+        
+        # Update stats
+        self.count_item(item)
         
+        # Write item to file
         item_dict = dict(item)
-        json.dump(item_dict, self.file, ensure_ascii=False, indent=2)
+        self.file.write(json.dumps(item_dict, ensure_ascii=False) + '\n')
+        self.file.flush()
         
         return item
     
     def close_spider(self, spider):
+        if not self.enabled:
+            return
         self.metadata['scrape_info']['completed_at'] = datetime.now().isoformat()
-        
-        # Close items array and add metadata
-        self.file.write('\n]\n')
         self.file.close()
         
+        # Latency histograms and throughput, if TimingStats is enabled
+        timing = find_extension(spider.crawler, TimingStats)
+        if timing:
+            self.metadata['timing'] = timing.snapshot()
+        
+        # Pages that answered 304 skipped the pipelines; keep their last record
+        revalidation = find_downloader_middleware(spider.crawler, RevalidationMiddleware)
+        if revalidation:
+            self.carry_forward(revalidation.unchanged, spider)
+            self.metadata['revalidation'] = revalidation.summary()
+        
+        # Crawl budget burn-down, read by run_scraper.py to carry leftovers over
+        budget = getattr(spider, 'budget', None)
+        if budget:
+            self.metadata['budget'] = budget.snapshot()
+        
+        # Build the items array from the part file
+        tmp_file = self.filename + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write('[\n')
+            for i, item in enumerate(self.iter_part_file()):
+                if i:
+                    f.write(',\n')
+                json.dump(item, f, ensure_ascii=False, indent=2)
+            f.write('\n]\n')
+        os.replace(tmp_file, self.filename)
+        
         # Save metadata separately
         metadata_file = self.filename.replace('.json', '_metadata.json')
-        with open(metadata_file, 'w', encoding='utf-8') as f:
+        with open(metadata_file + '.tmp', 'w', encoding='utf-8') as f:
             json.dump(self.metadata, f, indent=2)
+        os.replace(metadata_file + '.tmp', metadata_file)
+        
+        if self.store:
+            self.store.save(type(self).__name__, self.checkpoint_state())
+        os.remove(self.part_filename)
         
         spider.logger.info(f"Saved {self.metadata['stats']['total_items']} items to {self.filename}")
         spider.logger.info(f"Metadata saved to {metadata_file}")
 
+class PriceDeltaPipeline:
+    """Write the price/availability changes found by a refresh crawl
+
+    Each PriceItem is compared with the current known state
+    (catalogue.latest_prices: the last full scrape plus later deltas). Only
+    changes are appended, as JSON lines, to price_delta_<site>_<run id>.jsonl;
+    a metadata file counts checked, changed and unchanged products.
+    """
+    
+    def open_spider(self, spider):
+        self.enabled = getattr(spider, 'mode', 'full') == 'refresh'
+        if not self.enabled:
+            return
+        
+        settings = spider.crawler.settings
+        output_dir = settings.get('OUTPUT_DIR', 'data')
+        os.makedirs(output_dir, exist_ok=True)
+        run_id = settings.get('RUN_ID') or datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.filename = os.path.join(output_dir, f'price_delta_{spider.site_name}_{run_id}.jsonl')
+        
+        self.known = spider.known_prices
+        self.stats = {'checked': 0, 'changed': 0, 'unchanged': 0}
+        self.started_at = datetime.now().isoformat()
+        
+        # A resumed run continues its delta
+        truncate_partial_line(self.filename)
+        self.file = open(self.filename, 'a', encoding='utf-8')
+    
+    def process_item(self, item, spider):
+        if not self.enabled or not isinstance(item, PriceItem):
+            return item
+        
+        self.stats['checked'] += 1
+        previous = self.known.get(item['url'], {})
+        item['previous_price'] = previous.get('price')
+        item['previous_availability'] = previous.get('availability')
+        
+        if item['price'] == item['previous_price'] and item['availability'] == item['previous_availability']:
+            self.stats['unchanged'] += 1
+            return item
+        
+        self.stats['changed'] += 1
+        self.file.write(json.dumps(dict(item), ensure_ascii=False) + '\n')
+        self.file.flush()
+        return item
+    
+    def close_spider(self, spider):
+        if not self.enabled:
+            return
+        self.file.close()
+        
+        # Pages that answered 304 did not change either
+        revalidation = find_downloader_middleware(spider.crawler, RevalidationMiddleware)
+        if revalidation:
+            self.stats['not_modified'] = len(revalidation.unchanged)
+        
+        metadata = {
+            'refresh_info': {
+                'site': spider.site_name,
+                'started_at': self.started_at,
+                'completed_at': datetime.now().isoformat(),
+                'known_products': len(self.known),
+            },
+            'stats': self.stats,
+        }
+        budget = getattr(spider, 'budget', None)
+        if budget:
+            metadata['budget'] = budget.snapshot()
+        
+        metadata_file = self.filename.replace('.jsonl', '_metadata.json')
+        with open(metadata_file, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, indent=2)
+        
+        spider.logger.info(f"Price refresh: {self.stats['changed']} of {self.stats['checked']} products changed, saved to {self.filename}")
+
+class PriceHistoryPipeline:
+    """Append the prices seen by a crawl to the price history store
+
+    Works on full crawls (ProductItem) and price refreshes (PriceItem) alike.
+    Observations that match a product's latest stored price and availability
+    are skipped; the changes are written as one segment when the spider
+    closes. Pending changes are checkpointed with resumable crawls.
+
+    Settings:
+        PRICE_HISTORY_ENABLED   set to False to disable
+        PRICE_HISTORY_DIR       store directory (default <OUTPUT_DIR>/price_history)
+    """
+    
+    def __init__(self):
+        self.pending = {}
+    
+    def checkpoint_state(self):
+        return {'pending': list(self.pending.values())} if self.enabled else {}
+    
+    def restore_state(self, state):
+        for row in state.get('pending', []):
+            self.pending[row['sku']] = row
+    
+    def open_spider(self, spider):
+        settings = spider.crawler.settings
+        self.enabled = settings.getbool('PRICE_HISTORY_ENABLED', True)
+        if not self.enabled:
+            return
+        
+        self.history = PriceHistory(settings.get('PRICE_HISTORY_DIR')
+                                    or os.path.join(settings.get('OUTPUT_DIR', 'data'), 'price_history'))
+        self.run_id = settings.get('RUN_ID') or datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.latest = self.history.latest(spider.site_name)
+        
+        store = CheckpointStore.from_crawler(spider.crawler)
+        if store:
+            self.restore_state(store.load(type(self).__name__, {}))
+    
+    def process_item(self, item, spider):
+        if not self.enabled or isinstance(item, InventoryItem):
+            return item
+        
+        sku = item.get('sku') or item.get('url')
+        observed_at = item.get('checked_at') if isinstance(item, PriceItem) else item.get('scraped_at')
+        if not sku or (item.get('price') is None and not item.get('availability')):
+            return item
+        
+        observation = {
+            'sku': sku,
+            'price': item.get('price'),
+            'availability': item.get('availability') or None,
+            'time': observed_at or datetime.now().isoformat(),
+        }
+        latest = self.pending.get(sku) or self.latest.get(sku)
+        if latest and (latest['price'], latest['availability']) == (observation['price'], observation['availability']):
+            return item
+        
+        self.pending[sku] = observation
+        return item
+    
+    def close_spider(self, spider):
+        if not self.enabled:
+            return
+        
+        path = self.history.append(spider.site_name, self.pending.values(), run_id=self.run_id)
+        spider.crawler.stats.set_value('price_history/changes', len(self.pending))
+        if path:
+            spider.logger.info(f"Price history: {len(self.pending)} changes saved to {path}")
+        
+        # The changes are stored; a resumed run must not append them again
+        self.pending = {}
+        store = CheckpointStore.from_crawler(spider.crawler)
+        if store:
+            store.save(type(self).__name__, self.checkpoint_state())
+
+class InventoryMatrixPipeline:
+    """Collect per-store stock from an inventory crawl into a sparse snapshot
+
+    InventoryItems are appended to inventory_<site>_<run id>.jsonl as they
+    arrive (a resumed run continues the file). When the spider closes, the
+    file and data/stores_<site>.json are built into an inventory_matrix.py
+    snapshot in inventory_matrix_<site>_<run id>/.
+    """
+    
+    def open_spider(self, spider):
+        self.enabled = getattr(spider, 'mode', 'full') == 'inventory'
+        if not self.enabled:
+            return
+        
+        settings = spider.crawler.settings
+        self.output_dir = settings.get('OUTPUT_DIR', 'data')
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.run_id = settings.get('RUN_ID') or datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.filename = os.path.join(self.output_dir, f'inventory_{spider.site_name}_{self.run_id}.jsonl')
+        self.started_at = datetime.now().isoformat()
+        
+        truncate_partial_line(self.filename)
+        self.file = open(self.filename, 'a', encoding='utf-8')
+    
+    def process_item(self, item, spider):
+        if not self.enabled or not isinstance(item, InventoryItem):
+            return item
+        
+        self.file.write(json.dumps(dict(item), ensure_ascii=False) + '\n')
+        self.file.flush()
+        return item
+    
+    def close_spider(self, spider):
+        if not self.enabled:
+            return
+        self.file.close()
+        
+        matrix = build_inventory_matrix(load_observations(self.filename),
+                                        load_stores(spider.site_name, self.output_dir))
+        output_dir = save_inventory_matrix(
+            matrix, os.path.join(self.output_dir, f'inventory_matrix_{spider.site_name}_{self.run_id}'),
+            spider.site_name)
+        
+        stats = spider.crawler.stats
+        stats.set_value('inventory/products', len(matrix['skus']))
+        stats.set_value('inventory/stores', len(matrix['stores']))
+        stats.set_value('inventory/stocked_pairs', int(len(matrix['product_store'][1])))
+        
+        metadata = {
+            'inventory_info': {
+                'site': spider.site_name,
+                'started_at': self.started_at,
+                'completed_at': datetime.now().isoformat(),
+                'matrix_dir': output_dir,
+            },
+            'stats': {
+                'products': len(matrix['skus']),
+                'stores': len(matrix['stores']),
+                'stocked_pairs': int(len(matrix['product_store'][1])),
+            },
+        }
+        budget = getattr(spider, 'budget', None)
+        if budget:
+            metadata['budget'] = budget.snapshot()
+        with open(self.filename.replace('.jsonl', '_metadata.json'), 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, indent=2)
+        spider.logger.info(f"Inventory: {len(matrix['skus'])} products x {len(matrix['stores'])} stores "
+                           f"saved to {output_dir}")
+
 class CSVWriterPipeline:
     """Write items to CSV format for easy analysis"""
     
@@ -0,0 +1,128 @@
+from datetime import datetime
+
+from catalogue import latest_file, load_json
+from config import CATEGORY_WEIGHTS
+
+# Fields a complete product record should have, in order of importance
+RECORD_FIELDS = {
+    'price': 0.3,
+    'manuals': 0.25,
+    'specifications': 0.2,
+    'sku': 0.15,
+    'brand': 0.1,
+}
+
+def parse_lastmod(value):
+    """Parse a sitemap <lastmod> (W3C datetime) into a timestamp
+
+    Values without a timezone, like our own scraped_at, are local time.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return parsed.timestamp()
+
+def record_gaps(record):
+    """Weighted share of RECORD_FIELDS missing from a scraped record (0-1)"""
+    return sum(weight for field, weight in RECORD_FIELDS.items() if not record.get(field))
+
+def load_known_records(site, data_dir='data'):
+    """Index the latest scraped output for a site by URL"""
+    scraped_file = latest_file(f'products_{site}_*.json', data_dir)
+    if not scraped_file:
+        return {}
+    known = {}
+    for item in load_json(scraped_file) or []:
+        if not item.get('url'):
+            continue
+        known[item['url']] = {
+            'scraped_at': parse_lastmod(item.get('scraped_at')),
+            'gaps': record_gaps(item),
+        }
+    return known
+
+class UrlPrioritizer:
+    """Score product URLs so the most valuable, stalest pages are crawled first
+
+    score = staleness * PRIORITY_STALENESS_WEIGHT
+          + category weight * PRIORITY_CATEGORY_WEIGHT
+          + data gaps * PRIORITY_GAPS_WEIGHT
+
+    staleness  1 for URLs never scraped or modified (sitemap lastmod) since
+               our copy was scraped; otherwise grows with the age of our copy
+               over PRIORITY_STALE_DAYS
+    category   the highest CATEGORY_WEIGHTS entry the URL matches
+    gaps       1 for new URLs, else the weighted share of missing fields
+               (price, manuals, specifications, sku, brand)
+
+    The score (0-1) is quantized to PRIORITY_LEVELS integer Scrapy request
+    priorities. With a JOBDIR, Scrapy keeps one disk queue per priority
+    level, so a few levels keep the number of open queue files small.
+    """
+
+    def __init__(self, category_weights, known=None, weights=(0.4, 0.3, 0.3),
+                 stale_days=30.0, now=None, levels=16):
+        self.category_weights = category_weights
+        self.known = known or {}
+        self.staleness_weight, self.category_weight, self.gaps_weight = weights
+        self.stale_seconds = stale_days * 86400
+        self.now = now or datetime.now().timestamp()
+        self.levels = max(levels, 2)
+
+    @classmethod
+    def from_crawler(cls, crawler, site):
+        settings = crawler.settings
+        known = load_known_records(site, settings.get('OUTPUT_DIR', 'data'))
+        weights = (
+            settings.getfloat('PRIORITY_STALENESS_WEIGHT', 0.4),
+            settings.getfloat('PRIORITY_CATEGORY_WEIGHT', 0.3),
+            settings.getfloat('PRIORITY_GAPS_WEIGHT', 0.3),
+        )
+        return cls(CATEGORY_WEIGHTS, known, weights, settings.getfloat('PRIORITY_STALE_DAYS', 30.0),
+                   levels=settings.getint('PRIORITY_LEVELS', 16))
+
+    def category_score(self, url):
+        url_lower = url.lower()
+        return max((weight for category, weight in self.category_weights.items()
+                    if category in url_lower), default=0.0)
+
+    def staleness(self, url, lastmod):
+        record = self.known.get(url)
+        if record is None or record['scraped_at'] is None:
+            return 1.0
+        modified = parse_lastmod(lastmod)
+        if modified is not None and modified > record['scraped_at']:
+            return 1.0
+        # Unchanged per the sitemap (or no lastmod): older copies first
+        age = max(self.now - record['scraped_at'], 0.0)
+        return min(age / self.stale_seconds, 1.0) * (0.5 if modified is not None else 1.0)
+
+    def gaps(self, url):
+        record = self.known.get(url)
+        return 1.0 if record is None else record['gaps']
+
+    def score(self, url, lastmod=None):
+        return (self.staleness_weight * self.staleness(url, lastmod)
+                + self.category_weight * self.category_score(url)
+                + self.gaps_weight * self.gaps(url))
+
+    def quantize(self, score):
+        """Priority level (0 to levels - 1) of a score"""
+        return int(round(min(max(score, 0.0), 1.0) * (self.levels - 1)))
+
+    def priority(self, url, lastmod=None):
+        return self.quantize(self.score(url, lastmod))
+
+    def rank(self, entries):
+        """Sort sitemap entries ({'loc', 'lastmod'}) by descending score
+
+        Adds 'score' and 'priority' keys to each entry. The budget is granted
+        in the order of the full score; only the request priority is coarse.
+        """
+        for entry in entries:
+            entry['score'] = self.score(entry['loc'], entry.get('lastmod'))
+            entry['priority'] = self.quantize(entry['score'])
+        return sorted(entries, key=lambda entry: entry['score'], reverse=True)
@@ -17,10 +17,64 @@ DEFAULT_REQUEST_HEADERS = {
 ITEM_PIPELINES = {
     'hardware_scraper.pipelines.ValidationPipeline': 200,
     'hardware_scraper.pipelines.DuplicatesPipeline': 300,
+    'hardware_scraper.pipelines.SpecNormalizationPipeline': 350,
     'hardware_scraper.pipelines.ManualDownloadPipeline': 400,
+    'hardware_scraper.pipelines.PriceDeltaPipeline': 450,
+    'hardware_scraper.pipelines.PriceHistoryPipeline': 460,
+    'hardware_scraper.pipelines.InventoryMatrixPipeline': 470,
     'hardware_scraper.pipelines.JsonWriterPipeline': 500,
 }
 
+DOWNLOADER_MIDDLEWARES = {
+    # Before RetryMiddleware (550) in the response chain
+    'hardware_scraper.middlewares.BlockDetectionMiddleware': 560,
+    # After block detection, so validators are only kept for pages that passed it
+    'hardware_scraper.middlewares.RevalidationMiddleware': 555,
+}
+
+EXTENSIONS = {
+    'hardware_scraper.extensions.TimingStats': 500,
+    'hardware_scraper.extensions.MemoryTracker': 510,
+    'hardware_scraper.extensions.Checkpointer': 520,
+}
+
+# Latency histograms per callback / pipeline stage / download slot
+TIMING_STATS_ENABLED = True
+TIMING_STATS_INTERVAL = 30
+# TIMING_STATS_TEXTFILE = 'logs/hardware_scraper.prom'
+# TIMING_STATS_PROMETHEUS_PORT = 9410
+
+# Opt-in memory growth sampling (RSS, tracemalloc, live objects)
+MEMORY_TRACKER_ENABLED = False
+MEMORY_TRACKER_INTERVAL = 60
+MEMORY_TRACKER_CEILING_MB = 0
+MEMORY_TRACKER_ACTION = 'close'
+
+# Response classification and per-domain circuit breaker for bot walls
+BLOCK_DETECTION_ENABLED = True
+BLOCK_BREAKER_THRESHOLD = 3
+BLOCK_BREAKER_COOLDOWN = 60
+BLOCK_BREAKER_MAX_COOLDOWN = 900
+BLOCK_BREAKER_MAX_TRIPS = 4
+
+# Product URL priority: staleness, category value (config.CATEGORY_WEIGHTS), data gaps
+PRIORITY_STALENESS_WEIGHT = 0.4
+PRIORITY_CATEGORY_WEIGHT = 0.3
+PRIORITY_GAPS_WEIGHT = 0.3
+PRIORITY_STALE_DAYS = 30
+# Distinct request priorities; a JOBDIR keeps one disk queue file per level
+PRIORITY_LEVELS = 16
+
+# Crawl budget split across sitemap shards and categories (0 = unlimited)
+CRAWL_BUDGET_REQUESTS = 500
+CRAWL_BUDGET_BYTES = 0
+CRAWL_BUDGET_SECONDS = 0
+CRAWL_BUDGET_SHARD_WEIGHTS = {}
+CRAWL_BUDGET_INTERVAL = 30
+
+# Pipeline/stats checkpoints, active when JOBDIR is set (see run_scraper.py --resume)
+CHECKPOINT_INTERVAL = 60
+
 DOWNLOAD_DELAY = 2
 RANDOMIZE_DOWNLOAD_DELAY = 0.5
 CONCURRENT_REQUESTS = 8
@@ -34,6 +88,16 @@ AUTOTHROTTLE_DEBUG = False
 
 HTTPCACHE_ENABLED = True
 HTTPCACHE_EXPIRATION_SECS = 3600
+# 304s are handled by RevalidationMiddleware, not replayed from the cache
+HTTPCACHE_IGNORE_HTTP_CODES = [304]
+
+# Conditional requests using validators kept across crawls
+REVALIDATION_ENABLED = True
+REVALIDATION_DB = 'crawls/http_validators.sqlite'
+
+# Append-only price/availability history (price_history.py); defaults to <OUTPUT_DIR>/price_history
+PRICE_HISTORY_ENABLED = True
+PRICE_HISTORY_DIR = None
 
 REQUEST_FINGERPRINTER_IMPLEMENTATION = '2.7'
 
@@ -2,25 +2,48 @@ import scrapy
 import json
 from datetime import datetime
 from urllib.parse import urljoin, urlparse
-from hardware_scraper.items import ProductItem
+from hardware_scraper.checkpoint import CheckpointStore
+from hardware_scraper.items import InventoryItem, PriceItem, ProductItem
+from hardware_scraper.priority import UrlPrioritizer
 from hardware_scraper.utils import (
-    parse_sitemap, get_sitemap_index, filter_product_urls,
+    parse_sitemap_entries, get_sitemap_index, filter_product_urls,
     extract_text_content, extract_price, clean_specifications,
-    is_manual_link, normalize_url
+    is_manual_link, normalize_url, json_path
 )
-from config import SITES_CONFIG, TARGET_CATEGORIES
+from hardware_scraper.budget import CrawlBudget
+from catalogue import latest_prices
+from config import SITES_CONFIG, TARGET_CATEGORIES, CATEGORY_WEIGHTS
 
 class HardwareSpider(scrapy.Spider):
     name = 'hardware'
     
-    def __init__(self, site='rona', *args, **kwargs):
+    # Selectors for the fields a price refresh extracts
+    PRICE_SELECTORS = {
+        'rona': {
+            'price': '.price::text, .current-price::text, .product-price::text',
+            'availability': '.availability::text, .stock-status::text',
+        },
+        'canadiantire': {
+            'price': '.price-current::text, .price::text',
+            'availability': '.availability::text, .stock-status::text',
+        },
+    }
+    
+    def __init__(self, site='rona', mode='full', *args, **kwargs):
         super(HardwareSpider, self).__init__(*args, **kwargs)
         
         if site not in SITES_CONFIG:
             raise ValueError(f"Site '{site}' not configured. Available: {list(SITES_CONFIG.keys())}")
+        if mode not in ('full', 'refresh', 'inventory'):
+            raise ValueError(f"Unknown mode '{mode}'. Available: ['full', 'refresh', 'inventory']")
+        if mode == 'inventory' and not SITES_CONFIG[site].get('inventory_api'):
+            raise ValueError(f"Site '{site}' has no inventory_api configured")
         
         self.site_config = SITES_CONFIG[site]
         self.site_name = site
+        # 'refresh' revisits known products for price and availability only,
+        # 'inventory' collects their per-store stock from the site's inventory API
+        self.mode = mode
         self.allowed_domains = self.site_config['allowed_domains']
         self.start_urls = [self.site_config['sitemap_url']]
         
@@ -31,51 +54,132 @@ class HardwareSpider(scrapy.Spider):
             'CONCURRENT_REQUESTS': self.site_config['concurrent_requests'],
         }
         
+        self.completed_urls = set()
+        
         self.logger.info(f"Initialized spider for {self.site_config['name']}")
 
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        
+        # When resuming, skip product pages already scraped before the
+        # interruption (the request queue does not survive a hard kill)
+        store = CheckpointStore.from_crawler(crawler)
+        if store:
+            spider.completed_urls = set(store.load('DuplicatesPipeline', {}).get('urls_seen', []))
+        
+        # Rank product URLs by staleness, category value and data gaps
+        spider.prioritizer = UrlPrioritizer.from_crawler(crawler, spider.site_name)
+        # Split the request budget across sitemap shards and categories
+        spider.budget = CrawlBudget.from_crawler(crawler, CATEGORY_WEIGHTS)
+        
+        if spider.mode in ('refresh', 'inventory'):
+            spider.known_prices = latest_prices(spider.site_name, crawler.settings.get('OUTPUT_DIR', 'data'))
+        return spider
+
+    async def start(self):
+        # Scrapy >= 2.13 entry point; start_requests() serves older versions
+        for request in self.start_requests():
+            yield request
+
+    def start_requests(self):
+        if self.mode == 'full':
+            for url in self.start_urls:
+                yield scrapy.Request(url, dont_filter=True)
+            return
+        
+        # Refresh / inventory: known product URLs instead of the sitemaps
+        entries = [{'loc': url, 'lastmod': None} for url, known in self.known_prices.items()
+                   if url not in self.completed_urls and (self.mode == 'refresh' or known.get('sku'))]
+        self.logger.info(f"Checking {self.mode} of {len(entries)} known products")
+        for entry in self.budget.grant('known-products', self.prioritizer.rank(entries)):
+            yield self.product_request(entry)
+
+    def price_request(self, entry):
+        """Request for a product's price, from the site's price API if it has one"""
+        sku = self.known_prices.get(entry['loc'], {}).get('sku')
+        meta = {'site': self.site_name, 'product_url': entry['loc']}
+        price_api = self.site_config.get('price_api')
+        if price_api and sku:
+            return scrapy.Request(
+                url=price_api.format(sku=sku),
+                callback=self.parse_price_api,
+                priority=entry['priority'],
+                meta=meta
+            )
+        return scrapy.Request(
+            url=entry['loc'],
+            callback=self.parse_price,
+            priority=entry['priority'],
+            meta=meta
+        )
+
+    def inventory_request(self, entry):
+        """Request for a product's per-store stock from the site's inventory API"""
+        sku = self.known_prices[entry['loc']]['sku']
+        return scrapy.Request(
+            url=self.site_config['inventory_api'].format(sku=sku),
+            callback=self.parse_inventory_api,
+            priority=entry['priority'],
+            meta={'site': self.site_name, 'product_url': entry['loc']}
+        )
+
     def parse(self, response):
         """Parse main sitemap to find product sitemaps"""
         self.logger.info(f"Parsing sitemap index: {response.url}")
         
         # Get all sitemap URLs from the index
-        sitemap_urls = get_sitemap_index(response.url)
+        sitemap_urls = get_sitemap_index(response.url, response.body)
         
         if not sitemap_urls:
             # If no sitemaps found, try parsing as direct sitemap
-            product_urls = parse_sitemap(response.url)
-            filtered_urls = filter_product_urls(product_urls, TARGET_CATEGORIES)
-            
-            for url in filtered_urls[:100]:  # Limit for testing
-                yield scrapy.Request(
-                    url=url,
-                    callback=self.parse_product,
-                    meta={'site': self.site_name}
-                )
+            entries = parse_sitemap_entries(response.url, response.body)
+            yield from self.product_requests(response.url, entries)
         else:
             # Process individual sitemaps
+            sitemap_urls = [url for url in sitemap_urls
+                            if any(keyword in url.lower() for keyword in ['product', 'category'])]
+            self.budget.register_shards(sitemap_urls)
             for sitemap_url in sitemap_urls:
-                if any(keyword in sitemap_url.lower() for keyword in ['product', 'category']):
-                    yield scrapy.Request(
-                        url=sitemap_url,
-                        callback=self.parse_sitemap,
-                        meta={'site': self.site_name}
-                    )
+                yield scrapy.Request(
+                    url=sitemap_url,
+                    callback=self.parse_sitemap,
+                    meta={'site': self.site_name}
+                )
 
     def parse_sitemap(self, response):
         """Parse individual sitemap files"""
         self.logger.info(f"Parsing sitemap: {response.url}")
         
-        product_urls = parse_sitemap(response.url)
-        filtered_urls = filter_product_urls(product_urls, TARGET_CATEGORIES)
+        entries = parse_sitemap_entries(response.url, response.body)
+        yield from self.product_requests(response.url, entries)
+
+    def product_requests(self, sitemap_url, entries):
+        """Requests for the product URLs in a sitemap that fit the crawl budget"""
+        filtered_urls = set(filter_product_urls([entry['loc'] for entry in entries], TARGET_CATEGORIES))
+        entries = [entry for entry in entries
+                   if entry['loc'] in filtered_urls and entry['loc'] not in self.completed_urls]
         
-        self.logger.info(f"Found {len(filtered_urls)} product URLs in {response.url}")
+        self.logger.info(f"Found {len(entries)} product URLs in {sitemap_url}")
         
-        for url in filtered_urls[:50]:  # Limit for testing
-            yield scrapy.Request(
-                url=url,
-                callback=self.parse_product,
-                meta={'site': self.site_name}
-            )
+        # Best URLs first, so each shard and category spends its share on them
+        for entry in self.budget.grant(sitemap_url, self.prioritizer.rank(entries)):
+            yield self.product_request(entry)
+
+    def product_request(self, entry):
+        if self.mode == 'refresh':
+            return self.price_request(entry)
+        if self.mode == 'inventory':
+            return self.inventory_request(entry)
+        self.crawler.stats.inc_value('priority/requests')
+        if entry['loc'] not in self.prioritizer.known:
+            self.crawler.stats.inc_value('priority/new_urls')
+        return scrapy.Request(
+            url=entry['loc'],
+            callback=self.parse_product,
+            priority=entry['priority'],
+            meta={'site': self.site_name, 'lastmod': entry.get('lastmod')}
+        )
 
     def parse_product(self, response):
         """Parse individual product pages"""
@@ -96,6 +200,56 @@ class HardwareSpider(scrapy.Spider):
         
         yield item
 
+    def parse_price(self, response):
+        """Extract only price and availability from a product page"""
+        selectors = self.PRICE_SELECTORS[self.site_name]
+        yield self.price_item(
+            response.meta['product_url'],
+            extract_price(extract_text_content(response.css(selectors['price']))),
+            extract_text_content(response.css(selectors['availability'])),
+        )
+
+    def parse_price_api(self, response):
+        """Extract price and availability from the site's JSON price API"""
+        data = json.loads(response.text)
+        fields = self.site_config.get('price_api_fields', {})
+        price = json_path(data, fields.get('price', 'price'))
+        yield self.price_item(
+            response.meta['product_url'],
+            extract_price(str(price)) if price is not None else None,
+            json_path(data, fields.get('availability', 'availability')) or '',
+        )
+
+    def parse_inventory_api(self, response):
+        """Extract per-store stock from the site's JSON inventory API"""
+        data = json.loads(response.text)
+        fields = self.site_config.get('inventory_api_fields', {})
+        stores = []
+        for entry in json_path(data, fields.get('stores', 'stores')) or []:
+            store = {key: json_path(entry, fields.get(key, key))
+                     for key in ('store_id', 'quantity', 'availability', 'name', 'latitude', 'longitude')}
+            if store['store_id'] is not None:
+                stores.append(store)
+        
+        url = response.meta['product_url']
+        item = InventoryItem()
+        item['url'] = url
+        item['site'] = self.site_name
+        item['sku'] = self.known_prices[url]['sku']
+        item['stores'] = stores
+        item['checked_at'] = datetime.now().isoformat()
+        yield item
+
+    def price_item(self, url, price, availability):
+        item = PriceItem()
+        item['url'] = url
+        item['site'] = self.site_name
+        item['sku'] = self.known_prices.get(url, {}).get('sku')
+        item['price'] = price
+        item['availability'] = availability
+        item['checked_at'] = datetime.now().isoformat()
+        return item
+
     def extract_rona_data(self, response, item):
         """Extract product data specific to Rona website"""
         # Product name
@@ -118,7 +272,7 @@ class HardwareSpider(scrapy.Spider):
         
         # Price
         price_text = extract_text_content(
-            response.css('.price::text, .current-price::text, .product-price::text')
+            response.css(self.PRICE_SELECTORS['rona']['price'])
         )
         item['price'] = extract_price(price_text)
         
@@ -177,7 +331,7 @@ class HardwareSpider(scrapy.Spider):
         
         # Additional fields
         item['availability'] = extract_text_content(
-            response.css('.availability::text, .stock-status::text')
+            response.css(self.PRICE_SELECTORS['rona']['availability'])
         )
         
         # Rating
@@ -219,7 +373,7 @@ class HardwareSpider(scrapy.Spider):
         )
         
         price_text = extract_text_content(
-            response.css('.price-current::text, .price::text')
+            response.css(self.PRICE_SELECTORS['canadiantire']['price'])
         )
         item['price'] = extract_price(price_text)
         
@@ -6,37 +6,50 @@ import gzip
 import io
 from typing import List, Dict, Optional
 
-def parse_sitemap(sitemap_url: str) -> List[str]:
-    """Parse sitemap XML and extract product URLs"""
-    try:
+def sitemap_content(sitemap_url: str, content: Optional[bytes] = None) -> bytes:
+    """Sitemap XML bytes, fetched only if the body is not given, gunzipped if needed"""
+    if content is None:
         response = requests.get(sitemap_url, timeout=30)
         response.raise_for_status()
+        content = response.content
+    
+    # .xml.gz files are served as-is rather than with Content-Encoding
+    if content[:2] == b'\x1f\x8b':
+        content = gzip.decompress(content)
+    return content
+
+def parse_sitemap(sitemap_url: str, content: Optional[bytes] = None) -> List[str]:
+    """Parse sitemap XML and extract product URLs"""
+    return [entry['loc'] for entry in parse_sitemap_entries(sitemap_url, content)]
+
+def parse_sitemap_entries(sitemap_url: str, content: Optional[bytes] = None) -> List[Dict]:
+    """Parse sitemap XML into {'loc', 'lastmod'} entries (lastmod may be None)
+
+    Pass the body of an already downloaded response as content to avoid
+    fetching the sitemap a second time.
+    """
+    try:
+        root = ET.fromstring(sitemap_content(sitemap_url, content))
         
-        if sitemap_url.endswith('.gz'):
-            content = gzip.decompress(response.content)
-        else:
-            content = response.content
-            
-        root = ET.fromstring(content)
-        
-        urls = []
+        entries = []
         for url_elem in root.findall('.//{http://www.sitemaps.org/schemas/sitemap/0.9}url'):
             loc_elem = url_elem.find('{http://www.sitemaps.org/schemas/sitemap/0.9}loc')
+            lastmod_elem = url_elem.find('{http://www.sitemaps.org/schemas/sitemap/0.9}lastmod')
             if loc_elem is not None:
-                urls.append(loc_elem.text)
+                entries.append({
+                    'loc': loc_elem.text,
+                    'lastmod': lastmod_elem.text.strip() if lastmod_elem is not None and lastmod_elem.text else None,
+                })
         
-        return urls
+        return entries
     except Exception as e:
         print(f"Error parsing sitemap {sitemap_url}: {e}")
         return []
 
-def get_sitemap_index(sitemap_url: str) -> List[str]:
+def get_sitemap_index(sitemap_url: str, content: Optional[bytes] = None) -> List[str]:
     """Get list of sitemap URLs from sitemap index"""
     try:
-        response = requests.get(sitemap_url, timeout=30)
-        response.raise_for_status()
-        
-        root = ET.fromstring(response.content)
+        root = ET.fromstring(sitemap_content(sitemap_url, content))
         sitemap_urls = []
         
         for sitemap_elem in root.findall('.//{http://www.sitemaps.org/schemas/sitemap/0.9}sitemap'):
@@ -90,6 +103,13 @@ def extract_price(price_text: str) -> Optional[float]:
             pass
     return None
 
+def json_path(data, path: str):
+    """Follow a dotted path ('product.price.value') into decoded JSON"""
+    value = data
+    for key in path.split('.'):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
 def clean_specifications(specs_dict: Dict) -> Dict:
     """Clean and normalize specifications dictionary"""
     cleaned = {}
@@ -120,4 +140,46 @@ def normalize_url(url: str, base_url: str) -> str:
     """Normalize relative URLs to absolute URLs"""
     if url.startswith('http'):
         return url
-    return urljoin(base_url, url)
\ No newline at end of file
+    return urljoin(base_url, url)
+
+
+CHALLENGE_INDICATORS = [
+    'captcha', 'access denied', 'cf-chl', 'challenge-platform', 'just a moment',
+    'pardon our interruption', 'px-captcha', '_incapsula_', 'request unsuccessful',
+    'are you a robot', 'unusual traffic', 'bot detection', 'verify you are human'
+]
+
+SOFT_404_INDICATORS = [
+    'page not found', 'page you requested', 'no longer available',
+    'product is unavailable', "can't find the page", 'cannot be found', 'error 404'
+]
+
+PRODUCT_INDICATORS = [
+    'pdp-product-name', 'product-title', 'sku-number', 'data-sku', 'add-to-cart',
+    'schema.org/product', '"@type":"product"', '"@type": "product"',
+    'og:type" content="product'
+]
+
+
+def classify_page(status: int, body: str, expect_product: bool = False) -> str:
+    """Classify a response as 'challenge', 'empty', 'soft_404', 'product' or 'other'"""
+    text = body[:200000].lower()
+    
+    if status in (401, 403, 429, 503) or (
+        len(text) < 20000 and any(indicator in text for indicator in CHALLENGE_INDICATORS)
+    ):
+        # Bot walls are short pages; a product page may mention captcha in a form
+        if not any(indicator in text for indicator in PRODUCT_INDICATORS):
+            return 'challenge'
+    
+    visible = re.sub(r'<(script|style)\b.*?</\1>|<[^>]+>', ' ', text, flags=re.S)
+    if len(visible.split()) < 5:
+        return 'empty'
+    
+    if expect_product:
+        if any(indicator in text for indicator in PRODUCT_INDICATORS):
+            return 'product'
+        if any(indicator in text for indicator in SOFT_404_INDICATORS):
+            return 'soft_404'
+    
+    return 'other'
@@ -0,0 +1,87 @@
+import os
+import sqlite3
+import zlib
+from datetime import datetime
+
+class ValidatorStore:
+    """HTTP validators (ETag / Last-Modified) of everything we have fetched
+
+    Kept in a small SQLite file that outlives individual crawls, so the
+    next crawl can send conditional requests. Sitemap bodies are stored
+    too (compressed), since an unchanged sitemap still has to be parsed to
+    schedule its product URLs. Manuals record where the file was saved.
+    """
+
+    COMMIT_EVERY = 200
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS validators (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                length INTEGER,
+                body BLOB,
+                local_path TEXT,
+                checked_at TEXT
+            )
+        """)
+        self.pending = 0
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(settings.get('REVALIDATION_DB', 'crawls/http_validators.sqlite'))
+
+    def get(self, url):
+        row = self.connection.execute(
+            'SELECT etag, last_modified, length, body, local_path FROM validators WHERE url = ?', (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, length, body, local_path = row
+        return {
+            'etag': etag,
+            'last_modified': last_modified,
+            'length': length or 0,
+            'body': zlib.decompress(body) if body else None,
+            'local_path': local_path,
+        }
+
+    def conditional_headers(self, url):
+        """If-None-Match / If-Modified-Since headers for a URL, if we have validators"""
+        validators = self.get(url)
+        if not validators:
+            return {}
+        headers = {}
+        if validators['etag']:
+            headers['If-None-Match'] = validators['etag']
+        if validators['last_modified']:
+            headers['If-Modified-Since'] = validators['last_modified']
+        return headers
+
+    def put(self, url, etag=None, last_modified=None, length=0, body=None, local_path=None):
+        if not etag and not last_modified:
+            # Nothing to revalidate with; forget stale validators
+            self.connection.execute('DELETE FROM validators WHERE url = ?', (url,))
+        else:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO validators VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, etag, last_modified, length, zlib.compress(body) if body else None,
+                 local_path, datetime.now().isoformat()),
+            )
+        self.pending += 1
+        if self.pending >= self.COMMIT_EVERY:
+            self.commit()
+
+    def commit(self):
+        self.connection.commit()
+        self.pending = 0
+
+    def close(self):
+        self.commit()
+        self.connection.close()
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Store Inventory Matrix Builder
+
+Turns the per-store stock levels collected by an inventory crawl
+(`scrapy crawl hardware -a mode=inventory`) into a sparse store x product
+matrix. Only stores that stock a product are kept, so thousands of stores by
+hundreds of thousands of SKUs fits in a few CSR arrays per snapshot:
+
+    product_store   row per SKU   -> stores that stock it, with quantity
+    store_product   row per store -> SKUs it stocks, with quantity
+
+plus store coordinates. Snapshots are written as .npy arrays and a JSON
+manifest, memory-mapped at query time, so "which nearby stores stock X" is a
+row slice and a vectorised distance computation, without a database.
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from catalogue import latest_file
+from config import OUTPUT_DIR
+
+# Stock level stored for stores that have a product but do not say how many
+IN_STOCK_UNKNOWN = -1
+
+OUT_OF_STOCK_WORDS = ('out of stock', 'unavailable', 'not available', 'sold out', 'no stock')
+IN_STOCK_WORDS = ('in stock', 'available', 'limited', 'low stock', 'en stock', 'en inventaire')
+
+EARTH_RADIUS_KM = 6371.0
+
+TABLES = ('product_store', 'store_product')
+
+def stock_level(quantity=None, availability=None) -> int:
+    """Quantity on hand, IN_STOCK_UNKNOWN, or 0 for out of stock"""
+    if quantity not in (None, ''):
+        try:
+            return max(int(float(quantity)), 0)
+        except (TypeError, ValueError):
+            pass
+    text = str(availability or '').strip().lower()
+    if not text or any(word in text for word in OUT_OF_STOCK_WORDS):
+        return 0
+    if any(word in text for word in IN_STOCK_WORDS):
+        return IN_STOCK_UNKNOWN
+    return 0
+
+def to_csr(rows: np.ndarray, cols: np.ndarray, values: np.ndarray, n_rows: int):
+    """CSR arrays from (row, column, value) triplets; columns sorted within rows"""
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols[order].astype(np.int32), values[order].astype(np.int32)
+
+def load_observations(path: str) -> List[Dict]:
+    """Read the JSON lines written by InventoryMatrixPipeline"""
+    observations = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                observations.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return observations
+
+def load_stores(site: str, data_dir: str = OUTPUT_DIR) -> List[Dict]:
+    """Store list from data/stores_{site}.json ({id, name, address, latitude, longitude})"""
+    path = os.path.join(data_dir, f'stores_{site}.json')
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def build_inventory_matrix(observations: Iterable[Dict], stores: Optional[List[Dict]] = None) -> Dict:
+    """Build both CSR orientations from inventory observations
+
+    Each observation is an InventoryItem: {'sku', 'stores': [{'store_id',
+    'quantity', 'availability', ...}]}. A later observation of the same
+    SKU and store replaces an earlier one. Stores seen in observations but
+    missing from `stores` are added without coordinates.
+    """
+    store_info = {}
+    for store in stores or []:
+        store_info[str(store['id'])] = store
+
+    levels = {}
+    for observation in observations:
+        sku = observation.get('sku') or observation.get('url')
+        if not sku:
+            continue
+        for entry in observation.get('stores') or []:
+            store_id = str(entry.get('store_id') or '')
+            if not store_id:
+                continue
+            if store_id not in store_info:
+                store_info[store_id] = {'id': store_id}
+            for key in ('name', 'latitude', 'longitude'):
+                if entry.get(key) is not None:
+                    store_info[store_id].setdefault(key, entry[key])
+            levels[(str(sku), store_id)] = stock_level(entry.get('quantity'), entry.get('availability'))
+
+    skus = sorted({sku for sku, _ in levels})
+    store_ids = sorted(store_info)
+    sku_index = {sku: i for i, sku in enumerate(skus)}
+    store_index = {store_id: i for i, store_id in enumerate(store_ids)}
+
+    stocked = [(sku_index[sku], store_index[store_id], level)
+               for (sku, store_id), level in levels.items() if level]
+    triplets = np.array(stocked, dtype=np.int64).reshape(-1, 3)
+    product_rows, store_cols, values = triplets[:, 0], triplets[:, 1], triplets[:, 2]
+
+    def coordinate(store, key):
+        try:
+            return float(store.get(key))
+        except (TypeError, ValueError):
+            return np.nan
+
+    return {
+        'skus': skus,
+        'stores': [{'id': store_id, 'name': store_info[store_id].get('name'),
+                    'address': store_info[store_id].get('address')} for store_id in store_ids],
+        'latitude': np.array([coordinate(store_info[s], 'latitude') for s in store_ids], dtype=np.float32),
+        'longitude': np.array([coordinate(store_info[s], 'longitude') for s in store_ids], dtype=np.float32),
+        'observed': len(levels),
+        'product_store': to_csr(product_rows, store_cols, values, len(skus)),
+        'store_product': to_csr(store_cols, product_rows, values, len(store_ids)),
+    }
+
+def save_inventory_matrix(matrix: Dict, output_dir: str, site: str) -> str:
+    """Write the matrix as .npy arrays plus a JSON manifest"""
+    os.makedirs(output_dir, exist_ok=True)
+    for table in TABLES:
+        for name, array in zip(('indptr', 'indices', 'values'), matrix[table]):
+            np.save(os.path.join(output_dir, f'{table}_{name}.npy'), array)
+    np.save(os.path.join(output_dir, 'store_latitude.npy'), matrix['latitude'])
+    np.save(os.path.join(output_dir, 'store_longitude.npy'), matrix['longitude'])
+
+    manifest = {
+        'created_at': datetime.now().isoformat(),
+        'site': site,
+        'in_stock_unknown': IN_STOCK_UNKNOWN,
+        'observed_pairs': matrix['observed'],
+        'stocked_pairs': int(len(matrix['product_store'][1])),
+        'skus': matrix['skus'],
+        'stores': matrix['stores'],
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    return output_dir
+
+def haversine_km(lat, lon, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    lat, lon = np.radians(lat), np.radians(lon)
+    latitudes, longitudes = np.radians(latitudes), np.radians(longitudes)
+    a = (np.sin((latitudes - lat) / 2) ** 2
+         + np.cos(lat) * np.cos(latitudes) * np.sin((longitudes - lon) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+class InventoryMatrix:
+    """Memory-mapped, read-only view over a saved inventory snapshot"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self.skus = self.manifest['skus']
+        self.stores = self.manifest['stores']
+        self.sku_rows = {sku: i for i, sku in enumerate(self.skus)}
+        self.store_rows = {store['id']: i for i, store in enumerate(self.stores)}
+        self.tables = {}
+        for table in TABLES:
+            self.tables[table] = tuple(
+                np.load(os.path.join(path, f'{table}_{name}.npy'), mmap_mode='r')
+                for name in ('indptr', 'indices', 'values')
+            )
+        self.latitude = np.load(os.path.join(path, 'store_latitude.npy'), mmap_mode='r')
+        self.longitude = np.load(os.path.join(path, 'store_longitude.npy'), mmap_mode='r')
+
+    @classmethod
+    def latest(cls, site: str, data_dir: str = OUTPUT_DIR) -> Optional['InventoryMatrix']:
+        """Open the most recent snapshot for a site, if any"""
+        path = latest_file(f'inventory_matrix_{site}_*', data_dir)
+        return cls(path) if path else None
+
+    def _row(self, table: str, row: Optional[int]):
+        if row is None:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+        indptr, indices, values = self.tables[table]
+        start, end = indptr[row], indptr[row + 1]
+        return np.asarray(indices[start:end]), np.asarray(values[start:end])
+
+    def quantity(self, sku: str, store_id: str) -> int:
+        """Stock of a SKU at a store (IN_STOCK_UNKNOWN when only 'in stock' is known)"""
+        stores, values = self._row('product_store', self.sku_rows.get(sku))
+        store = self.store_rows.get(str(store_id))
+        if store is None:
+            return 0
+        i = np.searchsorted(stores, store)
+        return int(values[i]) if i < len(stores) and stores[i] == store else 0
+
+    def stores_stocking(self, sku: str, latitude: Optional[float] = None, longitude: Optional[float] = None,
+                        radius_km: Optional[float] = None, limit: Optional[int] = None) -> List[Dict]:
+        """Stores that stock a SKU, nearest first when a location is given"""
+        stores, values = self._row('product_store', self.sku_rows.get(sku))
+        if latitude is None or longitude is None:
+            order = np.arange(len(stores))
+            distances = np.full(len(stores), np.nan)
+        else:
+            distances = haversine_km(latitude, longitude, self.latitude[stores], self.longitude[stores])
+            # Stores without coordinates go last unless a radius excludes them
+            order = np.argsort(np.where(np.isnan(distances), np.inf, distances), kind='stable')
+            if radius_km is not None:
+                order = order[distances[order] <= radius_km]
+        if limit:
+            order = order[:limit]
+        return [{
+            'store_id': self.stores[stores[i]]['id'],
+            'name': self.stores[stores[i]]['name'],
+            'quantity': int(values[i]),
+            'distance_km': None if np.isnan(distances[i]) else round(float(distances[i]), 2),
+        } for i in order]
+
+    def products_at(self, store_id: str) -> List[Dict]:
+        """SKUs a store stocks, with quantity"""
+        skus, values = self._row('store_product', self.store_rows.get(str(store_id)))
+        return [{'sku': self.skus[c], 'quantity': int(v)} for c, v in zip(skus, values)]
+
+def synthetic_observations(n_stores: int, n_products: int, density: float, seed: int = 0):
+    """Random inventory for benchmarking at realistic scale"""
+    rng = np.random.default_rng(seed)
+    stores = [{'id': str(i), 'name': f'Store {i}',
+               'latitude': float(rng.uniform(43, 53)), 'longitude': float(rng.uniform(-123, -63))}
+              for i in range(n_stores)]
+    per_product = rng.binomial(n_stores, density, n_products)
+    observations = []
+    for product, count in enumerate(per_product):
+        chosen = rng.choice(n_stores, size=count, replace=False)
+        quantities = rng.integers(-1, 40, size=count)
+        observations.append({'sku': f'SKU{product}', 'stores': [
+            {'store_id': str(s), 'quantity': int(q) if q >= 0 else None,
+             'availability': 'In Stock' if q < 0 else None}
+            for s, q in zip(chosen, quantities)]})
+    return observations, stores
+
+def benchmark(args):
+    print(f"⏱️  Building {args.stores} stores x {args.products} products at {args.density:.1%} density...")
+    observations, stores = synthetic_observations(args.stores, args.products, args.density)
+    started = time.perf_counter()
+    matrix = build_inventory_matrix(observations, stores)
+    build_seconds = time.perf_counter() - started
+    output_dir = save_inventory_matrix(matrix, os.path.join(OUTPUT_DIR, 'inventory_matrix_benchmark'), 'benchmark')
+    size = sum(os.path.getsize(os.path.join(output_dir, f)) for f in os.listdir(output_dir))
+
+    inventory = InventoryMatrix(output_dir)
+    rng = np.random.default_rng(1)
+    queries = [(f'SKU{rng.integers(args.products)}', rng.uniform(43, 53), rng.uniform(-123, -63))
+               for _ in range(1000)]
+    started = time.perf_counter()
+    for sku, lat, lon in queries:
+        inventory.stores_stocking(sku, lat, lon, radius_km=50, limit=10)
+    query_ms = (time.perf_counter() - started) / len(queries) * 1000
+
+    print(f"✅ {len(matrix['product_store'][1])} stocked pairs, built in {build_seconds:.1f}s, {size / 1024 / 1024:.1f} MB")
+    print(f"📍 Nearby-store lookup: {query_ms:.3f} ms per query")
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and query store inventory snapshots')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('build', help='Build a snapshot from the latest inventory crawl')
+    command.add_argument('site')
+    command = commands.add_parser('stock', help='Stores that stock a product')
+    command.add_argument('site')
+    command.add_argument('sku')
+    command.add_argument('--lat', type=float)
+    command.add_argument('--lon', type=float)
+    command.add_argument('--radius', type=float, help='Kilometres')
+    command.add_argument('--limit', type=int, default=10)
+    command = commands.add_parser('store', help='Products a store stocks')
+    command.add_argument('site')
+    command.add_argument('store_id')
+    command = commands.add_parser('benchmark', help='Build and query a synthetic snapshot')
+    command.add_argument('--stores', type=int, default=2000)
+    command.add_argument('--products', type=int, default=200000)
+    command.add_argument('--density', type=float, default=0.01)
+    args = parser.parse_args()
+
+    if args.command == 'benchmark':
+        benchmark(args)
+        return
+
+    if args.command == 'build':
+        observations_file = latest_file(f'inventory_{args.site}_*.jsonl')
+        if not observations_file:
+            print(f"No inventory data found. Run: scrapy crawl hardware -a site={args.site} -a mode=inventory")
+            return
+        print(f"🏬 Building inventory matrix from {observations_file}...")
+        matrix = build_inventory_matrix(load_observations(observations_file), load_stores(args.site))
+        run_id = os.path.basename(observations_file)[len(f'inventory_{args.site}_'):-len('.jsonl')]
+        output_dir = save_inventory_matrix(
+            matrix, os.path.join(OUTPUT_DIR, f'inventory_matrix_{args.site}_{run_id}'), args.site)
+        print(f"✅ {len(matrix['skus'])} products x {len(matrix['stores'])} stores, "
+              f"{len(matrix['product_store'][1])} in stock")
+        print(f"📁 Snapshot: {output_dir}")
+        return
+
+    inventory = InventoryMatrix.latest(args.site)
+    if not inventory:
+        print(f"No inventory snapshot for {args.site}. Run: python inventory_matrix.py build {args.site}")
+        return
+
+    started = time.perf_counter()
+    if args.command == 'stock':
+        results = inventory.stores_stocking(args.sku, args.lat, args.lon, args.radius, args.limit)
+        elapsed = (time.perf_counter() - started) * 1000
+        for store in results:
+            distance = f"{store['distance_km']} km" if store['distance_km'] is not None else ''
+            quantity = 'in stock' if store['quantity'] == IN_STOCK_UNKNOWN else store['quantity']
+            print(f"{store['store_id']:>8}  {store['name'] or '':30}  {quantity!s:>8}  {distance}")
+        print(f"🏬 {len(results)} stores stock {args.sku} ({elapsed:.2f} ms)")
+    elif args.command == 'store':
+        results = inventory.products_at(args.store_id)
+        elapsed = (time.perf_counter() - started) * 1000
+        for product in results:
+            quantity = 'in stock' if product['quantity'] == IN_STOCK_UNKNOWN else product['quantity']
+            print(f"{product['sku']:>12}  {quantity}")
+        print(f"📦 Store {args.store_id} stocks {len(results)} products ({elapsed:.2f} ms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,615 @@
+#!/usr/bin/env python3
+"""
+Offline Catalogue Bundle
+
+Packs the catalogue into one SQLite file the Android app can ship and query
+on the device, instead of calling the backend for every product question:
+
+- normalized tables: products with brand and category lookup tables, spec
+  keys, raw spec values, their SI quantities from spec_normalizer.py, and
+  the feature/application lists;
+- FTS5 full-text search over names, brands, categories, descriptions, specs
+  and features. The FTS table uses the product_search view as external
+  content, so the text is indexed without being stored a second time.
+  Prefix searches scan the term list instead of using prefix indexes, which
+  would double the FTS size, and positions are kept (detail=full) because
+  ranking without them re-reads every matching row;
+- the compatibility tables from compatibility_index.py. Drill/bit fit only
+  depends on the drill's chuck and the bit's shank, so the bundle stores
+  each distinct chuck and shank profile once with the fit between them,
+  rather than every drill x bit pair, which grows with the product of the
+  two counts. Material -> bit and screw gauge -> bit are stored as pairs.
+
+The file is size-optimized before it is published: FTS segments are merged,
+the page size with the smallest file is picked by rebuilding with VACUUM,
+and a gzip (or xz) copy is written for transport.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from catalogue import latest_file, load_products
+from compatibility_index import (FULL, INCH, build_compatibility_index, chuck_profile, fit_level,
+                                 shank_profile)
+from config import OUTPUT_DIR
+from pg_loader import to_availability, to_price
+from query_parser import product_kind
+from spec_normalizer import normalize_catalogue
+
+# PRAGMA user_version of the bundle; bump when the schema changes
+BUNDLE_VERSION = 1
+
+PAGE_SIZES = (512, 1024, 2048, 4096)
+
+SCHEMA = """
+CREATE TABLE bundle_info (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID;
+CREATE TABLE brands (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE COLLATE NOCASE);
+CREATE TABLE categories (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE COLLATE NOCASE);
+CREATE TABLE products (
+    id INTEGER PRIMARY KEY,
+    product_id TEXT NOT NULL UNIQUE,
+    sku TEXT,
+    model TEXT,
+    name TEXT NOT NULL,
+    kind TEXT,
+    brand INTEGER REFERENCES brands (id),
+    category INTEGER REFERENCES categories (id),
+    price REAL,
+    available INTEGER NOT NULL,
+    chuck INTEGER REFERENCES chucks (id),
+    shank INTEGER REFERENCES shanks (id),
+    warranty TEXT,
+    description TEXT
+);
+CREATE INDEX products_sku ON products (sku);
+CREATE INDEX products_model ON products (model);
+CREATE INDEX products_chuck ON products (chuck) WHERE chuck IS NOT NULL;
+CREATE INDEX products_shank ON products (shank) WHERE shank IS NOT NULL;
+CREATE TABLE product_lists (
+    product INTEGER NOT NULL REFERENCES products (id),
+    list TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (product, list, position)
+) WITHOUT ROWID;
+CREATE TABLE spec_keys (
+    id INTEGER PRIMARY KEY,
+    field TEXT NOT NULL,
+    name TEXT NOT NULL,
+    UNIQUE (field, name)
+);
+CREATE TABLE specs (
+    product INTEGER NOT NULL REFERENCES products (id),
+    key INTEGER NOT NULL REFERENCES spec_keys (id),
+    raw TEXT NOT NULL,
+    PRIMARY KEY (product, key)
+) WITHOUT ROWID;
+CREATE TABLE spec_values (
+    product INTEGER NOT NULL,
+    key INTEGER NOT NULL,
+    dimension TEXT NOT NULL,
+    unit TEXT,
+    min REAL,
+    max REAL,
+    PRIMARY KEY (product, key, dimension)
+) WITHOUT ROWID;
+CREATE TABLE chucks (id INTEGER PRIMARY KEY, kind TEXT NOT NULL, capacity REAL, hammer INTEGER NOT NULL);
+CREATE TABLE shanks (
+    id INTEGER PRIMARY KEY,
+    kinds TEXT NOT NULL,
+    min REAL,
+    max REAL,
+    needs_hammer INTEGER NOT NULL
+);
+CREATE TABLE fits (
+    chuck INTEGER NOT NULL REFERENCES chucks (id),
+    shank INTEGER NOT NULL REFERENCES shanks (id),
+    fit TEXT NOT NULL,
+    PRIMARY KEY (chuck, shank)
+) WITHOUT ROWID;
+CREATE INDEX shank_fits ON fits (shank, chuck);
+CREATE TABLE materials (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE material_bits (
+    material INTEGER NOT NULL REFERENCES materials (id),
+    bit INTEGER NOT NULL REFERENCES products (id),
+    PRIMARY KEY (material, bit)
+) WITHOUT ROWID;
+CREATE TABLE screw_bits (
+    gauge INTEGER NOT NULL,
+    bit INTEGER NOT NULL REFERENCES products (id),
+    pilot_inches REAL,
+    PRIMARY KEY (gauge, bit)
+) WITHOUT ROWID;
+CREATE VIEW product_search AS
+SELECT p.id, p.name, b.name AS brand, c.name AS category, p.description,
+       (SELECT group_concat(k.name || ' ' || s.raw, ' ')
+        FROM specs s JOIN spec_keys k ON k.id = s.key WHERE s.product = p.id) AS specs,
+       (SELECT group_concat(l.text, ' ') FROM product_lists l WHERE l.product = p.id) AS features
+FROM products p
+LEFT JOIN brands b ON b.id = p.brand
+LEFT JOIN categories c ON c.id = p.category;
+CREATE VIRTUAL TABLE products_fts USING fts5(
+    name, brand, category, description, specs, features,
+    content='product_search', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+# Table -> columns, in insert order
+TABLES = {
+    'brands': ('id', 'name'),
+    'categories': ('id', 'name'),
+    'chucks': ('id', 'kind', 'capacity', 'hammer'),
+    'shanks': ('id', 'kinds', 'min', 'max', 'needs_hammer'),
+    'fits': ('chuck', 'shank', 'fit'),
+    'products': ('id', 'product_id', 'sku', 'model', 'name', 'kind', 'brand', 'category', 'price',
+                 'available', 'chuck', 'shank', 'warranty', 'description'),
+    'product_lists': ('product', 'list', 'position', 'text'),
+    'spec_keys': ('id', 'field', 'name'),
+    'specs': ('product', 'key', 'raw'),
+    'spec_values': ('product', 'key', 'dimension', 'unit', 'min', 'max'),
+    'materials': ('id', 'name'),
+    'material_bits': ('material', 'bit'),
+    'screw_bits': ('gauge', 'bit', 'pilot_inches'),
+}
+
+# Product fields kept as ordered text lists
+LISTS = ('features', 'applications', 'included_items')
+
+# bm25 column weights: name, brand, category, description, specs, features
+SEARCH_SQL = """
+SELECT p.product_id, p.name, b.name, p.price, bm25(products_fts, 10.0, 5.0, 3.0, 1.0, 2.0, 1.0) AS score
+FROM products_fts
+JOIN products p ON p.id = products_fts.rowid
+LEFT JOIN brands b ON b.id = p.brand
+WHERE products_fts MATCH ?
+ORDER BY score
+LIMIT ?
+"""
+
+def text(value) -> Optional[str]:
+    value = ' '.join(str(value).split()) if value not in (None, '') else ''
+    return value or None
+
+class Numbering(dict):
+    """Key -> id that keeps the ids of an earlier bundle and numbers new keys after them"""
+
+    def __init__(self, previous: Optional[Dict] = None):
+        super().__init__(previous or {})
+        self.next = max(self.values(), default=0) + 1
+
+    def __call__(self, key) -> int:
+        if key not in self:
+            self[key] = self.next
+            self.next += 1
+        return self[key]
+
+def bundle_ids(path: str) -> Dict[str, Dict]:
+    """The ids a bundle gave its products and lookup rows, keyed like bundle_rows numbers them"""
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    queries = {
+        'products': 'SELECT product_id, id FROM products',
+        'brands': 'SELECT name, id FROM brands',
+        'categories': 'SELECT name, id FROM categories',
+        'spec_keys': 'SELECT field, name, id FROM spec_keys',
+        'materials': 'SELECT name, id FROM materials',
+        'chucks': 'SELECT kind, capacity, hammer, id FROM chucks',
+        'shanks': 'SELECT kinds, min, max, needs_hammer, id FROM shanks',
+    }
+    ids = {table: {row[:-1]: row[-1] for row in conn.execute(sql)} for table, sql in queries.items()}
+    conn.close()
+    ids['products'] = {key: value for (key,), value in ids['products'].items()}
+    ids['materials'] = {key: value for (key,), value in ids['materials'].items()}
+    for table in ('brands', 'categories'):
+        ids[table] = {key.casefold(): value for (key,), value in ids[table].items()}
+    ids['chucks'] = {(kind, capacity, bool(hammer)): value for (kind, capacity, hammer), value in ids['chucks'].items()}
+    ids['shanks'] = {(kinds, low, high, bool(hammer)): value
+                     for (kinds, low, high, hammer), value in ids['shanks'].items()}
+    return ids
+
+def bundle_rows(products: List[Dict], previous: Optional[Dict[str, Dict]] = None) -> Dict[str, List[tuple]]:
+    """Rows for every bundle table
+
+    Products are numbered in id order. Given the ids of the previous bundle
+    (bundle_ids), rows keep their ids and only new rows get new ones, so
+    consecutive bundles can be diffed row by row.
+    """
+    products = sorted(products, key=lambda p: str(p['id']))
+    ids = {table: Numbering((previous or {}).get(table))
+           for table in ('products', 'brands', 'categories', 'spec_keys', 'materials', 'chucks', 'shanks')}
+    numbers = {p['id']: ids['products'](str(p['id'])) for p in products}
+    rows = {table: [] for table in TABLES}
+    names = {'brands': {}, 'categories': {}}
+
+    def lookup_id(table: str, name) -> Optional[int]:
+        name = text(name)
+        if not name:
+            return None
+        if name.casefold() not in names[table]:
+            names[table][name.casefold()] = name
+            rows[table].append((ids[table](name.casefold()), name))
+        return ids[table][name.casefold()]
+
+    # Distinct chuck and shank profiles, and which pairs fit
+    chucks, shanks = {}, {}
+    profiles = {}
+    for product in products:
+        chuck = chuck_profile(product)
+        if chuck:
+            key = (chuck['kind'], chuck['capacity'], chuck['hammer'])
+            chucks.setdefault(key, chuck)
+            profiles[product['id']] = ('chuck', key)
+        shank = shank_profile(product) if product.get('product_type') == 'drill_bit' else None
+        if shank:
+            key = (','.join(sorted(shank['kinds'])), shank['min'], shank['max'], shank['needs_hammer'])
+            shanks.setdefault(key, shank)
+            profiles[product['id']] = ('shank', key)
+    chuck_ids = {key: ids['chucks'](key) for key in sorted(chucks, key=str)}
+    shank_ids = {key: ids['shanks'](key) for key in sorted(shanks, key=str)}
+    rows['chucks'] = [(chuck_ids[key], key[0], key[1], int(key[2])) for key in chuck_ids]
+    rows['shanks'] = [(shank_ids[key], key[0], key[1], key[2], int(key[3])) for key in shank_ids]
+    for chuck_key, chuck in chucks.items():
+        for shank_key, shank in shanks.items():
+            level = fit_level(chuck, shank)
+            if level:
+                rows['fits'].append((chuck_ids[chuck_key], shank_ids[shank_key],
+                                     'full' if level == FULL else 'partial'))
+
+    for product in products:
+        number = numbers[product['id']]
+        kind, profile = profiles.get(product['id'], (None, None))
+        rows['products'].append((
+            number,
+            str(product['id']),
+            text(product.get('sku')),
+            text(product.get('model')),
+            text(product.get('name')) or str(product['id']),
+            product_kind(product),
+            lookup_id('brands', product.get('brand')),
+            lookup_id('categories', product.get('subcategory') or product.get('category')),
+            to_price(product.get('price')),
+            int(to_availability(product)),
+            chuck_ids[profile] if kind == 'chuck' else None,
+            shank_ids[profile] if kind == 'shank' else None,
+            text(product.get('warranty')),
+            text(product.get('description')),
+        ))
+        for name in LISTS:
+            values = product.get(name) or []
+            for position, value in enumerate(values if isinstance(values, list) else [values]):
+                if text(value):
+                    rows['product_lists'].append((number, name, position, text(value)))
+
+    # Raw values and their parsed quantities from the spec normalizer
+    long = normalize_catalogue(products)['long']
+    keys = {}
+    for field, name in long[['field', 'spec_key']].drop_duplicates().itertuples(index=False):
+        keys[field, name] = ids['spec_keys']((field, name))
+        rows['spec_keys'].append((keys[field, name], field, name))
+    seen = set()
+    for record in long.itertuples(index=False):
+        product, key = numbers[record.product_id], keys[record.field, record.spec_key]
+        if (product, key) not in seen:
+            seen.add((product, key))
+            rows['specs'].append((product, key, record.raw))
+        if isinstance(record.dimension, str):
+            rows['spec_values'].append((product, key, record.dimension, record.unit or None,
+                                        float(record.min), float(record.max)))
+
+    index = build_compatibility_index(products)
+    bits = [numbers[pid] for pid in index['bit_ids']]
+    indptr, indices, _ = index['material_bit']
+    for row, material in enumerate(index['materials']):
+        number = ids['materials'](material)
+        rows['materials'].append((number, material))
+        rows['material_bits'] += [(number, bits[col]) for col in indices[indptr[row]:indptr[row + 1]]]
+    indptr, indices, values = index['screw_bit']
+    for row, gauge in enumerate(index['screw_gauges']):
+        for col, pilot in zip(indices[indptr[row]:indptr[row + 1]], values[indptr[row]:indptr[row + 1]]):
+            rows['screw_bits'].append((gauge, bits[col], round(float(pilot) / INCH, 4) if pilot else None))
+
+    for table in rows:
+        rows[table].sort(key=lambda row: tuple((value is not None, value) for value in row))
+    return rows
+
+def bundle_version(rows: Dict[str, List[tuple]]) -> str:
+    """Content hash of the bundle rows; unchanged catalogues get the same version"""
+    digest = hashlib.sha256()
+    for table in TABLES:
+        digest.update(table.encode('utf-8'))
+        for row in rows[table]:
+            digest.update(json.dumps(row, separators=(',', ':')).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def vacuum(path: str, page_size: int) -> int:
+    """Rebuild the database with a page size, returning the new file size"""
+    conn = sqlite3.connect(path)
+    conn.execute(f'PRAGMA page_size = {int(page_size)}')
+    conn.execute('VACUUM')
+    conn.close()
+    return os.path.getsize(path)
+
+def tune_page_size(path: str, page_sizes=PAGE_SIZES) -> Dict[int, int]:
+    """Rebuild the database at the page size with the smallest file; page size -> bytes tried"""
+    sizes = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        trial = os.path.join(tmp, 'trial.db')
+        for page_size in page_sizes:
+            shutil.copyfile(path, trial)
+            sizes[page_size] = vacuum(trial, page_size)
+    # Larger pages win ties: fewer reads per lookup on the device
+    best = min(sizes, key=lambda page_size: (sizes[page_size], -page_size))
+    vacuum(path, best)
+    return sizes
+
+def write_bundle(path: str, products: List[Dict], page_size: Optional[int] = None,
+                 previous: Optional[str] = None) -> Dict:
+    """Write the catalogue bundle to 'path' and return its build stats
+
+    With the path of the previous bundle, rows keep the ids they had there.
+    """
+    started = time.perf_counter()
+    rows = bundle_rows(products, bundle_ids(previous) if previous else None)
+    version = bundle_version(rows)
+
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.executescript(SCHEMA)
+    with conn:
+        for table, columns in TABLES.items():
+            conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                             rows[table])
+        conn.executemany('INSERT INTO bundle_info (key, value) VALUES (?, ?)', [
+            ('version', version),
+            ('created_at', datetime.now().isoformat()),
+            ('products', str(len(rows['products']))),
+        ])
+        conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO products_fts (products_fts) VALUES ('optimize')")
+    conn.execute('ANALYZE')
+    conn.execute(f'PRAGMA user_version = {BUNDLE_VERSION}')
+    conn.execute('PRAGMA journal_mode = DELETE')
+    conn.close()
+
+    page_sizes = {page_size: vacuum(tmp_path, page_size)} if page_size else tune_page_size(tmp_path)
+    os.replace(tmp_path, path)
+    return {
+        'version': version,
+        'rows': {table: len(table_rows) for table, table_rows in rows.items()},
+        'page_sizes': page_sizes,
+        'page_size': min(page_sizes, key=lambda size: (page_sizes[size], -size)),
+        'bytes': os.path.getsize(path),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+def compress(path: str, method: str = 'gzip') -> str:
+    """Write a compressed copy of the bundle for transport"""
+    if method == 'xz':
+        target = path + '.xz'
+        with open(path, 'rb') as src, lzma.open(target, 'wb', preset=9 | lzma.PRESET_EXTREME) as dst:
+            shutil.copyfileobj(src, dst)
+    else:
+        # mtime=0 keeps the compressed bytes identical for identical bundles
+        target = path + '.gz'
+        with open(path, 'rb') as src, open(target, 'wb') as raw, \
+                gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=9, mtime=0) as dst:
+            shutil.copyfileobj(src, dst)
+    return target
+
+def fts_query(text: str) -> str:
+    """An FTS5 MATCH expression with every word quoted and the last one as a prefix"""
+    words = [word.replace('"', '') for word in text.split()]
+    words = [word for word in words if word]
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    if not text[-1:].isspace():
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+class OfflineBundle:
+    """Read-only access to a bundle with the queries the app runs on the device"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+        self.info = dict(self.conn.execute('SELECT key, value FROM bundle_info'))
+
+    @classmethod
+    def latest(cls, data_dir: str = OUTPUT_DIR) -> Optional['OfflineBundle']:
+        path = latest_file('offline_bundle_*.db', data_dir)
+        return cls(path) if path else None
+
+    def search(self, text: str, limit: int = 10) -> List[Dict]:
+        """Full-text product search, best matches first"""
+        query = fts_query(text)
+        if not query:
+            return []
+        return [{'id': pid, 'name': name, 'brand': brand, 'price': price, 'score': round(score, 3)}
+                for pid, name, brand, price, score in self.conn.execute(SEARCH_SQL, (query, limit))]
+
+    def product(self, product_id: str) -> Optional[Dict]:
+        """One product with its specs and lists"""
+        row = self.conn.execute("""
+            SELECT p.id, p.product_id, p.sku, p.model, p.name, p.kind, b.name, c.name, p.price,
+                   p.available, p.warranty, p.description
+            FROM products p LEFT JOIN brands b ON b.id = p.brand LEFT JOIN categories c ON c.id = p.category
+            WHERE p.product_id = ?""", (product_id,)).fetchone()
+        if not row:
+            return None
+        number = row[0]
+        product = dict(zip(('id', 'sku', 'model', 'name', 'kind', 'brand', 'category', 'price', 'available',
+                            'warranty', 'description'), row[1:]))
+        product['available'] = bool(product['available'])
+        product['specifications'] = {}
+        for field, name, raw in self.conn.execute("""
+                SELECT k.field, k.name, s.raw FROM specs s JOIN spec_keys k ON k.id = s.key
+                WHERE s.product = ? ORDER BY k.id""", (number,)):
+            product['specifications'].setdefault(field, {})[name] = raw
+        for name, value in self.conn.execute(
+                'SELECT list, text FROM product_lists WHERE product = ? ORDER BY list, position', (number,)):
+            product.setdefault(name, []).append(value)
+        return product
+
+    def bits_for_drill(self, drill_id: str) -> List[Dict]:
+        return [{'bit_id': bit, 'fit': fit} for bit, fit in self.conn.execute("""
+            SELECT b.product_id, f.fit FROM products d
+            JOIN fits f ON f.chuck = d.chuck JOIN products b ON b.shank = f.shank
+            WHERE d.product_id = ? ORDER BY b.product_id""", (drill_id,))]
+
+    def drills_for_bit(self, bit_id: str) -> List[Dict]:
+        return [{'drill_id': drill, 'fit': fit} for drill, fit in self.conn.execute("""
+            SELECT d.product_id, f.fit FROM products b
+            JOIN fits f ON f.shank = b.shank JOIN products d ON d.chuck = f.chuck
+            WHERE b.product_id = ? ORDER BY d.product_id""", (bit_id,))]
+
+    def bits_for_material(self, material: str) -> List[str]:
+        return [bit for bit, in self.conn.execute("""
+            SELECT b.product_id FROM material_bits m
+            JOIN materials n ON n.id = m.material JOIN products b ON b.id = m.bit
+            WHERE n.name = ? ORDER BY b.product_id""", (material.strip().lower(),))]
+
+    def bits_for_screw(self, size) -> List[Dict]:
+        try:
+            gauge = int(str(size).strip().lstrip('#'))
+        except ValueError:
+            return []
+        results = []
+        for bit, pilot in self.conn.execute("""
+                SELECT b.product_id, s.pilot_inches FROM screw_bits s JOIN products b ON b.id = s.bit
+                WHERE s.gauge = ? ORDER BY b.product_id""", (gauge,)):
+            if pilot is None:
+                results.append({'bit_id': bit, 'use': 'countersink'})
+            else:
+                results.append({'bit_id': bit, 'use': 'pilot_hole', 'pilot_inches': pilot})
+        return results
+
+def synthetic_products(products: List[Dict], copies: int) -> List[Dict]:
+    """Copies of the catalogue under new ids, to size the bundle like a full catalogue"""
+    catalogue = []
+    for i in range(copies):
+        for product in products:
+            record = dict(product)
+            for field in ('id', 'sku', 'model'):
+                if record.get(field):
+                    record[field] = f"{record[field]}-{i}"
+            catalogue.append(record)
+    return catalogue
+
+def json_bytes(data_dir: str = OUTPUT_DIR) -> int:
+    """Size of the catalogue JSON the bundle replaces"""
+    patterns = ('comprehensive_drilling_data_*.json', 'complete_hardware_data_*.json', 'products_*_*.json')
+    files = {latest_file(pattern, data_dir) for pattern in patterns}
+    return sum(os.path.getsize(f) for f in files if f)
+
+def timed_queries(bundle: OfflineBundle, queries: List[str], repeat: int = 200) -> Dict[str, float]:
+    """Median microseconds per search query"""
+    timings = {}
+    for query in queries:
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            bundle.search(query)
+            samples.append(time.perf_counter() - started)
+        timings[query] = float(np.median(samples) * 1e6)
+    return timings
+
+def report(stats: Dict, path: str, compressed: Dict[str, int]):
+    print(f"✅ Bundle {stats['version']}: {stats['rows']['products']:,} products, "
+          f"{stats['rows']['chucks']} chucks x {stats['rows']['shanks']} shanks, {stats['rows']['specs']:,} spec values "
+          f"in {stats['seconds']:.1f}s")
+    tried = ', '.join(f"{size}: {size_bytes / 1024:.0f} KB" for size, size_bytes in stats['page_sizes'].items())
+    print(f"   • Page size {stats['page_size']} ({tried})")
+    print(f"📁 {path}: {stats['bytes'] / 1024:.1f} KB")
+    for method, size in compressed.items():
+        print(f"   • {method}: {size / 1024:.1f} KB ({size / stats['bytes']:.0%})")
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the offline SQLite catalogue bundle for the app')
+    commands = parser.add_subparsers(dest='command', required=True)
+    command = commands.add_parser('build', help='Write a bundle from the latest product data')
+    command.add_argument('--page-size', type=int, choices=PAGE_SIZES, help='Skip page size tuning')
+    command.add_argument('--compression', choices=('gzip', 'xz', 'none'), default='gzip')
+    command = commands.add_parser('search', help='Search the latest bundle')
+    command.add_argument('queries', nargs='+')
+    command = commands.add_parser('benchmark', help='Size and query latency at catalogue scale')
+    command.add_argument('--copies', type=int, default=500, help='Copies of the catalogue to bundle')
+    args = parser.parse_args()
+
+    if args.command == 'search':
+        bundle = OfflineBundle.latest()
+        if not bundle:
+            print("No offline bundle found. Run: python offline_bundle.py build")
+            return
+        for query in args.queries:
+            started = time.perf_counter()
+            results = bundle.search(query)
+            print(f"🔎 {query!r} ({(time.perf_counter() - started) * 1e6:.0f} µs)")
+            for result in results:
+                print(f"   • {result['id']:<12} {result['score']:>8} {result['name']}")
+            if not results:
+                print("   • no match")
+        return
+
+    products = load_products()
+    if not products:
+        print("No product data found. Run comprehensive_drill_data.py or working_scraper.py first.")
+        return
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    if args.command == 'build':
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        path = os.path.join(OUTPUT_DIR, f'offline_bundle_{timestamp}.db')
+        stats = write_bundle(path, products, args.page_size)
+        compressed = {}
+        if args.compression != 'none':
+            target = compress(path, args.compression)
+            compressed[os.path.basename(target)] = os.path.getsize(target)
+        report(stats, path, compressed)
+        print(f"   • Catalogue JSON: {json_bytes() / 1024:.1f} KB")
+        return
+
+    catalogue = synthetic_products(products, args.copies)
+    # Outside OUTPUT_DIR, so OfflineBundle.latest() never picks up the benchmark bundle
+    work_dir = tempfile.mkdtemp(prefix='offline_bundle_benchmark_')
+    try:
+        path = os.path.join(work_dir, 'offline_bundle.db')
+        stats = write_bundle(path, catalogue)
+        # Copies of the same text compress far better than a real catalogue, so only the raw size is shown
+        report(stats, path, {})
+        print(f"   • {stats['bytes'] / len(catalogue):.0f} bytes per product")
+
+        bundle = OfflineBundle(path)
+        try:
+            queries = ['dewalt drill', 'milwaukee m18 fuel impact', 'masonry bit', 'cordless dri', 'hex shank']
+            print("\n⏱️  Median search latency:")
+            for query, micros in timed_queries(bundle, queries).items():
+                print(f"   • {query!r}: {micros:.0f} µs")
+            drill = bundle.conn.execute('SELECT product_id FROM products WHERE chuck IS NOT NULL').fetchone()
+            if drill:
+                started = time.perf_counter()
+                fits = bundle.bits_for_drill(drill[0])
+                print(f"   • bits for {drill[0]}: {len(fits)} in {(time.perf_counter() - started) * 1e6:.0f} µs")
+        finally:
+            bundle.conn.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
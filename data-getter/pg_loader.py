@@ -0,0 +1,539 @@
+#!/usr/bin/env python3
+"""
+Postgres Bulk Loader
+
+Loads data-getter outputs into the core-service database without going
+through `POST /api/products` one item at a time:
+
+- products: records from the data/ JSON and JSONL outputs are mapped onto the
+  `products` table created in backend/core-service/src/database/connection.js;
+- chunk embeddings: vectors written by embedding.py go into
+  `knowledge_embeddings` (pgvector when the extension is available);
+- chunk diffs: chunk_diff.py diffs are applied in publish order, and the
+  ones applied are recorded in `chunk_diffs_applied`.
+
+Rows are streamed in batches with COPY into a temporary staging table, then
+merged into the target table by one INSERT ... ON CONFLICT statement, all in
+a single transaction. Needs psycopg2 (`pip install psycopg2-binary`).
+"""
+
+import argparse
+import io
+import json
+import os
+import struct
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from catalogue import load_products
+from chunk_diff import list_diffs
+from config import DATABASE_URL
+from embedding import DEFAULT_DIM, HashingEmbedder, chunk_text, latest_embeddings, load_chunk_files, load_embeddings
+from inventory_matrix import stock_level
+
+BATCH_SIZE = 10000
+
+# Mirrors createTables() in backend/core-service/src/database/connection.js
+PRODUCTS_DDL = """
+CREATE TABLE IF NOT EXISTS products (
+    id SERIAL PRIMARY KEY,
+    sku VARCHAR(50) UNIQUE NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    description TEXT,
+    category VARCHAR(100),
+    price DECIMAL(10,2),
+    availability BOOLEAN DEFAULT true,
+    store_location VARCHAR(100),
+    image_url VARCHAR(500),
+    compatibility TEXT[],
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+PRODUCT_COLUMNS = ('sku', 'name', 'description', 'category', 'price', 'availability',
+                   'store_location', 'image_url', 'compatibility')
+
+# Fields a record may leave out without clearing what is already stored
+KEEP_EXISTING = ('description', 'category', 'price', 'store_location', 'image_url', 'compatibility')
+
+# The statement behind POST /api/products (backend/core-service/src/routes/products.js)
+INSERT_PRODUCT_SQL = f"""
+INSERT INTO products ({', '.join(PRODUCT_COLUMNS)})
+VALUES ({', '.join(['%s'] * len(PRODUCT_COLUMNS))})
+"""
+
+CHUNK_COLUMNS = ('chunk_id', 'content', 'embedding', 'metadata', 'chunk_index')
+
+# Diffs already in knowledge_embeddings, so `pg_loader.py diff` only applies newer ones
+DIFFS_DDL = """
+CREATE TABLE IF NOT EXISTS chunk_diffs_applied (
+    name VARCHAR(255) PRIMARY KEY,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+def connect(database_url: Optional[str]):
+    try:
+        import psycopg2
+    except ImportError:
+        raise RuntimeError("psycopg2 is not installed. Run: pip install psycopg2-binary")
+    if not database_url:
+        raise RuntimeError("No database configured. Set DATABASE_URL or pass --database-url.")
+    return psycopg2.connect(database_url)
+
+def iter_records(path: str) -> Iterator[Dict]:
+    """Product records from a JSON or JSONL output file, read lazily for JSONL"""
+    if path.endswith('.jsonl'):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # partial last line of an interrupted crawl
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        for key in ('products', 'drills', 'drill_bits'):
+            yield from data.get(key, [])
+    else:
+        yield from data
+
+def to_price(value) -> Optional[float]:
+    if value in (None, ''):
+        return None
+    try:
+        return round(float(str(value).replace('$', '').replace(',', '')), 2)
+    except ValueError:
+        return None
+
+def to_availability(record: Dict) -> bool:
+    """Products are available unless the record says otherwise (the column default)"""
+    availability = record.get('availability')
+    if isinstance(availability, bool):
+        return availability
+    if availability in (None, '') and record.get('quantity') is None:
+        return True
+    return stock_level(record.get('quantity'), availability) != 0
+
+def product_row(record: Dict) -> Optional[tuple]:
+    """A `products` row for a record, or None when it has no usable SKU or name"""
+    sku = str(record.get('sku') or record.get('model') or record.get('id') or '').strip()
+    name = str(record.get('name') or '').strip()
+    if not sku or len(sku) > 50 or not name:
+        return None
+
+    images = record.get('images') or []
+    image_url = record.get('image_url') or (images[0] if images else None)
+    if isinstance(image_url, dict):
+        image_url = image_url.get('url')
+    if image_url and len(image_url) > 500:
+        image_url = None
+
+    compatibility = record.get('compatibility')
+    if not isinstance(compatibility, list):
+        compatibility = None
+    category = record.get('subcategory') or record.get('category')
+
+    return (
+        sku,
+        name[:255],
+        record.get('description') or None,
+        str(category)[:100] if category else None,
+        to_price(record.get('price')),
+        to_availability(record),
+        record.get('store_location') or None,
+        image_url or None,
+        [str(value) for value in compatibility] if compatibility is not None else None,
+    )
+
+def copy_value(value) -> str:
+    """A value in COPY text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, list):
+        value = '{' + ','.join('"' + str(v).replace('\\', '\\\\').replace('"', '\\"') + '"' for v in value) + '}'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+# Binary COPY framing: signature, flags, header extension length ... trailer
+BINARY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+BINARY_TRAILER = struct.pack('>h', -1)
+
+def binary_row(fields: tuple) -> bytes:
+    """A row in binary COPY format from already-encoded field values (None for NULL)"""
+    parts = [struct.pack('>h', len(fields))]
+    for field in fields:
+        parts.append(struct.pack('>i', -1) if field is None else struct.pack('>i', len(field)) + field)
+    return b''.join(parts)
+
+def copy_rows(cursor, table: str, columns: Iterable[str], rows: Iterable[tuple],
+              batch_size: int = BATCH_SIZE, binary: bool = False) -> int:
+    """COPY rows into a table in batches; returns the number of rows copied
+
+    Text rows are tuples of Python values; binary rows are tuples of encoded
+    fields, which skips formatting and parsing numbers as text.
+    """
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN" + (" WITH (FORMAT binary)" if binary else '')
+    total = 0
+    pending = []
+
+    def flush():
+        if binary:
+            buffer = io.BytesIO(BINARY_HEADER + b''.join(pending) + BINARY_TRAILER)
+        else:
+            buffer = io.StringIO(''.join(pending))
+        cursor.copy_expert(sql, buffer)
+
+    for row in rows:
+        pending.append(binary_row(row) if binary else '\t'.join(map(copy_value, row)) + '\n')
+        if len(pending) == batch_size:
+            flush()
+            total += len(pending)
+            pending = []
+    if pending:
+        flush()
+        total += len(pending)
+    return total
+
+def merge_sql(table: str, columns: Iterable[str], key: str, keep_existing: Iterable[str] = ()) -> str:
+    """Upsert the staging rows (first row per key wins) and count inserts and updates"""
+    columns = list(columns)
+    updated = [c for c in columns if c != key]
+    values = [f'COALESCE(EXCLUDED.{c}, {table}.{c})' if c in keep_existing else f'EXCLUDED.{c}'
+              for c in updated]
+    assignments = ', '.join(f'{c} = {value}' for c, value in zip(updated, values))
+    column_list = ', '.join(columns)
+    # Unchanged rows are skipped, so re-loading the same data writes nothing
+    return f"""
+        WITH merged AS (
+            INSERT INTO {table} ({column_list})
+            SELECT DISTINCT ON ({key}) {column_list} FROM {table}_staging ORDER BY {key}, staging_seq
+            ON CONFLICT ({key}) DO UPDATE SET {assignments}, updated_at = CURRENT_TIMESTAMP
+            WHERE ({', '.join(f'{table}.{c}' for c in updated)}) IS DISTINCT FROM ({', '.join(values)})
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted),
+               (SELECT count(DISTINCT {key}) FROM {table}_staging)
+        FROM merged
+    """
+
+def stage_and_merge(conn, table: str, columns: Iterable[str], key: str, rows: Iterable[tuple],
+                    keep_existing: Iterable[str] = (), batch_size: int = BATCH_SIZE, binary: bool = False) -> Dict:
+    columns = list(columns)
+    with conn.cursor() as cursor:
+        cursor.execute(f"""
+            CREATE TEMP TABLE {table}_staging ON COMMIT DROP AS
+            SELECT {', '.join(columns)} FROM {table} WITH NO DATA
+        """)
+        cursor.execute(f"ALTER TABLE {table}_staging ADD COLUMN staging_seq BIGSERIAL")
+        staged = copy_rows(cursor, f'{table}_staging', columns, rows, batch_size, binary)
+        cursor.execute(merge_sql(table, columns, key, keep_existing))
+        inserted, updated, distinct = cursor.fetchone()
+    conn.commit()
+    return {'staged': staged, 'inserted': inserted, 'updated': updated,
+            'unchanged': distinct - inserted - updated, 'duplicates': staged - distinct}
+
+def load_products_table(conn, records: Iterable[Dict], batch_size: int = BATCH_SIZE) -> Dict:
+    """Upsert product records into `products` by SKU"""
+    with conn.cursor() as cursor:
+        cursor.execute(PRODUCTS_DDL)
+    skipped = 0
+
+    def rows():
+        nonlocal skipped
+        for record in records:
+            row = product_row(record)
+            if row is None:
+                skipped += 1
+            else:
+                yield row
+
+    stats = stage_and_merge(conn, 'products', PRODUCT_COLUMNS, 'sku', rows(), KEEP_EXISTING, batch_size)
+    stats['skipped'] = skipped
+    return stats
+
+def ensure_embeddings_table(conn, dim: int) -> str:
+    """Create knowledge_embeddings if needed; returns the embedding column type"""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'vector'")
+        if cursor.fetchone():
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS vector")
+            column_type = f'vector({dim})'
+        else:
+            column_type = 'REAL[]'
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS knowledge_embeddings (
+                id SERIAL PRIMARY KEY,
+                chunk_id VARCHAR(255) NOT NULL,
+                content TEXT,
+                embedding {column_type},
+                metadata JSONB,
+                chunk_index INTEGER,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        # Tables created from the architecture doc's schema lack these columns
+        cursor.execute("ALTER TABLE knowledge_embeddings ADD COLUMN IF NOT EXISTS chunk_id VARCHAR(255)")
+        cursor.execute("ALTER TABLE knowledge_embeddings ADD COLUMN IF NOT EXISTS "
+                       "updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_knowledge_embeddings_chunk_id
+            ON knowledge_embeddings (chunk_id)
+        """)
+        cursor.execute("""
+            SELECT format_type(atttypid, atttypmod) FROM pg_attribute
+            WHERE attrelid = 'knowledge_embeddings'::regclass AND attname = 'embedding'
+        """)
+        existing = cursor.fetchone()[0]
+    if existing.startswith('vector') and existing != f'vector({dim})':
+        raise ValueError(f"knowledge_embeddings stores {existing}, the embeddings have {dim} dimensions")
+    conn.commit()
+    return existing
+
+def format_vector(vector: np.ndarray) -> str:
+    return '{' + ','.join(map('{:.7g}'.format, vector.tolist())) + '}'
+
+def encode_vector(vector: np.ndarray) -> bytes:
+    """pgvector's binary format: dimensions, an unused int16, big-endian float4 values"""
+    return struct.pack('>hh', len(vector), 0) + np.asarray(vector, dtype='>f4').tobytes()
+
+def load_embeddings_table(conn, vectors: np.ndarray, ids: List[str], chunks: Optional[Dict[str, Dict]] = None,
+                          batch_size: int = BATCH_SIZE) -> Dict:
+    """Upsert chunk vectors (and their content and metadata, when known) by chunk id"""
+    column_type = ensure_embeddings_table(conn, vectors.shape[1])
+    pgvector = column_type.startswith('vector')
+    chunks = chunks or {}
+
+    def rows():
+        for row, chunk_id in enumerate(ids):
+            chunk = chunks.get(chunk_id, {})
+            content = chunk.get('content')
+            metadata = chunk.get('metadata')
+            metadata = json.dumps(metadata, ensure_ascii=False) if metadata is not None else None
+            if not pgvector:
+                yield chunk_id, content, format_vector(vectors[row]), metadata, row
+                continue
+            # jsonb's binary format is a version byte followed by the JSON text
+            yield (chunk_id.encode('utf-8'), content.encode('utf-8') if content is not None else None,
+                   encode_vector(vectors[row]), b'\x01' + metadata.encode('utf-8') if metadata else None,
+                   struct.pack('>i', row))
+
+    return stage_and_merge(conn, 'knowledge_embeddings', CHUNK_COLUMNS, 'chunk_id', rows(),
+                           ('content', 'metadata'), batch_size, binary=pgvector)
+
+def diff_vectors(path: str, diff: Dict):
+    """(vectors, ids) of a diff's upserts; embedded here when it was published without --embed"""
+    if os.path.exists(os.path.join(path, 'vectors.npy')):
+        vectors, manifest = load_embeddings(path)
+        return vectors, manifest['ids']
+    model = diff.get('model') or f'hashing-{DEFAULT_DIM}'
+    if not model.startswith('hashing-'):
+        raise RuntimeError(f"{path} has no embeddings and {model} is not available here; "
+                           f"re-publish with: python chunk_diff.py publish --embed --full")
+    embedder = HashingEmbedder(int(model.split('-')[1]))
+    return embedder.embed([chunk_text(chunk) for chunk in diff['upsert']]), [chunk['id'] for chunk in diff['upsert']]
+
+def applied_diffs(conn) -> set:
+    """Names of the chunk diffs already applied to this database"""
+    with conn.cursor() as cursor:
+        cursor.execute(DIFFS_DDL)
+        cursor.execute("SELECT name FROM chunk_diffs_applied")
+        names = {row[0] for row in cursor.fetchall()}
+    conn.commit()
+    return names
+
+def apply_diff(conn, path: str, batch_size: int = BATCH_SIZE) -> Dict:
+    """Apply a chunk_diff.py diff to knowledge_embeddings: upsert its vectors, delete its tombstones"""
+    with open(os.path.join(path, 'diff.json'), 'r', encoding='utf-8') as f:
+        diff = json.load(f)
+    stats = {'staged': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'duplicates': 0}
+    if diff['upsert']:
+        vectors, ids = diff_vectors(path, diff)
+        stats = load_embeddings_table(conn, vectors, ids, {chunk['id']: chunk for chunk in diff['upsert']},
+                                      batch_size)
+    stats['deleted'] = 0
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass('knowledge_embeddings')")
+        if diff['delete'] and cursor.fetchone()[0]:
+            cursor.execute("DELETE FROM knowledge_embeddings WHERE chunk_id = ANY(%s)", (diff['delete'],))
+            stats['deleted'] = cursor.rowcount
+        # Recorded last: a diff interrupted before this is applied again, which is harmless
+        cursor.execute(DIFFS_DDL)
+        cursor.execute("INSERT INTO chunk_diffs_applied (name) VALUES (%s) ON CONFLICT (name) DO NOTHING",
+                       (os.path.basename(os.path.normpath(path)),))
+    conn.commit()
+    return stats
+
+def insert_one_by_one(conn, records: Iterable[Dict]) -> int:
+    """The per-item path: one autocommitted INSERT per product, as POST /api/products does"""
+    conn.autocommit = True
+    count = 0
+    with conn.cursor() as cursor:
+        for record in records:
+            row = product_row(record)
+            if row:
+                cursor.execute(INSERT_PRODUCT_SQL, row)
+                count += 1
+    conn.autocommit = False
+    return count
+
+def post_one_by_one(records: Iterable[Dict], base_url: str) -> int:
+    """POST each product to a running core-service"""
+    import requests
+    session = requests.Session()
+    count = 0
+    for record in records:
+        row = product_row(record)
+        if not row:
+            continue
+        body = dict(zip(('sku', 'name', 'description', 'category', 'price', 'availability',
+                         'storeLocation', 'imageUrl', 'compatibility'), row))
+        body['compatibility'] = body['compatibility'] or []
+        session.post(f"{base_url.rstrip('/')}/api/products", json=body, timeout=30).raise_for_status()
+        count += 1
+    return count
+
+def synthetic_products(n: int, offset: int = 0) -> List[Dict]:
+    return [{'sku': f'BENCH{offset + i:08d}', 'name': f'Benchmark Drill {i}', 'category': 'Power Tools',
+             'description': f'Cordless drill number {i}\twith a tab, a "quote" and a \\ backslash.',
+             'price': f'${100 + i % 500}.99', 'availability': 'In Stock' if i % 7 else 'Out of Stock',
+             'images': [f'https://example.com/images/{i}.jpg'], 'compatibility': [f'BIT{i % 50}', 'DCB205']}
+            for i in range(n)]
+
+def rate(count: int, seconds: float) -> str:
+    return f"{count / seconds:,.0f} rows/s" if seconds else 'n/a'
+
+def benchmark(args):
+    conn = connect(args.database_url)
+    with conn.cursor() as cursor:
+        cursor.execute("DROP SCHEMA IF EXISTS loader_benchmark CASCADE")
+        cursor.execute("CREATE SCHEMA loader_benchmark")
+        cursor.execute("SET search_path TO loader_benchmark, public")
+    conn.commit()
+
+    try:
+        records = synthetic_products(args.rows)
+        print(f"⏱️  {args.rows} products, batches of {args.batch_size}...")
+        started = time.perf_counter()
+        stats = load_products_table(conn, records, args.batch_size)
+        copy_seconds = time.perf_counter() - started
+        print(f"   • COPY + merge (insert): {rate(stats['inserted'], copy_seconds)}")
+
+        for record in records[::2]:
+            record['price'] = '$1.00'
+        started = time.perf_counter()
+        stats = load_products_table(conn, records, args.batch_size)
+        print(f"   • COPY + merge (re-load, {stats['updated']} updated): "
+              f"{rate(stats['staged'], time.perf_counter() - started)}")
+
+        per_item = synthetic_products(args.per_item_rows, offset=args.rows)
+        started = time.perf_counter()
+        count = insert_one_by_one(conn, per_item)
+        sql_seconds = time.perf_counter() - started
+        print(f"   • One INSERT per item (the POST handler's statement, no HTTP): {rate(count, sql_seconds)}")
+
+        if args.http:
+            per_item = synthetic_products(args.per_item_rows, offset=args.rows * 2)
+            started = time.perf_counter()
+            count = post_one_by_one(per_item, args.http)
+            print(f"   • POST /api/products per item: {rate(count, time.perf_counter() - started)}")
+
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((args.chunks, args.dim)).astype(np.float32)
+        ids = [f'chunk_{i}' for i in range(args.chunks)]
+        started = time.perf_counter()
+        stats = load_embeddings_table(conn, vectors, ids, batch_size=args.batch_size)
+        print(f"   • Chunk embeddings ({args.dim} dimensions): "
+              f"{rate(stats['inserted'], time.perf_counter() - started)}")
+        print(f"✅ COPY loads {args.rows / copy_seconds / (count / sql_seconds):.0f}x faster than one INSERT per item")
+    finally:
+        conn.rollback()
+        with conn.cursor() as cursor:
+            cursor.execute("DROP SCHEMA IF EXISTS loader_benchmark CASCADE")
+        conn.commit()
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk load data-getter outputs into the core-service database')
+    parser.add_argument('--database-url', default=DATABASE_URL, help='Postgres URL (default: $DATABASE_URL)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows per COPY batch')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('products', help='Upsert products into the products table')
+    command.add_argument('files', nargs='*', help='JSON/JSONL product files (default: latest curated and scraped data)')
+    command = commands.add_parser('embeddings', help='Upsert chunk embeddings into knowledge_embeddings')
+    command.add_argument('path', nargs='?', help='Embedding directory (default: latest chunk_embeddings_*)')
+    command = commands.add_parser('diff', help='Apply chunk_diff.py diffs to knowledge_embeddings')
+    command.add_argument('paths', nargs='*', help='Diff directories, oldest first (default: every diff not applied yet)')
+    command = commands.add_parser('benchmark', help='COPY loading against one INSERT per item')
+    command.add_argument('--rows', type=int, default=50000)
+    command.add_argument('--per-item-rows', type=int, default=2000)
+    command.add_argument('--chunks', type=int, default=10000)
+    command.add_argument('--dim', type=int, default=1536)
+    command.add_argument('--http', help='core-service base URL, to also time POST /api/products')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'benchmark':
+            benchmark(args)
+            return
+        conn = connect(args.database_url)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return
+
+    started = time.perf_counter()
+    if args.command == 'products':
+        if args.files:
+            records = (record for path in args.files for record in iter_records(path))
+        else:
+            records = load_products()
+        print("📦 Loading products...")
+        stats = load_products_table(conn, records, args.batch_size)
+        print(f"   • Skipped {stats['skipped']} records without a SKU (50 characters max) or name")
+    elif args.command == 'diff':
+        paths = args.paths
+        if not paths:
+            diffs = list_diffs()
+            if not diffs:
+                print("No chunk diffs found. Run: python chunk_diff.py publish --embed")
+                return
+            applied = applied_diffs(conn)
+            paths = [path for path in diffs if os.path.basename(path) not in applied]
+            if not paths:
+                print(f"✅ All {len(diffs)} chunk diffs are already applied")
+                return
+        for path in paths:
+            try:
+                stats = apply_diff(conn, path, args.batch_size)
+            except (RuntimeError, ValueError) as e:
+                conn.rollback()
+                print(f"❌ {e}")
+                break
+            print(f"🔁 {os.path.basename(path)}: {stats['inserted']} inserted, {stats['updated']} updated, "
+                  f"{stats['deleted']} deleted")
+        conn.close()
+        return
+    else:
+        path = args.path or latest_embeddings()
+        if not path:
+            print("No chunk embeddings found. Run embedding.py first.")
+            return
+        vectors, manifest = load_embeddings(path)
+        chunks = {chunk['id']: chunk for chunk in load_chunk_files()}
+        print(f"🧮 Loading {len(vectors)} chunk embeddings from {path}...")
+        stats = load_embeddings_table(conn, vectors, manifest['ids'], chunks, args.batch_size)
+    elapsed = time.perf_counter() - started
+    conn.close()
+
+    print(f"✅ {stats['staged']} rows: {stats['inserted']} inserted, {stats['updated']} updated, "
+          f"{stats['unchanged']} unchanged, {stats['duplicates']} duplicate keys ({rate(stats['staged'], elapsed)})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+Price History Store
+
+Append-only price and availability history per site, keyed by SKU (or the
+product URL when a product has no SKU). Only changes are stored: a row means
+"from this time on, the product cost this much and had this availability".
+
+Each crawl appends one immutable segment file under data/price_history/<site>/.
+A segment holds its rows sorted by (SKU, time) as compressed columns:
+
+    key           run-length encoded index into the segment's SKU list
+    time          delta-encoded epoch seconds
+    price         delta-encoded cents (-1 when unknown)
+    availability  run-length encoded index into the availability dictionary
+
+Integers are narrowed to the smallest dtype that fits before compression, so
+a year of daily refreshes costs a few bytes per price change. Segment headers
+carry their time range and SKU list, so range queries, latest-price lookups
+and "changed since" scans only decode the segments that can match.
+"""
+
+import argparse
+import glob
+import json
+import os
+import struct
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from catalogue import load_json
+from config import OUTPUT_DIR
+
+PRICE_HISTORY_DIR = os.path.join(OUTPUT_DIR, 'price_history')
+
+MAGIC = b'PHS1'
+MISSING_PRICE = -1
+INT_DTYPES = (np.int8, np.int16, np.int32, np.int64)
+
+def to_timestamp(value) -> Optional[int]:
+    """Epoch seconds from a number or an ISO datetime (naive values are local time)"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(datetime.fromisoformat(str(value).strip().replace('Z', '+00:00')).timestamp())
+    except ValueError:
+        return None
+
+def to_cents(price) -> int:
+    if price is None or price == '':
+        return MISSING_PRICE
+    try:
+        return int(round(float(price) * 100))
+    except (TypeError, ValueError):
+        return MISSING_PRICE
+
+def from_cents(cents) -> Optional[float]:
+    return None if cents == MISSING_PRICE else int(cents) / 100
+
+def narrow(values: np.ndarray) -> np.ndarray:
+    """Cast integers to the smallest signed dtype that holds them"""
+    if not len(values):
+        return values.astype(np.int8)
+    low, high = values.min(), values.max()
+    for dtype in INT_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return values.astype(dtype)
+    return values
+
+def delta_encode(values: np.ndarray) -> np.ndarray:
+    return narrow(np.diff(values.astype(np.int64), prepend=0))
+
+def delta_decode(deltas: np.ndarray) -> np.ndarray:
+    return np.cumsum(deltas.astype(np.int64))
+
+def run_length_encode(values: np.ndarray):
+    """Return (run values, run lengths)"""
+    if not len(values):
+        return values, np.zeros(0, dtype=np.int64)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(values)) + 1))
+    lengths = np.diff(np.concatenate((starts, [len(values)])))
+    return values[starts], lengths
+
+def run_length_decode(values: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    return np.repeat(values, lengths)
+
+def write_segment(path: str, run_id: str, keys: List[str], availability: List, columns: Dict) -> int:
+    """Write sorted columns (key, time, price, availability codes) to a segment file"""
+    key_values, key_lengths = run_length_encode(columns['key'])
+    availability_values, availability_lengths = run_length_encode(columns['availability'])
+    arrays = {
+        'key_values': delta_encode(key_values),
+        'key_lengths': narrow(key_lengths),
+        'time': delta_encode(columns['time']),
+        'price': delta_encode(columns['price']),
+        'availability_values': narrow(availability_values),
+        'availability_lengths': narrow(availability_lengths),
+    }
+
+    blobs = []
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        blob = zlib.compress(array.tobytes(), 9)
+        layout[name] = {'dtype': array.dtype.str, 'offset': offset, 'length': len(blob)}
+        blobs.append(blob)
+        offset += len(blob)
+
+    header = json.dumps({
+        'run_id': run_id,
+        'rows': int(len(columns['time'])),
+        'min_time': int(columns['time'].min()),
+        'max_time': int(columns['time'].max()),
+        'keys': keys,
+        'availability': availability,
+        'columns': layout,
+    }, ensure_ascii=False).encode('utf-8')
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(header)) + header)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+class Segment:
+    """One immutable segment file; columns are decoded on first use"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(4) != MAGIC:
+                raise ValueError(f"Not a price history segment: {path}")
+            size, = struct.unpack('<I', f.read(4))
+            self.header = json.loads(f.read(size))
+        self.data_offset = 8 + size
+        self.keys = self.header['keys']
+        self.key_set = set(self.keys)
+        self._columns = None
+
+    def overlaps(self, start: Optional[int] = None, end: Optional[int] = None) -> bool:
+        return ((start is None or self.header['max_time'] >= start)
+                and (end is None or self.header['min_time'] <= end))
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        if self._columns is None:
+            with open(self.path, 'rb') as f:
+                f.seek(self.data_offset)
+                data = f.read()
+            arrays = {}
+            for name, spec in self.header['columns'].items():
+                blob = data[spec['offset']:spec['offset'] + spec['length']]
+                arrays[name] = np.frombuffer(zlib.decompress(blob), dtype=np.dtype(spec['dtype']))
+            self._columns = {
+                'key': run_length_decode(delta_decode(arrays['key_values']), arrays['key_lengths']),
+                'time': delta_decode(arrays['time']),
+                'price': delta_decode(arrays['price']),
+                'availability': run_length_decode(arrays['availability_values'],
+                                                  arrays['availability_lengths']),
+            }
+        return self._columns
+
+    def rows(self, keys: Optional[Iterable[str]] = None, start: Optional[int] = None,
+             end: Optional[int] = None) -> Iterable[Dict]:
+        """Rows matching optional SKUs and an inclusive time range"""
+        columns = self.columns()
+        mask = np.ones(len(columns['time']), dtype=bool)
+        if keys is not None:
+            keys = set(keys)
+            codes = [i for i, key in enumerate(self.keys) if key in keys]
+            mask &= np.isin(columns['key'], codes)
+        if start is not None:
+            mask &= columns['time'] >= start
+        if end is not None:
+            mask &= columns['time'] <= end
+        availability = self.header['availability']
+        for i in np.flatnonzero(mask):
+            yield {
+                'sku': self.keys[columns['key'][i]],
+                'time': int(columns['time'][i]),
+                'price': from_cents(columns['price'][i]),
+                'availability': availability[columns['availability'][i]],
+            }
+
+    def last_rows(self) -> Iterable[Dict]:
+        """The newest row of every SKU in the segment"""
+        columns = self.columns()
+        ends = np.flatnonzero(np.diff(np.append(columns['key'], -1)))
+        availability = self.header['availability']
+        for i in ends:
+            yield {
+                'sku': self.keys[columns['key'][i]],
+                'time': int(columns['time'][i]),
+                'price': from_cents(columns['price'][i]),
+                'availability': availability[columns['availability'][i]],
+            }
+
+class PriceHistory:
+    """Append-only price/availability history for all sites"""
+
+    def __init__(self, directory: str = PRICE_HISTORY_DIR):
+        self.directory = directory
+        self._segments = {}
+
+    def site_dir(self, site: str) -> str:
+        return os.path.join(self.directory, site)
+
+    def segments(self, site: str) -> List[Segment]:
+        """Segments of a site, oldest first (cached; refreshed when files change)"""
+        paths = sorted(glob.glob(os.path.join(self.site_dir(site), '*.phs')))
+        cached = self._segments.get(site, {})
+        self._segments[site] = {path: cached.get(path) or Segment(path) for path in paths}
+        return list(self._segments[site].values())
+
+    def latest(self, site: str, skus: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+        """Current price and availability per SKU, with the time it took effect"""
+        wanted = set(skus) if skus is not None else None
+        latest = {}
+        for segment in self.segments(site):
+            if wanted is not None and not (wanted & segment.key_set):
+                continue
+            for row in segment.last_rows():
+                if wanted is not None and row['sku'] not in wanted:
+                    continue
+                if row['sku'] not in latest or row['time'] >= latest[row['sku']]['time']:
+                    latest[row['sku']] = row
+        return latest
+
+    def history(self, site: str, sku: str, start=None, end=None) -> List[Dict]:
+        """Changes of one SKU within an optional time range, oldest first
+
+        The row in effect at `start` is included, so the range is fully covered.
+        """
+        start, end = to_timestamp(start), to_timestamp(end)
+        rows = []
+        for segment in self.segments(site):
+            if sku in segment.key_set and segment.overlaps(None, end):
+                rows.extend(segment.rows([sku], None, end))
+        rows.sort(key=lambda row: row['time'])
+        if start is not None:
+            before = [row for row in rows if row['time'] < start]
+            rows = before[-1:] + [row for row in rows if row['time'] >= start]
+        return rows
+
+    def changed_since(self, site: str, since) -> List[Dict]:
+        """Every change made at or after `since`, with the value it replaced"""
+        since = to_timestamp(since)
+        segments = self.segments(site)
+        changed = set()
+        for segment in segments:
+            if segment.overlaps(since, None):
+                changed.update(row['sku'] for row in segment.rows(None, since, None))
+        if not changed:
+            return []
+
+        by_sku = {}
+        for segment in segments:
+            if changed & segment.key_set:
+                for row in segment.rows(changed):
+                    by_sku.setdefault(row['sku'], []).append(row)
+
+        changes = []
+        for sku, rows in by_sku.items():
+            rows.sort(key=lambda row: row['time'])
+            previous = {}
+            for row in rows:
+                if row['time'] >= since:
+                    changes.append(dict(row, previous_price=previous.get('price'),
+                                        previous_availability=previous.get('availability')))
+                previous = row
+        changes.sort(key=lambda row: (row['time'], row['sku']))
+        return changes
+
+    def append(self, site: str, observations: Iterable[Dict], run_id: Optional[str] = None) -> Optional[str]:
+        """Store the observations that change a SKU's price or availability
+
+        Observations are dicts with 'sku', 'price', 'availability' and 'time'
+        (epoch seconds or ISO). Anything not newer than the SKU's latest
+        stored row is ignored: history is appended to, never rewritten.
+        Returns the new segment path, or None when nothing changed.
+        """
+        latest = self.latest(site)
+        rows = sorted(
+            (row for row in (normalize_observation(o) for o in observations) if row),
+            key=lambda row: (row['sku'], row['time']),
+        )
+
+        changes = []
+        for row in rows:
+            previous = latest.get(row['sku'])
+            if previous and row['time'] <= previous['time']:
+                continue
+            if previous and (to_cents(previous['price']), previous['availability']) == \
+                    (row['cents'], row['availability']):
+                continue
+            changes.append(row)
+            latest[row['sku']] = {'time': row['time'], 'price': from_cents(row['cents']),
+                                  'availability': row['availability']}
+        if not changes:
+            return None
+
+        os.makedirs(self.site_dir(site), exist_ok=True)
+        run_id = run_id or datetime.now().strftime('%Y%m%d_%H%M%S')
+        path = os.path.join(self.site_dir(site), f'{run_id}.phs')
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self.site_dir(site), f'{run_id}_{suffix}.phs')
+            suffix += 1
+        self.write(path, run_id, changes)
+        return path
+
+    def write(self, path: str, run_id: str, rows: List[Dict]) -> int:
+        """Write rows sorted by (sku, time) as one segment"""
+        keys = sorted({row['sku'] for row in rows})
+        key_codes = {key: i for i, key in enumerate(keys)}
+        availability = sorted({row['availability'] for row in rows}, key=lambda a: (a is not None, a or ''))
+        availability_codes = {value: i for i, value in enumerate(availability)}
+        columns = {
+            'key': np.array([key_codes[row['sku']] for row in rows], dtype=np.int64),
+            'time': np.array([row['time'] for row in rows], dtype=np.int64),
+            'price': np.array([row['cents'] for row in rows], dtype=np.int64),
+            'availability': np.array([availability_codes[row['availability']] for row in rows], dtype=np.int64),
+        }
+        return write_segment(path, run_id, keys, availability, columns)
+
+    def compact(self, site: str) -> Optional[str]:
+        """Merge all segments of a site into one, dropping rows that change nothing"""
+        segments = self.segments(site)
+        if len(segments) < 2:
+            return None
+        rows = []
+        for segment in segments:
+            rows.extend(segment.rows())
+        rows.sort(key=lambda row: (row['sku'], row['time']))
+
+        merged = []
+        for row in rows:
+            row = {'sku': row['sku'], 'time': row['time'], 'cents': to_cents(row['price']),
+                   'availability': row['availability']}
+            previous = merged[-1] if merged and merged[-1]['sku'] == row['sku'] else None
+            if previous and (previous['cents'], previous['availability']) == (row['cents'], row['availability']):
+                continue
+            merged.append(row)
+
+        # Named after the newest run so later appends still sort after it
+        run_id = os.path.splitext(os.path.basename(segments[-1].path))[0].split('~')[0]
+        path = os.path.join(self.site_dir(site), f'{run_id}~compacted.phs')
+        self.write(path, run_id, merged)
+        for segment in segments:
+            if segment.path != path:
+                os.remove(segment.path)
+        self._segments.pop(site, None)
+        return path
+
+    def size(self, site: str) -> Dict:
+        segments = self.segments(site)
+        return {
+            'segments': len(segments),
+            'rows': sum(segment.header['rows'] for segment in segments),
+            'skus': len(set().union(*(segment.key_set for segment in segments))) if segments else 0,
+            'bytes': sum(os.path.getsize(segment.path) for segment in segments),
+        }
+
+def normalize_observation(observation: Dict) -> Optional[Dict]:
+    """An observation as a storable row, or None if it has no key or time"""
+    sku = observation.get('sku') or observation.get('url')
+    time = to_timestamp(observation.get('time'))
+    if not sku or time is None:
+        return None
+    availability = observation.get('availability') or None
+    return {
+        'sku': str(sku),
+        'time': time,
+        'cents': to_cents(observation.get('price')),
+        'availability': availability.strip() if isinstance(availability, str) else availability,
+    }
+
+def historical_observations(site: str, data_dir: str = OUTPUT_DIR) -> List[Dict]:
+    """Observations from every products and price delta file written so far"""
+    observations = []
+    for path in glob.glob(os.path.join(data_dir, f'products_{site}_*.json')):
+        if path.endswith('_metadata.json'):
+            continue
+        for item in load_json(path) or []:
+            observations.append({'sku': item.get('sku') or item.get('url'), 'price': item.get('price'),
+                                 'availability': item.get('availability'),
+                                 'time': item.get('scraped_at')})
+    for path in glob.glob(os.path.join(data_dir, f'price_delta_{site}_*.jsonl')):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    change = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                observations.append({'sku': change.get('sku') or change.get('url'), 'price': change.get('price'),
+                                     'availability': change.get('availability'),
+                                     'time': change.get('checked_at')})
+    return observations
+
+def format_time(timestamp: int) -> str:
+    return datetime.fromtimestamp(timestamp).isoformat(sep=' ', timespec='minutes')
+
+def main():
+    parser = argparse.ArgumentParser(description='Query and maintain the price history store')
+    parser.add_argument('--dir', default=PRICE_HISTORY_DIR, help='Price history directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('import', help='Backfill from existing products and price delta files')
+    command.add_argument('site')
+    command = commands.add_parser('history', help='Price changes of one product')
+    command.add_argument('site')
+    command.add_argument('sku')
+    command.add_argument('--start', help='ISO date or datetime')
+    command.add_argument('--end', help='ISO date or datetime')
+    command = commands.add_parser('latest', help='Current price of products')
+    command.add_argument('site')
+    command.add_argument('skus', nargs='*')
+    command = commands.add_parser('changed', help='Products whose price or availability changed')
+    command.add_argument('site')
+    command.add_argument('--since', required=True, help='ISO date or datetime')
+    command = commands.add_parser('compact', help='Merge a site\'s segments into one')
+    command.add_argument('site')
+    command = commands.add_parser('stats', help='Segment, row and size counts')
+    command.add_argument('site')
+    args = parser.parse_args()
+
+    store = PriceHistory(args.dir)
+
+    if args.command == 'import':
+        print(f"📥 Importing price history for {args.site}...")
+        observations = historical_observations(args.site)
+        path = store.append(args.site, observations, run_id='import_' + datetime.now().strftime('%Y%m%d_%H%M%S'))
+        if path:
+            print(f"✅ {len(observations)} observations -> {path}")
+        else:
+            print("No new price changes found.")
+
+    elif args.command == 'history':
+        rows = store.history(args.site, args.sku, args.start, args.end)
+        if not rows:
+            print(f"No price history for {args.sku}")
+        for row in rows:
+            print(f"{format_time(row['time'])}  {row['price']!s:>10}  {row['availability'] or ''}")
+
+    elif args.command == 'latest':
+        latest = store.latest(args.site, args.skus or None)
+        for sku, row in sorted(latest.items()):
+            print(f"{sku}  {row['price']!s:>10}  {row['availability'] or ''}  (since {format_time(row['time'])})")
+
+    elif args.command == 'changed':
+        changes = store.changed_since(args.site, args.since)
+        for row in changes:
+            print(f"{format_time(row['time'])}  {row['sku']}  {row['previous_price']} -> {row['price']}"
+                  f"  {row['previous_availability'] or ''} -> {row['availability'] or ''}")
+        print(f"📈 {len(changes)} changes since {args.since}")
+
+    elif args.command == 'compact':
+        before = store.size(args.site)
+        path = store.compact(args.site)
+        if path:
+            after = store.size(args.site)
+            print(f"✅ {before['segments']} segments ({before['bytes']} bytes) -> {path} ({after['bytes']} bytes)")
+        else:
+            print("Nothing to compact.")
+
+    elif args.command == 'stats':
+        size = store.size(args.site)
+        print(f"📊 {args.site}: {size['skus']} products, {size['rows']} price changes "
+              f"in {size['segments']} segments, {size['bytes']} bytes")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+Typo-Tolerant Product Lookup
+
+Finds products from what people actually type for a model number or name:
+"dcd771", "2853 20", "XFD-131", "milwaukee m18 fuel impact".
+
+- Keys: product id, SKU and model number, normalized like entity resolution
+  ('2853-20', '2853 20' -> '285320'). A query matches a key exactly, as a
+  prefix ("dcd771" -> DCD771C2) or within a small edit distance. Fuzzy
+  matches use a SymSpell dictionary: every string reachable from a key by
+  deleting up to MAX_DISTANCE characters points back to the key, so a query
+  only generates its own deletes and checks the keys they hit.
+- Names: the words of every product name form a prefix trie for
+  autocomplete, stored flattened as a sorted word list (each trie node is a
+  contiguous range found by bisection) with the products of each word.
+  Every query word must match a name word; the last one may be a prefix and
+  misspelled words are corrected against the same SymSpell scheme.
+
+The index is exported as a single compressed file, data/product_lookup_*.bin,
+holding the keys, names, word postings and both delete dictionaries as flat
+arrays, so loading it is decompression rather than rebuilding.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import struct
+import tempfile
+import time
+import zlib
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+from catalogue import latest_file, load_products
+from config import OUTPUT_DIR
+from entity_resolution import model_number, normalize_model, normalize_text
+from price_history import narrow
+
+MAGIC = b'PLK1'
+MAX_DISTANCE = 2
+DEFAULT_LIMIT = 10
+RANK_WINDOW = 10  # completions per result slot checked for a name that starts with the query
+
+def max_distance(text: str) -> int:
+    """Edits allowed for a query of this length; short keys are too easy to hit by accident"""
+    return 0 if len(text) <= 3 else 1 if len(text) <= 5 else MAX_DISTANCE
+
+def deletes(text: str, distance: int) -> Set[str]:
+    """The text and every string made by deleting up to 'distance' characters from it"""
+    result = {text}
+    frontier = {text}
+    for _ in range(distance):
+        frontier = {word[:i] + word[i + 1:] for word in frontier for i in range(len(word))} - result
+        result |= frontier
+    return result
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (adjacent swaps count as one edit), limit + 1 when larger"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # Candidates mostly share a long head and tail with the query; only the middle needs the table
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if not a or not b:
+        return len(a) + len(b)
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+def delete_hashes(variants: Iterable[str]) -> np.ndarray:
+    return np.array([zlib.crc32(variant.encode('utf-8')) for variant in variants], dtype=np.uint32)
+
+def build_deletes(words: List[str]):
+    """(hashes, word numbers) of every delete of every word, sorted by hash"""
+    pairs = [(variant, i) for i, word in enumerate(words) for variant in deletes(word, max_distance(word))]
+    hashes = delete_hashes(variant for variant, _ in pairs)
+    numbers = np.array([i for _, i in pairs], dtype=np.int64)
+    order = np.argsort(hashes, kind='stable')
+    return hashes[order], numbers[order]
+
+class SymSpell:
+    """Words within an edit distance of a query, via precomputed deletes
+
+    The deletes are kept as a sorted array of their CRC32 hashes beside the
+    number of the word they came from, so the dictionary loads as two arrays
+    instead of millions of Python strings. A hash collision only adds a
+    candidate, which the edit distance check then rejects.
+    """
+
+    def __init__(self, words: List[str], hashes: np.ndarray, numbers: np.ndarray):
+        self.words = words
+        self.hashes = hashes
+        self.numbers = numbers
+
+    def lookup(self, query: str, distance: Optional[int] = None) -> Dict[str, int]:
+        """word -> distance for the words within 'distance' edits of the query"""
+        distance = min(MAX_DISTANCE, max_distance(query) if distance is None else distance)
+        wanted = delete_hashes(deletes(query, distance))
+        starts = np.searchsorted(self.hashes, wanted, 'left')
+        ends = np.searchsorted(self.hashes, wanted, 'right')
+        found = {}
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            for i in self.numbers[start:end].tolist():
+                word = self.words[i]
+                if word not in found:
+                    found[word] = edit_distance(query, word, distance)
+        return {word: d for word, d in found.items() if d <= distance}
+
+def product_keys(product: Dict) -> List[str]:
+    """Normalized id, SKU and model number of a product"""
+    keys = [normalize_model(product.get(field)) for field in ('id', 'sku', 'model')]
+    keys.append(model_number(product))
+    return [key for key in dict.fromkeys(keys) if len(key) >= 2]
+
+def write_lookup(path: str, products: List[Dict]) -> int:
+    """Write the keys, names and name word postings of the products to one file"""
+    # Rows are numbered shortest name first, so sorted postings are already in ranking order
+    products = sorted(products, key=lambda p: (len(normalize_text(p.get('name'))), str(p.get('name'))))
+    ids = [str(p['id']) for p in products]
+    names = [' '.join(str(p.get('name') or p['id']).split()) for p in products]
+
+    key_postings: Dict[str, Set[int]] = {}
+    word_postings: Dict[str, Set[int]] = {}
+    for row, (product, name) in enumerate(zip(products, names)):
+        for key in product_keys(product):
+            key_postings.setdefault(key, set()).add(row)
+        for word in normalize_text(name).split():
+            word_postings.setdefault(word, set()).add(row)
+
+    texts = {'ids': ids, 'names': names}
+    arrays = {}
+    for kind, postings in (('key', key_postings), ('word', word_postings)):
+        terms = sorted(postings)
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(postings[term]) for term in terms], out=indptr[1:])
+        hashes, numbers = build_deletes(terms)
+        texts[f'{kind}s'] = terms
+        arrays[f'{kind}_indptr'] = narrow(indptr)
+        arrays[f'{kind}_rows'] = narrow(np.array([row for term in terms for row in sorted(postings[term])],
+                                                 dtype=np.int64))
+        arrays[f'{kind}_delete_hashes'] = hashes
+        arrays[f'{kind}_delete_numbers'] = narrow(numbers)
+
+    blobs = []
+    layout = {}
+    offset = 0
+    for name, value in list(texts.items()) + list(arrays.items()):
+        raw = '\n'.join(value).encode('utf-8') if name in texts else value.tobytes()
+        blob = zlib.compress(raw, 9)
+        layout[name] = {'dtype': 'text' if name in texts else value.dtype.str, 'offset': offset,
+                        'length': len(blob)}
+        blobs.append(blob)
+        offset += len(blob)
+    header = json.dumps({'created_at': datetime.now().isoformat(), 'products': len(products),
+                         'columns': layout}).encode('utf-8')
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(header)) + header)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+class ProductLookup:
+    """Key lookup and name autocomplete over a lookup file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(4) != MAGIC:
+                raise ValueError(f"Not a product lookup file: {path}")
+            size, = struct.unpack('<I', f.read(4))
+            self.header = json.loads(f.read(size))
+            data = f.read()
+        columns = {}
+        for name, spec in self.header['columns'].items():
+            raw = zlib.decompress(data[spec['offset']:spec['offset'] + spec['length']])
+            if spec['dtype'] == 'text':
+                columns[name] = raw.decode('utf-8').split('\n') if raw else []
+            else:
+                values = np.frombuffer(raw, dtype=np.dtype(spec['dtype']))
+                columns[name] = values if name.endswith('_hashes') else values.astype(np.int64)
+
+        self.ids = columns['ids']
+        self.names = columns['names']
+        self.name_text = [normalize_text(name) for name in self.names]
+        self.keys = columns['keys']
+        self.key_numbers = {key: i for i, key in enumerate(self.keys)}
+        self.key_indptr = columns['key_indptr']
+        self.key_rows = columns['key_rows']
+        self.words = columns['words']
+        self.word_indptr = columns['word_indptr']
+        self.word_rows = columns['word_rows']
+        self.longest_key = max(map(len, self.keys), default=0)
+        self.key_index = SymSpell(self.keys, columns['key_delete_hashes'], columns['key_delete_numbers'])
+        self.word_index = SymSpell(self.words, columns['word_delete_hashes'], columns['word_delete_numbers'])
+
+    @classmethod
+    def latest(cls, data_dir: str = OUTPUT_DIR) -> Optional['ProductLookup']:
+        path = latest_file('product_lookup_*.bin', data_dir)
+        return cls(path) if path else None
+
+    def result(self, row: int, match: str, distance: int) -> Dict:
+        return {'id': self.ids[row], 'name': self.names[row], 'match': match, 'distance': distance}
+
+    def lookup(self, query: str, limit: int = DEFAULT_LIMIT) -> List[Dict]:
+        """Products whose id, SKU or model number matches the query: exact, then prefix, then fuzzy"""
+        key = normalize_model(query)
+        if len(key) < 2:
+            return []
+        matches = []  # (rank, distance, extra characters, key)
+        if key in self.key_numbers:
+            matches.append((0, 0, 0, key))
+        if len(key) >= 4:
+            start = bisect_left(self.keys, key)
+            for candidate in self.keys[start:bisect_right(self.keys, key + '\uffff')]:
+                if candidate != key:
+                    matches.append((1, 0, len(candidate) - len(key), candidate))
+        # A name typed as a key is longer than any model number and can't be a misspelt one
+        if not matches and len(key) <= self.longest_key + MAX_DISTANCE:
+            for candidate, distance in self.key_index.lookup(key).items():
+                matches.append((2, distance, abs(len(candidate) - len(key)), candidate))
+
+        results, seen = [], set()
+        for rank, distance, _, candidate in sorted(matches):
+            number = self.key_numbers[candidate]
+            for row in self.key_rows[self.key_indptr[number]:self.key_indptr[number + 1]].tolist():
+                if row not in seen:
+                    seen.add(row)
+                    results.append(self.result(row, ('exact', 'prefix', 'fuzzy')[rank], distance))
+        return results[:limit]
+
+    def postings(self, i: int) -> np.ndarray:
+        return self.word_rows[self.word_indptr[i]:self.word_indptr[i + 1]]
+
+    def word_range(self, prefix: str) -> np.ndarray:
+        """Products with a name word starting with the prefix (one trie node), possibly repeated"""
+        start = bisect_left(self.words, prefix)
+        end = bisect_right(self.words, prefix + '\uffff')
+        return self.word_rows[self.word_indptr[start]:self.word_indptr[end]]
+
+    def word_products(self, word: str, prefix: bool):
+        """(products, edits) for one query word; misspelled words fall back to their corrections
+
+        Prefixes and corrections cover several words, so their products may repeat.
+        """
+        if prefix:
+            rows = self.word_range(word)
+        else:
+            i = bisect_left(self.words, word)
+            rows = self.postings(i) if i < len(self.words) and self.words[i] == word else []
+        if len(rows):
+            return rows, 0
+        corrections = self.word_index.lookup(word)
+        if not corrections:
+            return np.empty(0, dtype=np.int64), 0
+        best = min(corrections.values())
+        rows = [self.postings(bisect_left(self.words, w)) for w, d in corrections.items() if d == best]
+        return np.concatenate(rows), best
+
+    def complete(self, text: str, limit: int = DEFAULT_LIMIT) -> List[Dict]:
+        """Products whose name has every query word, the last one as a prefix"""
+        query = normalize_text(text)
+        words = query.split()
+        if not words:
+            return []
+        found, edits = [], 0
+        for i, word in enumerate(words):
+            rows, distance = self.word_products(word, prefix=i == len(words) - 1 and not text[-1:].isspace())
+            if not len(rows):
+                return []
+            found.append(rows)
+            edits += distance
+        # Start from the smallest set and only test its rows against the others, so the
+        # large unions behind a short prefix are never sorted
+        found.sort(key=len)
+        rows = np.unique(found[0])
+        for other in found[1:]:
+            rows = rows[np.isin(rows, other, kind='table')]
+            if not len(rows):
+                return []
+        # Rows are in shortest-name order; among the first few, names that start with the query lead
+        ranked = sorted(rows[:limit * RANK_WINDOW].tolist(),
+                        key=lambda row: (not self.name_text[row].startswith(query), row))
+        return [self.result(row, 'name', edits) for row in ranked[:limit]]
+
+    def search(self, text: str, limit: int = DEFAULT_LIMIT) -> List[Dict]:
+        """Key matches first, then name completions"""
+        results = self.lookup(text, limit)
+        seen = {result['id'] for result in results}
+        # A query that is a model number or the start of one is not a name
+        if len(results) < limit and not any(result['match'] != 'fuzzy' for result in results):
+            results += [r for r in self.complete(text, limit) if r['id'] not in seen]
+        return results[:limit]
+
+def typo(text: str, rng: random.Random) -> str:
+    """The text as someone might type it: one dropped, swapped, doubled or wrong character"""
+    if len(text) < 4:
+        return text
+    i = rng.randrange(1, len(text) - 1)
+    edit = rng.choice(('drop', 'swap', 'double', 'replace'))
+    if edit == 'drop':
+        return text[:i] + text[i + 1:]
+    if edit == 'swap':
+        return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    if edit == 'double':
+        return text[:i] + text[i] + text[i:]
+    return text[:i] + rng.choice('abcdefghijklmnopqrstuvwxyz0123456789') + text[i + 1:]
+
+def synthetic_products(products: List[Dict], count: int, seed: int = 0) -> List[Dict]:
+    """Copies of real products under new model numbers, to size the index like a full catalogue"""
+    rng = random.Random(seed)
+    result = []
+    for i in range(count):
+        product = rng.choice(products)
+        model = f"{rng.choice('ABCDEFGHJKLMNPRSTUVWXYZ')}{rng.choice('ABCDEFGHJKLMNPRSTUVWXYZ')}{rng.randrange(10000, 99999)}"
+        result.append({'id': model, 'model': model, 'brand': product.get('brand'),
+                       'name': f"{product.get('name')} {model}"})
+    return result
+
+def benchmark(lookup: ProductLookup, products: List[Dict], queries: int, seed: int = 1) -> Dict:
+    rng = random.Random(seed)
+    cases = []
+    for _ in range(queries):
+        product = rng.choice(products)
+        kind = rng.choice(('exact', 'spaced', 'prefix', 'typo', 'name', 'name_typo'))
+        model = str(product.get('model') or product['id'])
+        if kind == 'exact':
+            text = model
+        elif kind == 'spaced':
+            text = model.replace('-', ' ').lower()
+        elif kind == 'prefix':
+            text = model[:max(4, len(model) - 2)]
+        elif kind == 'typo':
+            text = typo(model.lower(), rng)
+        else:
+            # The whole name as it is being typed, so the expected product is the one meant
+            words = normalize_text(product.get('name')).split()
+            if kind == 'name_typo':
+                long_words = [i for i, word in enumerate(words[:-1]) if len(word) >= 6]
+                if long_words:
+                    i = rng.choice(long_words)
+                    words[i] = typo(words[i], rng)
+            text = ' '.join(words)
+            text = text[:len(text) - rng.randint(0, min(2, len(words[-1]) - 1))]
+        cases.append((kind, text, str(product['id'])))
+
+    timings = {}
+    found = {}
+    for kind, text, expected in cases:
+        started = time.perf_counter()
+        results = lookup.search(text)
+        timings.setdefault(kind, []).append(time.perf_counter() - started)
+        found.setdefault(kind, []).append(expected in [r['id'] for r in results])
+    stats = {}
+    for kind in timings:
+        micros = np.array(timings[kind]) * 1e6
+        stats[kind] = {'queries': len(micros), 'found': float(np.mean(found[kind])),
+                       'p50_us': float(np.percentile(micros, 50)), 'p99_us': float(np.percentile(micros, 99))}
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description='Typo-tolerant model number, SKU and name lookup')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('build', help='Write a lookup file from the latest product data')
+    command = commands.add_parser('search', help='Look up model numbers, SKUs or names')
+    command.add_argument('queries', nargs='+')
+    command.add_argument('--limit', type=int, default=DEFAULT_LIMIT)
+    command = commands.add_parser('benchmark', help='Hit rate and latency on generated queries')
+    command.add_argument('--queries', type=int, default=5000)
+    command.add_argument('--synthetic', type=int, default=0, help='Add this many synthetic products')
+    args = parser.parse_args()
+
+    if args.command == 'search':
+        lookup = ProductLookup.latest()
+        if not lookup:
+            print("No product lookup file found. Run: python product_lookup.py build")
+            return
+        for query in args.queries:
+            started = time.perf_counter()
+            results = lookup.search(query, args.limit)
+            micros = (time.perf_counter() - started) * 1e6
+            print(f"🔎 {query!r} ({micros:.0f} µs)")
+            for result in results:
+                print(f"   • {result['id']:<12} {result['match']:<6} {result['distance']}  {result['name']}")
+            if not results:
+                print("   • no match")
+        return
+
+    products = load_products()
+    if not products:
+        print("No product data found. Run comprehensive_drill_data.py or working_scraper.py first.")
+        return
+
+    if args.command == 'build':
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        path = os.path.join(OUTPUT_DIR, f'product_lookup_{timestamp}.bin')
+        size = write_lookup(path, products)
+        lookup = ProductLookup(path)
+        print(f"✅ {len(products)} products, {len(lookup.keys)} keys, {len(lookup.words)} name words")
+        print(f"📁 Lookup file: {path} ({size:,} bytes)")
+        return
+
+    catalogue = products + synthetic_products(products, args.synthetic)
+    # Outside OUTPUT_DIR, so ProductLookup.latest() never picks up the benchmark file
+    work_dir = tempfile.mkdtemp(prefix='product_lookup_benchmark_')
+    try:
+        path = os.path.join(work_dir, 'product_lookup.bin')
+        size = write_lookup(path, catalogue)
+        started = time.perf_counter()
+        lookup = ProductLookup(path)
+        load_seconds = time.perf_counter() - started
+        print(f"⏱️  {len(catalogue):,} products, {len(lookup.keys):,} keys, {len(lookup.words):,} words: "
+              f"{size / 1024:.1f} KB file, loaded in {load_seconds * 1000:.0f} ms")
+        stats = benchmark(lookup, catalogue, args.queries)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print(f"\n{'query':<10}{'count':>7}{'found':>8}{'p50 µs':>9}{'p99 µs':>9}")
+    for kind, row in stats.items():
+        print(f"{kind:<10}{row['queries']:>7}{row['found']:>8.1%}{row['p50_us']:>9.0f}{row['p99_us']:>9.0f}")
+
+if __name__ == "__main__":
+    main()
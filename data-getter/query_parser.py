@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Query Understanding Pre-filter
+
+Shopper questions carry constraints that vector search treats as just more
+words: "Best cordless drill under $200?", "drill bits for stainless steel",
+"#10 screws". This module pulls them out before retrieval with a lexicon
+built from the catalogue itself:
+
+- brands                        every product brand ("black and decker" too)
+- drill_type / bit_type         the type values and subcategory names,
+                                e.g. "hammer drill", "forstner bits"
+- product type                  "drill", "drill bit"
+- materials                     materials_drilled of bits and the rated
+                                drilling_capacity of drills, with the
+                                compatibility_index material families
+- screw sizes                   "#8", "no. 10 screws": pilot-hole and
+                                countersink bits for that gauge
+- price                         "under $200", "over 100 dollars",
+                                "between $50 and $100", "around $150"
+
+Chunk metadata is uneven (the specs chunk of a drill has no drill_type), so
+every constraint is resolved against the products into the product ids that
+satisfy it, and the query is filtered on product_id. When the constraints
+together match no product, the least specific ones are dropped in order
+(type, product type, material, screw size, brand) until some product is
+left; a price limit is never dropped.
+"""
+
+import argparse
+import json
+import re
+import time
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from compatibility_index import MATERIAL_FAMILIES, lengths, material_keys, screw_uses
+
+# Constraint kinds, in the order they are dropped when nothing matches all of them
+RELAX_ORDER = ('type', 'product_type', 'material', 'screw', 'brand')
+
+# Generic product words; specific types come from the catalogue
+PRODUCT_TYPE_PHRASES = {
+    'drill': 'drill', 'drill driver': 'drill', 'driver drill': 'drill',
+    'bit': 'drill_bit', 'drill bit': 'drill_bit', 'bit set': 'drill_bit', 'drill bit set': 'drill_bit',
+}
+
+# Words that name a material without being one
+MATERIAL_ALIASES = {
+    'woodworking': 'wood', 'lumber': 'wood', 'metalworking': 'metal', 'stainless': 'stainless steel',
+    'cement': 'concrete', 'cinder block': 'masonry block',
+}
+
+# Comparisons name several types on purpose, so they are not filtered by type
+COMPARISON_WORDS = {'difference', 'differences', 'vs', 'versus', 'compare', 'compared', 'comparison'}
+
+WORD_PATTERN = re.compile(r'[a-z0-9]+')
+
+NUMBER = r'(\d[\d,]*(?:\.\d+)?)'
+# "$200", "200 dollars", or a bare 200 that is not followed by a unit ("up to 1,500 rpm")
+AMOUNT = (r'\$\s*' + NUMBER + '|' + NUMBER + r'(?:\s*(?:dollars|bucks))?'
+          r'(?!\d|[,.]\d|\s*(?:(?:v|volts?|amps?|ah|in|inch|inches|mm|cm|ft|feet|lbs?|oz|rpm|bpm|ipm|'
+          r'pieces?|pcs?|watts?|w|degrees?|screws?|gauge|ga)\b|["\'/%-]))')
+PRICE_PATTERNS = (
+    ('range', re.compile(r'(?:between\s+|from\s+)?(?:' + AMOUNT + r')\s*(?:-|to|and)\s*(?:' + AMOUNT + r')')),
+    ('max', re.compile(r'(?:under|below|less than|cheaper than|no more than|up to|at most|max(?:imum)?|<=?)\s*'
+                       r'(?:' + AMOUNT + r')')),
+    ('min', re.compile(r'(?:over|above|more than|at least|min(?:imum)?|>=?)\s*(?:' + AMOUNT + r')')),
+    ('around', re.compile(r'(?:around|about|roughly|approximately|~)\s*(?:' + AMOUNT + r')')),
+)
+# "around $150" means within this fraction of it
+AROUND = 0.2
+
+SCREW_PATTERN = re.compile(r'(?:#|no\.?\s*|number\s+)(\d{1,2})\b|\b(\d{1,2})\s*(?:gauge|ga)\b')
+
+def stem(word: str) -> str:
+    """Singular form of a plural word, good enough for catalogue nouns"""
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us')):
+        return word[:-1]
+    return word
+
+def phrase_words(text: str) -> Tuple[str, ...]:
+    return tuple(stem(word) for word in WORD_PATTERN.findall(str(text or '').lower()))
+
+def product_kind(product: Dict) -> Optional[str]:
+    """'drill', 'drill_bit' or None"""
+    if product.get('product_type') in ('drill', 'drill_bit'):
+        return product['product_type']
+    # Scraped products are typed 'product'; their name says what they are
+    name = set(phrase_words(product.get('name')))
+    return 'drill_bit' if 'bit' in name else 'drill' if name & {'drill', 'driver'} else None
+
+def amount(match: re.Match, first: int) -> Optional[float]:
+    """The dollar amount in a match, from either of the two AMOUNT groups starting at 'first'"""
+    value = match.group(first) or match.group(first + 1)
+    return float(value.replace(',', '')) if value else None
+
+def parse_price(text: str) -> Tuple[Dict[str, float], List[Tuple[int, int]]]:
+    """Price bounds in a query and the character spans they were read from"""
+    bounds, spans = {}, []
+    for kind, pattern in PRICE_PATTERNS:
+        for match in pattern.finditer(text):
+            if any(start < match.end() and match.start() < end for start, end in spans):
+                continue
+            if kind == 'range':
+                low, high = amount(match, 1), amount(match, 3)
+                # A bare "2 to 4" is a quantity; a range needs a price word or sign
+                if low is None or high is None or not ('$' in match.group(0) or 'between' in match.group(0)):
+                    continue
+                bounds['price_min'], bounds['price_max'] = min(low, high), max(low, high)
+            else:
+                value = amount(match, 1)
+                if value is None:
+                    continue
+                if kind == 'max':
+                    bounds['price_max'] = value
+                elif kind == 'min':
+                    bounds['price_min'] = value
+                else:
+                    bounds['price_min'], bounds['price_max'] = value * (1 - AROUND), value * (1 + AROUND)
+            spans.append(match.span())
+    return bounds, spans
+
+class QueryParser:
+    """Rule and lexicon based extraction of catalogue constraints from a query"""
+
+    def __init__(self, products: Iterable[Dict]):
+        self.lexicon: Dict[Tuple[str, ...], List[Tuple[str, str]]] = {}  # phrase -> [(kind, value)]
+        self.ids: Dict[Tuple[str, str], FrozenSet[str]] = {}  # (kind, value) -> product ids
+        self.prices: Dict[str, float] = {}
+        self.max_words = 1
+
+        members: Dict[Tuple[str, str], set] = {}
+        material_products: Dict[str, set] = {}
+        for product in products:
+            product_id = str(product['id'])
+            if isinstance(product.get('price'), (int, float)):
+                self.prices[product_id] = float(product['price'])
+            for kind, value, phrases in self.product_phrases(product):
+                members.setdefault((kind, value), set()).add(product_id)
+                for phrase in phrases:
+                    self.add_phrase(phrase, kind, value)
+            for material in self.product_materials(product):
+                material_products.setdefault(material, set()).add(product_id)
+            for gauge in screw_uses(product):
+                members.setdefault(('screw', f'#{gauge}'), set()).add(product_id)
+
+        # A query material matches products rated for it, for a broader family
+        # of it ("metal" for stainless steel) or for a specific kind of it
+        known = set(material_products) | set(MATERIAL_FAMILIES) | set(MATERIAL_FAMILIES.values())
+        for material in known:
+            matched = set()
+            for rated, ids in material_products.items():
+                if rated in material_keys(material) or material in material_keys(rated):
+                    matched |= ids
+            if matched:
+                members[('material', material)] = matched
+                self.add_phrase(material, 'material', material)
+        for alias, material in MATERIAL_ALIASES.items():
+            if ('material', material) in members:
+                self.add_phrase(alias, 'material', material)
+
+        self.ids = {key: frozenset(ids) for key, ids in members.items()}
+
+    @staticmethod
+    def product_phrases(product: Dict):
+        """(kind, value, phrases) a product can be asked for by"""
+        brand = str(product.get('brand') or '').strip()
+        if brand:
+            phrases = [brand]
+            if re.search(r'[+&]', brand):
+                phrases.append(re.sub(r'\s*[+&]\s*', ' and ', brand))
+            yield 'brand', brand.lower(), phrases
+        for type_field in ('drill_type', 'bit_type'):
+            if product.get(type_field):
+                value = str(product[type_field]).lower()
+                yield 'type', value, [value.replace('_', ' '), product.get('subcategory') or '']
+        value = product_kind(product)
+        if value:
+            yield 'product_type', value, [phrase for phrase, kind in PRODUCT_TYPE_PHRASES.items() if kind == value]
+
+    @staticmethod
+    def product_materials(product: Dict) -> List[str]:
+        materials = [str(m).strip().lower() for m in product.get('materials_drilled') or []]
+        for material, capacity in (product.get('drilling_capacity') or {}).items():
+            if lengths(str(capacity)):  # "Not recommended" is not a rating
+                materials.append(material.strip().lower())
+        return materials
+
+    def add_phrase(self, phrase: str, kind: str, value: str):
+        words = phrase_words(phrase)
+        if not words:
+            return
+        entries = self.lexicon.setdefault(words, [])
+        if (kind, value) not in entries:
+            entries.append((kind, value))
+        self.max_words = max(self.max_words, len(words))
+
+    @classmethod
+    def from_index(cls, index) -> 'QueryParser':
+        """Parser over the product catalogue stored in a chunk index snapshot"""
+        return cls(json.loads(index.products[row]) for row in range(len(index.products)))
+
+    def match(self, words: List[str]) -> Dict[str, List[str]]:
+        """Longest catalogue phrases in a word list, grouped by kind"""
+        found: Dict[str, List[str]] = {}
+        i = 0
+        while i < len(words):
+            for size in range(min(self.max_words, len(words) - i), 0, -1):
+                entries = self.lexicon.get(tuple(words[i:i + size]))
+                if entries:
+                    for kind, value in entries:
+                        if value not in found.setdefault(kind, []):
+                            found[kind].append(value)
+                    i += size
+                    break
+            else:
+                i += 1
+        return found
+
+    def parse(self, query: str) -> Dict:
+        """Constraints found in a query and the product ids satisfying them
+
+        'filters' is what to pass to ChunkIndex.search ({} when nothing narrows
+        the products) and 'text' the query without its price phrases.
+        """
+        lowered = query.lower()
+        price, spans = parse_price(lowered)
+        text = query
+        for start, end in sorted(spans, reverse=True):
+            text = text[:start] + ' ' + text[end:]
+        text = ' '.join(text.split())
+
+        words = [stem(word) for word in WORD_PATTERN.findall(lowered)]
+        constraints = self.match([stem(word) for word in WORD_PATTERN.findall(text.lower())])
+        gauges = [f'#{int(a or b)}' for a, b in SCREW_PATTERN.findall(lowered)]
+        gauges = [gauge for gauge in dict.fromkeys(gauges) if ('screw', gauge) in self.ids]
+        if gauges:
+            constraints['screw'] = gauges
+        if COMPARISON_WORDS & set(words):
+            constraints.pop('type', None)
+            constraints.pop('product_type', None)
+
+        parsed = {'query': query, 'text': text or query, 'constraints': constraints, 'price': price,
+                  'dropped': [], 'product_ids': None, 'filters': {}}
+        if not constraints and not price:
+            return parsed
+
+        priced = None
+        if price:
+            low, high = price.get('price_min', float('-inf')), price.get('price_max', float('inf'))
+            priced = frozenset(pid for pid, value in self.prices.items() if low <= value <= high)
+        kinds = [kind for kind in RELAX_ORDER if kind in constraints]
+        while True:
+            ids = priced
+            for kind in reversed(kinds):
+                # Values of one kind are alternatives ("dewalt or makita"), kinds must all hold
+                matched = frozenset().union(*(self.ids.get((kind, value), frozenset())
+                                              for value in constraints[kind]))
+                ids = matched if ids is None else ids & matched
+            if ids or not kinds:
+                break
+            parsed['dropped'].append(kinds.pop(0))
+        parsed['product_ids'] = sorted(ids)
+        parsed['filters'] = {'product_id': parsed['product_ids']}
+        return parsed
+
+def summary(parsed: Dict) -> Dict:
+    """A parse result without the product id list"""
+    return {'constraints': parsed['constraints'], 'price': parsed['price'], 'dropped': parsed['dropped'],
+            'products': len(parsed['product_ids']) if parsed['product_ids'] is not None else None}
+
+def main():
+    from chunk_index import CHUNK_INDEX_DIR, ChunkIndex
+    from final_summary import RAG_QUERIES
+
+    parser = argparse.ArgumentParser(description='Extract catalogue filters from shopper queries')
+    parser.add_argument('queries', nargs='*', help='Queries to parse (default: the final_summary RAG queries)')
+    parser.add_argument('--benchmark', action='store_true', help='Time parsing and filtered vs. full search')
+    parser.add_argument('--repeat', type=int, default=200, help='Timing repetitions per query')
+    parser.add_argument('--index-dir', default=CHUNK_INDEX_DIR, help='Snapshot directory')
+    args = parser.parse_args()
+
+    index = ChunkIndex.latest(args.index_dir)
+    if not index:
+        print("No chunk index found. Run: python chunk_index.py build")
+        return
+    query_parser = QueryParser.from_index(index)
+    queries = args.queries or RAG_QUERIES
+
+    for query in queries:
+        parsed = query_parser.parse(query)
+        print(f"🔎 {query}")
+        if parsed['filters']:
+            print(f"   • {json.dumps(summary(parsed))}")
+            mask = index.mask(parsed['filters'])
+            if mask is not None:
+                print(f"   • {int(mask.sum())}/{len(index)} chunks remain")
+        else:
+            print("   • no constraints")
+
+    if not args.benchmark:
+        return
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        for query in queries:
+            query_parser.parse(query)
+    parse_us = (time.perf_counter() - started) / (args.repeat * len(queries)) * 1e6
+
+    timings = {}
+    for name, use_parser in (('full', False), ('pre-filtered', True)):
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            for query in queries:
+                if use_parser:
+                    parsed = query_parser.parse(query)
+                    index.search_rows(parsed['text'], 5, parsed['filters'])
+                else:
+                    index.search_rows(query, 5)
+        timings[name] = (time.perf_counter() - started) / (args.repeat * len(queries)) * 1000
+    print(f"\n⏱️  Parse: {parse_us:.1f} µs/query")
+    print(f"   • Search, full corpus: {timings['full']:.3f} ms/query")
+    print(f"   • Search, pre-filtered (parse included): {timings['pre-filtered']:.3f} ms/query")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Retrieval Benchmark
+
+Measures how well and how fast each retrieval backend answers a labelled
+query set:
+
+- the final_summary RAG questions, labelled by hand with the products that
+  answer them;
+- variants generated from the drill and bit catalogue (product names, brand
+  and model, type, brand and type, material, screw size and price questions),
+  labelled from the catalogue facts they were generated from.
+
+Retrieved chunks are mapped to their product_id and de-duplicated, so the
+metrics are over the product ranking: recall@1/5/10 (divided by
+min(k, expected) so a perfect ranking scores 1 at every k), MRR, p50/p95
+latency and the size of the index data the backend keeps mapped. Each run is
+appended to data/retrieval_benchmark_history.json and compared with the last
+run of the same backend on the same query set.
+
+Backends: bm25, dense and hybrid (chunk_index.py), hybrid+parser (with the
+query_parser.py pre-filter), int8 and pq+rerank (vector_quantization.py over
+the snapshot's embeddings) and service (a running retrieval service, --url).
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from chunk_dedup import product_ids
+from chunk_index import CHUNK_INDEX_DIR, ChunkIndex
+from compatibility_index import lengths, screw_uses
+from config import OUTPUT_DIR
+from final_summary import RAG_QUERIES
+from query_parser import QueryParser, product_kind
+from vector_quantization import QuantizedIndex, make_quantizer, save_quantized
+
+HISTORY_FILE = os.path.join(OUTPUT_DIR, 'retrieval_benchmark_history.json')
+
+BACKENDS = ('bm25', 'dense', 'hybrid', 'hybrid+parser', 'int8', 'pq+rerank', 'service')
+DEFAULT_BACKENDS = ('bm25', 'dense', 'hybrid', 'hybrid+parser', 'int8', 'pq+rerank')
+
+# Chunks fetched per query; several chunks usually belong to one product
+CHUNKS_PER_QUERY = 30
+RECALL_AT = (1, 5, 10)
+PQ_RERANK = 100
+
+# A later run is flagged when it is this much worse than the previous one
+RECALL_TOLERANCE = 0.02
+LATENCY_TOLERANCE = 1.25
+
+# Products answering the final_summary questions
+RAG_LABELS = {
+    "What drill should I use for concrete work?": ['XPH12Z', 'HD18-2', 'DCD460T1'],
+    "What size drill bit do I need for #10 screws?": ['DW2535', 'DW1177', 'CO-29', 'DW1361'],
+    "Best cordless drill under $200?": ['DCD771C2', 'XPH12Z', 'RYB01011G', 'BDCDD12C'],
+    "What drill bits work best with stainless steel?": ['CO-29'],
+    "I need to drill holes in ceramic tile, what should I use?": ['GT2000'],
+    "What's the difference between impact driver and regular drill?": ['2853-22CT', '2853-20'],
+    "What drill bit sizes come in the DEWALT black oxide set?": ['DW1177'],
+    "I need a drill for tight spaces, what do you recommend?": ['1680-21'],
+    "What's the drilling capacity of the Milwaukee hammer drill?": ['XPH12Z', 'HD18-2'],
+    "Best drill bits for woodworking projects?": ['DW1587', 'IRW88886', 'FB-008'],
+}
+
+PHRASINGS = ('{}', 'best {}', 'which {} should I buy', '{} recommendations', 'looking for {}')
+KIND_NAMES = {'drill': 'drill', 'drill_bit': 'drill bits'}
+
+def build_query_set(products: List[Dict], seed: int = 0) -> List[Dict]:
+    """The labelled RAG questions plus generated catalogue questions"""
+    rng = random.Random(seed)
+    queries = [{'query': q, 'expected': RAG_LABELS[q], 'source': 'rag'} for q in RAG_QUERIES if q in RAG_LABELS]
+
+    def add(source: str, text: str, expected):
+        if expected:
+            queries.append({'query': rng.choice(PHRASINGS).format(text), 'expected': sorted(set(expected)),
+                            'source': source})
+
+    kinds = {p['id']: product_kind(p) for p in products}
+    for product in products:
+        queries.append({'query': product['name'], 'expected': [product['id']], 'source': 'name'})
+        if product.get('brand') and product.get('model'):
+            add('model', f"{product['brand']} {product['model']}", [product['id']])
+
+    by_type, by_brand, by_material, by_capacity = {}, {}, {}, {}
+    for product in products:
+        type_value = product.get('drill_type') or product.get('bit_type')
+        if type_value and product.get('subcategory'):
+            by_type.setdefault(product['subcategory'].lower(), []).append(product['id'])
+        if product.get('brand') and kinds[product['id']]:
+            by_brand.setdefault((product['brand'], kinds[product['id']]), []).append(product['id'])
+        for material in product.get('materials_drilled') or []:
+            by_material.setdefault(material.lower(), []).append(product['id'])
+        for material, capacity in (product.get('drilling_capacity') or {}).items():
+            if lengths(str(capacity)):
+                by_capacity.setdefault(material.lower(), []).append(product['id'])
+    for subcategory, ids in sorted(by_type.items()):
+        add('type', subcategory, ids)
+    for (brand, kind), ids in sorted(by_brand.items()):
+        add('brand_type', f"{brand} {KIND_NAMES[kind]}", ids)
+    for material, ids in sorted(by_material.items()):
+        add('material', f"drill bits for {material}", ids)
+    for material, ids in sorted(by_capacity.items()):
+        add('material', f"drill for drilling {material}", ids)
+
+    for gauge in sorted({g for p in products for g in screw_uses(p)}):
+        add('screw', f"bit for #{gauge} screws", [p['id'] for p in products if gauge in screw_uses(p)])
+
+    for kind, name in KIND_NAMES.items():
+        prices = sorted(p['price'] for p in products
+                        if kinds[p['id']] == kind and isinstance(p.get('price'), (int, float)))
+        for quantile in (0.25, 0.5, 0.75):
+            if not prices:
+                break
+            limit = int(math.ceil(prices[int(quantile * (len(prices) - 1))] / 10) * 10)
+            add('price', f"{name} under ${limit}", [p['id'] for p in products if kinds[p['id']] == kind
+                                                    and isinstance(p.get('price'), (int, float))
+                                                    and p['price'] <= limit])
+    return queries
+
+def query_set_hash(queries: List[Dict]) -> str:
+    payload = json.dumps([[q['query'], q['expected']] for q in queries], sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12]
+
+def directory_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+def chunk_products(index: ChunkIndex) -> List[List[str]]:
+    """Product ids of every chunk row, all owners for a shared chunk"""
+    return [[pid for pid in product_ids({'metadata': json.loads(index.metadata[row])}) if pid]
+            for row in range(len(index))]
+
+def owners(products: List[List[str]], rows) -> List[str]:
+    """Product ids of ranked chunk rows, in rank order"""
+    return [pid for row in rows for pid in products[row]]
+
+def index_backend(name: str, index: ChunkIndex, products: List[List[str]], work_dir: str):
+    """(search(query) -> product ids in rank order, index bytes) for a local backend"""
+    size = directory_bytes(index.path)
+    if name in ('bm25', 'dense', 'hybrid'):
+        alpha = {'bm25': 0.0, 'dense': 1.0, 'hybrid': 0.5}[name]
+        return (lambda query: owners(products, index.search_rows(query, CHUNKS_PER_QUERY, alpha=alpha)[0])), size
+    if name == 'hybrid+parser':
+        parser = QueryParser.from_index(index)
+
+        def search(query):
+            parsed = parser.parse(query)
+            return owners(products, index.search_rows(parsed['text'], CHUNKS_PER_QUERY, parsed['filters'])[0])
+        return search, size
+
+    method = 'int8' if name == 'int8' else 'pq'
+    vectors = np.asarray(index.vectors)
+    quantizer = make_quantizer(method).train(vectors)
+    codes = quantizer.encode(vectors)
+    quantized = QuantizedIndex(save_quantized(quantizer, codes, [index.ids[i] for i in range(len(index))],
+                                              os.path.join(work_dir, method),
+                                              os.path.join(index.path, 'vectors.npy'), index.manifest['model']))
+    rerank = PQ_RERANK if name == 'pq+rerank' else 0
+    # Only the codes and quantizer parameters stay in memory; re-ranking reads float32 rows from disk
+    size = sum(os.path.getsize(os.path.join(quantized.path, f)) for f in os.listdir(quantized.path)
+               if f != 'manifest.json')
+    return (lambda query: owners(products, quantized.search_rows(
+        index.embedder.embed_query(query), CHUNKS_PER_QUERY, rerank)[0])), size
+
+def service_backend(url: str):
+    def search(query):
+        body = json.dumps({'query': query, 'k': CHUNKS_PER_QUERY, 'cache': False}).encode('utf-8')
+        request = urllib.request.Request(url.rstrip('/') + '/search', data=body,
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=30) as response:
+            results = json.load(response)['results']
+        return [pid for result in results for pid in product_ids(result)]
+    return search, None
+
+def evaluate(search: Callable[[str], List[Optional[str]]], queries: List[Dict], repeat: int) -> Dict:
+    for q in queries:  # warm-up: page in the mapped files, build lazy state
+        search(q['query'])
+    latencies = []
+    recalls = {k: [] for k in RECALL_AT}
+    reciprocal_ranks = []
+    by_source = {}
+    for q in queries:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            found = search(q['query'])
+            latencies.append(time.perf_counter() - started)
+        ranking = [pid for pid in dict.fromkeys(found) if pid]
+        expected = set(q['expected'])
+        for k in RECALL_AT:
+            recalls[k].append(len(expected & set(ranking[:k])) / min(k, len(expected)))
+        rank = next((i for i, pid in enumerate(ranking, 1) if pid in expected), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+        source = by_source.setdefault(q['source'], {'queries': 0, 'recall@10': 0.0, 'mrr': 0.0})
+        source['queries'] += 1
+        source['recall@10'] += recalls[10][-1]
+        source['mrr'] += reciprocal_ranks[-1]
+
+    for source in by_source.values():
+        source['recall@10'] = round(source['recall@10'] / source['queries'], 4)
+        source['mrr'] = round(source['mrr'] / source['queries'], 4)
+    latencies_ms = np.array(latencies) * 1000
+    result = {f'recall@{k}': round(float(np.mean(values)), 4) for k, values in recalls.items()}
+    result.update({
+        'mrr': round(float(np.mean(reciprocal_ranks)), 4),
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(latencies_ms, 95)), 3),
+        'by_source': by_source,
+    })
+    return result
+
+def load_history(path: str = HISTORY_FILE) -> List[Dict]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return []
+
+def save_history(history: List[Dict], path: str = HISTORY_FILE):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+    os.replace(tmp_path, path)
+
+def previous_result(history: List[Dict], query_set: str, backend: str) -> Optional[Dict]:
+    for run in reversed(history):
+        if run['query_set'] == query_set and backend in run['backends']:
+            return run['backends'][backend]
+    return None
+
+def regressions(current: Dict, previous: Dict) -> List[str]:
+    found = []
+    for metric in [f'recall@{k}' for k in RECALL_AT] + ['mrr']:
+        if current[metric] < previous[metric] - RECALL_TOLERANCE:
+            found.append(f"{metric} {previous[metric]:.3f} -> {current[metric]:.3f}")
+    if current['p95_ms'] > previous['p95_ms'] * LATENCY_TOLERANCE:
+        found.append(f"p95 {previous['p95_ms']:.2f} -> {current['p95_ms']:.2f} ms")
+    return found
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Recall, MRR, latency and memory of the retrieval backends')
+    parser.add_argument('--backends', default=','.join(DEFAULT_BACKENDS),
+                        help=f"Comma-separated, from: {', '.join(BACKENDS)}")
+    parser.add_argument('--url', help='Retrieval service for the service backend, e.g. http://127.0.0.1:3003')
+    parser.add_argument('--index-dir', default=CHUNK_INDEX_DIR, help='Snapshot directory')
+    parser.add_argument('--queries', help='Labelled query set (JSON) instead of the generated one')
+    parser.add_argument('--write-queries', help='Write the generated query set to this file and exit')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per query')
+    parser.add_argument('--history', default=HISTORY_FILE, help='Benchmark history file')
+    parser.add_argument('--no-save', action='store_true', help='Do not append this run to the history')
+    parser.add_argument('--verbose', action='store_true', help='Show recall and MRR per query source')
+    args = parser.parse_args()
+
+    backends = [name.strip() for name in args.backends.split(',') if name.strip()]
+    unknown = [name for name in backends if name not in BACKENDS]
+    if unknown:
+        parser.error(f"unknown backend(s): {', '.join(unknown)}")
+    if 'service' in backends and not args.url:
+        parser.error('the service backend needs --url')
+
+    index = ChunkIndex.latest(args.index_dir)
+    if not index:
+        print("No chunk index found. Run: python chunk_index.py build")
+        return
+    products = chunk_products(index)
+
+    if args.queries:
+        with open(args.queries, 'r', encoding='utf-8') as f:
+            queries = json.load(f)
+    else:
+        catalogue = [json.loads(index.products[row]) for row in range(len(index.products))]
+        queries = build_query_set(catalogue)
+    # Products without chunks cannot be retrieved by any backend
+    indexed = {pid for owned in products for pid in owned}
+    for q in queries:
+        q['expected'] = [pid for pid in q['expected'] if pid in indexed]
+    queries = [q for q in queries if q['expected']]
+    if args.write_queries:
+        with open(args.write_queries, 'w', encoding='utf-8') as f:
+            json.dump(queries, f, indent=2)
+        print(f"📁 {len(queries)} labelled queries written to {args.write_queries}")
+        return
+    if not queries:
+        print("No labelled queries match the indexed products.")
+        return
+
+    query_set = query_set_hash(queries)
+    sources = ', '.join(f"{source} {sum(q['source'] == source for q in queries)}"
+                        for source in dict.fromkeys(q['source'] for q in queries))
+    print(f"🧪 {len(queries)} labelled queries ({sources}), index {index.version} ({len(index)} chunks)")
+
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix='retrieval_benchmark_')
+    try:
+        for name in backends:
+            if name == 'service':
+                search, size = service_backend(args.url)
+            else:
+                search, size = index_backend(name, index, products, work_dir)
+            results[name] = evaluate(search, queries, args.repeat)
+            results[name]['index_mb'] = round(size / 1024 / 1024, 3) if size is not None else None
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    history = load_history(args.history)
+    recall_headers = ''.join(f'{f"R@{k}":>8}' for k in RECALL_AT)
+    print(f"\n{'backend':<15}{recall_headers}{'MRR':>8}{'p50 ms':>9}{'p95 ms':>9}{'index MB':>10}")
+    for name, result in results.items():
+        recalls = ''.join(f"{result[f'recall@{k}']:>8.3f}" for k in RECALL_AT)
+        size = f"{result['index_mb']:>10.2f}" if result['index_mb'] is not None else f"{'-':>10}"
+        print(f"{name:<15}{recalls}{result['mrr']:>8.3f}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{size}")
+        if args.verbose:
+            for source, metrics in result['by_source'].items():
+                print(f"   • {source:<11} {metrics['queries']:>4} queries, R@10 {metrics['recall@10']:.3f}, "
+                      f"MRR {metrics['mrr']:.3f}")
+
+    flagged = False
+    for name, result in results.items():
+        previous = previous_result(history, query_set, name)
+        found = regressions(result, previous) if previous else []
+        if found:
+            flagged = True
+            print(f"⚠️  {name} regressed since the last run: {'; '.join(found)}")
+    if not flagged and any(previous_result(history, query_set, name) for name in results):
+        print("✅ No regressions against the last run")
+
+    if not args.no_save:
+        history.append({
+            'run_at': datetime.now().isoformat(),
+            'commit': git_commit(),
+            'index_version': index.version,
+            'query_set': query_set,
+            'queries': len(queries),
+            'backends': results,
+        })
+        save_history(history, args.history)
+        print(f"📁 History: {args.history} ({len(history)} runs)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Retrieval Service Load Test
+
+Sends POST /search requests over keep-alive connections and reports
+throughput and latency percentiles. Queries are the final_summary RAG
+questions plus paraphrases of them, so repeated intents exercise the
+semantic cache. Without --url a service is started on a free port for the
+duration of the test.
+
+--scaling 1,2,4 starts the service once per worker count and reports QPS
+next to the memory of each worker from /proc/<pid>/smaps_rollup. RSS counts
+the mmap'd index pages a worker has touched; Private is what that worker
+alone costs, so it should stay flat as workers are added. --synthetic-chunks
+builds a larger throwaway index from copies of the real chunks so the shared
+part is big enough to see.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+
+from catalogue import load_products
+from chunk_index import CHUNK_INDEX_DIR, publish_snapshot
+from embedding import load_chunk_files
+from final_summary import RAG_QUERIES
+
+PARAPHRASES = ('{}', 'best {}', '{} please', 'what do you recommend: {}', 'which {}')
+
+def query_mix(count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    questions = [q.rstrip('?').lower() for q in RAG_QUERIES]
+    return [rng.choice(PARAPHRASES).format(rng.choice(questions)) for _ in range(count)]
+
+async def request(reader, writer, host: str, method: str, path: str, body: Dict = None) -> Tuple[int, Dict]:
+    data = json.dumps(body).encode('utf-8') if body is not None else b''
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(data)}\r\n\r\n".encode('latin-1') + data)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+async def run_load(host: str, port: int, queries: List[str], concurrency: int, k: int, use_cache: bool) -> Dict:
+    pending = iter(queries)
+    latencies = []
+    cached = 0
+    errors = 0
+
+    async def worker():
+        nonlocal cached, errors
+        reader, writer = await asyncio.open_connection(host, port)
+        for query in pending:
+            started = time.perf_counter()
+            status, payload = await request(reader, writer, host, 'POST', '/search',
+                                            {'query': query, 'k': k, 'cache': use_cache})
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors += 1
+            elif payload['cached']:
+                cached += 1
+        writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'qps': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'cache_hit_rate': cached / len(latencies) if latencies else 0.0,
+    }
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def synthetic_chunks(count: int, seed: int = 0) -> List[Dict]:
+    """Copies of the real chunks with new ids and shuffled sentences"""
+    rng = random.Random(seed)
+    chunks = load_chunk_files()
+    result = []
+    for i in range(count):
+        chunk = dict(rng.choice(chunks))
+        sentences = chunk['content'].split('. ')
+        rng.shuffle(sentences)
+        chunk['id'] = f"synthetic_{i}"
+        chunk['content'] = '. '.join(sentences) + f" (variant {i})"
+        result.append(chunk)
+    return result
+
+def memory(pid: int) -> Dict[str, float]:
+    """Rss, Pss, Shared and Private memory of a process in MB"""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup', 'r') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {
+        'rss_mb': fields.get('Rss', 0.0),
+        'pss_mb': fields.get('Pss', 0.0),
+        'shared_mb': fields.get('Shared_Clean', 0.0) + fields.get('Shared_Dirty', 0.0),
+        'private_mb': fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0),
+    }
+
+def worker_pids(pid: int) -> List[int]:
+    """The service's pre-forked workers, or the service itself when it has none"""
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children', 'r') as f:
+            children = [int(child) for child in f.read().split()]
+    except OSError:
+        children = []
+    return children or [pid]
+
+def start_service(host: str, port: int, workers: int, index_dir: str) -> subprocess.Popen:
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'retrieval_service.py')
+    # One BLAS thread per worker, otherwise each worker competes for every core
+    env = dict(os.environ, OPENBLAS_NUM_THREADS='1', OMP_NUM_THREADS='1', MKL_NUM_THREADS='1')
+    return subprocess.Popen([sys.executable, script, '--host', host, '--port', str(port), '--workers',
+                             str(workers), '--index-dir', index_dir, '--watch-interval', '0'],
+                            env=env, stdout=subprocess.DEVNULL)
+
+def stop_service(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+async def wait_until_up(host: str, port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            await request(reader, writer, host, 'GET', '/health')
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+def scaling(args, index_dir: str) -> List[Dict]:
+    rows = []
+    queries = query_mix(args.requests)
+    for workers in [int(value) for value in args.scaling.split(',')]:
+        host, port = '127.0.0.1', free_port()
+        process = start_service(host, port, workers, index_dir)
+        try:
+            asyncio.run(wait_until_up(host, port))
+            # Warm-up so every worker has mapped the pages it scores
+            asyncio.run(run_load(host, port, queries[:max(200, workers * 50)], args.concurrency, args.k, False))
+            result = asyncio.run(run_load(host, port, queries, args.concurrency, args.k, False))
+            usage = [memory(pid) for pid in worker_pids(process.pid)]
+        finally:
+            stop_service(process)
+        result['workers'] = workers
+        for key in ('rss_mb', 'pss_mb', 'private_mb'):
+            result[key] = float(np.mean([u[key] for u in usage]))
+        rows.append(result)
+        print(f"   • {workers} worker(s): {result['qps']:,.0f} QPS, p99 {result['p99_ms']:.1f} ms, "
+              f"per worker RSS {result['rss_mb']:.1f} MB, PSS {result['pss_mb']:.1f} MB, "
+              f"private {result['private_mb']:.1f} MB")
+    return rows
+
+def run_single(args, index_dir: str):
+    process = None
+    if args.url:
+        url = urlparse(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        host, port = '127.0.0.1', free_port()
+        process = start_service(host, port, args.workers, index_dir)
+
+    try:
+        asyncio.run(wait_until_up(host, port))
+        print(f"⏱️  {args.requests} requests, {args.concurrency} connections, "
+              f"cache {'off' if args.no_cache else 'on'}...")
+        result = asyncio.run(run_load(host, port, query_mix(args.requests), args.concurrency,
+                                      args.k, not args.no_cache))
+    finally:
+        if process:
+            stop_service(process)
+
+    print(f"✅ {result['qps']:,.0f} QPS, p50 {result['p50_ms']:.2f} ms, p95 {result['p95_ms']:.2f} ms, "
+          f"p99 {result['p99_ms']:.2f} ms")
+    print(f"   • Cache hit rate: {result['cache_hit_rate']:.1%}, errors: {result['errors']}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the retrieval service')
+    parser.add_argument('--url', help='Running service, e.g. http://127.0.0.1:3003 (default: start one)')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the semantic cache')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes for the started service')
+    parser.add_argument('--index-dir', default=CHUNK_INDEX_DIR, help='Snapshot directory for the started service')
+    parser.add_argument('--scaling', help='Comma-separated worker counts to compare, e.g. 1,2,4 (cache off)')
+    parser.add_argument('--synthetic-chunks', type=int, default=0,
+                        help='Serve a temporary index of this many synthetic chunks')
+    args = parser.parse_args()
+
+    index_dir = args.index_dir
+    temp_dir = None
+    if args.synthetic_chunks and not args.url:
+        temp_dir = tempfile.mkdtemp(prefix='chunk_index_')
+        print(f"🗂️  Building a synthetic index of {args.synthetic_chunks:,} chunks...")
+        publish_snapshot(synthetic_chunks(args.synthetic_chunks), temp_dir, products=load_products())
+        index_dir = temp_dir
+
+    try:
+        if args.scaling:
+            print(f"⏱️  {args.requests} requests per run, {args.concurrency} connections, cache off, "
+                  f"{os.cpu_count()} CPUs")
+            rows = scaling(args, index_dir)
+            base = rows[0]['qps'] / rows[0]['workers']
+            print("✅ Speedup: " + ', '.join(f"{row['workers']}x → {row['qps'] / base:.2f}x" for row in rows))
+        else:
+            run_single(args, index_dir)
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+Retrieval Service
+
+A small asyncio HTTP service answering hybrid top-k queries over the
+memory-mapped chunk index (chunk_index.py), for the api-gateway to fetch
+product context before calling the LLM.
+
+    POST /search   {"query": "...", "k": 5, "filters": {"brand": "dewalt"}, "alpha": 0.5, "understand": true}
+    GET  /products/{id}
+    GET  /health
+    GET  /stats
+
+Brands, product types, materials, screw sizes and prices in the query are
+turned into product filters before scoring (query_parser.py), so "cordless
+drill under $200" only scores the chunks of cordless drills under $200.
+Send "understand": false to search the whole index.
+
+Results are kept in a semantic cache: a query is looked up by the embedding
+of its content words, so "best drill for concrete" and "drill for concrete
+work" share an entry. Tokens containing digits (prices, sizes, model
+numbers), k, alpha and the filters must match exactly. Entries expire after
+a TTL, the least recently used are evicted first, and the whole cache is
+dropped when the index version changes.
+
+New index snapshots are picked up without a restart: on SIGHUP, or when the
+snapshot CURRENT file changes (checked every --watch-interval seconds).
+Queries in flight finish on the snapshot they started with.
+
+With --workers N the service pre-forks N processes accepting on one listening
+socket. The snapshot is a read-only set of mmap'd files (vectors, BM25
+postings, chunk texts and the product catalogue), so every worker maps the
+same page-cache pages and a worker costs its interpreter plus its cache, not
+another copy of the corpus. The parent restarts workers that die and passes
+SIGHUP on to all of them.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import time
+from collections import OrderedDict
+from http import HTTPStatus
+from urllib.parse import unquote
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from chunk_index import (CHUNK_INDEX_DIR, DEFAULT_ALPHA, ChunkIndex, IndexManager, collect_snapshots,
+                         current_snapshot)
+from embedding import HashingEmbedder, tokenize
+from query_parser import QueryParser, summary
+
+DEFAULT_PORT = 3003
+CACHE_CAPACITY = 4096
+CACHE_TTL = 300.0
+CACHE_THRESHOLD = 0.9
+MAX_K = 100
+WATCH_INTERVAL = 2.0
+
+# Words that do not change what a shopper is asking for
+STOPWORDS = {
+    'a', 'an', 'the', 'for', 'to', 'of', 'in', 'on', 'with', 'and', 'or', 'is', 'are', 'do', 'does',
+    'i', 'me', 'my', 'we', 'you', 'your', 'it', 'that', 'this', 'what', 'which', 'whats', 'should',
+    'can', 'could', 'would', 'need', 'want', 'use', 'using', 'used', 'best', 'good', 'great', 'top',
+    'recommend', 'recommended', 'work', 'works', 'working', 'job', 'jobs', 'please', 'some', 'any',
+}
+
+def cache_form(query: str) -> Tuple[str, Tuple[str, ...]]:
+    """(content words to embed, tokens that must match exactly)"""
+    words, exact = [], []
+    for token in tokenize(query.replace("'", '')):
+        if any(ch.isdigit() for ch in token):
+            exact.append(token)
+        elif token not in STOPWORDS:
+            words.append(token)
+    return ' '.join(words), tuple(sorted(exact))
+
+class SemanticCache:
+    """LRU + TTL result cache keyed by query embedding similarity"""
+
+    def __init__(self, capacity: int = CACHE_CAPACITY, ttl: float = CACHE_TTL,
+                 threshold: float = CACHE_THRESHOLD, embedder: Optional[HashingEmbedder] = None):
+        # Independent of the index's embedder, so snapshots can change model
+        self.embedder = embedder or HashingEmbedder()
+        self.capacity = capacity
+        self.ttl = ttl
+        self.threshold = threshold
+        self.vectors = np.zeros((capacity, self.embedder.dim), dtype=np.float32)
+        self.entries = OrderedDict()  # slot -> (text, key, created, result), least recently used first
+        self.exact = {}  # (text, key) -> slot
+        self.free = list(range(capacity - 1, -1, -1))
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.entries.clear()
+        self.exact.clear()
+        self.free = list(range(self.capacity - 1, -1, -1))
+
+    def _drop(self, slot: int):
+        text, key, _, _ = self.entries.pop(slot)
+        self.exact.pop((text, key), None)
+        self.free.append(slot)
+
+    def _fresh(self, slot: int, now: float) -> bool:
+        if now - self.entries[slot][2] <= self.ttl:
+            return True
+        self._drop(slot)
+        return False
+
+    def lookup(self, text: str, key: str, vector: np.ndarray, version: str):
+        if version != self.version:
+            self.clear()
+            self.version = version
+        now = time.monotonic()
+
+        slot = self.exact.get((text, key))
+        if slot is None and text and self.entries:
+            slots = np.fromiter(self.entries.keys(), dtype=np.int64, count=len(self.entries))
+            similarities = self.vectors[slots] @ vector
+            for position in np.argsort(-similarities):
+                if similarities[position] < self.threshold:
+                    break
+                candidate = int(slots[position])
+                if self.entries[candidate][1] == key:
+                    slot = candidate
+                    break
+        if slot is not None and self._fresh(slot, now):
+            self.entries.move_to_end(slot)
+            self.hits += 1
+            return self.entries[slot][3]
+        self.misses += 1
+        return None
+
+    def store(self, text: str, key: str, vector: np.ndarray, version: str, result):
+        if version != self.version:
+            return  # the index changed while this query ran
+        if (text, key) in self.exact:
+            self._drop(self.exact[(text, key)])
+        if not self.free:
+            self._drop(next(iter(self.entries)))
+        slot = self.free.pop()
+        self.vectors[slot] = vector
+        self.entries[slot] = (text, key, time.monotonic(), result)
+        self.exact[(text, key)] = slot
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {'entries': len(self.entries), 'capacity': self.capacity, 'hits': self.hits,
+                'misses': self.misses, 'hit_rate': round(self.hits / total, 4) if total else 0.0}
+
+class RetrievalService:
+    def __init__(self, manager: IndexManager, cache: Optional[SemanticCache] = None):
+        self.manager = manager
+        self.cache = cache if cache is not None else SemanticCache()
+        self.parser: Optional[Tuple[str, QueryParser]] = None  # (index version, parser)
+        self.queries = 0
+
+    @property
+    def index(self) -> ChunkIndex:
+        return self.manager.index
+
+    def parse(self, body: Dict) -> Dict:
+        query = str(body.get('query') or '').strip()
+        if not query:
+            raise ValueError("'query' is required")
+        filters = body.get('filters') or {}
+        if not isinstance(filters, dict):
+            raise ValueError("'filters' must be an object")
+        return {
+            'query': query,
+            'k': max(1, min(int(body.get('k', 5)), MAX_K)),
+            'filters': filters,
+            'alpha': min(max(float(body.get('alpha', DEFAULT_ALPHA)), 0.0), 1.0),
+            'cache': body.get('cache', True) is not False,
+            'understand': body.get('understand', True) is not False,
+        }
+
+    def query_parser(self, index: ChunkIndex) -> QueryParser:
+        """Parser over the catalogue of the given snapshot, rebuilt when the snapshot changes"""
+        if self.parser is None or self.parser[0] != index.version:
+            self.parser = (index.version, QueryParser.from_index(index))
+        return self.parser[1]
+
+    def understand(self, request: Dict, index: ChunkIndex):
+        """Add the query's own constraints to the request; explicit filters win"""
+        request['text'] = request['query']
+        request['understood'] = None
+        if not request['understand']:
+            return
+        parsed = self.query_parser(index).parse(request['query'])
+        request['text'] = parsed['text']
+        if parsed['filters']:
+            request['understood'] = summary(parsed)
+            if 'product_id' not in request['filters']:
+                request['filters'] = dict(request['filters'], **parsed['filters'])
+
+    def cached(self, request: Dict, index: ChunkIndex):
+        """(cached results or None, cache text, cache key, cache vector)"""
+        text, exact = cache_form(request['query'])
+        # The understood constraints stand in for the product ids they resolved to
+        explicit = {name: value for name, value in request['filters'].items()
+                    if not (request['understood'] and name == 'product_id')}
+        key = json.dumps([exact, request['k'], explicit, request['understood'], request['alpha']], sort_keys=True)
+        vector = self.cache.embedder.embed_query(text)
+        if not request['cache']:
+            return None, text, key, vector
+        return self.cache.lookup(text, key, vector, index.version), text, key, vector
+
+    def search(self, request: Dict, index: ChunkIndex):
+        return index.search(request['text'], request['k'], request['filters'], request['alpha'])
+
+    async def handle_search(self, body: Dict) -> Dict:
+        started = time.perf_counter()
+        request = self.parse(body)
+        self.queries += 1
+        # The snapshot stays open until this query is done, even if a new one is swapped in
+        with self.manager.acquire() as index:
+            self.understand(request, index)
+            results, text, key, vector = self.cached(request, index)
+            hit = results is not None
+            if not hit:
+                # Scoring runs off the event loop so other connections keep being served
+                results = await asyncio.get_running_loop().run_in_executor(None, self.search, request, index)
+                if request['cache']:
+                    self.cache.store(text, key, vector, index.version, results)
+            version = index.version
+        return {'query': request['query'], 'version': version, 'cached': hit, 'understood': request['understood'],
+                'took_ms': round((time.perf_counter() - started) * 1000, 3), 'results': results}
+
+    def health(self) -> Dict:
+        return {'status': 'healthy', 'service': 'retrieval-service', 'version': self.index.version,
+                'chunks': len(self.index), 'pid': os.getpid()}
+
+    def product(self, product_id: str) -> Optional[Dict]:
+        with self.manager.acquire() as index:
+            return index.product(product_id)
+
+    def stats(self) -> Dict:
+        return {'pid': os.getpid(), 'version': self.index.version, 'snapshot': self.manager.snapshot.path,
+                'swaps': self.manager.swaps, 'queries': self.queries, 'cache': self.cache.stats()}
+
+    async def reload(self):
+        """Switch to a new current snapshot, then delete snapshots nobody uses any more"""
+        loop = asyncio.get_running_loop()
+        version = self.index.version
+        await loop.run_in_executor(None, self.manager.reload)
+        if self.index.version != version:
+            print(f"🔄 Switched to index {self.index.version} ({len(self.index)} chunks)", flush=True)
+            await loop.run_in_executor(None, collect_snapshots, self.manager.root)
+
+    async def watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reload()
+            except Exception as e:
+                print(f"⚠️  Index reload failed: {e}", flush=True)
+
+    async def route(self, method: str, path: str, body: bytes) -> Tuple[int, Dict]:
+        path = path.split('?', 1)[0]
+        if path == '/health' and method == 'GET':
+            return HTTPStatus.OK, self.health()
+        if path == '/stats' and method == 'GET':
+            return HTTPStatus.OK, self.stats()
+        if path.startswith('/products/') and method == 'GET':
+            product = self.product(unquote(path[len('/products/'):]))
+            if product is None:
+                return HTTPStatus.NOT_FOUND, {'error': 'Product not found'}
+            return HTTPStatus.OK, product
+        if path == '/search':
+            if method != 'POST':
+                return HTTPStatus.METHOD_NOT_ALLOWED, {'error': 'Use POST'}
+            try:
+                payload = json.loads(body or b'{}')
+                if not isinstance(payload, dict):
+                    raise ValueError('expected a JSON object')
+                return HTTPStatus.OK, await self.handle_search(payload)
+            except (ValueError, TypeError) as e:
+                return HTTPStatus.BAD_REQUEST, {'error': str(e)}
+        return HTTPStatus.NOT_FOUND, {'error': 'Not found'}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """HTTP/1.1 with keep-alive; one request at a time per connection"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                body = await reader.readexactly(length) if length else b''
+
+                try:
+                    status, payload = await self.route(method, path, body)
+                except Exception as e:
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)}
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+async def serve(service: RetrievalService, host: str, port: int, watch_interval: float = WATCH_INTERVAL,
+                sock: Optional[socket.socket] = None):
+    if sock is not None:
+        server = await asyncio.start_server(service.handle_connection, sock=sock)
+    else:
+        server = await asyncio.start_server(service.handle_connection, host, port, reuse_address=True)
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGHUP, lambda: loop.create_task(service.reload()))
+    if watch_interval > 0:
+        loop.create_task(service.watch(watch_interval))
+    print(f"🚀 Retrieval service on http://{host}:{port} "
+          f"(pid {os.getpid()}, index {service.index.version}, {len(service.index)} chunks)", flush=True)
+    async with server:
+        await server.serve_forever()
+
+def run_worker(args, sock: Optional[socket.socket] = None):
+    # Opened here, not inherited: snapshot locks and mmaps belong to the process using them
+    manager = IndexManager(args.index_dir)
+    cache = SemanticCache(args.cache_size, args.cache_ttl, args.cache_threshold)
+    try:
+        asyncio.run(serve(RetrievalService(manager, cache), args.host, args.port, args.watch_interval, sock))
+    except KeyboardInterrupt:
+        pass
+
+def spawn_worker(args, sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+    code = 0
+    try:
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, signal.SIG_DFL)
+        run_worker(args, sock)
+    except BaseException as e:
+        print(f"⚠️  Worker {os.getpid()} failed: {e}", flush=True)
+        code = 1
+    finally:
+        os._exit(code)
+
+def run_workers(args, workers: int):
+    """Pre-fork workers on one listening socket and keep that many running"""
+    sock = socket.create_server((args.host, args.port), backlog=1024)
+    sock.setblocking(False)
+    pids: List[int] = []
+    stopping = False
+
+    def forward(signum, _frame):
+        nonlocal stopping
+        if signum != signal.SIGHUP:
+            stopping = True
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM if signum != signal.SIGHUP else signal.SIGHUP)
+            except ProcessLookupError:
+                pass
+
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        signal.signal(signum, forward)
+    print(f"🧵 Starting {workers} retrieval workers on http://{args.host}:{args.port}", flush=True)
+    pids.extend(spawn_worker(args, sock) for _ in range(workers))
+
+    while pids:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        if pid not in pids:
+            continue
+        pids.remove(pid)
+        if not stopping:
+            print(f"⚠️  Worker {pid} exited ({status}), restarting", flush=True)
+            time.sleep(0.5)
+            pids.append(spawn_worker(args, sock))
+    sock.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Async HTTP retrieval service over the chunk index')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--index-dir', default=CHUNK_INDEX_DIR, help='Snapshot directory')
+    parser.add_argument('--watch-interval', type=float, default=WATCH_INTERVAL,
+                        help='Seconds between checks for a new snapshot (0 = only on SIGHUP)')
+    parser.add_argument('--cache-size', type=int, default=CACHE_CAPACITY, help='Cached queries')
+    parser.add_argument('--cache-ttl', type=float, default=CACHE_TTL, help='Seconds a cached result stays valid')
+    parser.add_argument('--cache-threshold', type=float, default=CACHE_THRESHOLD,
+                        help='Query embedding similarity that counts as the same query')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Worker processes sharing the mmap\'d index (default: 1, 0 = one per CPU)')
+    args = parser.parse_args()
+
+    if current_snapshot(args.index_dir) is None:
+        print("No chunk index found. Run: python chunk_index.py build")
+        return
+    workers = args.workers if args.workers > 0 else os.cpu_count() or 1
+    if workers == 1:
+        run_worker(args)
+    else:
+        run_workers(args, workers)
+
+if __name__ == "__main__":
+    main()
@@ -8,12 +8,51 @@ for different sites with various configuration options.
 
 import os
 import sys
+import json
 import argparse
 import subprocess
 from datetime import datetime
-from config import SITES_CONFIG
+from config import SITES_CONFIG, CRAWLS_DIR, OUTPUT_DIR
 
-def run_scraper(site, limit=None, categories=None, output_dir=None):
+# Crawl budget keys and the scrapy settings they map to
+BUDGET_SETTINGS = {
+    'requests': 'CRAWL_BUDGET_REQUESTS',
+    'bytes': 'CRAWL_BUDGET_BYTES',
+    'seconds': 'CRAWL_BUDGET_SECONDS',
+}
+
+# Output file prefix of each crawl mode; its _metadata.json holds the budget spent
+MODE_OUTPUTS = {
+    'full': 'products',
+    'refresh': 'price_delta',
+    'inventory': 'inventory',
+}
+
+def job_dir(site, run_id):
+    """Scrapy JOBDIR holding the scheduler queue and checkpoints of a run"""
+    return os.path.join(CRAWLS_DIR, f'{site}_{run_id}')
+
+def site_budget(budget, sites):
+    """Share of the remaining budget for the first of the remaining sites"""
+    weights = [SITES_CONFIG[site].get('budget_weight', 1.0) for site in sites]
+    share = weights[0] / sum(weights)
+    return {key: int(value * share) for key, value in budget.items() if value}
+
+def budget_used(output_dir, site, run_id, mode='full'):
+    """Requests, bytes and seconds a finished run spent, from its metadata file"""
+    metadata_file = os.path.join(output_dir or OUTPUT_DIR, f'{MODE_OUTPUTS[mode]}_{site}_{run_id}_metadata.json')
+    try:
+        with open(metadata_file, 'r', encoding='utf-8') as f:
+            budget = json.load(f).get('budget', {})
+    except (OSError, json.JSONDecodeError):
+        return None
+    return {
+        'requests': budget.get('requests_granted', 0),
+        'bytes': budget.get('bytes_used', 0),
+        'seconds': budget.get('seconds_elapsed', 0),
+    }
+
+def run_scraper(site, limit=None, categories=None, output_dir=None, run_id=None, resume=False, budget=None, mode='full'):
     """Run the scrapy spider with specified parameters"""
     
     if site not in SITES_CONFIG:
@@ -21,25 +60,36 @@ def run_scraper(site, limit=None, categories=None, output_dir=None):
         print(f"Available sites: {list(SITES_CONFIG.keys())}")
         return False
     
-    # Prepare scrapy command
-    cmd = ['scrapy', 'crawl', 'hardware', '-a', f'site={site}']
+    run_id = run_id or datetime.now().strftime('%Y%m%d_%H%M%S')
+    crawl_dir = job_dir(site, run_id)
+    if resume and not os.path.isdir(crawl_dir):
+        print(f"Error: No interrupted run '{run_id}' for {site} in {CRAWLS_DIR}")
+        return False
+    
+    # Prepare scrapy command; JOBDIR persists the request queue and
+    # seen-request fingerprints so the run can be resumed
+    cmd = ['scrapy', 'crawl', 'hardware', '-a', f'site={site}',
+           '-s', f'JOBDIR={os.path.abspath(crawl_dir)}', '-s', f'RUN_ID={run_id}']
     
     # Add custom settings if specified
     if limit:
         cmd.extend(['-s', f'CLOSESPIDER_ITEMCOUNT={limit}'])
     
+    if mode != 'full':
+        cmd.extend(['-a', f'mode={mode}'])
+    
+    for key, value in (budget or {}).items():
+        cmd.extend(['-s', f'{BUDGET_SETTINGS[key]}={value}'])
+    
     if output_dir:
-        cmd.extend(['-s', f'FEEDS_STORE_EMPTY=false'])
-        # Update output directory in feeds
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        json_feed = f'{output_dir}/products_{site}_{timestamp}.json'
-        csv_feed = f'{output_dir}/products_{site}_{timestamp}.csv'
-        cmd.extend(['-O', json_feed])
+        # JsonWriterPipeline writes products_<site>_<run id>.json here
+        cmd.extend(['-s', f'OUTPUT_DIR={os.path.abspath(output_dir)}'])
     
     # Set log level
     cmd.extend(['-L', 'INFO'])
     
-    print(f"Starting scraper for {SITES_CONFIG[site]['name']}...")
+    action = 'Resuming' if resume else 'Starting'
+    print(f"{action} scraper for {SITES_CONFIG[site]['name']} (run id: {run_id})...")
     print(f"Command: {' '.join(cmd)}")
     
     try:
@@ -48,6 +98,10 @@ def run_scraper(site, limit=None, categories=None, output_dir=None):
         return True
     except subprocess.CalledProcessError as e:
         print(f"Scraping failed with error: {e}")
+        print(f"Resume with: python run_scraper.py {site} --resume {run_id}")
+        return False
+    except KeyboardInterrupt:
+        print(f"\nScraping interrupted. Resume with: python run_scraper.py {site} --resume {run_id}")
         return False
 
 def main():
@@ -55,8 +109,8 @@ def main():
     
     parser.add_argument(
         'site',
-        choices=list(SITES_CONFIG.keys()),
-        help='Site to scrape'
+        choices=list(SITES_CONFIG.keys()) + ['all'],
+        help='Site to scrape, or all sites sharing one budget'
     )
     
     parser.add_argument(
@@ -78,6 +132,47 @@ def main():
         help='Specific categories to scrape'
     )
     
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        '--refresh',
+        action='store_const',
+        dest='mode',
+        const='refresh',
+        default='full',
+        help='Only re-check price and availability of known products'
+    )
+    mode.add_argument(
+        '--inventory',
+        action='store_const',
+        dest='mode',
+        const='inventory',
+        help='Collect per-store stock of known products (needs inventory_api in config)'
+    )
+    
+    parser.add_argument(
+        '--budget-requests',
+        type=int,
+        help='Product page requests to spend, split across sitemaps and categories'
+    )
+    
+    parser.add_argument(
+        '--budget-mb',
+        type=float,
+        help='Megabytes to download before stopping'
+    )
+    
+    parser.add_argument(
+        '--budget-minutes',
+        type=float,
+        help='Minutes to crawl before stopping'
+    )
+    
+    parser.add_argument(
+        '--resume',
+        metavar='RUN_ID',
+        help='Resume an interrupted run (the run id printed when it started)'
+    )
+    
     parser.add_argument(
         '--dry-run',
         action='store_true',
@@ -106,19 +201,46 @@ def main():
         print(f"  Limit: {args.limit}")
         print(f"  Output dir: {args.output_dir}")
         print(f"  Categories: {args.categories}")
+        print(f"  Resume: {args.resume}")
+        print(f"  Mode: {args.mode}")
+        print(f"  Budget: {args.budget_requests} requests, {args.budget_mb} MB, {args.budget_minutes} min")
         return
     
-    # Run the scraper
-    success = run_scraper(
-        site=args.site,
-        limit=args.limit,
-        categories=args.categories,
-        output_dir=args.output_dir
-    )
+    budget = {
+        'requests': args.budget_requests or 0,
+        'bytes': int((args.budget_mb or 0) * 1024 * 1024),
+        'seconds': int((args.budget_minutes or 0) * 60),
+    }
+    limited = [key for key, value in budget.items() if value]
+    sites = list(SITES_CONFIG.keys()) if args.site == 'all' else [args.site]
+    run_id = args.resume or datetime.now().strftime('%Y%m%d_%H%M%S')
+    
+    # Sites run one after another; what a site leaves unspent goes to the next
+    success = True
+    for i, site in enumerate(sites):
+        if any(budget[key] <= 0 for key in limited):
+            print(f"Crawl budget exhausted, skipping {', '.join(sites[i:])}")
+            break
+        
+        success = run_scraper(
+            site=site,
+            limit=args.limit,
+            categories=args.categories,
+            output_dir=args.output_dir,
+            run_id=run_id,
+            resume=bool(args.resume),
+            budget=site_budget(budget, sites[i:]),
+            mode=args.mode
+        ) and success
+        
+        used = budget_used(args.output_dir, site, run_id, args.mode)
+        for key in limited:
+            budget[key] -= used[key] if used else budget[key] // len(sites[i:])
     
     if success:
         print(f"\nData saved to: {args.output_dir}")
-        print(f"Manuals saved to: ./manuals/{args.site}")
+        for site in sites:
+            print(f"Manuals saved to: ./manuals/{site}")
     else:
         sys.exit(1)
 
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Numeric Specification Normalizer
+
+Turns free-text specification values such as "2-speed (0-450/0-1,500 RPM)",
+"1/2 inch keyless" or "1,800 in-lbs fastening / 1,200 in-lbs breakaway" into
+typed numeric columns in SI units, keeping the raw string alongside.
+
+The grammar is a single compiled regex (numbers, fractions, ranges, units) that
+runs through pandas' vectorized string engine over a whole catalogue at once.
+Each distinct raw value is parsed only once.
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import pandas as pd
+
+from catalogue import load_products
+from config import OUTPUT_DIR
+
+# Numbers: mixed fractions (1-1/2), fractions (3/8), thousands (1,500), decimals
+NUMBER = (
+    r'\d+-\d{1,2}/(?:64|32|16|8|4|2)(?!\d)'
+    r'|\d{1,2}/(?:64|32|16|8|4|2)(?!\d)'
+    r'|\d{1,3}(?:,\d{3})+(?:\.\d+)?'
+    r'|\d*\.\d+'
+    r'|\d+'
+)
+
+UNIT = (
+    r'in\.?[\s-]?lbs?|inch[\s-]pounds?|ft\.?[\s-]?lbs?|foot[\s-]pounds?|n\.?[\s·]?m'
+    r'|inches|inch|in\.?|feet|foot|ft|mm|cm'
+    r'|lbs?|pounds?|oz|kg'
+    r'|rpm|ipm|bpm|spm|opm'
+    r'|degrees?|°'
+    r'|amps?|volts?|v|watts?|w|uwo|mah|ah'
+    r'|sizes?|speeds?|positions?|pieces?|pcs?|flutes?|settings?|screws?'
+    r'|"'
+)
+
+QUANTITY_RE = re.compile(
+    r'(?<![A-Za-z0-9.])(?<![A-Za-z]-)'
+    r'(?P<gauge>\#)?(?P<lo>' + NUMBER + r')(?!\d)(?!(?:th|st|nd|rd)s?\b)'
+    r'(?:\s*(?:-|–|to)\s*\#?(?P<hi>' + NUMBER + r')(?!\d))?'
+    r'(?:[\s-]*(?P<unit>(?:' + UNIT + r')(?![A-Za-z])))?'
+    r'(?P<tail>\s*(?:/|,|&|and|or)\s*)?',
+    re.IGNORECASE,
+)
+
+# Normalized unit token -> (dimension, SI unit, factor to SI)
+UNITS = {
+    'in': ('length', 'm', 0.0254), 'inch': ('length', 'm', 0.0254),
+    'inches': ('length', 'm', 0.0254), '"': ('length', 'm', 0.0254),
+    'ft': ('length', 'm', 0.3048), 'foot': ('length', 'm', 0.3048),
+    'feet': ('length', 'm', 0.3048), 'mm': ('length', 'm', 0.001),
+    'cm': ('length', 'm', 0.01),
+    'lb': ('mass', 'kg', 0.45359237), 'lbs': ('mass', 'kg', 0.45359237),
+    'pound': ('mass', 'kg', 0.45359237), 'pounds': ('mass', 'kg', 0.45359237),
+    'oz': ('mass', 'kg', 0.028349523125), 'kg': ('mass', 'kg', 1.0),
+    'inlb': ('torque', 'N*m', 0.1129848290276167), 'inlbs': ('torque', 'N*m', 0.1129848290276167),
+    'inchpound': ('torque', 'N*m', 0.1129848290276167), 'inchpounds': ('torque', 'N*m', 0.1129848290276167),
+    'ftlb': ('torque', 'N*m', 1.3558179483314004), 'ftlbs': ('torque', 'N*m', 1.3558179483314004),
+    'footpound': ('torque', 'N*m', 1.3558179483314004), 'footpounds': ('torque', 'N*m', 1.3558179483314004),
+    'nm': ('torque', 'N*m', 1.0),
+    # No-load speed and impact/stroke rates share specs ("0-2,000 RPM, 0-3,200 IPM") but not a scale
+    'rpm': ('rotational_speed', 'rev/s', 1 / 60), 'opm': ('rotational_speed', 'rev/s', 1 / 60),
+    'ipm': ('impact_rate', 'Hz', 1 / 60), 'bpm': ('impact_rate', 'Hz', 1 / 60),
+    'spm': ('impact_rate', 'Hz', 1 / 60),
+    'degree': ('angle', 'rad', math.pi / 180), 'degrees': ('angle', 'rad', math.pi / 180),
+    '°': ('angle', 'rad', math.pi / 180),
+    'amp': ('current', 'A', 1.0), 'amps': ('current', 'A', 1.0),
+    'v': ('voltage', 'V', 1.0), 'volt': ('voltage', 'V', 1.0), 'volts': ('voltage', 'V', 1.0),
+    'w': ('power', 'W', 1.0), 'watt': ('power', 'W', 1.0), 'watts': ('power', 'W', 1.0),
+    'uwo': ('power', 'W', 1.0),
+    'ah': ('charge', 'C', 3600.0), 'mah': ('charge', 'C', 3.6),
+}
+COUNT_UNITS = ('size', 'speed', 'position', 'piece', 'pc', 'flute', 'setting', 'screw')
+
+# SI unit -> column suffix
+UNIT_SLUGS = {
+    'm': 'm', 'kg': 'kg', 'N*m': 'nm', 'rev/s': 'rps', 'Hz': 'hz', 'rad': 'rad', 'A': 'a',
+    'V': 'v', 'W': 'w', 'C': 'c', 'count': 'count', '#': 'gauge', '': 'num',
+}
+
+def normalize_unit_token(token: str) -> str:
+    """Lowercase a unit token and strip separators (in. lbs -> inlbs)"""
+    return re.sub(r'[\s.\-·]', '', token.lower())
+
+def unit_info(token) -> tuple:
+    """Map a raw unit token to (dimension, SI unit, factor)"""
+    if not isinstance(token, str) or not token:
+        return ('number', '', 1.0)
+    key = normalize_unit_token(token)
+    if key in UNITS:
+        return UNITS[key]
+    if key.rstrip('s') in COUNT_UNITS:
+        return ('count', 'count', 1.0)
+    return ('number', '', 1.0)
+
+def parse_number(text: str) -> float:
+    """Parse '1-1/2', '3/8', '1,500' or '3.6' into a float"""
+    text = text.replace(',', '')
+    if '/' in text:
+        whole, _, fraction = text.rpartition('-') if '-' in text else ('0', '', text)
+        numerator, denominator = fraction.split('/')
+        return float(whole) + float(numerator) / float(denominator)
+    return float(text)
+
+def slugify(key: str) -> str:
+    """Turn a specification key into a column-safe name"""
+    return re.sub(r'[^a-z0-9]+', '_', key.lower()).strip('_')
+
+def parse_quantities(text: str) -> List[Dict]:
+    """Extract every quantity in a single string (per-record path)"""
+    found = []
+    for match in QUANTITY_RE.finditer(text):
+        found.append({
+            'lo': match.group('lo'),
+            'hi': match.group('hi'),
+            'unit': match.group('unit'),
+            'gauge': match.group('gauge'),
+            'tail': match.group('tail'),
+        })
+
+    # A unitless value directly followed by a separator takes the next unit:
+    # "0-450/0-1,500 RPM", "3/4, 7/8, 1 inch"
+    next_unit = None
+    for quantity in reversed(found):
+        if quantity['unit']:
+            next_unit = quantity['unit']
+        elif quantity['tail'] and next_unit:
+            quantity['unit'] = next_unit
+
+    by_dimension = {}
+    for quantity in found:
+        dimension, unit, factor = unit_info(quantity['unit'])
+        if quantity['gauge']:
+            dimension, unit, factor = 'gauge', '#', 1.0
+        lo = parse_number(quantity['lo']) * factor
+        hi = parse_number(quantity['hi']) * factor if quantity['hi'] else lo
+        entry = by_dimension.setdefault(dimension, {
+            'dimension': dimension, 'unit': unit, 'min': lo, 'max': hi, 'count': 0,
+        })
+        entry['min'] = min(entry['min'], lo, hi)
+        entry['max'] = max(entry['max'], lo, hi)
+        entry['count'] += 1
+
+    for entry in by_dimension.values():
+        entry['min'] = round(entry['min'], 9)
+        entry['max'] = round(entry['max'], 9)
+    return list(by_dimension.values())
+
+def normalize_specifications(specs: Dict) -> Dict:
+    """Normalize one specifications dict, keeping the raw value of each key"""
+    normalized = {}
+    for key, raw in (specs or {}).items():
+        if isinstance(raw, list):
+            raw = ', '.join(str(v) for v in raw)
+        if not isinstance(raw, (str, int, float)):
+            continue
+        raw = str(raw)
+        normalized[key] = {'raw': raw, 'quantities': parse_quantities(raw)}
+    return normalized
+
+def normalize_values(raw: pd.Series) -> pd.DataFrame:
+    """Vectorized parse of a Series of raw strings
+
+    Returns one row per (raw value, dimension) with SI min/max and the number
+    of quantities found. Raw values with no quantity produce no rows.
+    """
+    columns = ['raw', 'dimension', 'unit', 'min', 'max', 'count']
+    uniques = pd.Series(raw.dropna().astype(str).unique())
+    if uniques.empty:
+        return pd.DataFrame(columns=columns)
+
+    matches = uniques.str.extractall(QUANTITY_RE)
+    if matches.empty:
+        return pd.DataFrame(columns=columns)
+
+    # Back-fill units onto unitless values followed by a separator
+    unit = matches['unit']
+    backfilled = unit.groupby(level=0).bfill()
+    unit = unit.where(unit.notna() | matches['tail'].isna(), backfilled)
+
+    unit_keys = unit.dropna().unique()
+    info = {token: unit_info(token) for token in unit_keys}
+    dimension = unit.map(lambda t: info[t][0] if isinstance(t, str) else 'number')
+    si_unit = unit.map(lambda t: info[t][1] if isinstance(t, str) else '')
+    factor = unit.map(lambda t: info[t][2] if isinstance(t, str) else 1.0).astype(float)
+
+    is_gauge = matches['gauge'].notna()
+    dimension = dimension.where(~is_gauge, 'gauge')
+    si_unit = si_unit.where(~is_gauge, '#')
+    factor = factor.where(~is_gauge, 1.0)
+
+    numbers = pd.concat([matches['lo'], matches['hi']]).dropna().unique()
+    parsed = {text: parse_number(text) for text in numbers}
+    lo = matches['lo'].map(parsed) * factor
+    hi = matches['hi'].map(parsed).fillna(matches['lo'].map(parsed)) * factor
+
+    frame = pd.DataFrame({
+        'row': matches.index.get_level_values(0),
+        'dimension': dimension.values,
+        'unit': si_unit.values,
+        'min': pd.concat([lo, hi], axis=1).min(axis=1).values,
+        'max': pd.concat([lo, hi], axis=1).max(axis=1).values,
+    })
+    grouped = frame.groupby(['row', 'dimension'], sort=False).agg(
+        unit=('unit', 'first'), min=('min', 'min'), max=('max', 'max'), count=('min', 'size'),
+    ).reset_index()
+    grouped['min'] = grouped['min'].round(9)
+    grouped['max'] = grouped['max'].round(9)
+    grouped['raw'] = uniques.values[grouped['row'].values]
+    return grouped[columns]
+
+def specification_frame(products: List[Dict], fields=('specifications', 'drilling_capacity', 'size_range')) -> pd.DataFrame:
+    """Flatten product spec dicts into a long (product_id, field, spec_key, raw) frame"""
+    rows = []
+    for product in products:
+        for field in fields:
+            for key, raw in (product.get(field) or {}).items():
+                if isinstance(raw, list):
+                    raw = ', '.join(str(v) for v in raw)
+                if isinstance(raw, (str, int, float)):
+                    rows.append((product['id'], field, key, str(raw)))
+    return pd.DataFrame(rows, columns=['product_id', 'field', 'spec_key', 'raw'])
+
+def normalize_catalogue(products: List[Dict]) -> Dict[str, pd.DataFrame]:
+    """Normalize every specification of a catalogue
+
+    Returns the long frame (one row per product, spec key and dimension) and
+    the wide frame (one row per product, '<key>_<unit>_min/max' columns plus
+    '<key>_raw').
+    """
+    specs = specification_frame(products)
+    values = normalize_values(specs['raw'])
+    long = specs.merge(values, on='raw', how='left')
+
+    parsed = long.dropna(subset=['dimension']).copy()
+    parsed['column'] = (
+        parsed['spec_key'].map(slugify) + '_' + parsed['unit'].map(UNIT_SLUGS)
+    )
+    wide_min = parsed.pivot_table(index='product_id', columns='column', values='min', aggfunc='min')
+    wide_max = parsed.pivot_table(index='product_id', columns='column', values='max', aggfunc='max')
+    wide_min.columns = [f'{c}_min' for c in wide_min.columns]
+    wide_max.columns = [f'{c}_max' for c in wide_max.columns]
+
+    raw = specs.drop_duplicates(['product_id', 'spec_key']).pivot(
+        index='product_id', columns='spec_key', values='raw'
+    )
+    raw.columns = [f'{slugify(c)}_raw' for c in raw.columns]
+
+    wide = pd.concat([wide_min, wide_max, raw], axis=1)
+    wide = wide.reindex(sorted(wide.columns), axis=1)
+    return {'long': long, 'wide': wide}
+
+def coverage_report(long: pd.DataFrame) -> Dict:
+    """Summarize which spec values produced no numeric quantity"""
+    per_value = long.groupby(['spec_key', 'raw'], sort=False)['dimension'].apply(
+        lambda s: s.notna().any()
+    ).reset_index(name='parsed')
+    has_digits = per_value['raw'].str.contains(r'\d', regex=True)
+
+    unparsed = per_value[~per_value['parsed'] & has_digits]
+    non_numeric = per_value[~per_value['parsed'] & ~has_digits]
+
+    return {
+        'total_values': int(len(per_value)),
+        'parsed': int(per_value['parsed'].sum()),
+        'non_numeric': int(len(non_numeric)),
+        'unparsed_numeric': int(len(unparsed)),
+        'coverage': round(float(per_value['parsed'].sum()) / max(1, int((per_value['parsed'] | has_digits).sum())), 4),
+        'unparsed_by_key': unparsed.groupby('spec_key')['raw'].apply(list).to_dict(),
+    }
+
+def run_benchmark(products: List[Dict], copies: int = 200) -> Dict:
+    """Compare the vectorized catalogue path with a per-record loop"""
+    catalogue = []
+    for i in range(copies):
+        for product in products:
+            record = dict(product)
+            record['id'] = f"{product['id']}#{i}"
+            catalogue.append(record)
+
+    total_values = len(specification_frame(catalogue))
+
+    start = time.perf_counter()
+    normalize_catalogue(catalogue)
+    vectorized = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for product in catalogue:
+        for field in ('specifications', 'drilling_capacity', 'size_range'):
+            normalize_specifications(product.get(field))
+    per_record = time.perf_counter() - start
+
+    return {
+        'products': len(catalogue),
+        'spec_values': total_values,
+        'vectorized_seconds': round(vectorized, 4),
+        'vectorized_values_per_sec': int(total_values / vectorized) if vectorized else None,
+        'per_record_seconds': round(per_record, 4),
+        'per_record_values_per_sec': int(total_values / per_record) if per_record else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Normalize product specifications into SI columns')
+    parser.add_argument('--benchmark', action='store_true', help='Run the throughput benchmark')
+    parser.add_argument('--copies', type=int, default=200, help='Catalogue copies for the benchmark')
+    args = parser.parse_args()
+
+    products = load_products()
+    if not products:
+        print("No product data found. Run comprehensive_drill_data.py first.")
+        return
+
+    print(f"📐 Normalizing specifications for {len(products)} products...")
+    result = normalize_catalogue(products)
+    report = coverage_report(result['long'])
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    specs_file = os.path.join(OUTPUT_DIR, f'normalized_specs_{timestamp}.csv')
+    result['wide'].to_csv(specs_file)
+    report_file = os.path.join(OUTPUT_DIR, f'spec_coverage_{timestamp}.json')
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print(f"✅ {report['parsed']}/{report['total_values']} distinct values parsed "
+          f"({report['non_numeric']} non-numeric, {report['unparsed_numeric']} unparsed)")
+    print(f"📊 Coverage of numeric values: {report['coverage']:.1%}")
+    for key, values in report['unparsed_by_key'].items():
+        print(f"   • {key}: {', '.join(values[:3])}")
+    print(f"📄 Typed columns: {specs_file} ({len(result['wide'].columns)} columns)")
+    print(f"📄 Coverage report: {report_file}")
+
+    if args.benchmark:
+        print(f"\n⏱️  Benchmarking with {args.copies}x catalogue...")
+        bench = run_benchmark(products, args.copies)
+        print(f"   • Spec values: {bench['spec_values']}")
+        print(f"   • Vectorized: {bench['vectorized_seconds']}s ({bench['vectorized_values_per_sec']}/s)")
+        print(f"   • Per-record: {bench['per_record_seconds']}s ({bench['per_record_values_per_sec']}/s)")
+
+if __name__ == "__main__":
+    main()
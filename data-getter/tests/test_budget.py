@@ -0,0 +1,33 @@
+import time
+
+from scrapy.utils.test import get_crawler
+
+from hardware_scraper.budget import CrawlBudget
+from hardware_scraper.checkpoint import CheckpointStore
+
+DRILLS = 'https://www.rona.ca/sitemap_products_drills.xml'
+SAWS = 'https://www.rona.ca/sitemap_products_saws.xml'
+
+def entries(sitemap, count):
+    return [{'loc': f'{sitemap}/p/{i}', 'priority': 0} for i in range(count)]
+
+def new_budget(job_dir):
+    crawler = get_crawler(settings_dict={'JOBDIR': str(job_dir), 'CRAWL_BUDGET_REQUESTS': 10})
+    return CrawlBudget.from_crawler(crawler, {})
+
+def test_resumed_crawl_only_spends_the_remainder(tmp_path):
+    budget = new_budget(tmp_path)
+    budget.register_shards([DRILLS, SAWS])
+    budget.started = time.time() - 120
+    assert len(budget.grant(DRILLS, entries(DRILLS, 20))) == 5
+    # Interrupted before the second sitemap arrived
+    CheckpointStore(str(tmp_path)).save('CrawlBudget', budget.checkpoint_state())
+
+    resumed = new_budget(tmp_path)
+    resumed.register_shards([DRILLS, SAWS])
+    resumed.started = time.time()
+    # Both sitemaps are parsed again; the drills shard already had its share
+    assert resumed.grant(DRILLS, entries(DRILLS, 15)) == []
+    assert len(resumed.grant(SAWS, entries(SAWS, 20))) == 5
+    assert resumed.granted == 10
+    assert resumed.elapsed() >= 120
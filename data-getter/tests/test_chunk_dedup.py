@@ -0,0 +1,47 @@
+from chunk_dedup import DEFAULT_THRESHOLD, dedupe_chunks, extract_shared_items, near_duplicate_groups
+
+OVERVIEW = ("Drill: DEWALT 20V MAX Cordless Drill/Driver Kit by DEWALT (Model: {model}). Type: Cordless. "
+            "Compact, lightweight design fits into tight areas; high performance motor delivers 300 unit watts "
+            "out; 2-speed transmission with 0-450 and 0-1,500 RPM. Price: {price}.")
+SAFETY = "Safety Information: Always wear safety glasses when operating; Ensure chuck is securely tightened{end}"
+
+def chunk(product_id, chunk_type, content, canonical_id=None):
+    metadata = {'product_id': product_id}
+    if canonical_id:
+        metadata['canonical_id'] = canonical_id
+    return {'id': f'{product_id}_{chunk_type}', 'type': chunk_type, 'content': content, 'metadata': metadata}
+
+def test_sibling_models_are_not_merged():
+    chunks = [
+        chunk('dcd771c2', 'drill_overview', OVERVIEW.format(model='DCD771C2', price='$99.00')),
+        chunk('dcd777c2', 'drill_overview', OVERVIEW.format(model='DCD777C2', price='$129.00')),
+    ]
+    deduped, report = dedupe_chunks(chunks)
+    assert report['chunks_after'] == 2
+    assert {c['content'] for c in deduped} == {c['content'] for c in chunks}
+
+def test_different_numbers_are_not_near_duplicates():
+    texts = [OVERVIEW.format(model='DCD771C2', price='$99.00'), OVERVIEW.format(model='DCD771C2', price='$129.00')]
+    assert len(near_duplicate_groups(texts)) == 2
+
+def test_boilerplate_near_duplicates_are_merged():
+    chunks = [chunk('a', 'safety', SAFETY.format(end='.')), chunk('b', 'safety', SAFETY.format(end=' before use'))]
+    deduped, _ = dedupe_chunks(chunks, min_products=5)
+    assert len(deduped) == 1
+    assert deduped[0]['metadata']['product_ids'] == ['a', 'b']
+
+def test_listings_of_one_canonical_product_are_merged():
+    chunks = [
+        chunk('rona-dcd771c2', 'drill_overview', OVERVIEW.format(model='DCD771C2', price='$99.00'), 'dewalt-dcd771c2'),
+        chunk('ct-0541234', 'drill_overview', OVERVIEW.format(model='DCD771C2', price='$109.99'), 'dewalt-dcd771c2'),
+        chunk('dcd777c2', 'drill_overview', OVERVIEW.format(model='DCD777C2', price='$129.00'), 'dewalt-dcd777c2'),
+    ]
+    deduped, _ = dedupe_chunks(chunks)
+    assert len(deduped) == 2
+    merged = next(c for c in deduped if c['metadata'].get('shared'))
+    assert merged['metadata']['canonical_id'] == 'dewalt-dcd771c2'
+    assert merged['metadata']['product_ids'] == ['rona-dcd771c2', 'ct-0541234']
+
+def test_one_product_on_several_sites_counts_once_for_shared_items():
+    chunks = [chunk(f'site{i}-dcd771c2', 'safety', SAFETY.format(end=''), 'dewalt-dcd771c2') for i in range(3)]
+    assert extract_shared_items(chunks, DEFAULT_THRESHOLD, min_products=2) == chunks
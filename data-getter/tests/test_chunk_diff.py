@@ -0,0 +1,23 @@
+import json
+import os
+
+from chunk_diff import list_diffs, publish
+from pg_loader import diff_vectors
+
+def chunks(*contents):
+    return [{'id': f'c{i}', 'type': 'features', 'content': content, 'metadata': {}} for i, content in enumerate(contents)]
+
+def test_every_diff_is_listed_in_publish_order(tmp_path):
+    first = publish(chunks('drill', 'saw'), str(tmp_path))['path']
+    second = publish(chunks('drill', 'saw', 'bit'), str(tmp_path))['path']
+    third = publish(chunks('drill'), str(tmp_path))['path']
+    assert list_diffs(str(tmp_path)) == [first, second, third]
+
+def test_diff_published_without_embeddings_is_embedded_by_the_loader(tmp_path):
+    path = publish(chunks('drill', 'saw'), str(tmp_path))['path']
+    assert not os.path.exists(os.path.join(path, 'vectors.npy'))
+    with open(os.path.join(path, 'diff.json'), encoding='utf-8') as f:
+        diff = json.load(f)
+    vectors, ids = diff_vectors(path, diff)
+    assert ids == ['c0', 'c1']
+    assert vectors.shape[0] == 2
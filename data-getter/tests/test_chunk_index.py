@@ -0,0 +1,17 @@
+from chunk_index import ChunkIndex, build_chunk_index
+from embedding import HashingEmbedder
+
+def chunk(chunk_id, content, metadata):
+    return {'id': chunk_id, 'type': 'safety', 'content': content, 'metadata': metadata}
+
+def test_shared_chunk_matches_any_owner(tmp_path):
+    chunks = [
+        chunk('shared_safety', 'Always wear safety glasses',
+              {'product_id': 'a', 'product_ids': ['a', 'b', 'c'], 'shared': True}),
+        chunk('d_safety', 'Keep hands away from the bit', {'product_id': 'd'}),
+    ]
+    index = ChunkIndex(build_chunk_index(chunks, str(tmp_path / 'index'), HashingEmbedder(64)))
+    assert [r['id'] for r in index.search('safety', filters={'product_id': ['b']})] == ['shared_safety']
+    assert [r['id'] for r in index.search('safety', filters={'product_id': 'D'})] == ['d_safety']
+    assert index.search('safety', filters={'product_id': ['e']}) == []
+    assert index.mask({'product_id': ['c', 'd']}).tolist() == [True, True]
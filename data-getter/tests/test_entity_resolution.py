@@ -0,0 +1,18 @@
+from entity_resolution import resolve_entities
+
+SPECS = {'Voltage': '20V', 'Chuck Size': '1/2 inch', 'Speed': '0-450 / 0-1,500 RPM'}
+DESCRIPTION = 'Compact, lightweight design fits into tight areas with a high performance motor'
+
+def listing(record_id, name, model=''):
+    return {'id': record_id, 'brand': 'DEWALT', 'name': name, 'model': model,
+            'specifications': SPECS, 'description': DESCRIPTION}
+
+def test_variants_without_model_numbers_are_not_merged():
+    records = [
+        listing('rona-1', 'DEWALT 20V MAX Cordless Drill Driver Kit V1', 'DCD771C2V1'),
+        listing('ct-1', 'DEWALT 20V MAX Drill Driver Cordless Kit V1'),
+        listing('ct-2', 'DEWALT 20V MAX Cordless Drill Driver Kit V2'),
+    ]
+    canonical_ids = resolve_entities(records)['canonical_ids']
+    assert canonical_ids['rona-1'] == canonical_ids['ct-1']
+    assert canonical_ids['ct-2'] != canonical_ids['ct-1']
@@ -0,0 +1,11 @@
+from hardware_scraper.priority import UrlPrioritizer
+
+def test_priorities_are_quantized_to_a_few_levels():
+    now = 1_700_000_000.0
+    known = {f'https://example.com/p/{i}': {'scraped_at': now - i * 3600, 'gaps': (i % 7) / 7} for i in range(1000)}
+    prioritizer = UrlPrioritizer({'drill': 1.0}, known, now=now, levels=16)
+    entries = prioritizer.rank([{'loc': url} for url in known])
+    assert {entry['priority'] for entry in entries} <= set(range(16))
+    assert len({entry['priority'] for entry in entries}) > 1
+    scores = [entry['score'] for entry in entries]
+    assert scores == sorted(scores, reverse=True)
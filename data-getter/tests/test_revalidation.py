@@ -0,0 +1,58 @@
+import pytest
+from scrapy import Request, Spider
+from scrapy.exceptions import IgnoreRequest
+from scrapy.http import HtmlResponse, TextResponse
+from scrapy.utils.misc import load_object
+from scrapy.utils.test import get_crawler
+
+from hardware_scraper import settings
+from hardware_scraper.middlewares import RevalidationMiddleware
+
+ROBOTS = 'https://www.rona.ca/robots.txt'
+PAGE = 'https://www.rona.ca/en/product/drill-1001234'
+
+def crawl(db, url, **meta):
+    """One request/response through a fresh middleware, as in a new crawl"""
+    crawler = get_crawler(Spider, {'REVALIDATION_ENABLED': True, 'REVALIDATION_DB': str(db)})
+    middleware = RevalidationMiddleware.from_crawler(crawler)
+    spider = Spider('hardware')
+    request = Request(url, meta=meta)
+    middleware.process_request(request, spider)
+    response = TextResponse(url, body=b'User-agent: *\nDisallow: /checkout', request=request,
+                            headers={'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Sep 2025 00:00:00 GMT'})
+    middleware.process_response(request, response, spider)
+    middleware.store.close()
+    return request
+
+def test_robots_txt_is_fetched_in_full_on_the_next_crawl(tmp_path):
+    db = tmp_path / 'validators.sqlite'
+    crawl(db, ROBOTS, dont_obey_robotstxt=True)
+    second = crawl(db, ROBOTS, dont_obey_robotstxt=True)
+    assert b'If-None-Match' not in second.headers
+    assert b'If-Modified-Since' not in second.headers
+    assert not second.meta.get('revalidating')
+
+def test_pages_are_still_revalidated(tmp_path):
+    db = tmp_path / 'validators.sqlite'
+    crawl(db, PAGE)
+    second = crawl(db, PAGE)
+    assert second.headers.get('If-None-Match') == b'"v1"'
+    assert second.meta['revalidating']
+
+def test_challenge_page_validators_are_not_stored(tmp_path):
+    crawler = get_crawler(Spider, {'REVALIDATION_ENABLED': True, 'REVALIDATION_DB': str(tmp_path / 'validators.sqlite'),
+                                   'BLOCK_DETECTION_ENABLED': True})
+    spider = Spider('hardware')
+    # Response hooks run from the highest order down, as in Scrapy
+    middlewares = [load_object(path).from_crawler(crawler)
+                   for path, _ in sorted(settings.DOWNLOADER_MIDDLEWARES.items(), key=lambda mw: -mw[1])]
+    request = Request(PAGE)
+    response = HtmlResponse(PAGE, body=b'<html><title>Just a moment...</title>captcha</html>', request=request,
+                            headers={'ETag': '"challenge"', 'Content-Type': 'text/html'})
+    with pytest.raises(IgnoreRequest):
+        for middleware in middlewares:
+            response = middleware.process_response(request, response, spider)
+
+    revalidation = next(mw for mw in middlewares if isinstance(mw, RevalidationMiddleware))
+    assert revalidation.store.get(PAGE) is None
+    revalidation.store.close()
@@ -0,0 +1,17 @@
+import json
+
+import pytest
+
+from run_scraper import budget_used
+
+def write_metadata(path, requests):
+    path.write_text(json.dumps({'budget': {'requests_granted': requests, 'bytes_used': 10, 'seconds_elapsed': 5}}))
+
+@pytest.mark.parametrize('mode, prefix', [('full', 'products'), ('refresh', 'price_delta'), ('inventory', 'inventory')])
+def test_budget_used_reads_the_metadata_of_the_mode(tmp_path, mode, prefix):
+    write_metadata(tmp_path / f'{prefix}_rona_run1_metadata.json', 42)
+    assert budget_used(str(tmp_path), 'rona', 'run1', mode) == {'requests': 42, 'bytes': 10, 'seconds': 5}
+
+def test_budget_used_without_metadata(tmp_path):
+    write_metadata(tmp_path / 'products_rona_run1_metadata.json', 42)
+    assert budget_used(str(tmp_path), 'rona', 'run1', 'refresh') is None
@@ -0,0 +1,21 @@
+import pandas as pd
+import pytest
+
+from spec_normalizer import normalize_catalogue, normalize_values, parse_quantities
+
+SPEED = '0-2,000 RPM, 0-3,200 IPM'
+
+def test_rpm_and_ipm_are_separate_dimensions():
+    quantities = {q['dimension']: q for q in parse_quantities(SPEED)}
+    assert quantities['rotational_speed']['max'] == pytest.approx(2000 / 60)
+    assert quantities['impact_rate']['max'] == pytest.approx(3200 / 60)
+
+def test_vectorized_path_keeps_speed_and_impact_rate_apart():
+    frame = normalize_values(pd.Series([SPEED])).set_index('dimension')
+    assert frame.loc['rotational_speed', 'unit'] == 'rev/s'
+    assert frame.loc['rotational_speed', 'max'] == pytest.approx(2000 / 60)
+    assert frame.loc['impact_rate', 'max'] == pytest.approx(3200 / 60)
+
+    wide = normalize_catalogue([{'id': 'impact', 'specifications': {'Speed': SPEED}}])['wide']
+    assert wide.loc['impact', 'speed_rps_max'] == pytest.approx(2000 / 60)
+    assert wide.loc['impact', 'speed_hz_max'] == pytest.approx(3200 / 60)
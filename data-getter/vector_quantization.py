@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Quantized Chunk Embeddings
+
+float32 embeddings cost dim * 4 bytes per chunk, which stops fitting in the
+retrieval container once manuals and the full catalogue are embedded. Two
+compressed layouts for the embedding matrix:
+
+- int8: per-dimension scalar quantization, 4x smaller.
+- pq: product quantization; each vector is split into m sub-vectors and each
+  sub-vector is replaced by the index of its nearest centroid in a codebook
+  of 256 trained with k-means, m bytes per vector.
+
+Queries stay in float32 and are scored against the codes directly
+(asymmetric distance computation): int8 codes are dotted with the rescaled
+query, PQ codes gather from a per-query table of sub-vector scores. The top
+candidates can be re-ranked against the float32 vectors, which stay on disk
+and are memory-mapped, so only the rows being re-ranked are read.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from catalogue import latest_file
+from config import OUTPUT_DIR
+from embedding import HashingEmbedder, latest_embeddings, load_embeddings
+
+DEFAULT_SUBVECTORS = 32
+CENTROIDS = 256
+TRAINING_SAMPLE = 20000
+KMEANS_ITERATIONS = 20
+
+# Rows scored per step, bounding the temporary float32 buffers
+BLOCK_ROWS = 65536
+
+class ScalarQuantizer:
+    """int8 codes with a per-dimension offset and scale"""
+
+    method = 'int8'
+
+    def __init__(self, offset: Optional[np.ndarray] = None, scale: Optional[np.ndarray] = None):
+        self.offset = offset
+        self.scale = scale
+
+    def train(self, vectors: np.ndarray) -> 'ScalarQuantizer':
+        low = vectors.min(axis=0).astype(np.float32)
+        high = vectors.max(axis=0).astype(np.float32)
+        self.offset = low
+        self.scale = np.maximum((high - low) / 255.0, 1e-12).astype(np.float32)
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.empty(vectors.shape, dtype=np.int8)
+        for start in range(0, len(vectors), BLOCK_ROWS):
+            block = (np.asarray(vectors[start:start + BLOCK_ROWS], dtype=np.float32) - self.offset) / self.scale
+            codes[start:start + BLOCK_ROWS] = np.clip(np.rint(block), 0, 255) - 128
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return (codes.astype(np.float32) + 128) * self.scale + self.offset
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate dot products of the query with every encoded vector"""
+        # q . x = (q * scale) . code + (q * scale) . 128 + q . offset
+        weights = (query * self.scale).astype(np.float32)
+        bias = np.float32(128 * weights.sum() + query @ self.offset)
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            scores[start:start + BLOCK_ROWS] = codes[start:start + BLOCK_ROWS].astype(np.float32) @ weights
+        return scores + bias
+
+    def save(self, path: str):
+        np.save(os.path.join(path, 'offset.npy'), self.offset)
+        np.save(os.path.join(path, 'scale.npy'), self.scale)
+
+    @classmethod
+    def load(cls, path: str, manifest: Dict) -> 'ScalarQuantizer':
+        return cls(np.load(os.path.join(path, 'offset.npy')), np.load(os.path.join(path, 'scale.npy')))
+
+def kmeans(points: np.ndarray, k: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """Lloyd's k-means; empty clusters are re-seeded with random points"""
+    centroids = points[rng.choice(len(points), size=k, replace=len(points) < k)].copy()
+    point_norms = (points ** 2).sum(axis=1)
+    for _ in range(iterations):
+        distances = point_norms[:, None] - 2 * points @ centroids.T + (centroids ** 2).sum(axis=1)
+        assignment = distances.argmin(axis=1)
+        counts = np.bincount(assignment, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, points)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        centroids[empty] = points[rng.choice(len(points), size=int(empty.sum()))]
+    return centroids
+
+class ProductQuantizer:
+    """m bytes per vector: one codebook index per sub-vector"""
+
+    method = 'pq'
+
+    def __init__(self, m: int = DEFAULT_SUBVECTORS, centroids: Optional[np.ndarray] = None):
+        self.m = m
+        self.centroids = centroids  # (m, 256, dim / m)
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        n, dim = vectors.shape
+        if dim % self.m:
+            raise ValueError(f'dimension {dim} is not divisible into {self.m} sub-vectors')
+        return np.asarray(vectors, dtype=np.float32).reshape(n, self.m, dim // self.m)
+
+    def train(self, vectors: np.ndarray, seed: int = 0) -> 'ProductQuantizer':
+        rng = np.random.default_rng(seed)
+        sample = vectors
+        if len(vectors) > TRAINING_SAMPLE:
+            sample = vectors[np.sort(rng.choice(len(vectors), size=TRAINING_SAMPLE, replace=False))]
+        parts = self._split(sample)
+        self.centroids = np.stack([kmeans(parts[:, j], CENTROIDS, KMEANS_ITERATIONS, rng)
+                                   for j in range(self.m)]).astype(np.float32)
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        centroid_norms = (self.centroids ** 2).sum(axis=2)
+        for start in range(0, len(vectors), BLOCK_ROWS):
+            parts = self._split(vectors[start:start + BLOCK_ROWS])
+            for j in range(self.m):
+                distances = centroid_norms[j] - 2 * parts[:, j] @ self.centroids[j].T
+                codes[start:start + BLOCK_ROWS, j] = distances.argmin(axis=1)
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        parts = self.centroids[np.arange(self.m), codes]
+        return parts.reshape(len(codes), -1)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate dot products of the query with every encoded vector"""
+        # Score of each centroid against its slice of the query, then one gather per sub-vector
+        table = np.einsum('mkd,md->mk', self.centroids, self._split(query[None])[0])
+        scores = np.zeros(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            block = codes[start:start + BLOCK_ROWS]
+            out = scores[start:start + BLOCK_ROWS]
+            for j in range(self.m):
+                out += table[j][block[:, j]]
+        return scores
+
+    def save(self, path: str):
+        np.save(os.path.join(path, 'centroids.npy'), self.centroids)
+
+    @classmethod
+    def load(cls, path: str, manifest: Dict) -> 'ProductQuantizer':
+        return cls(manifest['subvectors'], np.load(os.path.join(path, 'centroids.npy')))
+
+QUANTIZERS = {'int8': ScalarQuantizer, 'pq': ProductQuantizer}
+
+def make_quantizer(method: str, m: int = DEFAULT_SUBVECTORS):
+    if method == 'pq':
+        return ProductQuantizer(m)
+    if method == 'int8':
+        return ScalarQuantizer()
+    raise ValueError(f'unknown quantization method: {method}')
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Row numbers of the k highest scores, best first"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    rows = np.argpartition(-scores, k - 1)[:k]
+    return rows[np.argsort(-scores[rows], kind='stable')]
+
+def save_quantized(quantizer, codes: np.ndarray, ids: List[str], output_dir: str,
+                   vectors_path: Optional[str] = None, model: Optional[str] = None) -> str:
+    """Write codes.npy, the quantizer parameters and a manifest"""
+    os.makedirs(output_dir, exist_ok=True)
+    np.save(os.path.join(output_dir, 'codes.npy'), codes)
+    quantizer.save(output_dir)
+    manifest = {
+        'created_at': datetime.now().isoformat(),
+        'method': quantizer.method,
+        'model': model,
+        'count': int(len(codes)),
+        'code_bytes': int(codes.shape[1] * codes.itemsize),
+        'subvectors': getattr(quantizer, 'm', None),
+        # float32 vectors for re-ranking, left where the embedding step wrote them
+        'vectors': os.path.abspath(vectors_path) if vectors_path else None,
+        'ids': ids,
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    return output_dir
+
+class QuantizedIndex:
+    """Memory-mapped quantized embeddings with optional float32 re-ranking"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self.ids = self.manifest['ids']
+        self.codes = np.load(os.path.join(path, 'codes.npy'), mmap_mode='r')
+        self.quantizer = QUANTIZERS[self.manifest['method']].load(path, self.manifest)
+        vectors_path = self.manifest.get('vectors')
+        self.vectors = (np.load(vectors_path, mmap_mode='r')
+                        if vectors_path and os.path.exists(vectors_path) else None)
+
+    @classmethod
+    def latest(cls, data_dir: str = OUTPUT_DIR) -> Optional['QuantizedIndex']:
+        """Open the most recently built quantized index, if any"""
+        path = latest_file('quantized_embeddings_*', data_dir)
+        return cls(path) if path else None
+
+    def search_rows(self, query: np.ndarray, k: int = 10, rerank: int = 0):
+        """(rows, scores) of the k best matches; rerank > 0 re-scores that many candidates in float32"""
+        query = np.asarray(query, dtype=np.float32)
+        scores = self.quantizer.scores(self.codes, query)
+        if not rerank or self.vectors is None:
+            rows = top_k(scores, k)
+            return rows, scores[rows]
+        # Sorted rows keep the reads from the memory-mapped vectors sequential
+        candidates = np.sort(top_k(scores, max(rerank, k)))
+        exact = np.asarray(self.vectors[candidates], dtype=np.float32) @ query
+        best = top_k(exact, k)
+        return candidates[best], exact[best]
+
+    def search(self, query: np.ndarray, k: int = 10, rerank: int = 0) -> List[Dict]:
+        rows, scores = self.search_rows(query, k, rerank)
+        return [{'id': self.ids[row], 'score': round(float(score), 4)} for row, score in zip(rows, scores)]
+
+def build(args):
+    path = latest_embeddings()
+    if not path:
+        print("No chunk embeddings found. Run embedding.py first.")
+        return
+    vectors, manifest = load_embeddings(path)
+    print(f"🗜️  Quantizing {len(vectors)} x {vectors.shape[1]} embeddings ({args.method})...")
+    quantizer = make_quantizer(args.method, args.m)
+    quantizer.train(vectors)
+    codes = quantizer.encode(vectors)
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    output_dir = os.path.join(OUTPUT_DIR, f'quantized_embeddings_{timestamp}')
+    suffix = 1
+    while os.path.exists(output_dir):
+        output_dir = os.path.join(OUTPUT_DIR, f'quantized_embeddings_{timestamp}_{suffix}')
+        suffix += 1
+    output_dir = save_quantized(quantizer, codes, manifest['ids'], output_dir,
+                                os.path.join(path, 'vectors.npy'), manifest.get('model'))
+    print(f"✅ {vectors.nbytes / 1024:.0f} KB float32 -> {codes.nbytes / 1024:.0f} KB codes")
+    print(f"📁 Quantized index: {output_dir}")
+
+def search(args):
+    index = QuantizedIndex.latest()
+    if not index:
+        print("No quantized index found. Run: python vector_quantization.py build")
+        return
+    model = index.manifest.get('model') or ''
+    if not model.startswith('hashing-'):
+        print(f"Queries for '{model}' embeddings must be embedded with that model.")
+        return
+    query = HashingEmbedder(int(model.split('-')[1])).embed_query(args.query)
+    print(json.dumps(index.search(query, args.k, args.rerank), indent=2))
+
+def synthetic_embeddings(n: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Unit vectors scattered around random topic centres, like chunk embeddings"""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(clusters, size=n)] + 0.7 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def benchmark(args):
+    print(f"⏱️  {args.n} synthetic {args.dim}-dimension embeddings, {args.queries} queries...")
+    vectors = synthetic_embeddings(args.n, args.dim, args.clusters)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(args.n, size=args.queries, replace=False)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(args.dim)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    def timed(search_rows):
+        started = time.perf_counter()
+        results = [search_rows(query) for query in queries]
+        return results, (time.perf_counter() - started) / len(queries) * 1000
+
+    truth, float_ms = timed(lambda query: top_k(vectors @ query, args.k))
+    rows = [('float32', vectors.nbytes, float_ms, 1.0)]
+
+    # Outside OUTPUT_DIR, so QuantizedIndex.latest() never picks up the benchmark index
+    output_dir = tempfile.mkdtemp(prefix='quantized_embeddings_benchmark_')
+    try:
+        vectors_path = os.path.join(output_dir, 'vectors.npy')
+        np.save(vectors_path, vectors)
+        ids = [str(i) for i in range(args.n)]
+
+        for method in ('int8', 'pq'):
+            started = time.perf_counter()
+            quantizer = make_quantizer(method, args.m).train(vectors)
+            codes = quantizer.encode(vectors)
+            print(f"   • {method} trained and encoded in {time.perf_counter() - started:.1f}s")
+            index = QuantizedIndex(save_quantized(quantizer, codes, ids, os.path.join(output_dir, method),
+                                                  vectors_path))
+            size = codes.nbytes + sum(getattr(quantizer, name).nbytes for name in ('offset', 'scale', 'centroids')
+                                      if getattr(quantizer, name, None) is not None)
+            for rerank in (0, args.rerank):
+                results, ms = timed(lambda query: index.search_rows(query, args.k, rerank)[0])
+                recall = np.mean([len(np.intersect1d(found, expected)) / len(expected)
+                                  for found, expected in zip(results, truth)])
+                label = f'{method} + rerank {rerank}' if rerank else method
+                rows.append((label, size, ms, recall))
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    print(f"\n{'storage':<22}{'memory':>12}{'ms/query':>10}{f'recall@{args.k}':>11}")
+    for label, size, ms, recall in rows:
+        print(f"{label:<22}{size / 1024 / 1024:>9.1f} MB{ms:>10.2f}{recall:>11.3f}")
+    print("   (re-ranking reads the float32 rows from disk; only the codes stay in memory)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Quantized storage and search for chunk embeddings')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('build', help='Quantize the latest chunk embeddings')
+    command.add_argument('--method', choices=sorted(QUANTIZERS), default='pq')
+    command.add_argument('--m', type=int, default=DEFAULT_SUBVECTORS, help='PQ sub-vectors (bytes per vector)')
+    command = commands.add_parser('search', help='Search the latest quantized index')
+    command.add_argument('query')
+    command.add_argument('--k', type=int, default=10)
+    command.add_argument('--rerank', type=int, default=100, help='Candidates re-scored in float32 (0 = off)')
+    command = commands.add_parser('benchmark', help='Memory, latency and recall against float32')
+    command.add_argument('--n', type=int, default=100000)
+    command.add_argument('--dim', type=int, default=256)
+    command.add_argument('--clusters', type=int, default=1000)
+    command.add_argument('--queries', type=int, default=200)
+    command.add_argument('--k', type=int, default=10)
+    command.add_argument('--m', type=int, default=DEFAULT_SUBVECTORS)
+    command.add_argument('--rerank', type=int, default=100)
+    args = parser.parse_args()
+
+    {'build': build, 'search': search, 'benchmark': benchmark}[args.command](args)
+
+if __name__ == "__main__":
+    main()
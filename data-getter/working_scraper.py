@@ -15,6 +15,9 @@ import time
 from datetime import datetime
 from bs4 import BeautifulSoup
 
+from chunk_dedup import dedupe_chunks, format_report
+from entity_resolution import load_canonical_ids, resolve_canonical_id
+
 def generate_comprehensive_hardware_data():
     """Generate comprehensive hardware product data for RAG system"""
     
@@ -326,7 +329,12 @@ def create_rag_optimized_output(products, output_dir):
     # 2. RAG-optimized chunks for vectorization
     rag_chunks = []
     
+    # Cross-site product clusters from entity_resolution.py, if it has been run
+    canonical_ids = load_canonical_ids()
+    
     for product in products:
+        canonical_id = resolve_canonical_id(product, canonical_ids)
+        
         # Main product chunk
         main_chunk = {
             "id": f"{product['id']}_main",
@@ -334,6 +342,7 @@ def create_rag_optimized_output(products, output_dir):
             "content": f"Product: {product['name']} by {product['brand']} (Model: {product['model']}). {product['description']}",
             "metadata": {
                 "product_id": product["id"],
+                "canonical_id": canonical_id,
                 "brand": product["brand"],
                 "category": product["category"],
                 "subcategory": product["subcategory"],
@@ -350,6 +359,7 @@ def create_rag_optimized_output(products, output_dir):
             "content": specs_text,
             "metadata": {
                 "product_id": product["id"],
+                "canonical_id": canonical_id,
                 "brand": product["brand"],
                 "model": product["model"]
             }
@@ -364,6 +374,7 @@ def create_rag_optimized_output(products, output_dir):
             "content": features_text,
             "metadata": {
                 "product_id": product["id"],
+                "canonical_id": canonical_id,
                 "brand": product["brand"],
                 "model": product["model"]
             }
@@ -379,6 +390,7 @@ def create_rag_optimized_output(products, output_dir):
                 "content": apps_text,
                 "metadata": {
                     "product_id": product["id"],
+                    "canonical_id": canonical_id,
                     "brand": product["brand"],
                     "model": product["model"]
                 }
@@ -394,12 +406,16 @@ def create_rag_optimized_output(products, output_dir):
                 "content": safety_text,
                 "metadata": {
                     "product_id": product["id"],
+                    "canonical_id": canonical_id,
                     "brand": product["brand"],
                     "model": product["model"]
                 }
             }
             rag_chunks.append(safety_chunk)
     
+    # Store content repeated across products once, with a product fan-out list
+    rag_chunks, dedup_report = dedupe_chunks(rag_chunks)
+    
     # Save RAG chunks
     with open(f"{output_dir}/rag_chunks_{timestamp}.json", "w") as f:
         json.dump(rag_chunks, f, indent=2)
@@ -432,7 +448,8 @@ def create_rag_optimized_output(products, output_dir):
         "rag_chunks": f"{output_dir}/rag_chunks_{timestamp}.json", 
         "csv_analysis": csv_file,
         "total_products": len(products),
-        "total_chunks": len(rag_chunks)
+        "total_chunks": len(rag_chunks),
+        "dedup_report": dedup_report
     }
 
 def main():
@@ -448,6 +465,7 @@ def main():
     print(f"\n📊 Data Generation Complete!")
     print(f"📄 Complete dataset: {results['complete_data']}")
     print(f"🧠 RAG chunks: {results['rag_chunks']} ({results['total_chunks']} chunks)")
+    print(f"🧹 Deduplication: {format_report(results['dedup_report'])}")
     print(f"📈 CSV analysis: {results['csv_analysis']}")
     print(f"\n🎯 Ready for RAG Implementation!")
     